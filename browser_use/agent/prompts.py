@@ -4,7 +4,7 @@ from typing import TYPE_CHECKING, Optional
 
 from browser_use.llm.messages import ContentPartImageParam, ContentPartTextParam, ImageURL, SystemMessage, UserMessage
 from browser_use.observability import observe_debug
-from browser_use.utils import is_new_tab_page
+from browser_use.utils import get_image_media_type, is_new_tab_page
 
 if TYPE_CHECKING:
 	from browser_use.agent.views import AgentStepInfo
@@ -279,11 +279,12 @@ Interactive elements from top layer of the current page inside the viewport{trun
 				content_parts.append(ContentPartTextParam(text=label))
 
 				# Add the screenshot
+				media_type = get_image_media_type(screenshot)
 				content_parts.append(
 					ContentPartImageParam(
 						image_url=ImageURL(
-							url=f'data:image/png;base64,{screenshot}',
-							media_type='image/png',
+							url=f'data:{media_type};base64,{screenshot}',
+							media_type=media_type,
 						),
 					)
 				)
@@ -1,5 +1,6 @@
 import asyncio
 import gc
+import hashlib
 import inspect
 import json
 import logging
@@ -49,6 +50,7 @@ from browser_use.agent.views import (
 	AgentStepInfo,
 	AgentStructuredOutput,
 	BrowserStateHistory,
+	LLMResponseCache,
 	StepMetadata,
 )
 from browser_use.browser import BrowserProfile, BrowserSession
@@ -170,6 +172,7 @@ class Agent(Generic[Context, AgentStructuredOutput]):
 		calculate_cost: bool = False,
 		display_files_in_done_text: bool = True,
 		include_tool_call_examples: bool = False,
+		llm_response_cache: LLMResponseCache | None = None,
 		**kwargs,
 	):
 		# Check for deprecated planner parameters
@@ -411,6 +414,11 @@ class Agent(Generic[Context, AgentStructuredOutput]):
 							f'   This may be a security risk as credentials could be used on unintended domains.'
 						)
 
+		# LLM response cache, keyed per step by _get_llm_cache_key
+		self.llm_response_cache = llm_response_cache
+		self.llm_cache_key: str | None = None
+		self.llm_cache_hit = False
+
 		# Callbacks
 		self.register_new_step_callback = register_new_step_callback
 		self.register_done_callback = register_done_callback
@@ -659,12 +667,15 @@ class Agent(Generic[Context, AgentStructuredOutput]):
 		"""Execute one step of the task"""
 		# Initialize timing first, before any exceptions can occur
 		self.step_start_time = time.time()
+		self.llm_time_taken = 0.0
 
 		browser_state_summary = None
 
 		try:
 			# Phase 1: Prepare context and timing
 			browser_state_summary = await self._prepare_context(step_info)
+			self.llm_cache_hit = False
+			self.llm_cache_key = self._get_llm_cache_key(browser_state_summary) if self.llm_response_cache else None
 
 			self.logger.info(f'---------- 🧠 BUGOWL: Invoking LLM: {self.llm.provider} / {self.llm.model} ----------\n')
 			start_time = time.time()
@@ -673,10 +684,12 @@ class Agent(Generic[Context, AgentStructuredOutput]):
 			await self._get_next_action(browser_state_summary)
 
 			elapsed = time.time() - start_time
+			self.llm_time_taken = elapsed
 			self.logger.info(f'⏱️ LLM call took {elapsed:.2f} seconds')
 
 			# Phase 2.5: Execute actions
 			await self._execute_actions()
+			await self._update_llm_response_cache()
 
 			# Phase 3: Post-processing
 			await self._post_process()
@@ -824,6 +837,9 @@ class Agent(Generic[Context, AgentStructuredOutput]):
 			else:
 				self.logger.error(f'{prefix}{error_msg}')
 
+		if self.llm_response_cache and self.llm_cache_key and self.llm_cache_hit:
+			await self.llm_response_cache.invalidate(self.llm_cache_key)
+
 		self.state.last_result = [ActionResult(error=error_msg)]
 		return None
 
@@ -965,6 +981,42 @@ class Agent(Generic[Context, AgentStructuredOutput]):
 
 		self.state.history.history.append(history_item)
 
+	def _get_llm_cache_key(self, browser_state_summary: BrowserStateSummary) -> str:
+		"""Hash everything the next action depends on: task, model, system prompt, page elements, URL and previous actions"""
+		previous_actions = [
+			action.model_dump(exclude_none=True, mode='json')
+			for history_item in self.state.history.history
+			if history_item.model_output
+			for action in history_item.model_output.action
+		]
+		key_data = {
+			'task': self.task,
+			'model': self.llm.model,
+			'system_prompt_hash': hashlib.sha256(self._message_manager.system_prompt.text.encode()).hexdigest(),
+			'clickable_elements': browser_state_summary.element_tree.clickable_elements_to_string(
+				include_attributes=self.settings.include_attributes
+			),
+			'url': browser_state_summary.url,
+			'previous_actions': previous_actions,
+			'done_only': self.AgentOutput is self.DoneAgentOutput,
+		}
+		return hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode()).hexdigest()
+
+	async def _update_llm_response_cache(self) -> None:
+		"""Cache the model output of a step whose actions succeeded, and drop a cached output whose actions failed"""
+		if not self.llm_response_cache or not self.llm_cache_key or self.state.last_model_output is None:
+			return
+
+		results = self.state.last_result or []
+		failed = any(result.error or result.success is False for result in results)
+		if failed:
+			if self.llm_cache_hit:
+				await self.llm_response_cache.invalidate(self.llm_cache_key)
+		elif not self.llm_cache_hit:
+			await self.llm_response_cache.set(
+				self.llm_cache_key, self.state.last_model_output.model_dump(exclude_none=True, mode='json')
+			)
+
 	def _remove_think_tags(self, text: str) -> str:
 		THINK_TAGS = re.compile(r'<think>.*?</think>', re.DOTALL)
 		STRAY_CLOSE_TAG = re.compile(r'.*?</think>', re.DOTALL)
@@ -979,6 +1031,19 @@ class Agent(Generic[Context, AgentStructuredOutput]):
 	async def get_model_output(self, input_messages: list[BaseMessage]) -> AgentOutput:
 		"""Get next action from LLM based on current state"""
 
+		if self.llm_response_cache and self.llm_cache_key:
+			cached_output = await self.llm_response_cache.get(self.llm_cache_key)
+			if cached_output is not None:
+				try:
+					parsed = self.AgentOutput.model_validate(cached_output)
+				except ValidationError:
+					await self.llm_response_cache.invalidate(self.llm_cache_key)
+				else:
+					self.llm_cache_hit = True
+					self.logger.info('♻️ Reusing cached LLM response for an identical step')
+					self._log_next_action_summary(parsed)
+					return parsed
+
 		try:
 			response = await self.llm.ainvoke(input_messages, output_format=self.AgentOutput)
 			parsed = response.completion
@@ -1549,6 +1614,81 @@ class Agent(Generic[Context, AgentStructuredOutput]):
 
 		return results
 
+	async def replay_history_until_divergence(
+		self,
+		history: AgentHistoryList,
+		on_step_end: AgentHookFunc | None = None,
+	) -> int:
+		"""
+		Replay a saved history as steps of this agent, without calling the LLM, until it diverges from the page.
+
+		Elements are re-located with HistoryTreeProcessor. Replay stops before a step whose element can't be
+		matched, and after a step whose actions fail, so that run() can continue with the LLM from there.
+		Replayed steps are added to this agent's history and message history like regular steps.
+
+		Args:
+		                history: The history of a previous successful run of the same task
+		                on_step_end: Hook called after each replayed step, like in run()
+
+		Returns:
+		                Number of steps replayed
+		"""
+		assert self.browser_session is not None, 'BrowserSession is not set up'
+		replayed_steps = 0
+		previous_step = None
+
+		for i, history_item in enumerate(history.history):
+			model_output = history_item.model_output
+			if not model_output or not model_output.action or model_output.action == [None]:
+				continue
+
+			self.step_start_time = time.time()
+			self.llm_time_taken = 0.0
+			self.llm_cache_key = None
+			self.llm_cache_hit = False
+			browser_state_summary = await self.browser_session.get_state_summary(cache_clickable_elements_hashes=True)
+
+			interacted_elements = history_item.state.interacted_element or []
+			updated_actions = []
+			for action_index, action in enumerate(model_output.action):
+				historical_element = interacted_elements[action_index] if action_index < len(interacted_elements) else None
+				updated_actions.append(await self._update_action_indices(historical_element, action, browser_state_summary))
+			if any(action is None for action in updated_actions):
+				self.logger.info(
+					f'🔁 Replay stopped at step {i + 1}/{len(history.history)}: element not found on the current page'
+				)
+				break
+
+			try:
+				result = await self.multi_act(updated_actions)  # type: ignore
+			except Exception as e:
+				result = [ActionResult(error=f'Replay of step {i + 1} failed: {e}', include_in_memory=True)]
+
+			# The last replayed step is added to the message history by the next add_state_message() call
+			if previous_step:
+				self._message_manager._update_agent_history_description(*previous_step)
+			self.state.n_steps += 1
+			previous_step = (model_output, result, AgentStepInfo(step_number=self.state.n_steps, max_steps=len(history.history)))
+			self.state.last_model_output = model_output
+			self.state.last_result = result
+			metadata = StepMetadata(
+				step_number=self.state.n_steps, step_start_time=self.step_start_time, step_end_time=time.time()
+			)
+			self._make_history_item(model_output, browser_state_summary, result, metadata)
+			replayed_steps += 1
+			self.logger.info(f'🔁 Replayed step {i + 1}/{len(history.history)}: {model_output.next_goal}')
+
+			if on_step_end is not None:
+				await on_step_end(self)
+
+			if any(r.error for r in result) or result[-1].success is False:
+				self.logger.info(f'🔁 Replay stopped at step {i + 1}/{len(history.history)}: action failed')
+				break
+			if result[-1].is_done:
+				break
+
+		return replayed_steps
+
 	async def _execute_history_step(self, history_item: AgentHistory, delay: float) -> list[ActionResult]:
 		"""Execute a single step from history with element validation"""
 		assert self.browser_session is not None, 'BrowserSession is not set up'
@@ -4,7 +4,7 @@ import json
 import traceback
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Generic
+from typing import Any, Generic, Protocol
 
 from openai import RateLimitError
 from pydantic import BaseModel, ConfigDict, Field, ValidationError, create_model, model_validator
@@ -65,6 +65,16 @@ class AgentSettings(BaseModel):
 	include_tool_call_examples: bool = False
 
 
+class LLMResponseCache(Protocol):
+	"""Stores model outputs keyed by a hash of the step inputs, so an identical step can skip the LLM call"""
+
+	async def get(self, key: str) -> dict[str, Any] | None: ...
+
+	async def set(self, key: str, output: dict[str, Any]) -> None: ...
+
+	async def invalidate(self, key: str) -> None: ...
+
+
 class AgentState(BaseModel):
 	"""Holds all state information for an Agent"""
 
@@ -346,6 +356,11 @@ class AgentHistoryList(BaseModel, Generic[AgentStructuredOutput]):
 		"""Load history from JSON file"""
 		with open(filepath, encoding='utf-8') as f:
 			data = json.load(f)
+		return cls.load_from_dict(data, output_model)
+
+	@classmethod
+	def load_from_dict(cls, data: dict[str, Any], output_model: type[AgentOutput]) -> AgentHistoryList:
+		"""Load history from a dict produced by model_dump()"""
 		# loop through history and validate output_model actions to enrich with custom actions
 		for h in data['history']:
 			if h['model_output']:
@@ -0,0 +1,157 @@
+"""Per-page cache of the latest viewport capture, shared by the agent's state capture and live streaming."""
+
+from __future__ import annotations
+
+import base64
+import logging
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Installs a counter of DOM mutations and user-visible events on the page (once per document) and returns
+# the signature of what the viewport shows: document id, mutation count, URL, scroll position and size.
+PAGE_SIGNATURE_JS = """() => {
+	let state = window.__browserUseFrameCache;
+	if (!state) {
+		state = window.__browserUseFrameCache = { id: Math.random().toString(36).slice(2), changes: 0 };
+		const bump = () => { state.changes++; };
+		new MutationObserver((mutations) => { state.changes += mutations.length; }).observe(document, {
+			subtree: true,
+			childList: true,
+			attributes: true,
+			characterData: true,
+		});
+		for (const type of ['input', 'change', 'focusin', 'focusout', 'scroll', 'animationend', 'transitionend', 'load']) {
+			window.addEventListener(type, bump, true);
+		}
+	}
+	return [state.id, state.changes, location.href, window.scrollX, window.scrollY, window.innerWidth, window.innerHeight];
+}"""
+
+
+@dataclass
+class CachedFrame:
+	"""One viewport capture of a page and the page signature taken right before it."""
+
+	signature: tuple
+	source: str
+	image_format: str
+	quality: int | None = None
+	captured_at: float = field(default_factory=time.monotonic)
+	_data: bytes | None = None
+	_data_b64: str | None = None
+
+	@property
+	def data(self) -> bytes:
+		if self._data is None:
+			self._data = base64.b64decode(self._data_b64)  # type: ignore
+		return self._data
+
+	@property
+	def data_b64(self) -> str:
+		if self._data_b64 is None:
+			self._data_b64 = base64.b64encode(self._data).decode('utf-8')  # type: ignore
+		return self._data_b64
+
+	def age(self) -> float:
+		return time.monotonic() - self.captured_at
+
+
+class FrameCache:
+	"""
+	Keeps the latest viewport capture of each page, so a consumer (agent state capture, live streaming) can
+	reuse a fresh capture of the unchanged viewport made by another one instead of capturing again.
+
+	A capture is reused only if the page signature (see PAGE_SIGNATURE_JS) still matches and it is at most
+	max_age seconds old, which bounds staleness from changes the signature cannot see (canvas, video, :hover).
+	"""
+
+	def __init__(self):
+		self.frames: weakref.WeakKeyDictionary[Any, CachedFrame] = weakref.WeakKeyDictionary()
+		self.reused: dict[str, int] = {}
+		self.captured: dict[str, int] = {}
+
+	async def get_page_signature(self, page) -> tuple | None:
+		"""Signature of what the viewport of the page shows, or None if the page could not be evaluated."""
+		try:
+			return tuple(await page.evaluate(PAGE_SIGNATURE_JS))
+		except Exception as e:
+			logger.debug(f'Failed to get page signature for the frame cache: {type(e).__name__}: {e}')
+			return None
+
+	def lookup(
+		self,
+		page,
+		signature: tuple | None,
+		consumer: str,
+		max_age: float,
+		sources: tuple[str, ...] | None = None,
+		image_formats: tuple[str, ...] | None = None,
+		min_jpeg_quality: int = 0,
+	) -> CachedFrame | None:
+		"""
+		Get the latest capture of the page if it can stand in for a new one.
+
+		Args:
+			page: The Playwright page.
+			signature: The current page signature, from get_page_signature.
+			consumer: Name of the caller, for the reuse stats.
+			max_age: Maximum age of the capture in seconds.
+			sources: Only reuse captures made by these consumers.
+			image_formats: Only reuse captures in these formats.
+			min_jpeg_quality: Only reuse JPEG captures of at least this quality.
+		"""
+		frame = self.frames.get(page)
+		if (
+			frame is None
+			or signature is None
+			or frame.signature != signature
+			or frame.age() > max_age
+			or (sources is not None and frame.source not in sources)
+			or (image_formats is not None and frame.image_format not in image_formats)
+			or (frame.image_format == 'jpeg' and (frame.quality or 0) < min_jpeg_quality)
+		):
+			return None
+		self.reused[consumer] = self.reused.get(consumer, 0) + 1
+		return frame
+
+	def record(
+		self,
+		page,
+		signature: tuple | None,
+		consumer: str,
+		data: bytes | None = None,
+		data_b64: str | None = None,
+		image_format: str = 'png',
+		quality: int | None = None,
+	) -> None:
+		"""Record a new viewport capture of the page, as raw bytes or base64."""
+		self.captured[consumer] = self.captured.get(consumer, 0) + 1
+		if signature is None:
+			self.frames.pop(page, None)
+			return
+		self.frames[page] = CachedFrame(
+			signature=signature, source=consumer, image_format=image_format, quality=quality, _data=data, _data_b64=data_b64
+		)
+
+	def summary(self) -> dict[str, dict[str, Any]]:
+		"""Captures and reuses per consumer, with the share of frames that were reused."""
+		summary = {}
+		for consumer in sorted(set(self.reused) | set(self.captured)):
+			reused = self.reused.get(consumer, 0)
+			captured = self.captured.get(consumer, 0)
+			summary[consumer] = {
+				'captured': captured,
+				'reused': reused,
+				'reuse_rate': round(reused / (reused + captured), 3) if reused + captured else 0.0,
+			}
+		return summary
+
+	def reset(self) -> None:
+		"""Forget all captures and stats, e.g. when the browser is handed to another run."""
+		self.frames.clear()
+		self.reused.clear()
+		self.captured.clear()
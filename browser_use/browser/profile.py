@@ -581,6 +581,17 @@ class BrowserProfile(BrowserConnectArgs, BrowserLaunchPersistentContextArgs, Bro
 	include_dynamic_attributes: bool = Field(default=True, description='Include dynamic attributes in selectors.')
 	highlight_elements: bool = Field(default=True, description='Highlight interactive elements on the page.')
 	viewport_expansion: int = Field(default=500, description='Viewport expansion in pixels for LLM context.')
+	incremental_dom_extraction: bool = Field(
+		default=False,
+		description='Extract the DOM incrementally: only changed nodes are sent and the previous DOM tree is patched in place, so earlier states share (and see updates to) unchanged nodes.',
+	)
+	screenshot_reuse_max_age: float = Field(
+		default=0,
+		description='Reuse a capture of the unchanged viewport (e.g. a live streaming frame) made at most this many seconds ago instead of taking a new screenshot. 0 (default) disables reuse.',
+	)
+	screenshot_reuse_min_jpeg_quality: int = Field(
+		default=60, description='Minimum JPEG quality of a reused capture for the screenshots sent to the LLM.'
+	)
 
 	profile_directory: str = 'Default'  # e.g. 'Profile 1', 'Profile 2', 'Custom Profile', etc.
 
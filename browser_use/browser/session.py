@@ -32,6 +32,7 @@ from playwright._impl._api_structures import ViewportSize
 from pydantic import AliasChoices, BaseModel, ConfigDict, Field, InstanceOf, PrivateAttr, model_validator
 from uuid_extensions import uuid7str
 
+from browser_use.browser.frame_cache import FrameCache
 from browser_use.browser.profile import BROWSERUSE_DEFAULT_CHANNEL, BrowserChannel, BrowserProfile
 from browser_use.browser.types import (
 	Browser,
@@ -290,6 +291,9 @@ class BrowserSession(BaseModel):
 	_owns_browser_resources: bool = PrivateAttr(default=True)  # True if this instance owns and should clean up browser resources
 	_auto_download_pdfs: bool = PrivateAttr(default=True)  # Auto-download PDFs when detected
 	_subprocess: Any = PrivateAttr(default=None)  # Chrome subprocess reference for error handling
+	# Latest viewport capture per page, shared with live streaming
+	_frame_cache: FrameCache = PrivateAttr(default_factory=FrameCache)
+	_state_capture_timings: dict[str, float] = PrivateAttr(default_factory=dict)  # ms per phase of the last state capture
 
 	@model_validator(mode='after')
 	def apply_session_overrides_to_profile(self) -> Self:
@@ -319,6 +323,16 @@ class BrowserSession(BaseModel):
 			self._logger = logging.getLogger(f'browser_use.{self}')
 		return self._logger
 
+	@property
+	def frame_cache(self) -> FrameCache:
+		"""Latest viewport capture per page, shared between state capture and live streaming"""
+		return self._frame_cache
+
+	@property
+	def state_capture_timings(self) -> dict[str, float]:
+		"""Milliseconds spent in each phase of the last browser state capture, with the total."""
+		return self._state_capture_timings
+
 	def __repr__(self) -> str:
 		is_copy = '©' if self._original_browser_session else '#'
 		port_number_or_pid = (
@@ -3216,12 +3230,6 @@ class BrowserSession(BaseModel):
 			raise BrowserError('Page is not accessible')
 
 		try:
-			self.logger.debug('🧹 Removing highlights...')
-			try:
-				await self.remove_highlights()
-			except TimeoutError:
-				self.logger.debug('Timeout to remove highlights')
-
 			# Check for PDF and auto-download if needed
 			try:
 				pdf_path = await self._auto_download_pdf_if_needed(page)
@@ -3230,19 +3238,50 @@ class BrowserSession(BaseModel):
 			except Exception as e:
 				self.logger.debug(f'PDF auto-download check failed: {type(e).__name__}: {e}')
 
-			self.logger.debug('🌳 Starting DOM processing...')
+			timings: dict[str, float] = {}
+
+			async def timed(phase: str, coro):
+				phase_start = time.monotonic()
+				try:
+					return await coro
+				finally:
+					timings[phase] = round((time.monotonic() - phase_start) * 1000, 1)
+
+			capture_start = time.monotonic()
 			dom_service = DomService(page, logger=self.logger)
-			try:
-				content = await asyncio.wait_for(
-					dom_service.get_clickable_elements(
-						focus_element=focus_element,
-						viewport_expansion=self.browser_profile.viewport_expansion,
-						highlight_elements=self.browser_profile.highlight_elements,
+			# The DOM script also removes the previous highlights and measures the page size and scroll position.
+			# Highlights it draws must be in the screenshot, so only without highlights can they run concurrently.
+			concurrent_screenshot = not self.browser_profile.highlight_elements
+			self.logger.debug(
+				'🌳 Starting DOM processing, tabs info and title' + (' and screenshot' if concurrent_screenshot else '')
+			)
+			captures = [
+				timed(
+					'dom',
+					asyncio.wait_for(
+						dom_service.get_clickable_elements(
+							focus_element=focus_element,
+							viewport_expansion=self.browser_profile.viewport_expansion,
+							highlight_elements=self.browser_profile.highlight_elements,
+							incremental=self.browser_profile.incremental_dom_extraction,
+						),
+						timeout=45.0,  # 45 second timeout for DOM processing - generous for complex pages
 					),
-					timeout=45.0,  # 45 second timeout for DOM processing - generous for complex pages
-				)
-				self.logger.debug('✅ DOM processing completed')
-			except TimeoutError:
+				),
+				timed('tabs', self.get_tabs_info()),
+				timed('title', asyncio.wait_for(page.title(), timeout=3.0)),
+			]
+			if concurrent_screenshot:
+				captures.append(timed('screenshot', self.take_screenshot()))
+			results = await asyncio.gather(*captures, return_exceptions=True)
+			content, tabs_info, title = results[:3]
+			if concurrent_screenshot:
+				screenshot_b64 = results[3]
+			else:
+				self.logger.debug('📸 Capturing screenshot...')
+				screenshot_b64 = (await asyncio.gather(timed('screenshot', self.take_screenshot()), return_exceptions=True))[0]
+
+			if isinstance(content, TimeoutError):
 				self.logger.warning(f'DOM processing timed out after 45 seconds for {page.url}')
 				self.logger.warning('🔄 Falling back to minimal DOM state to allow basic navigation...')
 
@@ -3261,10 +3300,12 @@ class BrowserSession(BaseModel):
 				from browser_use.dom.views import DOMState
 
 				content = DOMState(element_tree=minimal_element_tree, selector_map={})
+			elif isinstance(content, BaseException):
+				raise content
+			self.logger.debug('✅ DOM processing completed')
 
-			self.logger.debug('📋 Getting tabs info...')
-			tabs_info = await self.get_tabs_info()
-			self.logger.debug('✅ Tabs info completed')
+			if isinstance(tabs_info, BaseException):
+				raise tabs_info
 
 			# Get all cross-origin iframes within the page and open them in new tabs
 			# mark the titles of the new tabs so the LLM knows to check them for additional content
@@ -3287,30 +3328,26 @@ class BrowserSession(BaseModel):
 			# 		)
 			# 	)
 
-			try:
-				self.logger.debug('📸 Capturing screenshot...')
-				# Reasonable timeout for screenshot
-				screenshot_b64 = await self.take_screenshot()
-				# self.logger.debug('✅ Screenshot completed')
-			except Exception as e:
-				self.logger.warning(f'❌ Screenshot failed for {_log_pretty_url(page.url)}: {type(e).__name__} {e}')
+			if isinstance(screenshot_b64, BaseException):
+				self.logger.warning(
+					f'❌ Screenshot failed for {_log_pretty_url(page.url)}: {type(screenshot_b64).__name__} {screenshot_b64}'
+				)
 				screenshot_b64 = None
 
-			# Get comprehensive page information
-			page_info = await self.get_page_info(page)
-			try:
-				self.logger.debug('📏 Getting scroll info...')
-				pixels_above, pixels_below = await asyncio.wait_for(self.get_scroll_info(page), timeout=5.0)
-				self.logger.debug('✅ Scroll info completed')
-			except Exception as e:
-				self.logger.warning(f'Failed to get scroll info: {type(e).__name__}')
-				pixels_above, pixels_below = 0, 0
-
-			try:
-				title = await asyncio.wait_for(page.title(), timeout=3.0)
-			except Exception:
+			if isinstance(title, BaseException):
 				title = 'Title unavailable'
 
+			# Page size and scroll position come with the DOM tree, except for new tab pages and the fallback state
+			if content.page_metrics:
+				page_info = self._page_info_from_metrics(content.page_metrics)
+			else:
+				page_info = await timed('page_info', self.get_page_info(page))
+			pixels_above, pixels_below = page_info.pixels_above, page_info.pixels_below
+
+			timings['total'] = round((time.monotonic() - capture_start) * 1000, 1)
+			self._state_capture_timings = timings
+			self.logger.debug(f'⏱️ State capture phases (ms): {timings}')
+
 			# Check if this is a minimal fallback state
 			browser_errors = []
 			if not content.selector_map:  # Empty selector map indicates fallback state
@@ -3628,6 +3665,24 @@ class BrowserSession(BaseModel):
 			# return a 1px*1px white png to avoid wasting tokens
 			return 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8/x8AAwMCAO+ip1sAAAAASUVORK5CYII='
 
+		# Reuse a fresh capture of the unchanged viewport, e.g. the latest live streaming frame
+		signature = None
+		reuse_max_age = self.browser_profile.screenshot_reuse_max_age
+		if not full_page and reuse_max_age > 0:
+			signature = await self._frame_cache.get_page_signature(page)
+			cached_frame = self._frame_cache.lookup(
+				page,
+				signature,
+				consumer='agent',
+				max_age=reuse_max_age,
+				min_jpeg_quality=self.browser_profile.screenshot_reuse_min_jpeg_quality,
+			)
+			if cached_frame:
+				self.logger.debug(
+					f'📸 Reusing {cached_frame.image_format} {cached_frame.source} capture from {cached_frame.age():.2f}s ago of unchanged page {_log_pretty_url(page.url)}'
+				)
+				return cached_frame.data_b64
+
 		# Always bring page to front before rendering, otherwise it crashes in some cases, not sure why
 		try:
 			await page.bring_to_front()
@@ -3659,6 +3714,8 @@ class BrowserSession(BaseModel):
 					f'CDP returned empty screenshot data for page {_log_pretty_url(page.url)}? (expected png base64)'
 				)  # have never seen this happen in practice
 
+			if not full_page and reuse_max_age > 0:
+				self._frame_cache.record(page, signature, consumer='agent', data_b64=screenshot_b64, image_format='png')
 			return screenshot_b64
 
 		except Exception as err:
@@ -4299,7 +4356,11 @@ class BrowserSession(BaseModel):
 				scroll_y: window.scrollY || window.pageYOffset || document.documentElement.scrollTop || 0
 			};
 		}""")
+		return self._page_info_from_metrics(page_data)
 
+	@staticmethod
+	def _page_info_from_metrics(page_data: dict) -> PageInfo:
+		"""Build the PageInfo from the raw viewport, page size and scroll metrics of a page."""
 		# Calculate derived values (convert to int to handle fractional pixels)
 		viewport_width = int(page_data['viewport_width'])
 		viewport_height = int(page_data['viewport_height'])
@@ -6,7 +6,7 @@
     debugMode: false,
   }
 ) => {
-  const { doHighlightElements, focusHighlightIndex, viewportExpansion, debugMode } = args;
+  const { doHighlightElements, focusHighlightIndex, viewportExpansion, debugMode, incremental, incrementalGeneration, compact } = args;
   let highlightIndex = 0; // Reset highlight index
 
   // Add caching mechanisms at the top level
@@ -95,6 +95,281 @@
 
   const HIGHLIGHT_CONTAINER_ID = "playwright-highlight-container";
 
+  // Remove the highlights of the previous run here rather than in a separate round-trip before it
+  try {
+    const oldHighlightContainer = document.getElementById(HIGHLIGHT_CONTAINER_ID);
+    if (oldHighlightContainer) {
+      oldHighlightContainer.remove();
+    }
+    document.querySelectorAll('[browser-user-highlight-id^="playwright-highlight-"]').forEach(el => {
+      el.removeAttribute('browser-user-highlight-id');
+    });
+  } catch (e) {
+    console.error('Failed to remove highlights:', e);
+  }
+
+  /**
+   * Incremental mode keeps, per document, stable node ids, the records sent by the last extraction and a cache of
+   * the layout-independent data of each element (xpath, attributes, interactivity). A MutationObserver stamps
+   * mutated nodes with the extraction generation; a cache entry is only reused if neither its element nor any
+   * ancestor mutated since the entry was computed. Layout-dependent checks (visibility, viewport, top element,
+   * highlighting) still run for every node, since scrolling or an overlay changes them without any mutation.
+   * Only the records that changed since the last extraction are returned.
+   *
+   * The state is rebuilt (full extraction) on a new document, when the options or the caller's generation do not
+   * match, when a stylesheet or the <html> element changed, or past INCREMENTAL_MAX_MUTATIONS mutations.
+   */
+  const INCREMENTAL_STATE_KEY = "__browserUseDomTreeState";
+  const INCREMENTAL_MAX_MUTATIONS = 2000;
+  const incrementalConfigKey = `${doHighlightElements}|${focusHighlightIndex}|${viewportExpansion}`;
+
+  function isOwnHighlightMutation(mutation) {
+    const target = mutation.target.nodeType === Node.ELEMENT_NODE ? mutation.target : mutation.target.parentElement;
+    if (target && target.closest && target.closest(`#${HIGHLIGHT_CONTAINER_ID}`)) {
+      return true;
+    }
+    if (mutation.type !== "childList") {
+      return false;
+    }
+    const nodes = [...mutation.addedNodes, ...mutation.removedNodes];
+    return nodes.length > 0 && nodes.every(node => node.id === HIGHLIGHT_CONTAINER_ID);
+  }
+
+  function affectsStyles(mutation) {
+    const target = mutation.target;
+    if (target === document.documentElement || target.nodeName === "STYLE" || target.parentNode?.nodeName === "STYLE") {
+      return true;
+    }
+    return [...mutation.addedNodes, ...mutation.removedNodes].some(
+      node => node.nodeName === "STYLE" || node.nodeName === "LINK"
+    );
+  }
+
+  function recordMutations(state, mutations) {
+    if (state.full) return;
+    state.mutations += mutations.length;
+    if (state.mutations > INCREMENTAL_MAX_MUTATIONS) {
+      state.full = true;
+      return;
+    }
+    for (const mutation of mutations) {
+      if (isOwnHighlightMutation(mutation)) continue;
+      const target = mutation.type === "characterData" ? mutation.target.parentNode : mutation.target;
+      if (!target) continue;
+      if (!document.body || !document.body.contains(target)) {
+        // Outside <body> only stylesheets matter, and they can change any element
+        if (affectsStyles(mutation)) {
+          state.full = true;
+          return;
+        }
+        continue;
+      }
+      state.mutatedAt.set(target, state.generation);
+    }
+  }
+
+  function createIncrementalState() {
+    const state = {
+      configKey: incrementalConfigKey,
+      generation: 0,
+      nextId: 0,
+      nodeIds: new WeakMap(),
+      elementCache: new WeakMap(),
+      mutatedAt: new WeakMap(),
+      records: new Map(),
+      mutations: 0,
+      full: false,
+    };
+    state.observer = new MutationObserver(mutations => recordMutations(state, mutations));
+    state.observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+    Object.defineProperty(window, INCREMENTAL_STATE_KEY, { value: state, configurable: true, writable: true });
+    return state;
+  }
+
+  let incrementalState = null;
+  let incrementalReset = false;
+  if (incremental) {
+    incrementalState = window[INCREMENTAL_STATE_KEY] || null;
+    if (incrementalState) {
+      recordMutations(incrementalState, incrementalState.observer.takeRecords());
+    }
+    if (
+      !incrementalState ||
+      incrementalState.full ||
+      incrementalState.configKey !== incrementalConfigKey ||
+      incrementalState.generation !== incrementalGeneration
+    ) {
+      incrementalState?.observer.disconnect();
+      incrementalState = createIncrementalState();
+      incrementalReset = true;
+    }
+  }
+  // Node records in the order they are finished, children before their parent
+  const INCREMENTAL_NODE_ORDER = [];
+
+  function storeNode(node, nodeData) {
+    let id;
+    if (incrementalState) {
+      id = incrementalState.nodeIds.get(node);
+      if (id === undefined) {
+        id = `${incrementalState.nextId++}`;
+        incrementalState.nodeIds.set(node, id);
+      }
+      INCREMENTAL_NODE_ORDER.push(id);
+    } else {
+      id = `${ID.current++}`;
+    }
+    DOM_HASH_MAP[id] = nodeData;
+    return id;
+  }
+
+  function isSameRecord(previous, record) {
+    const keys = Object.keys(record);
+    if (keys.length !== Object.keys(previous).length) return false;
+    for (const key of keys) {
+      const a = previous[key];
+      const b = record[key];
+      if (a === b) continue;
+      if (!a || !b || typeof a !== "object" || typeof b !== "object") return false;
+      const entries = Object.keys(b);
+      if (entries.length !== Object.keys(a).length || entries.some(entry => a[entry] !== b[entry])) return false;
+    }
+    return true;
+  }
+
+  function getIncrementalResult(rootId) {
+    const state = incrementalState;
+    const nodes = [];
+    const highlights = [];
+    const visited = new Set(INCREMENTAL_NODE_ORDER);
+    for (const id of INCREMENTAL_NODE_ORDER) {
+      const record = DOM_HASH_MAP[id];
+      // Highlight indexes shift with every interactive element added above, so they are sent apart from the records
+      if (record.highlightIndex !== undefined) {
+        highlights.push([id, record.highlightIndex]);
+        delete record.highlightIndex;
+      }
+      const previous = state.records.get(id);
+      if (!previous || !isSameRecord(previous, record)) {
+        nodes.push([id, record]);
+      }
+      state.records.set(id, record);
+    }
+    const removed = [];
+    for (const id of state.records.keys()) {
+      if (!visited.has(id)) {
+        removed.push(id);
+        state.records.delete(id);
+      }
+    }
+    // Drop the mutations of our own highlights
+    state.observer.takeRecords();
+    state.generation++;
+    state.mutations = 0;
+    return { rootId, nodes, removed, highlights, reset: incrementalReset, generation: state.generation };
+  }
+
+  /**
+   * Compact (columnar) encoding of DOM_HASH_MAP, used with args.compact outside incremental mode. Instead of one
+   * object per node repeating key names, full xpaths and attribute dicts, the nodes are sent as parallel arrays
+   * indexed by node id, with every string stored once in a string table:
+   *
+   *   tag[i]       string index of the tag name, -1 for text nodes
+   *   parent[i]    node id of the parent, -1 for the root
+   *   flags[i]     COLUMNAR_FLAGS bits
+   *   highlight[i] highlight index, -1 if none
+   *   value[i]     string index of the text of a text node, or of the xpath of an element; with the
+   *                XPATH_RELATIVE flag only the segments after the parent's xpath
+   *   attributes   flat [key, value, key, value, ...] string indexes, those of node i between
+   *                attributeOffsets[i] and attributeOffsets[i + 1]
+   *
+   * Node ids are assigned children first, so the children of a node are the nodes with that parent, in id order.
+   */
+  const COLUMNAR_FLAGS = {
+    VISIBLE: 1,
+    TOP_ELEMENT: 2,
+    INTERACTIVE: 4,
+    IN_VIEWPORT: 8,
+    SHADOW_ROOT: 16,
+    XPATH_RELATIVE: 32,
+  };
+
+  function encodeColumnar(rootId) {
+    const strings = [];
+    const stringIds = new Map();
+    const intern = value => {
+      let id = stringIds.get(value);
+      if (id === undefined) {
+        id = strings.length;
+        strings.push(value);
+        stringIds.set(value, id);
+      }
+      return id;
+    };
+
+    const count = ID.current;
+    const tag = new Array(count);
+    const parent = new Array(count).fill(-1);
+    const flags = new Array(count);
+    const highlight = new Array(count);
+    const value = new Array(count);
+    const attributeOffsets = new Array(count + 1);
+    const attributes = [];
+
+    for (let id = 0; id < count; id++) {
+      for (const childId of DOM_HASH_MAP[id].children || []) {
+        parent[childId] = id;
+      }
+    }
+
+    for (let id = 0; id < count; id++) {
+      const nodeData = DOM_HASH_MAP[id];
+      attributeOffsets[id] = attributes.length;
+      highlight[id] = nodeData.highlightIndex ?? -1;
+      if (nodeData.type === "TEXT_NODE") {
+        tag[id] = -1;
+        flags[id] = nodeData.isVisible ? COLUMNAR_FLAGS.VISIBLE : 0;
+        value[id] = intern(nodeData.text);
+        continue;
+      }
+
+      tag[id] = intern(nodeData.tagName);
+      let nodeFlags = 0;
+      if (nodeData.isVisible) nodeFlags |= COLUMNAR_FLAGS.VISIBLE;
+      if (nodeData.isTopElement) nodeFlags |= COLUMNAR_FLAGS.TOP_ELEMENT;
+      if (nodeData.isInteractive) nodeFlags |= COLUMNAR_FLAGS.INTERACTIVE;
+      if (nodeData.isInViewport) nodeFlags |= COLUMNAR_FLAGS.IN_VIEWPORT;
+      if (nodeData.shadowRoot) nodeFlags |= COLUMNAR_FLAGS.SHADOW_ROOT;
+
+      const parentXpath = parent[id] === -1 ? undefined : DOM_HASH_MAP[parent[id]].xpath;
+      if (parentXpath !== undefined && nodeData.xpath.startsWith(`${parentXpath}/`)) {
+        nodeFlags |= COLUMNAR_FLAGS.XPATH_RELATIVE;
+        value[id] = intern(nodeData.xpath.slice(parentXpath.length + 1));
+      } else {
+        value[id] = intern(nodeData.xpath);
+      }
+      flags[id] = nodeFlags;
+
+      for (const name in nodeData.attributes) {
+        attributes.push(intern(name), intern(nodeData.attributes[name]));
+      }
+    }
+    attributeOffsets[count] = attributes.length;
+
+    return {
+      format: "columnar",
+      rootId: Number(rootId),
+      strings,
+      tag,
+      parent,
+      flags,
+      highlight,
+      value,
+      attributeOffsets,
+      attributes,
+    };
+  }
+
   // Add a WeakMap cache for XPath strings
   const xpathCache = new WeakMap();
 
@@ -1171,7 +1446,9 @@
    * @param {boolean} isParentHighlighted - Whether the parent node is highlighted.
    * @returns {string | null} The ID of the node data object, or null if the node is not processed.
    */
-  function buildDomTree(node, parentIframe = null, isParentHighlighted = false) {
+  function buildDomTree(node, parentIframe = null, isParentHighlighted = false, parentMutatedAt = -1) {
+    // Latest generation in which this node or an ancestor mutated, in incremental mode
+    let subtreeMutatedAt = parentMutatedAt;
     // Fast rejection checks first
     if (!node || node.id === HIGHLIGHT_CONTAINER_ID ||
       (node.nodeType !== Node.ELEMENT_NODE && node.nodeType !== Node.TEXT_NODE)) {
@@ -1193,13 +1470,11 @@
 
       // Process children of body
       for (const child of node.childNodes) {
-        const domElement = buildDomTree(child, parentIframe, false); // Body's children have no highlighted parent initially
+        const domElement = buildDomTree(child, parentIframe, false, getMutatedAt(node, parentMutatedAt)); // Body's children have no highlighted parent initially
         if (domElement) nodeData.children.push(domElement);
       }
 
-      const id = `${ID.current++}`;
-      DOM_HASH_MAP[id] = nodeData;
-      return id;
+      return storeNode(node, nodeData);
     }
 
     // Early bailout for non-element nodes except text
@@ -1220,13 +1495,11 @@
         return null;
       }
 
-      const id = `${ID.current++}`;
-      DOM_HASH_MAP[id] = {
+      return storeNode(node, {
         type: "TEXT_NODE",
         text: textContent,
         isVisible: isTextNodeVisible(node),
-      };
-      return id;
+      });
     }
 
     // Quick checks for element nodes
@@ -1275,22 +1548,40 @@
       }
     } nodeData - The node data object.
      */
+    let cachedElement = null;
+    if (incrementalState) {
+      const mutatedAt = Math.max(parentMutatedAt, incrementalState.mutatedAt.get(node) ?? -1);
+      subtreeMutatedAt = mutatedAt;
+      cachedElement = incrementalState.elementCache.get(node);
+      if (cachedElement && cachedElement.generation < mutatedAt) {
+        cachedElement = null;
+      }
+    }
+    if (!cachedElement) {
+      cachedElement = {
+        generation: incrementalState ? incrementalState.generation : 0,
+        xpath: getXPathTree(node, true),
+        attributes: {},
+        isInteractive: undefined,
+      };
+      // Get attributes for interactive elements or potential text containers
+      if (isInteractiveCandidate(node) || node.tagName.toLowerCase() === 'iframe' || node.tagName.toLowerCase() === 'body') {
+        const attributeNames = node.getAttributeNames?.() || [];
+        for (const name of attributeNames) {
+          const value = node.getAttribute(name);
+          cachedElement.attributes[name] = value;
+        }
+      }
+      incrementalState?.elementCache.set(node, cachedElement);
+    }
+
     const nodeData = {
       tagName: node.tagName.toLowerCase(),
-      attributes: {},
-      xpath: getXPathTree(node, true),
+      attributes: cachedElement.attributes,
+      xpath: cachedElement.xpath,
       children: [],
     };
 
-    // Get attributes for interactive elements or potential text containers
-    if (isInteractiveCandidate(node) || node.tagName.toLowerCase() === 'iframe' || node.tagName.toLowerCase() === 'body') {
-      const attributeNames = node.getAttributeNames?.() || [];
-      for (const name of attributeNames) {
-        const value = node.getAttribute(name);
-        nodeData.attributes[name] = value;
-      }
-    }
-
     let nodeWasHighlighted = false;
     // Perform visibility, interactivity, and highlighting checks
     if (node.nodeType === Node.ELEMENT_NODE) {
@@ -1298,7 +1589,10 @@
       if (nodeData.isVisible) {
         nodeData.isTopElement = isTopElement(node);
         if (nodeData.isTopElement) {
-          nodeData.isInteractive = isInteractiveElement(node);
+          if (cachedElement.isInteractive === undefined) {
+            cachedElement.isInteractive = isInteractiveElement(node);
+          }
+          nodeData.isInteractive = cachedElement.isInteractive;
           // Call the dedicated highlighting function
           nodeWasHighlighted = handleHighlighting(nodeData, node, parentIframe, isParentHighlighted);
         }
@@ -1315,7 +1609,8 @@
           const iframeDoc = node.contentDocument || node.contentWindow?.document;
           if (iframeDoc) {
             for (const child of iframeDoc.childNodes) {
-              const domElement = buildDomTree(child, node, false);
+              // Mutations inside iframes are not observed, so their content is never taken from the cache
+              const domElement = buildDomTree(child, node, false, Infinity);
               if (domElement) nodeData.children.push(domElement);
             }
           }
@@ -1333,7 +1628,7 @@
       ) {
         // Process all child nodes to capture formatted text
         for (const child of node.childNodes) {
-          const domElement = buildDomTree(child, parentIframe, nodeWasHighlighted);
+          const domElement = buildDomTree(child, parentIframe, nodeWasHighlighted, subtreeMutatedAt);
           if (domElement) nodeData.children.push(domElement);
         }
       }
@@ -1342,7 +1637,8 @@
         if (node.shadowRoot) {
           nodeData.shadowRoot = true;
           for (const child of node.shadowRoot.childNodes) {
-            const domElement = buildDomTree(child, parentIframe, nodeWasHighlighted);
+            // Nor are mutations inside shadow roots
+            const domElement = buildDomTree(child, parentIframe, nodeWasHighlighted, Infinity);
             if (domElement) nodeData.children.push(domElement);
           }
         }
@@ -1350,7 +1646,7 @@
         for (const child of node.childNodes) {
           // Pass the highlighted status of the *current* node to its children
           const passHighlightStatusToChild = nodeWasHighlighted || isParentHighlighted;
-          const domElement = buildDomTree(child, parentIframe, passHighlightStatusToChild);
+          const domElement = buildDomTree(child, parentIframe, passHighlightStatusToChild, subtreeMutatedAt);
           if (domElement) nodeData.children.push(domElement);
         }
       }
@@ -1367,9 +1663,11 @@
       }
     }
 
-    const id = `${ID.current++}`;
-    DOM_HASH_MAP[id] = nodeData;
-    return id;
+    return storeNode(node, nodeData);
+  }
+
+  function getMutatedAt(node, parentMutatedAt) {
+    return incrementalState ? Math.max(parentMutatedAt, incrementalState.mutatedAt.get(node) ?? -1) : parentMutatedAt;
   }
 
   const rootId = buildDomTree(document.body);
@@ -1377,5 +1675,21 @@
   // Clear the cache before starting
   DOM_CACHE.clearCache();
 
-  return { rootId, map: DOM_HASH_MAP };
+  // Page size and scroll position, returned with the tree to spare the state capture another round-trip
+  const pageInfo = {
+    viewport_width: window.innerWidth,
+    viewport_height: window.innerHeight,
+    page_width: Math.max(document.documentElement.scrollWidth, document.body.scrollWidth || 0),
+    page_height: Math.max(document.documentElement.scrollHeight, document.body.scrollHeight || 0),
+    scroll_x: window.scrollX || window.pageXOffset || document.documentElement.scrollLeft || 0,
+    scroll_y: window.scrollY || window.pageYOffset || document.documentElement.scrollTop || 0,
+  };
+
+  if (incrementalState) {
+    return { ...getIncrementalResult(rootId), pageInfo };
+  }
+  if (compact) {
+    return { ...encodeColumnar(rootId), pageInfo };
+  }
+  return { rootId, map: DOM_HASH_MAP, pageInfo };
 };
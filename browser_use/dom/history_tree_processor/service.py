@@ -1,8 +1,12 @@
 import hashlib
+from functools import lru_cache
 
 from browser_use.dom.history_tree_processor.view import DOMHistoryElement, HashedDomElement
 from browser_use.dom.views import DOMElementNode
 
+# Hashes of recently hashed elements, keyed by what they are computed from rather than kept on the nodes
+DOM_ELEMENT_HASH_CACHE_SIZE = 4096
+
 
 class HistoryTreeProcessor:
 	""" "
@@ -66,9 +70,18 @@ class HistoryTreeProcessor:
 	@staticmethod
 	def _hash_dom_element(dom_element: DOMElementNode) -> HashedDomElement:
 		parent_branch_path = HistoryTreeProcessor._get_parent_branch_path(dom_element)
-		branch_path_hash = HistoryTreeProcessor._parent_branch_path_hash(parent_branch_path)
-		attributes_hash = HistoryTreeProcessor._attributes_hash(dom_element.attributes)
-		xpath_hash = HistoryTreeProcessor._xpath_hash(dom_element.xpath)
+		return HistoryTreeProcessor._hash_dom_element_parts(
+			tuple(parent_branch_path), tuple(dom_element.attributes.items()), dom_element.xpath
+		)
+
+	@staticmethod
+	@lru_cache(maxsize=DOM_ELEMENT_HASH_CACHE_SIZE)
+	def _hash_dom_element_parts(
+		parent_branch_path: tuple[str, ...], attributes: tuple[tuple[str, str], ...], xpath: str
+	) -> HashedDomElement:
+		branch_path_hash = HistoryTreeProcessor._parent_branch_path_hash(list(parent_branch_path))
+		attributes_hash = HistoryTreeProcessor._attributes_hash(dict(attributes))
+		xpath_hash = HistoryTreeProcessor._xpath_hash(xpath)
 		# text_hash = DomTreeProcessor._text_hash(dom_element)
 
 		return HashedDomElement(branch_path_hash, attributes_hash, xpath_hash)
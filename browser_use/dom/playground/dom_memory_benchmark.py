@@ -0,0 +1,164 @@
+"""
+Measure with tracemalloc the memory retained by the DOM trees of a few consecutive browser states (as kept in the
+agent's history), built with the slotted, interned DOMElementNode/DOMTextNode from the compact extraction result,
+against the previous layout: plain dataclasses with a __dict__, full xpaths, per-node attribute dicts and a hash
+cached on every hashed node.
+
+Pages are saved HTML files or URLs; without any, the fixture pages of dom_wire_format_benchmark are generated.
+
+Run with: python -m browser_use.dom.playground.dom_memory_benchmark [page.html ...] --states 5
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import tempfile
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any
+
+from browser_use.browser import BrowserProfile, BrowserSession
+from browser_use.dom.history_tree_processor.service import HistoryTreeProcessor
+from browser_use.dom.playground.dom_wire_format_benchmark import get_page_urls
+from browser_use.dom.service import DOM_TREE_INSTALL_AND_CALL_JS, DomService
+
+ARGS = {'doHighlightElements': False, 'focusHighlightIndex': -1, 'viewportExpansion': -1, 'debugMode': False}
+
+
+@dataclass
+class PlainTextNode:
+	is_visible: bool
+	parent: Any
+	text: str
+	type: str = 'TEXT_NODE'
+
+
+@dataclass
+class PlainElementNode:
+	is_visible: bool
+	parent: Any
+	tag_name: str
+	xpath: str
+	attributes: dict[str, str]
+	children: list
+	is_interactive: bool = False
+	is_top_element: bool = False
+	is_in_viewport: bool = False
+	shadow_root: bool = False
+	highlight_index: int | None = None
+	viewport_coordinates: Any = None
+	page_coordinates: Any = None
+	viewport_info: Any = None
+	is_new: bool | None = None
+
+
+def build_plain_tree(eval_page: dict) -> tuple[PlainElementNode, dict]:
+	"""The previous _construct_dom_tree, with the hash cached_property filled in for the selector map."""
+	node_map = {}
+	selector_map = {}
+	for node_id, node_data in eval_page['map'].items():
+		if node_data.get('type') == 'TEXT_NODE':
+			node_map[node_id] = PlainTextNode(is_visible=node_data['isVisible'], parent=None, text=node_data['text'])
+			continue
+		node = PlainElementNode(
+			is_visible=node_data.get('isVisible', False),
+			parent=None,
+			tag_name=node_data['tagName'],
+			xpath=node_data['xpath'],
+			attributes=node_data.get('attributes', {}),
+			children=[],
+			is_interactive=node_data.get('isInteractive', False),
+			is_top_element=node_data.get('isTopElement', False),
+			is_in_viewport=node_data.get('isInViewport', False),
+			highlight_index=node_data.get('highlightIndex'),
+			shadow_root=node_data.get('shadowRoot', False),
+		)
+		node_map[node_id] = node
+		if node.highlight_index is not None:
+			selector_map[node.highlight_index] = node
+		for child_id in node_data.get('children', []):
+			if child_id in node_map:
+				node_map[child_id].parent = node
+				node.children.append(node_map[child_id])
+
+	for node in selector_map.values():
+		branch_path = tuple(HistoryTreeProcessor._get_parent_branch_path(node))  # type: ignore
+		node.__dict__['hash'] = HistoryTreeProcessor._hash_dom_element_parts.__wrapped__(  # type: ignore
+			branch_path, tuple(node.attributes.items()), node.xpath
+		)
+	return node_map[str(eval_page['rootId'])], selector_map
+
+
+async def build_slotted_tree(dom_service: DomService, eval_page: dict) -> tuple[Any, dict]:
+	root, selector_map = await dom_service._construct_dom_tree(eval_page)
+	for node in selector_map.values():
+		node.hash
+	return root, selector_map
+
+
+async def retained_bytes(build, states: int) -> tuple[int, list]:
+	"""Build the trees of several states and return the memory they retain once the raw results are dropped."""
+	gc.collect()
+	tracemalloc.start()
+	baseline = tracemalloc.get_traced_memory()[0]
+	trees = [await build() for _ in range(states)]
+	gc.collect()
+	used = tracemalloc.get_traced_memory()[0] - baseline
+	tracemalloc.stop()
+	return used, trees
+
+
+def count_nodes(node) -> int:
+	return 1 + sum(count_nodes(child) for child in getattr(node, 'children', []))
+
+
+async def benchmark_page(dom_service: DomService, url: str, states: int) -> None:
+	page = dom_service.page
+	await page.goto(url)
+	# Warm up the page and the connection so their one-time allocations are not measured
+	await page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, ARGS)
+	await page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, {**ARGS, 'compact': True})
+	HistoryTreeProcessor._hash_dom_element_parts.cache_clear()
+
+	async def build_plain():
+		return build_plain_tree(await page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, ARGS))
+
+	async def build_slotted():
+		return await build_slotted_tree(dom_service, await page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, {**ARGS, 'compact': True}))
+
+	plain_bytes, plain_trees = await retained_bytes(build_plain, states)
+	nodes = count_nodes(plain_trees[0][0])
+	del plain_trees
+	slotted_bytes, slotted_trees = await retained_bytes(build_slotted, states)
+	del slotted_trees
+
+	print(f'{url} ({nodes} nodes, {states} states)')
+	print(f'{"before":>10}: {plain_bytes / 1024 / 1024:7.1f} MiB  {plain_bytes / (nodes * states):6.0f} B/node')
+	print(
+		f'{"after":>10}: {slotted_bytes / 1024 / 1024:7.1f} MiB  {slotted_bytes / (nodes * states):6.0f} B/node  '
+		f'({slotted_bytes / plain_bytes:.0%})'
+	)
+
+
+async def main(urls: list[str], states: int) -> None:
+	logging.getLogger('browser_use').setLevel(logging.WARNING)
+	browser_session = BrowserSession(browser_profile=BrowserProfile(headless=True, user_data_dir=None))
+	await browser_session.start()
+	try:
+		dom_service = DomService(await browser_session.get_current_page())
+		for url in urls:
+			await benchmark_page(dom_service, url, states)
+	finally:
+		await browser_session.kill()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('pages', nargs='*', help='Saved HTML files or URLs')
+	parser.add_argument('--rows', type=int, default=5000, help='Rows of the generated fixture pages')
+	parser.add_argument('--states', type=int, default=5, help='Consecutive states kept, as in the agent history')
+	args = parser.parse_args()
+	# Resolve and write the pages before starting the event loop, the filesystem calls would block it
+	with tempfile.TemporaryDirectory() as directory:
+		asyncio.run(main(get_page_urls(args.pages, directory, args.rows), args.states))
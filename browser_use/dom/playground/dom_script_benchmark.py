@@ -0,0 +1,71 @@
+"""
+Compare the per-step DOM extraction latency of shipping the whole extraction script through page.evaluate
+(what every step used to do) with calling the function installed once per document.
+
+Run with: python -m browser_use.dom.playground.dom_script_benchmark --elements 5000 --steps 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from browser_use.browser import BrowserProfile, BrowserSession
+from browser_use.dom.service import DOM_TREE_CALL_JS, DOM_TREE_JS, DomService
+
+ARGS = {'doHighlightElements': False, 'focusHighlightIndex': -1, 'viewportExpansion': 0, 'debugMode': False}
+
+
+def write_large_page(directory: str, elements: int) -> str:
+	rows = '\n'.join(
+		f'<div class="row"><span>Item {i}</span><input name="field{i}"><button>Save {i}</button><a href="#item{i}">Open</a></div>'
+		for i in range(elements // 4)
+	)
+	path = Path(directory) / 'large.html'
+	path.write_text(f'<html><head><title>Large page</title></head><body>{rows}</body></html>')
+	return path.as_uri()
+
+
+async def time_steps(step, steps: int) -> list[float]:
+	latencies = []
+	for _ in range(steps):
+		start = time.perf_counter()
+		await step()
+		latencies.append((time.perf_counter() - start) * 1000)
+	return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+	print(f'{name:>28}: median {statistics.median(latencies):7.1f}ms  min {min(latencies):7.1f}ms  max {max(latencies):7.1f}ms')
+
+
+async def main(elements: int, steps: int) -> None:
+	browser_session = BrowserSession(browser_profile=BrowserProfile(headless=True, user_data_dir=None))
+	await browser_session.start()
+	try:
+		with tempfile.TemporaryDirectory() as directory:
+			await browser_session.navigate(write_large_page(directory, elements))
+			page = await browser_session.get_current_page()
+			dom_service = DomService(page)
+			# Installs the function in the page and its context
+			await dom_service.get_clickable_elements(highlight_elements=False)
+
+			print(f'{elements} elements, {steps} steps, script of {len(DOM_TREE_JS) / 1024:.0f} KiB')
+			report('script shipped every step', await time_steps(lambda: page.evaluate(DOM_TREE_JS, ARGS), steps))
+			report('installed function', await time_steps(lambda: page.evaluate(DOM_TREE_CALL_JS, ARGS), steps))
+			report(
+				'get_clickable_elements',
+				await time_steps(lambda: dom_service.get_clickable_elements(highlight_elements=False), steps),
+			)
+	finally:
+		await browser_session.kill()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--elements', type=int, default=5000)
+	parser.add_argument('--steps', type=int, default=20)
+	args = parser.parse_args()
+	asyncio.run(main(args.elements, args.steps))
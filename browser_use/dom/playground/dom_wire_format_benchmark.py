@@ -0,0 +1,111 @@
+"""
+Compare the payload size and Python decode time of the DOM extraction result in the per-node map format with the
+compact columnar format (string table plus parallel arrays).
+
+Pages are saved HTML files or URLs; without any, two large fixture pages are generated.
+
+Run with: python -m browser_use.dom.playground.dom_wire_format_benchmark [page.html ...] --steps 10
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from browser_use.browser import BrowserProfile, BrowserSession
+from browser_use.dom.service import DOM_TREE_INSTALL_AND_CALL_JS, DomService
+
+ARGS = {'doHighlightElements': False, 'focusHighlightIndex': -1, 'viewportExpansion': -1, 'debugMode': False}
+
+
+def write_fixture_pages(directory: str, rows: int) -> list[str]:
+	table_rows = '\n'.join(
+		f'<tr class="row"><td class="cell">{i}</td><td class="cell"><a href="/item/{i}" class="link">Item {i}</a></td>'
+		f'<td class="cell"><input type="checkbox" name="select{i}" aria-label="Select {i}"></td></tr>'
+		for i in range(rows)
+	)
+	form_rows = '\n'.join(
+		f'<div class="form-group"><label for="field{i}">Field {i}</label>'
+		f'<input id="field{i}" name="field{i}" type="text" class="form-control" placeholder="Value {i}">'
+		f'<button type="button" class="btn btn-secondary">Clear</button></div>'
+		for i in range(rows)
+	)
+	pages = {
+		'table.html': f'<html><body><table><tbody>{table_rows}</tbody></table></body></html>',
+		'form.html': f'<html><body><form><div class="container">{form_rows}</div></form></body></html>',
+	}
+	urls = []
+	for name, html in pages.items():
+		path = Path(directory) / name
+		path.write_text(html)
+		urls.append(path.as_uri())
+	return urls
+
+
+def get_page_urls(pages: list[str], directory: str, rows: int) -> list[str]:
+	"""URLs of the given files or URLs, or of fixture pages written to directory when none are given."""
+	urls = [page if '://' in page else Path(page).resolve().as_uri() for page in pages]
+	return urls or write_fixture_pages(directory, rows)
+
+
+async def time_steps(step, steps: int) -> float:
+	latencies = []
+	for _ in range(steps):
+		start = time.perf_counter()
+		await step()
+		latencies.append((time.perf_counter() - start) * 1000)
+	return statistics.median(latencies)
+
+
+async def benchmark_page(dom_service: DomService, url: str, steps: int) -> None:
+	page = dom_service.page
+	await page.goto(url)
+	map_result = await page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, ARGS)
+	columnar_result = await page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, {**ARGS, 'compact': True})
+
+	map_bytes = len(json.dumps(map_result))
+	columnar_bytes = len(json.dumps(columnar_result))
+	# Extraction in the page plus the transfer and JSON parsing of the result
+	map_evaluate_ms = await time_steps(lambda: page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, ARGS), steps)
+	columnar_evaluate_ms = await time_steps(lambda: page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, {**ARGS, 'compact': True}), steps)
+	# _construct_dom_tree dispatches on the format, so both go through the same entry point
+	map_decode_ms = await time_steps(lambda: dom_service._construct_dom_tree(map_result), steps)
+	columnar_decode_ms = await time_steps(lambda: dom_service._construct_dom_tree(columnar_result), steps)
+
+	print(f'{url} ({len(columnar_result["tag"])} nodes, {len(columnar_result["strings"])} distinct strings)')
+	print(f'{"map":>10}: {map_bytes / 1024:7.0f} KiB  evaluate {map_evaluate_ms:7.1f}ms  decode {map_decode_ms:7.1f}ms')
+	print(
+		f'{"columnar":>10}: {columnar_bytes / 1024:7.0f} KiB  evaluate {columnar_evaluate_ms:7.1f}ms  '
+		f'decode {columnar_decode_ms:7.1f}ms'
+	)
+	print(
+		f'{"":>10}  {columnar_bytes / map_bytes:.0%} of the bytes, {columnar_evaluate_ms / map_evaluate_ms:.0%} of the '
+		f'evaluate time, {columnar_decode_ms / map_decode_ms:.0%} of the decode time'
+	)
+
+
+async def main(urls: list[str], steps: int) -> None:
+	logging.getLogger('browser_use').setLevel(logging.WARNING)
+	browser_session = BrowserSession(browser_profile=BrowserProfile(headless=True, user_data_dir=None))
+	await browser_session.start()
+	try:
+		dom_service = DomService(await browser_session.get_current_page())
+		for url in urls:
+			await benchmark_page(dom_service, url, steps)
+	finally:
+		await browser_session.kill()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('pages', nargs='*', help='Saved HTML files or URLs')
+	parser.add_argument('--rows', type=int, default=5000, help='Rows of the generated fixture pages')
+	parser.add_argument('--steps', type=int, default=10)
+	args = parser.parse_args()
+	# Resolve and write the pages before starting the event loop, the filesystem calls would block it
+	with tempfile.TemporaryDirectory() as directory:
+		asyncio.run(main(get_page_urls(args.pages, directory, args.rows), args.steps))
@@ -0,0 +1,60 @@
+"""
+Measure the phases of the browser state capture (DOM, tabs, title, screenshot) on a local fixture page,
+with and without element highlighting.
+
+Run with: python -m browser_use.dom.playground.state_capture_timing
+"""
+
+import asyncio
+import statistics
+import tempfile
+from pathlib import Path
+
+from browser_use.browser import BrowserProfile, BrowserSession
+
+CAPTURES = 20
+
+
+def write_fixture_page(directory: str) -> str:
+	rows = '\n'.join(
+		f'<tr><td>Row {i}</td><td><input name="field{i}"></td><td><button>Save {i}</button></td><td><a href="#row{i}">Link</a></td></tr>'
+		for i in range(300)
+	)
+	path = Path(directory) / 'fixture.html'
+	path.write_text(f'<html><head><title>State capture fixture</title></head><body><table>{rows}</table></body></html>')
+	return path.as_uri()
+
+
+async def measure(url: str, highlight_elements: bool) -> None:
+	browser_session = BrowserSession(
+		browser_profile=BrowserProfile(headless=True, user_data_dir=None, highlight_elements=highlight_elements)
+	)
+	await browser_session.start()
+	try:
+		await browser_session.navigate(url)
+		timings = []
+		for _ in range(CAPTURES):
+			# Scroll so every capture sees a changed viewport instead of reusing the last screenshot
+			page = await browser_session.get_current_page()
+			await page.evaluate('window.scrollBy(0, 40)')
+			await browser_session.get_state_summary(cache_clickable_elements_hashes=False)
+			timings.append(browser_session.state_capture_timings)
+	finally:
+		await browser_session.kill()
+
+	print(f'highlight_elements={highlight_elements}, median of {CAPTURES} captures (ms):')
+	for phase in timings[-1]:
+		print(f'  {phase:>10}: {statistics.median(t.get(phase, 0.0) for t in timings):8.1f}')
+	serial = sum(statistics.median(t.get(phase, 0.0) for t in timings) for phase in timings[-1] if phase != 'total')
+	print(f'  {"serial sum":>10}: {serial:8.1f}')
+
+
+async def main():
+	with tempfile.TemporaryDirectory() as directory:
+		url = write_fixture_page(directory)
+		await measure(url, highlight_elements=True)
+		await measure(url, highlight_elements=False)
+
+
+if __name__ == '__main__':
+	asyncio.run(main())
@@ -1,4 +1,7 @@
+import hashlib
 import logging
+import weakref
+from dataclasses import dataclass, field
 from importlib import resources
 from typing import TYPE_CHECKING
 from urllib.parse import urlparse
@@ -7,6 +10,7 @@ if TYPE_CHECKING:
 	from browser_use.browser.types import Page
 
 
+from browser_use.dom.utils import intern_dom_string
 from browser_use.dom.views import (
 	DOMBaseNode,
 	DOMElementNode,
@@ -17,6 +21,43 @@ from browser_use.dom.views import (
 )
 from browser_use.utils import is_new_tab_page, time_execution_async
 
+# The DOM extraction function, read once at import
+DOM_TREE_JS = resources.files('browser_use.dom.dom_tree').joinpath('index.js').read_text().strip().rstrip(';')
+# Global the function is installed under in each top-level document, versioned so an old copy is never called
+DOM_TREE_FUNCTION = f'__browserUseBuildDomTree_{hashlib.sha1(DOM_TREE_JS.encode()).hexdigest()[:12]}'
+DOM_TREE_INSTALL_JS = f"""(() => {{
+	if (window !== window.top || window.{DOM_TREE_FUNCTION}) return;
+	Object.defineProperty(window, '{DOM_TREE_FUNCTION}', {{ value: {DOM_TREE_JS}, configurable: true }});
+}})()"""
+# Sends only the arguments. Returns null in documents loaded before the init script was added.
+DOM_TREE_CALL_JS = f'(args) => window.{DOM_TREE_FUNCTION} ? window.{DOM_TREE_FUNCTION}(args) : null'
+# Installs the function in the current document and calls it, in one round-trip
+DOM_TREE_INSTALL_AND_CALL_JS = f'(args) => {{ {DOM_TREE_INSTALL_JS}; return window.{DOM_TREE_FUNCTION}(args); }}'
+
+# Bits of the flags column of the compact (columnar) extraction result, see encodeColumnar in index.js
+COLUMNAR_VISIBLE = 1
+COLUMNAR_TOP_ELEMENT = 2
+COLUMNAR_INTERACTIVE = 4
+COLUMNAR_IN_VIEWPORT = 8
+COLUMNAR_SHADOW_ROOT = 16
+COLUMNAR_XPATH_RELATIVE = 32
+
+# Browser contexts that have the DOM extraction function as init script
+_contexts_with_dom_tree_script = weakref.WeakSet()
+
+
+@dataclass
+class IncrementalDomTree:
+	"""The DOM tree of a page kept between incremental extractions, by the node ids of the in-page extraction state."""
+
+	url: str
+	generation: int | None = None
+	nodes: dict[str, DOMBaseNode] = field(default_factory=dict)
+	highlighted: set[str] = field(default_factory=set)
+
+
+_incremental_dom_trees: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
 # @dataclass
 # class ViewportInfo:
 # 	width: int
@@ -29,10 +70,9 @@ class DomService:
 	def __init__(self, page: 'Page', logger: logging.Logger | None = None):
 		self.page = page
 		self.xpath_cache = {}
+		self.page_metrics: dict | None = None
 		self.logger = logger or logging.getLogger(__name__)
 
-		self.js_code = resources.files('browser_use.dom.dom_tree').joinpath('index.js').read_text()
-
 	# region - Clickable elements
 	@time_execution_async('--get_clickable_elements')
 	async def get_clickable_elements(
@@ -40,9 +80,12 @@ class DomService:
 		highlight_elements: bool = True,
 		focus_element: int = -1,
 		viewport_expansion: int = 0,
+		incremental: bool = False,
 	) -> DOMState:
-		element_tree, selector_map = await self._build_dom_tree(highlight_elements, focus_element, viewport_expansion)
-		return DOMState(element_tree=element_tree, selector_map=selector_map)
+		element_tree, selector_map = await self._build_dom_tree(
+			highlight_elements, focus_element, viewport_expansion, incremental
+		)
+		return DOMState(element_tree=element_tree, selector_map=selector_map, page_metrics=self.page_metrics)
 
 	@time_execution_async('--get_cross_origin_iframes')
 	async def get_cross_origin_iframes(self) -> list[str]:
@@ -68,6 +111,7 @@ class DomService:
 		highlight_elements: bool,
 		focus_element: int,
 		viewport_expansion: int,
+		incremental: bool = False,
 	) -> tuple[DOMElementNode, SelectorMap]:
 		if await self.page.evaluate('1+1') != 2:
 			raise ValueError('The page cannot evaluate javascript code properly')
@@ -96,14 +140,30 @@ class DomService:
 			'viewportExpansion': viewport_expansion,
 			'debugMode': debug_mode,
 		}
+		incremental_tree = None
+		if incremental:
+			incremental_tree = _incremental_dom_trees.get(self.page)
+			if incremental_tree is None or incremental_tree.url != self.page.url:
+				# After a navigation the in-page state no longer matches, start over with a full extraction
+				incremental_tree = IncrementalDomTree(url=self.page.url)
+				_incremental_dom_trees[self.page] = incremental_tree
+			args['incremental'] = True
+			args['incrementalGeneration'] = incremental_tree.generation
+		else:
+			# Full extractions are sent as columns with a string table rather than one JSON object per node
+			args['compact'] = True
 
 		try:
 			self.logger.debug(f'🔧 Starting JavaScript DOM analysis for {self.page.url[:50]}...')
-			eval_page: dict = await self.page.evaluate(self.js_code, args)
+			await self._install_dom_tree_script()
+			eval_page: dict | None = await self.page.evaluate(DOM_TREE_CALL_JS, args)
+			if eval_page is None:
+				eval_page = await self.page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, args)
 			self.logger.debug('✅ JavaScript DOM analysis completed')
 		except Exception as e:
 			self.logger.error('Error evaluating JavaScript: %s', e)
 			raise
+		self.page_metrics = eval_page.get('pageInfo')
 
 		# Only log performance metrics in debug mode
 		if debug_mode and 'perfMetrics' in eval_page:
@@ -119,6 +179,10 @@ class DomService:
 				for node_data in eval_page['map'].values():
 					if isinstance(node_data, dict) and node_data.get('isInteractive'):
 						interactive_count += 1
+			elif 'flags' in eval_page:
+				interactive_count = sum(1 for flags in eval_page['flags'] if flags & COLUMNAR_INTERACTIVE)
+			elif 'highlights' in eval_page:
+				interactive_count = len(eval_page['highlights'])
 
 			# Create concise summary
 			url_short = self.page.url[:50] + '...' if len(self.page.url) > 50 else self.page.url
@@ -131,15 +195,41 @@ class DomService:
 			)
 
 		self.logger.debug('🔄 Starting Python DOM tree construction...')
+		if incremental_tree is not None and 'nodes' in eval_page:
+			result = self._patch_dom_tree(incremental_tree, eval_page)
+			self.logger.debug(
+				f'🧩 Incremental DOM extraction: {len(eval_page["nodes"])} changed and {len(eval_page["removed"])} removed nodes'
+				+ (' (full rebuild)' if eval_page['reset'] else '')
+			)
+			return result
 		result = await self._construct_dom_tree(eval_page)
 		self.logger.debug('✅ Python DOM tree construction completed')
 		return result
 
+	async def _install_dom_tree_script(self) -> None:
+		"""
+		Add the DOM extraction function as init script of the page's context, once per context, so V8 compiles it
+		once per document instead of on every step. Documents loaded before are handled by the install-and-call
+		fallback in _build_dom_tree.
+		"""
+		context = self.page.context
+		if context in _contexts_with_dom_tree_script:
+			return
+		try:
+			await context.add_init_script(DOM_TREE_INSTALL_JS)
+		except Exception as e:
+			self.logger.debug(f'Failed to add the DOM extraction init script: {type(e).__name__}: {e}')
+			return
+		_contexts_with_dom_tree_script.add(context)
+
 	@time_execution_async('--construct_dom_tree')
 	async def _construct_dom_tree(
 		self,
 		eval_page: dict,
 	) -> tuple[DOMElementNode, SelectorMap]:
+		if eval_page.get('format') == 'columnar':
+			return self._decode_columnar_dom_tree(eval_page)
+
 		js_node_map = eval_page['map']
 		js_root_id = eval_page['rootId']
 
@@ -179,6 +269,129 @@ class DomService:
 
 		return html_to_dict, selector_map
 
+	def _decode_columnar_dom_tree(self, eval_page: dict) -> tuple[DOMElementNode, SelectorMap]:
+		"""
+		Build the DOM tree from the compact extraction result: string indexes are resolved a whole column at a time,
+		then nodes are created and linked in id order, which keeps children in document order. Relative xpaths are
+		kept relative, nodes with the same attributes share one dict, and short strings are interned.
+		"""
+		strings = list(map(intern_dom_string, eval_page['strings']))
+		tags = eval_page['tag']
+		parents = eval_page['parent']
+		flags = eval_page['flags']
+		highlights = eval_page['highlight']
+		attribute_offsets = eval_page['attributeOffsets']
+		attribute_ids = eval_page['attributes']
+		resolve = strings.__getitem__
+
+		values = list(map(resolve, eval_page['value']))
+		attribute_items = list(map(resolve, attribute_ids))
+		attribute_dicts: dict[tuple[int, ...], dict[str, str]] = {}
+
+		nodes: list[DOMBaseNode] = []
+		selector_map = {}
+		for node_id, tag in enumerate(tags):
+			node_flags = flags[node_id]
+			if tag == -1:
+				nodes.append(DOMTextNode(text=values[node_id], is_visible=bool(node_flags & COLUMNAR_VISIBLE), parent=None))
+				continue
+			start, end = attribute_offsets[node_id], attribute_offsets[node_id + 1]
+			attributes_key = tuple(attribute_ids[start:end])
+			attributes = attribute_dicts.get(attributes_key)
+			if attributes is None:
+				attributes = dict(zip(attribute_items[start:end:2], attribute_items[start + 1 : end : 2]))
+				attribute_dicts[attributes_key] = attributes
+			highlight_index = highlights[node_id]
+			element_node = DOMElementNode(
+				tag_name=strings[tag],
+				xpath=values[node_id],
+				xpath_relative=bool(node_flags & COLUMNAR_XPATH_RELATIVE),
+				attributes=attributes,
+				children=[],
+				is_visible=bool(node_flags & COLUMNAR_VISIBLE),
+				is_interactive=bool(node_flags & COLUMNAR_INTERACTIVE),
+				is_top_element=bool(node_flags & COLUMNAR_TOP_ELEMENT),
+				is_in_viewport=bool(node_flags & COLUMNAR_IN_VIEWPORT),
+				highlight_index=None if highlight_index == -1 else highlight_index,
+				shadow_root=bool(node_flags & COLUMNAR_SHADOW_ROOT),
+				parent=None,
+			)
+			if element_node.highlight_index is not None:
+				selector_map[element_node.highlight_index] = element_node
+			nodes.append(element_node)
+
+		for node, parent_id in zip(nodes, parents):
+			if parent_id != -1:
+				parent = nodes[parent_id]
+				node.parent = parent  # type: ignore
+				parent.children.append(node)  # type: ignore
+
+		root = nodes[eval_page['rootId']] if nodes else None
+		if root is None or not isinstance(root, DOMElementNode):
+			raise ValueError('Failed to parse HTML to dictionary')
+		return root, selector_map
+
+	def _patch_dom_tree(self, tree: IncrementalDomTree, eval_page: dict) -> tuple[DOMElementNode, SelectorMap]:
+		"""
+		Apply an incremental extraction to the DOM tree kept from the previous one.
+
+		Changed nodes come children first, so their children are already in place. A changed node is swapped into
+		the children of its parent when the parent itself did not change; otherwise the parent is rebuilt too.
+		"""
+		if eval_page['reset']:
+			tree.nodes.clear()
+			tree.highlighted.clear()
+		nodes = tree.nodes
+
+		for node_id in eval_page['removed']:
+			nodes.pop(node_id, None)
+
+		for node_id, node_data in eval_page['nodes']:
+			node, children_ids = self._parse_node(node_data)
+			previous = nodes.pop(node_id, None)
+			if node is None:
+				continue
+			nodes[node_id] = node
+
+			if isinstance(node, DOMElementNode):
+				for child_id in children_ids:
+					child_node = nodes.get(child_id)
+					if child_node is None:
+						continue
+					child_node.parent = node
+					node.children.append(child_node)
+
+			if previous is not None and previous.parent is not None:
+				siblings = previous.parent.children
+				for index, sibling in enumerate(siblings):
+					if sibling is previous:
+						siblings[index] = node
+						node.parent = previous.parent
+						break
+
+		for node_id in tree.highlighted:
+			node = nodes.get(node_id)
+			if isinstance(node, DOMElementNode):
+				node.highlight_index = None
+				node.is_new = None
+		tree.highlighted = set()
+		selector_map = {}
+		for node_id, highlight_index in eval_page['highlights']:
+			node = nodes.get(node_id)
+			if isinstance(node, DOMElementNode):
+				node.highlight_index = highlight_index
+				selector_map[highlight_index] = node
+				tree.highlighted.add(node_id)
+
+		root = nodes.get(str(eval_page['rootId']))
+		if root is None or not isinstance(root, DOMElementNode):
+			# Start over with a full extraction next time
+			_incremental_dom_trees.pop(self.page, None)
+			raise ValueError('Failed to parse HTML to dictionary')
+		# Only now, so a failed patch makes the next extraction a full one
+		tree.generation = eval_page['generation']
+		return root, selector_map
+
 	def _parse_node(
 		self,
 		node_data: dict,
@@ -189,7 +402,7 @@ class DomService:
 		# Process text nodes immediately
 		if node_data.get('type') == 'TEXT_NODE':
 			text_node = DOMTextNode(
-				text=node_data['text'],
+				text=intern_dom_string(node_data['text']),
 				is_visible=node_data['isVisible'],
 				parent=None,
 			)
@@ -208,7 +421,9 @@ class DomService:
 		element_node = DOMElementNode(
 			tag_name=node_data['tagName'],
 			xpath=node_data['xpath'],
-			attributes=node_data.get('attributes', {}),
+			attributes={
+				intern_dom_string(key): intern_dom_string(value) for key, value in node_data.get('attributes', {}).items()
+			},
 			children=[],
 			is_visible=node_data.get('isVisible', False),
 			is_interactive=node_data.get('isInteractive', False),
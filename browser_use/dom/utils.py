@@ -1,3 +1,16 @@
+import sys
+
+# Strings up to this length are interned; longer ones (urls, text, xpaths) are mostly unique
+INTERN_MAX_LENGTH = 64
+
+
+def intern_dom_string(value):
+	"""Intern a tag name, attribute key or short value, so equal strings of all DOM trees share one object."""
+	if isinstance(value, str) and len(value) <= INTERN_MAX_LENGTH:
+		return sys.intern(value)
+	return value
+
+
 def cap_text_length(text: str, max_length: int) -> str:
 	if len(text) > max_length:
 		return text[:max_length] + '...'
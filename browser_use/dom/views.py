@@ -1,9 +1,8 @@
-from dataclasses import dataclass
-from functools import cached_property
-from typing import TYPE_CHECKING, Optional
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, ClassVar, Optional
 
 from browser_use.dom.history_tree_processor.view import CoordinateSet, HashedDomElement, ViewportInfo
-from browser_use.dom.utils import cap_text_length
+from browser_use.dom.utils import cap_text_length, intern_dom_string
 from browser_use.utils import time_execution_sync
 
 # Avoid circular import issues
@@ -11,7 +10,10 @@ if TYPE_CHECKING:
 	from .views import DOMElementNode
 
 
-@dataclass(frozen=False)
+# Nodes are slotted: a large page holds hundreds of thousands of them, and they are kept in the agent's history
+
+
+@dataclass(frozen=False, slots=True)
 class DOMBaseNode:
 	is_visible: bool
 	# Use None as default and set parent later to avoid circular reference issues
@@ -21,10 +23,10 @@ class DOMBaseNode:
 		raise NotImplementedError('DOMBaseNode is an abstract class')
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True)
 class DOMTextNode(DOMBaseNode):
 	text: str
-	type: str = 'TEXT_NODE'
+	type: ClassVar[str] = 'TEXT_NODE'
 
 	def has_parent_with_highlight_index(self) -> bool:
 		current = self.parent
@@ -70,15 +72,18 @@ DEFAULT_INCLUDE_ATTRIBUTES = [
 ]
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, init=False, slots=True)
 class DOMElementNode(DOMBaseNode):
 	"""
 	xpath: the xpath of the element from the last root node (shadow root or iframe OR document if no shadow root or iframe).
 	To properly reference the element we need to recursively switch the root node until we find the element (work you way up the tree with `.parent`)
+
+	With xpath_relative=True, xpath is only the segments after the parent's xpath, which is prepended on access.
+	Tag names are interned, and attribute dicts may be shared between nodes, so they must not be mutated.
 	"""
 
 	tag_name: str
-	xpath: str
+	_xpath: str
 	attributes: dict[str, str]
 	children: list[DOMBaseNode]
 	is_interactive: bool = False
@@ -96,6 +101,54 @@ class DOMElementNode(DOMBaseNode):
 	The idea is that the clickable elements are sometimes persistent from the previous page -> tells the model which objects are new/_how_ the state has changed
 	"""
 	is_new: bool | None = None
+	_xpath_relative: bool = False
+
+	def __init__(
+		self,
+		is_visible: bool,
+		parent: Optional['DOMElementNode'],
+		tag_name: str,
+		xpath: str,
+		attributes: dict[str, str],
+		children: list[DOMBaseNode],
+		is_interactive: bool = False,
+		is_top_element: bool = False,
+		is_in_viewport: bool = False,
+		shadow_root: bool = False,
+		highlight_index: int | None = None,
+		viewport_coordinates: CoordinateSet | None = None,
+		page_coordinates: CoordinateSet | None = None,
+		viewport_info: ViewportInfo | None = None,
+		is_new: bool | None = None,
+		xpath_relative: bool = False,
+	):
+		self.is_visible = is_visible
+		self.parent = parent
+		self.tag_name = intern_dom_string(tag_name)
+		self._xpath = xpath
+		self._xpath_relative = xpath_relative
+		self.attributes = attributes
+		self.children = children
+		self.is_interactive = is_interactive
+		self.is_top_element = is_top_element
+		self.is_in_viewport = is_in_viewport
+		self.shadow_root = shadow_root
+		self.highlight_index = highlight_index
+		self.viewport_coordinates = viewport_coordinates
+		self.page_coordinates = page_coordinates
+		self.viewport_info = viewport_info
+		self.is_new = is_new
+
+	@property
+	def xpath(self) -> str:
+		if self._xpath_relative and self.parent is not None:
+			return f'{self.parent.xpath}/{self._xpath}'
+		return self._xpath
+
+	@xpath.setter
+	def xpath(self, xpath: str) -> None:
+		self._xpath = xpath
+		self._xpath_relative = False
 
 	def __json__(self) -> dict:
 		return {
@@ -139,8 +192,9 @@ class DOMElementNode(DOMBaseNode):
 
 		return tag_str
 
-	@cached_property
+	@property
 	def hash(self) -> HashedDomElement:
+		"""Not cached on the node, which may outlive its page in history; recent hashes are cached by their inputs."""
 		from browser_use.dom.history_tree_processor.service import (
 			HistoryTreeProcessor,
 		)
@@ -287,3 +341,6 @@ SelectorMap = dict[int, DOMElementNode]
 class DOMState:
 	element_tree: DOMElementNode
 	selector_map: SelectorMap
+	# Viewport, page size and scroll position, measured with the tree. Keyword-only, so subclasses such as
+	# BrowserStateSummary can still declare fields without defaults.
+	page_metrics: dict | None = field(default=None, kw_only=True)
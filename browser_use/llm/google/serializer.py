@@ -86,7 +86,8 @@ class GoogleMessageSerializer:
 						image_bytes = base64.b64decode(data)
 
 						# Add image part
-						image_part = Part.from_bytes(data=image_bytes, mime_type='image/png')
+						mime_type = header.split(';')[0].removeprefix('data:') or 'image/png'
+						image_part = Part.from_bytes(data=image_bytes, mime_type=mime_type)
 
 						message_parts.append(image_part)
 
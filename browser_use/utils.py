@@ -427,6 +427,19 @@ def is_new_tab_page(url: str) -> bool:
 	return url in ('about:blank', 'chrome://new-tab-page/', 'chrome://new-tab-page')
 
 
+def get_image_media_type(image_b64: str) -> str:
+	"""
+	Get the media type of a base64 encoded screenshot from its signature.
+
+	Screenshots are PNG unless a JPEG live streaming frame was reused (see browser.frame_cache).
+	"""
+	if image_b64.startswith('/9j/'):
+		return 'image/jpeg'
+	if image_b64.startswith('UklGR'):
+		return 'image/webp'
+	return 'image/png'
+
+
 def match_url_with_domain_pattern(url: str, domain_pattern: str, log_warnings: bool = False) -> bool:
 	"""
 	Check if a URL matches a domain pattern. SECURITY CRITICAL.
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+
+from .utils import HttpMethod, HttpUtils, RetryBudget, get_backoff_delay
+
+
+class RetryBudgetTests(SimpleTestCase):
+	def test_retries_are_limited_to_a_ratio_of_the_requests(self):
+		retry_budget = RetryBudget(ratio=0.5, max_tokens=2)
+
+		self.assertTrue(retry_budget.try_spend())
+		self.assertTrue(retry_budget.try_spend())
+		self.assertFalse(retry_budget.try_spend())
+		retry_budget.record_request()
+		self.assertFalse(retry_budget.try_spend())
+		retry_budget.record_request()
+		self.assertTrue(retry_budget.try_spend())
+
+	def test_tokens_are_capped(self):
+		retry_budget = RetryBudget(ratio=1, max_tokens=2)
+		for _ in range(10):
+			retry_budget.record_request()
+
+		self.assertEqual(retry_budget.tokens, 2)
+
+
+class BackoffTests(SimpleTestCase):
+	@mock.patch('api.utils.HTTP_BACKOFF_MAX', 5)
+	@mock.patch('api.utils.HTTP_BACKOFF_BASE', 0.5)
+	@mock.patch('api.utils.random.uniform', side_effect=lambda low, high: high)
+	def test_delay_grows_exponentially_up_to_the_maximum(self, uniform):
+		self.assertEqual([get_backoff_delay(attempt) for attempt in range(6)], [0.5, 1, 2, 4, 5, 5])
+
+	def test_delay_is_jittered_from_zero(self):
+		delays = [get_backoff_delay(2) for _ in range(100)]
+
+		self.assertTrue(all(0 <= delay <= 2 for delay in delays))
+		self.assertGreater(len(set(delays)), 1)
+
+
+@mock.patch('api.utils.time.sleep')
+@mock.patch('api.utils.HTTP_MAX_RETRIES', 2)
+class MakeHttpCallTests(SimpleTestCase):
+	def call(self, method, outcomes, retry_budget=None):
+		"""
+		Make an HTTP call whose attempts raise or return `outcomes` in order, and return the response and attempts.
+		"""
+		outcomes = list(outcomes)
+
+		def invoke_http_request_inner(*args):
+			outcome = outcomes.pop(0)
+			if isinstance(outcome, Exception):
+				raise outcome
+			return SimpleNamespace(status_code=outcome, content=b'')
+
+		with (
+			mock.patch.object(HttpUtils, 'invoke_http_request_inner', side_effect=invoke_http_request_inner) as invoke,
+			mock.patch('api.utils.retry_budget', retry_budget or RetryBudget()),
+			mock.patch.object(HttpUtils, 'log_response'),
+		):
+			response = HttpUtils.make_http_call(method=method, url='http://main/api/job/status-update/', json={})
+		return response, invoke.call_count
+
+	def test_server_errors_are_retried(self, sleep):
+		response, attempts = self.call(HttpMethod.POST, [503, 502, 200])
+
+		self.assertEqual((response.status_code, attempts), (200, 3))
+		self.assertEqual(sleep.call_count, 2)
+
+	def test_timed_out_post_is_not_retried(self, sleep):
+		response, attempts = self.call(HttpMethod.POST, [requests.ReadTimeout('read timed out'), 200])
+
+		self.assertEqual((response, attempts), ({}, 1))
+		sleep.assert_not_called()
+
+	def test_timed_out_get_is_retried(self, sleep):
+		response, attempts = self.call(HttpMethod.GET, [requests.ReadTimeout('read timed out'), 200])
+
+		self.assertEqual((response.status_code, attempts), (200, 2))
+
+	def test_post_that_never_connected_is_retried(self, sleep):
+		outcomes = [requests.ConnectTimeout('connect timed out'), requests.ConnectionError('refused'), 200]
+
+		response, attempts = self.call(HttpMethod.POST, outcomes)
+
+		self.assertEqual((response.status_code, attempts), (200, 3))
+
+	def test_exhausted_retry_budget_stops_retries(self, sleep):
+		response, attempts = self.call(HttpMethod.POST, [503, 200], retry_budget=RetryBudget(ratio=0, max_tokens=0))
+
+		self.assertEqual((response.status_code, attempts), (503, 1))
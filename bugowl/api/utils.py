@@ -1,14 +1,40 @@
+import json
 import logging
+import os
+import random
+import threading
 import time
 from enum import Enum
 
 import requests
 from celery import shared_task
 from django.conf import settings
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(settings.ENV)
 
 
+# Number of hosts whose connection pool is kept, and number of pooled connections per host.
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+# Retries of a request that failed with a connection error or a 5xx response. Timeouts are only retried for
+# idempotent methods, as the server may have acted on the request.
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+# Exponential backoff between retries: a random delay up to min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt) seconds.
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '5'))
+# Retries allowed per request made, so a failing dependency is not hammered with retries by every caller.
+HTTP_RETRY_BUDGET_RATIO = float(os.getenv('HTTP_RETRY_BUDGET_RATIO', '0.2'))
+HTTP_RETRY_BUDGET_MAX = float(os.getenv('HTTP_RETRY_BUDGET_MAX', '10'))
+# Default connect and read timeouts, in seconds.
+HTTP_DEFAULT_TIMEOUT = (
+	float(os.getenv('HTTP_CONNECT_TIMEOUT', '5')),
+	float(os.getenv('HTTP_READ_TIMEOUT', '30')),
+)
+# Read timeouts per endpoint, as a JSON object of URL substring to seconds, e.g. {"/api/job/status-update/": 10}.
+HTTP_ENDPOINT_TIMEOUTS = json.loads(os.getenv('HTTP_ENDPOINT_TIMEOUTS', '{}'))
+
+
 class HttpMethod(Enum):
 	GET = 1
 	POST = 2
@@ -41,18 +67,101 @@ class Browser(str, Enum):
 		return [(browser.value, browser.value.title()) for browser in cls]
 
 
+class RetryBudget:
+	"""
+	Token bucket limiting retries to a ratio of the requests made.
+
+	Each request deposits `ratio` tokens, up to `max_tokens`, and each retry spends one.
+	"""
+
+	def __init__(self, ratio=HTTP_RETRY_BUDGET_RATIO, max_tokens=HTTP_RETRY_BUDGET_MAX):
+		self.ratio = ratio
+		self.max_tokens = max_tokens
+		self.tokens = max_tokens
+		self.lock = threading.Lock()
+
+	def record_request(self):
+		with self.lock:
+			self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+	def try_spend(self):
+		"""
+		Spend a token for a retry.
+
+		Returns:
+			bool: False if the budget is exhausted and the request should not be retried.
+		"""
+		with self.lock:
+			if self.tokens < 1:
+				return False
+			self.tokens -= 1
+			return True
+
+
+def get_backoff_delay(attempt):
+	"""
+	Get the delay before a retry, with full jitter.
+
+	Args:
+		attempt (int): 0 for the first retry.
+	"""
+	return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2**attempt))
+
+
+def get_timeout(url):
+	"""
+	Get the (connect, read) timeout for a URL, using the first matching HTTP_ENDPOINT_TIMEOUTS entry.
+	"""
+	for endpoint, read_timeout in HTTP_ENDPOINT_TIMEOUTS.items():
+		if endpoint in url:
+			return (HTTP_DEFAULT_TIMEOUT[0], float(read_timeout))
+	return HTTP_DEFAULT_TIMEOUT
+
+
+def is_retryable_status(status_code):
+	return status_code >= 500
+
+
+IDEMPOTENT_METHODS = {HttpMethod.GET, HttpMethod.PUT, HttpMethod.DELETE}
+
+
+def is_retryable_error(method, error):
+	"""
+	Check whether a request that failed with a connection error or a timeout can be sent again.
+
+	A request that timed out may have reached the server, so it is only retried for idempotent methods, unless it
+	timed out while connecting.
+	"""
+	if isinstance(error, requests.ConnectTimeout):
+		return True
+	if isinstance(error, requests.Timeout):
+		return method in IDEMPOTENT_METHODS
+	return isinstance(error, requests.ConnectionError)
+
+
+_http_session = None
+_http_session_lock = threading.Lock()
+retry_budget = RetryBudget()
+
+
+def get_http_session():
+	"""
+	Get the process-wide requests session, keeping up to HTTP_POOL_MAXSIZE connections alive per host.
+	"""
+	global _http_session
+	with _http_session_lock:
+		if _http_session is None:
+			session = requests.Session()
+			adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+			session.mount('http://', adapter)
+			session.mount('https://', adapter)
+			_http_session = session
+		return _http_session
+
+
 class HttpUtils:
 	@staticmethod
-	def invoke_http_request_inner(
-		method,
-		url,
-		headers=None,
-		payload=None,
-		json=None,
-		files=None,
-		params=None,
-		skip_ssl_check=False,
-	):
+	def get_curl_command(method, url, headers=None, payload=None, json=None):
 		data = json
 		if payload:
 			data = payload
@@ -60,46 +169,60 @@ class HttpUtils:
 		if headers:
 			for h in headers:
 				header_param = header_param + f" --header '{h}:{headers[h]}' "
-		curl_command = f"curl --location  --request {method.name} {url} {header_param} --data '{data}' "
-		logger.info(curl_command)
+		return f"curl --location  --request {method.name} {url} {header_param} --data '{data}' "
+
+	@staticmethod
+	def get_request_kwargs(method, headers=None, payload=None, json=None, files=None, params=None):
 		if method == HttpMethod.GET:
-			response = requests.get(
-				url,
-				headers=headers,
-				files=files,
-				params=params,
-				verify=not skip_ssl_check,
-			)
+			return {'headers': headers, 'files': files, 'params': params}
 		elif method == HttpMethod.POST:
-			response = requests.post(
-				url,
-				headers=headers,
-				data=payload,
-				json=json,
-				files=files,
-				verify=not skip_ssl_check,
-			)
-		elif method == HttpMethod.PUT:
-			response = requests.put(
-				url,
-				headers=headers,
-				data=payload,
-				files=files,
-				verify=not skip_ssl_check,
-			)
-		elif method == HttpMethod.PATCH:
-			response = requests.patch(
-				url,
-				headers=headers,
-				data=payload,
-				files=files,
-				verify=not skip_ssl_check,
-			)
+			return {'headers': headers, 'data': payload, 'json': json, 'files': files}
+		elif method in (HttpMethod.PUT, HttpMethod.PATCH):
+			return {'headers': headers, 'data': payload, 'files': files}
 		elif method == HttpMethod.DELETE:
-			response = requests.delete(url, headers=headers, files=files, verify=not skip_ssl_check)
-		else:
-			logger.error('Invalid HTTP method', exc_info=True)
-		return response
+			return {'headers': headers, 'files': files}
+		raise ValueError(f'Invalid HTTP method: {method}')
+
+	@staticmethod
+	def invoke_http_request_inner(
+		method,
+		url,
+		headers=None,
+		payload=None,
+		json=None,
+		files=None,
+		params=None,
+		skip_ssl_check=False,
+	):
+		logger.info(HttpUtils.get_curl_command(method, url, headers, payload, json))
+		request_kwargs = HttpUtils.get_request_kwargs(method, headers, payload, json, files, params)
+		return get_http_session().request(method.name, url, verify=not skip_ssl_check, timeout=get_timeout(url), **request_kwargs)
+
+	@staticmethod
+	def prepare_headers(headers=None, files=None, headers_required=True):
+		if not files and headers_required:
+			if not headers:
+				headers = {}
+			if 'Content-Type' not in headers:
+				headers['Content-Type'] = 'application/json'
+			headers['Accept'] = '*/*'
+		return headers
+
+	@staticmethod
+	def log_response(response, method, url, headers=None, payload=None, json=None):
+		TRIM_LEN = 2000
+		if (
+			response.status_code < 200 or response.status_code > 299 and 'slack' not in url
+		):  # if slack call fails it can go in infinite loop
+			is_internal_call = response.status_code == 401 and 'baya.biz' in url
+			if not is_internal_call:
+				# With tracback prefix it logs to Slack channel
+				logger.error(
+					f'HTTP call failed: {response.status_code} {response.content} | {method} - {url}  headers: {headers}, payload: {payload} , json: {json}',
+					exc_info=True,
+				)
+		logger.info(response)
+		logger.info(response.content[:TRIM_LEN])
 
 	@staticmethod
 	@shared_task()
@@ -117,31 +240,29 @@ class HttpUtils:
 		TRIM_LEN = 2000
 		response = {}
 		try:
-			if not files and headers_required:
-				if not headers:
-					headers = {}
-				if 'Content-Type' not in headers:
-					headers['Content-Type'] = 'application/json'
-				headers['Accept'] = '*/*'
+			headers = HttpUtils.prepare_headers(headers, files, headers_required)
 			log_msg = f'CALLING API: {method} - {url}  headers: {headers}, payload: {payload} , json: {json}'
 			logger.info(log_msg[0:TRIM_LEN])
-			response = HttpUtils.invoke_http_request_inner(method, url, headers, payload, json, files, params, skip_ssl_check)
-			if response.status_code >= 500:
-				logger.error(f'Got server error of {response.status_code}, retrying again in 5 seconds', exc_info=True)
-				time.sleep(5)
-				response = HttpUtils.invoke_http_request_inner(method, url, headers, payload, json, files, params, skip_ssl_check)
-			if (
-				response.status_code < 200 or response.status_code > 299 and 'slack' not in url
-			):  # if slack call fails it can go in infinite loop
-				is_internal_call = response.status_code == 401 and 'baya.biz' in url
-				if not is_internal_call:
-					# With tracback prefix it logs to Slack channel
-					logger.error(
-						f'HTTP call failed: {response.status_code} {response.content} | {method} - {url}  headers: {headers}, payload: {payload} , json: {json}',
-						exc_info=True,
+			retry_budget.record_request()
+			for attempt in range(HTTP_MAX_RETRIES + 1):
+				can_retry = attempt < HTTP_MAX_RETRIES and not files
+				try:
+					response = HttpUtils.invoke_http_request_inner(
+						method, url, headers, payload, json, files, params, skip_ssl_check
 					)
-			logger.info(response)
-			logger.info(response.content[:TRIM_LEN])
+				except (requests.ConnectionError, requests.Timeout) as e:
+					if not can_retry or not is_retryable_error(method, e) or not retry_budget.try_spend():
+						raise
+					delay = get_backoff_delay(attempt)
+					logger.warning(f'HTTP call to {url} failed with {e}, retrying in {delay:.2f} seconds')
+					time.sleep(delay)
+					continue
+				if not is_retryable_status(response.status_code) or not can_retry or not retry_budget.try_spend():
+					break
+				delay = get_backoff_delay(attempt)
+				logger.error(f'Got server error of {response.status_code}, retrying again in {delay:.2f} seconds', exc_info=True)
+				time.sleep(delay)
+			HttpUtils.log_response(response, method, url, headers, payload, json)
 		except Exception as e:
 			logger.error(f'Unexpected error during HTTP request: {str(e)}', exc_info=True)
 			if 'slack' not in url:  # If slack call fails due to some formatting issue, it goes into infinite loop
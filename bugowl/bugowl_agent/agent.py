@@ -2,6 +2,7 @@ import asyncio
 import json
 import logging
 import os
+import time
 import uuid
 
 import coloredlogs
@@ -10,19 +11,45 @@ from asgiref.sync import sync_to_async
 from django.core.cache import cache
 from job.helpers import get_cancel_job_status_cache
 from job.utils import get_cancel_cache_key
+from testask.models import TestTaskHistory
 from testask.serializers import TestTaskRunSerializer
 from testcase.serializers import TestCaseRunSerializer
 from websocket.utils import PLAYCOMMANDS, get_job_streaming_group_name
 
 from browser_use import Agent
+from browser_use.agent.views import AgentHistoryList
 from browser_use.browser import BrowserProfile
 from browser_use.browser.profile import get_display_size
 from browser_use.browser.session import BrowserSession
 
+from .artifact_uploader import ArtifactUploadGroup
+from .browser_pool import get_browser_pool, reset_browser_session
+from .cancel_listener import CancelListener
 from .exceptions import JobCancelledException
-from .tasks import update_status_main
+from .llm_cache import get_llm_response_cache
+from .screencast_streaming import create_live_streaming
+from .status_outbox import send_status_update
+from .step_activity import StepActivityRecorder
+from .step_writer import get_step_writer
 from .utils import CHROME_ARGS, get_llm_model, save_failure_screenshot, upload_video_S3
-from .video_recording_streaming import LiveStreaming  # Import LiveStreaming
+from .video_ring_buffer import VIDEO_RECORDING_MODE, FrameRingBuffer, VideoCaptureStats
+from .video_transcoder import get_video_transcoder
+
+# Upper bound on how many test cases of one job a worker runs at the same time.
+# A job may ask for less (or more, which is capped) via payload['job']['max_concurrent_test_cases'].
+WORKER_MAX_CONCURRENT_TEST_CASES = int(os.getenv('AGENT_MAX_CONCURRENT_TEST_CASES', '1'))
+# Reuse a live streaming frame or an earlier screenshot of the unchanged viewport made at most this many seconds
+# ago, instead of taking a new screenshot for the LLM. 0 disables reuse.
+SCREENSHOT_REUSE_MAX_AGE = float(os.getenv('AGENT_SCREENSHOT_REUSE_MAX_AGE', '1'))
+# Seconds a finished test task waits for its step records to be written.
+STEP_RECORD_FLUSH_TIMEOUT = float(os.getenv('AGENT_STEP_RECORD_FLUSH_TIMEOUT', '30'))
+# Replay the last passing run of a test task before falling back to the LLM. Off by default; when enabled a job
+# can opt out with payload['job']['replay_history'] = False.
+REPLAY_PASSING_HISTORY = os.getenv('AGENT_REPLAY_HISTORY', 'False') == 'True'
+# Seconds a playground browser is kept warm without commands before it is freed. 0 keeps it until disconnect.
+PLAYGROUND_IDLE_TIMEOUT = float(os.getenv('PLAYGROUND_IDLE_TIMEOUT', '600'))
+# Also clear cookies and storage when the warm playground browser is reset before executing all tasks.
+PLAYGROUND_RESET_CLEAR_STORAGE = os.getenv('PLAYGROUND_RESET_CLEAR_STORAGE', 'False') == 'True'
 
 
 class PlayGroundTask:
@@ -41,12 +68,12 @@ class PlayGroundTask:
 
 
 class AgentManager:
-	def _setup_logger(self):
+	def _setup_logger(self, logger_name='AgentManager'):
 		"""
 		Set up a custom logger for the AgentManager class with colored logs.
 		"""
 
-		self.logger = logging.getLogger('AgentManager')
+		self.logger = logging.getLogger(logger_name)
 		self.logger.setLevel(logging.DEBUG)
 
 		self.logger.propagate = False
@@ -88,6 +115,8 @@ class AgentManager:
 		use_thinking=False,
 		highlight_elements=False,
 		channel_name=None,
+		max_concurrent_test_cases=None,
+		logger_name='AgentManager',
 	):
 		"""
 		Initialize the AgentManager with default or user-provided configurations.
@@ -103,9 +132,12 @@ class AgentManager:
 			use_vision (bool): Whether to enable vision for the agent.
 			cloud_sync (str): Cloud sync configuration (default: None).
 			use_thinking (bool): Whether to enable thinking mode for the agent.
+			max_concurrent_test_cases (int, optional): How many test cases of the job to run at once.
+				If None, reads it from the job payload, capped by AGENT_MAX_CONCURRENT_TEST_CASES.
+			logger_name (str): Name of the logger, so the logs of concurrent managers can be told apart.
 		"""
 
-		self._setup_logger()
+		self._setup_logger(logger_name)
 		self.logger.info('Initializing AgentManager...')
 		self.job_instance = job_instance
 		self.headless = headless
@@ -126,6 +158,7 @@ class AgentManager:
 		self.use_thinking = use_thinking
 		self.highlight_elements = highlight_elements
 		self.browser_session = None
+		self.browser_pool = None
 		self.agent = None
 		self.test_case_run = None
 		self.testtask_run = None
@@ -137,32 +170,102 @@ class AgentManager:
 		self.group_name = None
 
 		self.task_id = None
+		self.step_browser_state = None
+		self.step_activity = None
+		self.recorded_usage_count = 0
+		self.llm_cache = get_llm_response_cache(job_instance)
+		self.replay_enabled = self.get_replay_enabled()
+		self.max_concurrent_test_cases = self.get_max_concurrent_test_cases(max_concurrent_test_cases)
+		self.case_managers = []
+		# Test cases that could not be saved or run to completion, which fail the job
+		self.unfinished_test_cases = 0
+		# A shard of a sharded job leaves the job status to the finalize_job chord callback
+		self.is_job_shard = False
+		self.artifact_uploads = ArtifactUploadGroup()
+		self.frame_buffer = None
+		self.video_stats = VideoCaptureStats()
+		self.video_debug = self.get_video_debug()
+		self.cancel_requested = False
+		self.cancel_published_at = None
+		self.cancel_latency = None
+		self.in_flight_task = None
 
 		self.logger.info('AgentManager initialized successfully.')
 
+	def get_max_concurrent_test_cases(self, max_concurrent_test_cases=None):
+		"""
+		Resolve the test case concurrency for this job from the argument, the job payload and the worker limit.
+		"""
+		if max_concurrent_test_cases is None and self.job_instance:
+			job_payload = (self.job_instance.payload or {}).get('job') or {}  # type: ignore
+			max_concurrent_test_cases = job_payload.get('max_concurrent_test_cases')
+		if max_concurrent_test_cases is None:
+			max_concurrent_test_cases = WORKER_MAX_CONCURRENT_TEST_CASES
+		try:
+			max_concurrent_test_cases = int(max_concurrent_test_cases)
+		except (TypeError, ValueError):
+			self.logger.warning(f'Invalid max_concurrent_test_cases={max_concurrent_test_cases}, running test cases one by one.')
+			return 1
+		return max(1, min(max_concurrent_test_cases, max(1, WORKER_MAX_CONCURRENT_TEST_CASES)))
+
+	def get_video_debug(self):
+		"""
+		Check if the job asks for the video of every test case, even in the failure-only recording mode.
+		"""
+		if not self.job_instance:
+			return False
+		job_payload = (self.job_instance.payload or {}).get('job') or {}
+		return bool(job_payload.get('debug_video'))
+
+	def get_replay_enabled(self):
+		"""
+		Check whether test tasks should replay their last passing run before asking the LLM.
+		"""
+		if not REPLAY_PASSING_HISTORY or not self.job_instance:
+			return False
+		job_payload = (self.job_instance.payload or {}).get('job') or {}  # type: ignore
+		return job_payload.get('replay_history') is not False
+
 	def get_chrome_args(self):
 		"""
 		Get Chrome arguments optimized for automation.
 		"""
 		return CHROME_ARGS
 
+	def get_browser_profile_kwargs(self):
+		"""
+		Get the BrowserProfile arguments for this manager, without the per-session user_data_dir.
+		"""
+		screen_size = get_display_size() or {'width': 1920, 'height': 1080}
+		profile_kwargs = {
+			'viewport': None,
+			'keep_alive': True,
+			'headless': self.headless,
+			'disable_security': False,
+			'highlight_elements': self.highlight_elements,
+			'window_size': screen_size,
+			'args': self.get_chrome_args(),
+			'screenshot_reuse_max_age': SCREENSHOT_REUSE_MAX_AGE,
+		}
+		if not self.uses_frame_buffer():
+			profile_kwargs['record_video_dir'] = self.record_video_dir
+			profile_kwargs['record_video_size'] = screen_size
+		return profile_kwargs
+
+	def uses_frame_buffer(self):
+		"""
+		Check if test case videos come from the in-memory frame buffer instead of Playwright's recording.
+		"""
+		return VIDEO_RECORDING_MODE == 'failure' and self.job_instance is not None
+
 	def configure_browser(self):
 		"""
 		Configure the browser profile for the session.
 		"""
 		self.logger.info('Configuring browser profile...')
-		screen_size = get_display_size() or {'width': 1920, 'height': 1080}
 		browser_profile = BrowserProfile(
-			viewport=None,
-			keep_alive=True,
-			headless=self.headless,
-			disable_security=False,
-			highlight_elements=self.highlight_elements,
-			record_video_dir=self.record_video_dir,
-			record_video_size=screen_size,
-			window_size=screen_size,
+			**self.get_browser_profile_kwargs(),
 			user_data_dir=f'/app/bugowl/browser_profiles/{uuid.uuid4()}',
-			args=self.get_chrome_args(),
 		)
 		self.browser_session = BrowserSession(browser_profile=browser_profile)
 		self.logger.info('Browser session configured.')
@@ -179,7 +282,7 @@ class AgentManager:
 			self.test_case_run = await sync_to_async(serializer.save)()
 			self.logger.info('Test case run data saved successfully.')
 			self.logger.info('Updating test case run status to RUNNING in the main server...')
-			update_status_main.delay(  # type: ignore
+			send_status_update(
 				job_uuid=str(self.job_instance.job_uuid),  # type: ignore
 				test_case_uuid=str(self.test_case_run.test_case_uuid),  # type: ignore
 				test_case_status=self.test_case_run.status,
@@ -259,11 +362,29 @@ class AgentManager:
 		self.test_case_list = test_case_list
 		self.logger.info('Job payload processed successfully.')
 
+	def mark_runs_cancelled(self):
+		"""
+		Mark the current test case run and test task run as CANCELED unless they already finished.
+		"""
+		if self.test_case_run:
+			if self.test_case_run.status not in [JobStatusEnum.PASS_.value, JobStatusEnum.FAILED.value]:
+				self.logger.info(f'Updating test case {self.test_case_run.test_case_uuid} status to CANCELED')
+				self.test_case_run.status = JobStatusEnum.CANCELED.value
+				self.test_case_run.save(update_fields=['status', 'updated_at'])
+		if self.testtask_run:
+			if self.testtask_run.status not in [JobStatusEnum.PASS_.value, JobStatusEnum.FAILED.value]:
+				self.logger.info(f'Updating test task {self.testtask_run.testtask_uuid} status to CANCELED')
+				self.testtask_run.status = JobStatusEnum.CANCELED.value
+				self.testtask_run.save(update_fields=['status', 'updated_at'])
+
 	def check_job_cancelled(self, exception_message):
 		"""
 		Check if the job is cancelled based on the cache status.
 		Raise JobCancelledException if the job is cancelled.
 		"""
+		if self.cancel_requested:
+			self.logger.info(f'Job cancellation was pushed to this worker. {exception_message}')
+			raise JobCancelledException(f'{exception_message}')
 		if not self.job_instance:
 			self.logger.warning('Job instance is not set. Cannot check job cancellation status.')
 			return
@@ -273,22 +394,66 @@ class AgentManager:
 
 			raise JobCancelledException(f'{exception_message}')
 
+	def interrupt_for_cancel(self, published_at=None):
+		"""
+		Stop the agents of this manager and of its per-case managers right away, cancelling their in-flight step.
+
+		Called by the CancelListener when the cancellation of the job is published.
+
+		Args:
+			published_at (float): time.time() at which the cancellation was published, used to measure the halt latency.
+		"""
+		for manager in [self, *self.case_managers]:
+			manager.cancel_requested = True
+			manager.cancel_published_at = published_at
+			if manager.agent:
+				manager.agent.stop()
+			if manager.in_flight_task and not manager.in_flight_task.done():
+				manager.in_flight_task.cancel()
+		self.logger.info(f'Interrupted job {self.job_instance.job_uuid if self.job_instance else None} for cancellation.')
+
+	async def start_cancel_listener(self):
+		"""
+		Start listening for the cancellation of the job. Returns None if the listener could not subscribe,
+		in which case the job still sees the cancellation through check_job_cancelled.
+		"""
+		cancel_listener = CancelListener(self)
+		try:
+			await cancel_listener.start()
+		except Exception as e:
+			self.logger.warning(f'Failed to start cancel listener, falling back to cache polling: {e}')
+			await cancel_listener.stop()
+			return None
+		return cancel_listener
+
 	async def start_browser_session(self):
 		"""
 		Start the browser session and initialize LiveStreaming.
 		"""
 		self.check_job_cancelled('start_browser_session')
 		if not self.browser_session:
-			self.configure_browser()
+			self.browser_pool = get_browser_pool(self.get_browser_profile_kwargs())
+			if self.browser_pool:
+				self.browser_session = await self.browser_pool.checkout()
+			else:
+				self.configure_browser()
 		await self.browser_session.start()  # type: ignore
 		self.logger.info('Browser session started.')
+		if self.browser_session.browser_context:  # type: ignore
+			self.step_activity = StepActivityRecorder(self.browser_session.browser_context)  # type: ignore
+			self.step_activity.start()
 
 		# Initialize and start LiveStreaming
 		if not self.channel_name:
 			self.group_name = get_job_streaming_group_name(self.job_instance.job_uuid)  # type: ignore
 
-		self.live_streaming = LiveStreaming(
-			agent_manager=self, channel_name=self.channel_name, group_name=self.group_name, fps=12
+		self.frame_buffer = FrameRingBuffer() if self.uses_frame_buffer() else None
+		self.live_streaming = create_live_streaming(
+			agent_manager=self,
+			channel_name=self.channel_name,
+			group_name=self.group_name,
+			fps=12,
+			frame_buffer=self.frame_buffer,
 		)
 		await self.live_streaming.start()
 		self.logger.info('Live streaming started.')
@@ -311,10 +476,20 @@ class AgentManager:
 			self.live_streaming = None
 			self.logger.info('Live streaming stopped.')
 
+		if self.step_activity:
+			self.step_activity.stop()
+			self.step_activity = None
+
 		if self.browser_session:
-			await self.browser_session.kill()
+			self.log_frame_cache_stats()
+			if self.browser_pool:
+				await self.browser_pool.checkin(self.browser_session)
+				self.browser_pool = None
+				self.logger.info('Browser session returned to the pool.')
+			else:
+				await self.browser_session.kill()
+				self.logger.info('Browser session stopped.')
 			self.browser_session = None
-			self.logger.info('Browser session stopped.')
 
 		self.check_job_cancelled('stop_browser_session')
 
@@ -324,7 +499,7 @@ class AgentManager:
 		"""
 
 		if self.testtask_run:
-			update_fields = ['status', 'updated_at']
+			update_fields = ['status', 'replayed_steps', 'replanned_steps', 'updated_at']
 			self.testtask_run.status = status
 			await sync_to_async(self.testtask_run.save)(update_fields=update_fields)
 
@@ -343,7 +518,7 @@ class AgentManager:
 				update_fields.append('failure_screenshot')
 			await sync_to_async(self.test_case_run.save)(update_fields=update_fields)
 			self.logger.info(f'Updating test case status to {status} in the main server...')
-			update_status_main.delay(  # type: ignore
+			send_status_update(
 				job_uuid=str(self.job_instance.job_uuid),  # type: ignore
 				test_case_uuid=str(self.test_case_run.test_case_uuid),  # type: ignore
 				test_case_status=status,
@@ -355,13 +530,24 @@ class AgentManager:
 		"""
 		if self.job_instance:
 			self.check_job_cancelled('update_job_instance')
+			if status != JobStatusEnum.RUNNING.value:
+				await self.wait_for_artifact_uploads()
 
 			self.job_instance.status = status
 			await sync_to_async(self.job_instance.save)(update_fields=['status', 'updated_at'])
 			self.logger.info(f'Updating job status to {status} in the main server...')
-			update_status_main.delay(  # type: ignore
-				job_uuid=str(self.job_instance.job_uuid), job_status=status
-			)
+			send_status_update(job_uuid=str(self.job_instance.job_uuid), job_status=status)  # type: ignore
+
+	async def wait_for_artifact_uploads(self):
+		"""
+		Wait for the artifact uploads of the job still running in the background.
+		"""
+		upload_results = await self.artifact_uploads.wait()
+		if any(upload_results.values()):
+			self.logger.info(f'Artifact uploads of the job: {upload_results}')
+		transcoder = get_video_transcoder()
+		if transcoder and transcoder.transcoded:
+			self.logger.info(f'Video transcoding of this worker: {transcoder.stats()}')
 
 	async def run_test_case(self):
 		"""
@@ -375,98 +561,227 @@ class AgentManager:
 
 		self.check_job_cancelled('run_test_case')
 
-		self.logger.info('updating job status to RUNNING')
-		await self.update_job_instance(status=JobStatusEnum.RUNNING.value)
+		if not self.is_job_shard:
+			self.logger.info('updating job status to RUNNING')
+			await self.update_job_instance(status=JobStatusEnum.RUNNING.value)
 		run_results_case = {}
 		try:
-			for test_case in self.test_case_list:
-				self.logger.info(f'testcase name: {test_case["name"]}')
-				test_tasks = test_case.pop('test_task')
-				result = await self.save_testcase_run(test_case)
-				run_results_task = {}
-
-				if result:
-					if not self.browser_session:
-						await self.start_browser_session()
-						self.logger.info('New Browser session is ready for next testcase. Starting test case execution...')
-					else:
-						await self.stop_browser_session()
-						self.logger.info('Browser session stopped. Starting new browser session for next testcase...')
-						await self.start_browser_session()
-						self.logger.info('New Browser session is ready for next testcase. Starting test case execution...')
-					self.logger.info(f'Test case {test_case["name"]} saved successfully.')
-					image_url = None
-					for count, test_task in enumerate(test_tasks, start=1):
-						self.logger.info(f'Test task title: {test_task["title"]}')
-						test_task['test_case_run'] = self.test_case_run.id if self.test_case_run else None
-						result = await self.save_testtask_run(test_task)
-
-						if result:
-							title = self.testtask_run.title  # type: ignore
-							self.logger.info(f'Test task {title} saved successfully.')
-							self.logger.info(f'Executing Task #{count}: {title}')
-							sensitive_data = (
-								{self.testtask_run.test_data.get('name'): self.testtask_run.test_data.get('data')}  # type: ignore
-								if self.testtask_run.test_data  # type: ignore
-								else {}
-							)
-							self.check_job_cancelled('run_test_case_taskLoop')
-							self.task_id = str(self.test_case_run.test_case_uuid)  # type:ignore
-							history, output = await self.run_task(title, sensitive_data=sensitive_data)
-							self.logger.info(f'Task #{count} Result: {output}')
-							run_results_task[str(self.testtask_run.uuid)] = output  # type: ignore
-
-							if not history.is_successful():
-								# Handle failure (e.g., take a screenshot)
-								image_url = await save_failure_screenshot(
-									self.browser_session,
-									self.logger,
-									str(self.job_instance.job_uuid),  # type: ignore
-									str(self.test_case_run.test_case_uuid),  # type: ignore
-								)
-								await self.update_testtask_run(status=JobStatusEnum.FAILED.value)
-								break
-							else:
-								image_url = None
-								await self.update_testtask_run(status=JobStatusEnum.PASS_.value)
-						else:
-							self.logger.error(f'Failed to save test task {test_task["title"]}.', exc_info=True)
-							await self.update_job_instance(status=JobStatusEnum.FAILED.value)
-							return
-
-					# After all test tasks for this test case are executed, check their results
-					self.page = await self.browser_session.get_current_page()  # type: ignore
-					video_url = await self.page.video.path() if self.page else None  # type: ignore
-					self.logger.info(f'Video URL: {video_url}')
-					await self.stop_browser_session()
-					video_url = await upload_video_S3(
-						self.job_instance,
-						self.test_case_run,
-						video_url,
-						self.logger,
-					)
-					task_results = run_results_task  # type: ignore
-					all_success = all(result == '✅ SUCCESSFUL' for result in task_results.values())
-					final_status = JobStatusEnum.PASS_.value if all_success else JobStatusEnum.FAILED.value
-					run_results_case[str(self.test_case_run.uuid)] = all_success  # type: ignore
-
-					await self.update_testcase_run(status=final_status, video_url=video_url, image_url=image_url)
-				else:
-					self.logger.error(f'Failed to save test case {test_case["name"]}.', exc_info=True)
-					await self.update_job_instance(status=JobStatusEnum.FAILED.value)
-					return
+			if self.max_concurrent_test_cases > 1 and len(self.test_case_list) > 1:
+				self.logger.info(
+					f'Running {len(self.test_case_list)} test cases with concurrency {self.max_concurrent_test_cases}...'
+				)
+				case_results = await self.run_test_cases_concurrently()
+				for case_result in case_results:
+					if case_result is None:
+						self.unfinished_test_cases += 1
+						continue
+					run_results_case.update(case_result)
+			else:
+				for test_case in self.test_case_list:
+					case_result = await self.run_single_test_case(test_case)
+					if case_result is None:
+						self.unfinished_test_cases += 1
+						break
+					run_results_case.update(case_result)
 			self.logger.info('All test cases executed successfully.')
 		except JobCancelledException as e:
 			self.logger.info(f'Job cancelled from {e}')
 			raise JobCancelledException('run_test_case')
 		except Exception as e:
 			self.logger.error(f'Error running test cases: {e}', exc_info=True)
-			await self.update_job_instance(status=JobStatusEnum.FAILED.value)
+			if not self.is_job_shard:
+				await self.update_job_instance(status=JobStatusEnum.FAILED.value)
 			raise
 		finally:
 			if self.browser_session:
 				await self.stop_browser_session()
-			return run_results_case
+		return run_results_case
+
+	async def run_single_test_case(self, test_case):
+		"""
+		Run all the test tasks of a single test case in this manager's browser session.
+
+		Returns:
+			dict: {test_case_run_uuid: all_tasks_passed}, or None if the test case or one of its
+				test tasks could not be saved.
+		"""
+		self.logger.info(f'testcase name: {test_case["name"]}')
+		test_tasks = test_case.pop('test_task')
+		result = await self.save_testcase_run(test_case)
+		run_results_task = {}
+
+		if not result:
+			self.logger.error(f'Failed to save test case {test_case["name"]}.', exc_info=True)
+			return None
+
+		if not self.browser_session:
+			await self.start_browser_session()
+			self.logger.info('New Browser session is ready for next testcase. Starting test case execution...')
+		else:
+			await self.stop_browser_session()
+			self.logger.info('Browser session stopped. Starting new browser session for next testcase...')
+			await self.start_browser_session()
+			self.logger.info('New Browser session is ready for next testcase. Starting test case execution...')
+		self.logger.info(f'Test case {test_case["name"]} saved successfully.')
+		image_url = None
+		for count, test_task in enumerate(test_tasks, start=1):
+			self.logger.info(f'Test task title: {test_task["title"]}')
+			test_task['test_case_run'] = self.test_case_run.id if self.test_case_run else None
+			result = await self.save_testtask_run(test_task)
+
+			if result:
+				title = self.testtask_run.title  # type: ignore
+				self.logger.info(f'Test task {title} saved successfully.')
+				self.logger.info(f'Executing Task #{count}: {title}')
+				sensitive_data = (
+					{self.testtask_run.test_data.get('name'): self.testtask_run.test_data.get('data')}  # type: ignore
+					if self.testtask_run.test_data  # type: ignore
+					else {}
+				)
+				self.check_job_cancelled('run_test_case_taskLoop')
+				self.task_id = str(self.test_case_run.test_case_uuid)  # type:ignore
+				history, output = await self.run_task(title, sensitive_data=sensitive_data)
+				self.logger.info(f'Task #{count} Result: {output}')
+				run_results_task[str(self.testtask_run.uuid)] = output  # type: ignore
+
+				if not history.is_successful():
+					# Handle failure (e.g., take a screenshot)
+					image_url = await save_failure_screenshot(
+						self.browser_session,
+						self.logger,
+						str(self.job_instance.job_uuid),  # type: ignore
+						str(self.test_case_run.test_case_uuid),  # type: ignore
+					)
+					await self.update_testtask_run(status=JobStatusEnum.FAILED.value)
+					break
+				else:
+					image_url = None
+					await self.update_testtask_run(status=JobStatusEnum.PASS_.value)
+			else:
+				self.logger.error(f'Failed to save test task {test_task["title"]}.', exc_info=True)
+				return None
+
+		# After all test tasks for this test case are executed, check their results
+		task_results = run_results_task  # type: ignore
+		all_success = all(result == '✅ SUCCESSFUL' for result in task_results.values())
+		self.page = await self.browser_session.get_current_page()  # type: ignore
+		video_url = await self.page.video.path() if self.page and self.page.video else None  # type: ignore
+		await self.stop_browser_session()
+		if self.frame_buffer:
+			video_url = await self.save_buffered_video(all_success)
+		self.logger.info(f'Video URL: {video_url}')
+		video_url = await upload_video_S3(
+			self.job_instance,
+			self.test_case_run,
+			video_url,
+			self.logger,
+			artifact_uploads=self.artifact_uploads,
+		)
+		final_status = JobStatusEnum.PASS_.value if all_success else JobStatusEnum.FAILED.value
+
+		await self.update_testcase_run(status=final_status, video_url=video_url, image_url=image_url)
+		return {str(self.test_case_run.uuid): all_success}  # type: ignore
+
+	async def save_buffered_video(self, all_success):
+		"""
+		Encode the frame buffer of the test case to a video if it failed or the job asks for debug videos.
+
+		Returns:
+			str | None: Path of the video, or None if it was not needed.
+		"""
+		frame_buffer, self.frame_buffer = self.frame_buffer, None
+		if all_success and not self.video_debug:
+			self.video_stats.record_skipped(frame_buffer)
+			self.logger.info(f'Test case passed, discarding {len(frame_buffer.frames)} buffered frames.')  # type: ignore
+			return None
+		video_path = os.path.join(self.record_video_dir, f'{uuid.uuid4()}.mp4')
+		video_bytes, cpu_seconds = await asyncio.to_thread(frame_buffer.encode, video_path)  # type: ignore
+		if not video_bytes:
+			self.logger.warning('No buffered frames to encode for the test case video.')
+			return None
+		self.video_stats.record_encoded(frame_buffer, video_bytes, cpu_seconds)
+		self.logger.info(f'Encoded {len(frame_buffer.frames)} buffered frames to {video_path} in {cpu_seconds:.2f}s CPU.')  # type: ignore
+		return video_path
+
+	def log_video_stats(self):
+		if self.uses_frame_buffer():
+			self.logger.info(f'Failure-only video capture: {self.video_stats.summary()}')
+
+	def log_frame_cache_stats(self):
+		"""
+		Log how many screenshots the agent and the live stream reused from each other during this run, and reset
+		the cache so a pooled browser starts the next run clean.
+		"""
+		frame_cache = getattr(self.browser_session, 'frame_cache', None)
+		if frame_cache is None:
+			return
+		self.logger.info(f'Screenshot reuse: {frame_cache.summary()}')
+		frame_cache.reset()
+
+	def spawn_case_manager(self, case_index):
+		"""
+		Create a child AgentManager that runs one test case of this job in isolation.
+
+		The child shares the job and agent configuration but owns its own BrowserSession,
+		LiveStreaming instance, Agent and FileSystem, so several of them can run side by side.
+		Its logger is named after the position of the test case in the job.
+		"""
+		case_manager = AgentManager(
+			job_instance=self.job_instance,
+			headless=self.headless,
+			browser_type=self.browser_type,
+			llm_model=self.llm_model,
+			save_conversation_path=self.save_conversation_path,
+			record_video_dir=self.record_video_dir,
+			enable_memory=self.enable_memory,
+			use_vision=self.use_vision,
+			cloud_sync=self.cloud_sync,
+			use_thinking=self.use_thinking,
+			highlight_elements=self.highlight_elements,
+			max_concurrent_test_cases=1,
+			logger_name=f'AgentManager.case-{case_index + 1}',
+		)
+		# Uploads of every test case of the job must finish before the job is marked final
+		case_manager.artifact_uploads = self.artifact_uploads
+		case_manager.video_stats = self.video_stats
+		self.case_managers.append(case_manager)
+		return case_manager
+
+	async def run_test_cases_concurrently(self):
+		"""
+		Run the test cases of the job with at most `max_concurrent_test_cases` running at once.
+
+		Returns:
+			list: One entry per test case, in payload order, as returned by `run_single_test_case`.
+		"""
+		semaphore = asyncio.Semaphore(self.max_concurrent_test_cases)
+
+		async def run_case(case_index, test_case):
+			async with semaphore:
+				self.check_job_cancelled('run_test_cases_concurrently')
+				case_manager = self.spawn_case_manager(case_index)
+				try:
+					return await case_manager.run_single_test_case(test_case)
+				finally:
+					if case_manager.browser_session:
+						try:
+							await case_manager.stop_browser_session()
+						except JobCancelledException:
+							pass
+
+		results = await asyncio.gather(
+			*(run_case(case_index, test_case) for case_index, test_case in enumerate(self.test_case_list)),  # type: ignore
+			return_exceptions=True,
+		)
+
+		# Cancellation wins over any other failure so run_job can mark every run as CANCELED
+		for result in results:
+			if isinstance(result, JobCancelledException):
+				raise result
+		for result in results:
+			if isinstance(result, BaseException):
+				raise result
+		return results
 
 	async def run_task(self, task, sensitive_data={}):
 		"""
@@ -488,6 +803,8 @@ class AgentManager:
 				cloud_sync=self.cloud_sync,
 				use_thinking=self.use_thinking,
 				file_system_path=f'/app/bugowl/browser_data/browser_user_agent{self.task_id}-{str(uuid.uuid4())}/',
+				register_new_step_callback=self.on_new_step,
+				llm_response_cache=self.llm_cache,
 			)
 		else:
 			if len(sensitive_data) > 0:
@@ -496,28 +813,182 @@ class AgentManager:
 			self.check_job_cancelled('run_task')
 			await asyncio.to_thread(self.agent.add_new_task, task)
 
-		history = await self.agent.run()
+		history_start = len(self.agent.state.history.history)  # type: ignore
+		replay_history = await self.get_replay_history()
+
+		async def replay_and_run():
+			replayed_steps = 0
+			if replay_history:
+				replayed_steps = await self.agent.replay_history_until_divergence(  # type: ignore
+					replay_history, on_step_end=self.record_step
+				)
+			last_result = self.agent.state.last_result  # type: ignore
+			if replayed_steps and last_result and last_result[-1].is_done and last_result[-1].success is not False:
+				self.logger.info(f'Task fully replayed in {replayed_steps} steps, skipping the LLM.')
+				return self.agent.state.history, replayed_steps  # type: ignore
+			return await self.agent.run(on_step_end=self.record_step), replayed_steps  # type: ignore
+
+		# Run as a separate task so a pushed cancellation can interrupt the in-flight LLM call or browser action
+		self.in_flight_task = asyncio.ensure_future(replay_and_run())
+		try:
+			history, replayed_steps = await self.in_flight_task
+		except asyncio.CancelledError:
+			if not self.cancel_requested:
+				raise
+			if self.cancel_published_at:
+				self.cancel_latency = time.time() - self.cancel_published_at
+				self.logger.info(f'Task halted {self.cancel_latency * 1000:.0f}ms after the cancellation was published.')
+			raise JobCancelledException('run_task')
+		finally:
+			self.in_flight_task = None
+			await self.flush_step_records()
+		if self.llm_cache:
+			self.logger.info(f'LLM cache stats: {self.llm_cache.stats()}')
+		if self.testtask_run:
+			self.testtask_run.replayed_steps = replayed_steps
+			self.testtask_run.replanned_steps = len(history.history) - history_start - replayed_steps
+			self.logger.info(
+				f'Task steps: {self.testtask_run.replayed_steps} replayed, {self.testtask_run.replanned_steps} planned by the LLM'
+			)
+		if history.is_successful():
+			await self.save_passing_history(history_start)
 		output = '✅ SUCCESSFUL' if history.is_successful() else '❌ FAILED!'
 
 		return history, output
 
+	async def get_replay_history(self):
+		"""
+		Load the history of the last passing run of the current test task, to replay before asking the LLM.
+
+		Returns:
+			AgentHistoryList | None: None if replay is disabled or the test task never passed.
+		"""
+		if not self.replay_enabled or not self.testtask_run:
+			return None
+		history_data = await sync_to_async(
+			TestTaskHistory.objects.filter(test_task_uuid=self.testtask_run.test_task_uuid)
+			.values_list('history', flat=True)
+			.first
+		)()
+		if not history_data:
+			return None
+		try:
+			return AgentHistoryList.load_from_dict(history_data, self.agent.AgentOutput)  # type: ignore
+		except Exception as e:
+			self.logger.warning(f'Failed to load the passing history of test task {self.testtask_run.test_task_uuid}: {e}')
+			return None
+
+	async def save_passing_history(self, history_start):
+		"""
+		Save the steps of the test task that just passed as its replay history.
+
+		Steps whose actions failed and screenshots are left out.
+		"""
+		if not self.replay_enabled or not self.testtask_run:
+			return
+		history_items = [
+			history_item
+			for history_item in self.agent.state.history.history[history_start:]  # type: ignore
+			if not any(result.error for result in history_item.result)
+		]
+		history_data = AgentHistoryList(history=history_items).model_dump()
+		for history_item in history_data['history']:
+			history_item['state']['screenshot'] = None
+		await sync_to_async(TestTaskHistory.objects.update_or_create)(
+			test_task_uuid=self.testtask_run.test_task_uuid,
+			defaults={'history': history_data, 'test_task_run': self.testtask_run},
+		)
+
+	def on_new_step(self, browser_state_summary, model_output, n_steps):
+		"""
+		Agent step callback: keep the browser state the LLM saw, for the step record written at the end of the step.
+		"""
+		self.step_browser_state = browser_state_summary
+
+	async def record_step(self, agent):
+		"""
+		Agent on_step_end hook: queue a TestStepRun record for the step that just finished.
+
+		The DOM, history and LLM input are serialized here, as the agent keeps changing them (an incremental DOM
+		extraction patches the element tree in place); only the JSON encoding of the history runs on the writer thread.
+		"""
+		if not self.test_case_run or not self.testtask_run or not agent.state.history.history:
+			return
+		history_item = agent.state.history.history[-1]
+		model_output = history_item.model_output
+		results = history_item.result
+
+		usage_entries = agent.token_cost_service.usage_history[self.recorded_usage_count :]
+		self.recorded_usage_count = len(agent.token_cost_service.usage_history)
+		usage_entries = [entry for entry in usage_entries if entry.model == agent.llm.model]
+
+		llm_input = '\n\n'.join(f'{message.role}: {message.text}' for message in agent._message_manager.get_messages())
+		element_tree = self.step_browser_state.element_tree if self.step_browser_state else None
+		dom = element_tree.clickable_elements_to_string() if element_tree else ''
+		self.step_browser_state = None
+		agent_history = history_item.model_dump()
+		network_requests, console = self.step_activity.take() if self.step_activity else ([], '')
+
+		await get_step_writer().aput(
+			{
+				'test_case_run_id': self.test_case_run.id,  # type: ignore
+				'test_task_run_id': self.testtask_run.id,  # type: ignore
+				'status': JobStatusEnum.FAILED.value if any(result.error for result in results) else JobStatusEnum.PASS_.value,
+				'action': [action.model_dump(exclude_none=True) for action in model_output.action] if model_output else [],
+				'result': ' | '.join(str(result.error or result.extracted_content or '') for result in results)[:255],
+				'llm_input': llm_input,
+				'llm_output': model_output.model_dump(exclude_none=True, mode='json') if model_output else {},
+				'llm_input_tokens': sum(entry.usage.prompt_tokens for entry in usage_entries),
+				'llm_output_tokens': sum(entry.usage.completion_tokens for entry in usage_entries),
+				'llm_thinking': model_output.thinking if model_output else None,
+				'llm_time_taken': getattr(agent, 'llm_time_taken', 0.0),
+				'network_requests': network_requests,
+				'console': console,
+				'current_url': (history_item.state.url or '')[:200],
+				'caching_hash': agent.llm_cache_key,
+				'agent_history': lambda: json.dumps(agent_history, default=str),
+				'DOM': dom,
+			}
+		)
+
+	async def flush_step_records(self):
+		"""
+		Wait, off the event loop, until the queued step records are written.
+		"""
+		await asyncio.to_thread(get_step_writer().flush, STEP_RECORD_FLUSH_TIMEOUT)
+
+	def run_on_own_loop(self, coro):
+		"""
+		Run a coroutine of this manager on a new event loop. The browser pool is not used on such a loop.
+		"""
+		return asyncio.run(coro)
+
 	def run_job(self):
 		"""
-		Run the entire job.
+		Run the entire job on a new event loop.
+		"""
+		return self.run_on_own_loop(self.arun_job())
+
+	async def arun_job(self):
+		"""
+		Run the entire job on the running event loop.
 		"""
 		self.logger.info('Running job...')
+		cancel_listener = None
 		try:
 			if self.job_instance is None:
 				self.logger.error('Job instance is not set. Cannot run job.')
 				return
 			self.process_job_payload()
+			cancel_listener = await self.start_cancel_listener()
 
-			run_results = asyncio.run(self.run_test_case())
+			run_results = await self.run_test_case()
 			self.logger.info('Job completed.')
+			self.log_video_stats()
 			self.logger.info(f'Run results: {run_results}')
-			all_testcases_passed = all(run_results.values())  # type: ignore
+			all_testcases_passed = not self.unfinished_test_cases and all(run_results.values())  # type: ignore
 			final_job_status = JobStatusEnum.PASS_.value if all_testcases_passed else JobStatusEnum.FAILED.value
-			asyncio.run(self.update_job_instance(status=final_job_status))
+			await self.update_job_instance(status=final_job_status)
 			return run_results
 		except JobCancelledException as e:
 			key = get_cancel_cache_key(self.job_instance.job_uuid)  # type: ignore
@@ -525,21 +996,64 @@ class AgentManager:
 			self.logger.info(f'Cache key {key} deleted successfully.')
 			self.logger.info(f'Job cancelled from {e}')
 			self.logger.info('Job Cancelled from run_job')
-			if self.test_case_run:
-				if self.test_case_run.status not in [JobStatusEnum.PASS_.value, JobStatusEnum.FAILED.value]:
-					self.logger.info(f'Updating test case {self.test_case_run.test_case_uuid} status to CANCELED')
-					self.test_case_run.status = JobStatusEnum.CANCELED.value
-					self.test_case_run.save(update_fields=['status', 'updated_at'])
-			if self.testtask_run:
-				if self.testtask_run.status not in [JobStatusEnum.PASS_.value, JobStatusEnum.FAILED.value]:
-					self.logger.info(f'Updating test task {self.testtask_run.testtask_uuid} status to CANCELED')
-					self.testtask_run.status = JobStatusEnum.CANCELED.value
-					self.testtask_run.save(update_fields=['status', 'updated_at'])
-			asyncio.run(self.stop_browser_session())
+			await self.cancel_runs()
 			raise JobCancelledException('run_job')
 		except Exception as e:
 			self.logger.error(f'Error running job: {e}', exc_info=True)
 			raise
+		finally:
+			if cancel_listener:
+				await cancel_listener.stop()
+
+	async def arun_job_shard(self, case_indexes):
+		"""
+		Run some of the test cases of the job, as one shard of a sharded job.
+
+		The job status is not written here: the shard results are aggregated by the
+		finalize_job chord callback once every shard is done. The cancel cache key is kept
+		so the other shards of the job see the cancellation too.
+
+		Args:
+			case_indexes (list[int]): Indexes of the test cases to run in payload['test_case'].
+		Returns:
+			dict: {test_case_run_uuid: all_tasks_passed} for the test cases that finished.
+		"""
+		self.logger.info(f'Running job shard with test cases {case_indexes}...')
+		self.is_job_shard = True
+		cancel_listener = None
+		try:
+			if self.job_instance is None:
+				self.logger.error('Job instance is not set. Cannot run job shard.')
+				return {}
+			self.process_job_payload()
+			cancel_listener = await self.start_cancel_listener()
+			self.test_case_list = [self.test_case_list[index] for index in case_indexes]  # type: ignore
+
+			run_results = await self.run_test_case()
+			await self.wait_for_artifact_uploads()
+			self.log_video_stats()
+			self.logger.info(f'Job shard completed. Run results: {run_results}')
+			return run_results
+		except JobCancelledException as e:
+			self.logger.info(f'Job shard cancelled from {e}')
+			await self.cancel_runs()
+			raise JobCancelledException('run_job_shard')
+		finally:
+			if cancel_listener:
+				await cancel_listener.stop()
+
+	async def cancel_runs(self):
+		"""
+		Mark the runs of this manager and of its per-case managers as CANCELED and stop their browsers.
+		"""
+		for manager in [self, *self.case_managers]:
+			await manager.flush_step_records()
+			await sync_to_async(manager.mark_runs_cancelled)()
+			try:
+				await manager.stop_browser_session()
+			except JobCancelledException:
+				# Sharded jobs keep the cancel cache key until finalize_job, so stopping still reports it
+				pass
 
 
 # AgentManager for Playground Tasks
@@ -548,6 +1062,10 @@ class AgentManager:
 class PlayGroundAgentManager(AgentManager):
 	"""
 	AgentManager for managing tasks in the playground.
+
+	The browser session and the agent stay warm across commands of a connection. reset() brings the browser
+	back to a blank tab without relaunching it, and the browser is freed after PLAYGROUND_IDLE_TIMEOUT
+	seconds without commands, to be relaunched by the next execution.
 	"""
 
 	def __init__(self, task_id, channel_name, **kwargs):
@@ -562,14 +1080,123 @@ class PlayGroundAgentManager(AgentManager):
 		self.paused = False
 		self.stopped = False
 		self.task = None
+		self.last_active_at = time.monotonic()
+		self.idle_task = None
+		self.command_started_at = None
+		self.command_cold_start = False
+		self.first_action_latencies = {'warm': [], 'cold': []}
 		self.logger.info('PlaygroundAgentManager initialized successfully.')
 
+	def mark_active(self):
+		"""
+		Restart the idle timeout of the browser. Called for every command and when an execution ends.
+		"""
+		self.last_active_at = time.monotonic()
+
+	async def start_browser_session(self):
+		await super().start_browser_session()
+		if PLAYGROUND_IDLE_TIMEOUT > 0 and not self.idle_task:
+			self.mark_active()
+			self.idle_task = asyncio.create_task(self.watch_idle())
+
+	async def stop_browser_session(self):
+		idle_task, self.idle_task = self.idle_task, None
+		if idle_task and idle_task is not asyncio.current_task():
+			idle_task.cancel()
+		if self.first_action_latencies['warm'] or self.first_action_latencies['cold']:
+			self.logger.info(f'Playground command latency: {self.latency_stats()}')
+		await super().stop_browser_session()
+
+	async def ensure_browser_session(self):
+		"""
+		Start the browser session unless a warm one is running.
+		"""
+		if self.browser_session:
+			return
+		await self.start_browser_session()
+		self.logger.info('New Browser session is ready for task execution...')
+
+	async def watch_idle(self):
+		"""
+		Free the browser and the agent once no command arrived for PLAYGROUND_IDLE_TIMEOUT seconds.
+		"""
+		while True:
+			remaining = self.last_active_at + PLAYGROUND_IDLE_TIMEOUT - time.monotonic()
+			if remaining > 0 or self.execution:
+				await asyncio.sleep(max(remaining, 1))
+				continue
+			self.logger.info(f'Playground browser idle for {PLAYGROUND_IDLE_TIMEOUT:.0f}s, freeing it.')
+			# The agent holds the browser session, so it is recreated with the next browser
+			self.agent = None
+			await self.stop_browser_session()
+			return
+
+	async def reset(self, clear_storage=False):
+		"""
+		Bring the warm browser back to a single blank tab and clear the stopped/paused state, without relaunching.
+
+		Args:
+			clear_storage (bool): Also clear cookies, storage and permissions.
+
+		Returns:
+			bool: False if tasks are being executed.
+		"""
+		if self.execution:
+			self.logger.warning('PlaygroundAgentManager is running. Cannot reset.')
+			return False
+		started_at = time.monotonic()
+		if self.browser_session:
+			await reset_browser_session(self.browser_session, clear_storage=clear_storage)
+		else:
+			await self.ensure_browser_session()
+		self.stopped = False
+		self.paused = False
+		if self.agent:
+			self.agent.state.stopped = False
+			self.agent.state.paused = False
+		self.logger.info(f'Playground browser reset in {(time.monotonic() - started_at) * 1000:.0f}ms.')
+		return True
+
+	def begin_command(self):
+		"""
+		Start timing an execution command until the agent decides its first action.
+		"""
+		self.mark_active()
+		self.command_started_at = time.monotonic()
+		self.command_cold_start = self.browser_session is None
+
+	def on_new_step(self, browser_state_summary, model_output, n_steps):
+		super().on_new_step(browser_state_summary, model_output, n_steps)
+		if self.command_started_at is None:
+			return
+		latency = time.monotonic() - self.command_started_at
+		self.command_started_at = None
+		self.first_action_latencies['cold' if self.command_cold_start else 'warm'].append(latency)
+		self.logger.info(
+			f'First action {latency * 1000:.0f}ms after the command ({"cold" if self.command_cold_start else "warm"} browser).'
+		)
+
+	def latency_stats(self):
+		"""
+		Return the command-to-first-action latency of this connection, for warm and cold browsers.
+		"""
+		warm = self.first_action_latencies['warm']
+		cold = self.first_action_latencies['cold']
+		return {
+			'warm_commands': len(warm),
+			'cold_commands': len(cold),
+			'avg_warm_first_action_ms': round(sum(warm) / len(warm) * 1000, 1) if warm else 0.0,
+			'avg_cold_first_action_ms': round(sum(cold) / len(cold) * 1000, 1) if cold else 0.0,
+		}
+
 	async def run_task(self, task):
 		"""
 		Run a single task in the playground.
 		"""
 		try:
 			self.execution = True
+			self.begin_command()
+			await self.ensure_browser_session()
 			self.logger.info(f'Running task: {task}')
 			self.task = task
 			self.task.status = JobStatusEnum.RUNNING.value
@@ -583,19 +1210,21 @@ class PlayGroundAgentManager(AgentManager):
 			self.logger.error(f'Error running task {task}: {e}', exc_info=True)
 			self.execution = False
 			raise
+		finally:
+			self.command_started_at = None
+			self.mark_active()
 
 	async def run_all_tasks(self, socket_sender):
 		"""
 		Run all tasks in the playground.
 		"""
-		if not self.browser_session:
-			await self.start_browser_session()
-			self.logger.info('New Browser session is ready for task execution...')
+		self.begin_command()
+		if self.browser_session:
+			# Start from a blank tab on the warm browser instead of relaunching it
+			await reset_browser_session(self.browser_session, clear_storage=PLAYGROUND_RESET_CLEAR_STORAGE)
+			self.logger.info('Warm browser session reset for task execution...')
 		else:
-			await self.stop_browser_session()
-			self.logger.info('Browser session stopped. Starting new browser session for task execution...')
-			await self.start_browser_session()
-			self.logger.info('New Browser session is ready for task execution...')
+			await self.ensure_browser_session()
 
 		if not (self.playground_task_list or self.task_id):
 			self.logger.warning('No tasks found in the playground.')
@@ -651,6 +1280,9 @@ class PlayGroundAgentManager(AgentManager):
 			self.logger.error(f'Error running tasks: {e}', exc_info=True)
 			self.execution = False
 			raise
+		finally:
+			self.command_started_at = None
+			self.mark_active()
 
 	async def load_tasks(self, tasks_data):
 		"""
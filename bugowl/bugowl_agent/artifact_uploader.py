@@ -0,0 +1,216 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger('ArtifactUploader')
+
+# aws configs
+s3_bucket = os.getenv('AWS_STORAGE_BUCKET_NAME')
+aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
+aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
+region_name = os.getenv('AWS_S3_REGION_NAME')
+s3_custom_domain = os.getenv('AWS_S3_CUSTOM_DOMAIN')
+# Set to point the uploader at an S3 compatible server such as MinIO or a local moto server.
+s3_endpoint_url = os.getenv('AWS_S3_ENDPOINT_URL') or None
+obj_params = os.getenv('AWS_S3_OBJECT_PARAMETERS')
+s3_object_parameters = json.loads(obj_params) if obj_params else None
+
+# Number of artifacts uploaded at the same time.
+ARTIFACT_UPLOAD_WORKERS = int(os.getenv('AGENT_ARTIFACT_UPLOAD_WORKERS', '4'))
+# Maximum number of artifacts queued or uploading; submitting more waits for a slot.
+ARTIFACT_UPLOAD_MAX_PENDING = int(os.getenv('AGENT_ARTIFACT_UPLOAD_MAX_PENDING', '32'))
+# Retries of a failed upload, with exponential backoff and jitter between them.
+ARTIFACT_UPLOAD_RETRIES = int(os.getenv('AGENT_ARTIFACT_UPLOAD_RETRIES', '3'))
+ARTIFACT_UPLOAD_BACKOFF_BASE = float(os.getenv('AGENT_ARTIFACT_UPLOAD_BACKOFF_BASE', '1'))
+# Files larger than this are uploaded in parts of ARTIFACT_MULTIPART_CHUNK_MB, ARTIFACT_UPLOAD_PART_CONCURRENCY at a time.
+ARTIFACT_MULTIPART_THRESHOLD_MB = int(os.getenv('AGENT_ARTIFACT_MULTIPART_THRESHOLD_MB', '16'))
+ARTIFACT_MULTIPART_CHUNK_MB = int(os.getenv('AGENT_ARTIFACT_MULTIPART_CHUNK_MB', '8'))
+ARTIFACT_UPLOAD_PART_CONCURRENCY = int(os.getenv('AGENT_ARTIFACT_UPLOAD_PART_CONCURRENCY', '4'))
+# Seconds a job waits for its pending uploads before it is marked final.
+ARTIFACT_UPLOAD_TIMEOUT = float(os.getenv('AGENT_ARTIFACT_UPLOAD_TIMEOUT', '300'))
+
+RETRYABLE_UPLOAD_ERRORS = (BotoCoreError, ClientError, S3UploadFailedError)
+
+
+def get_s3_url(s3_key):
+	"""
+	Get the public URL of an uploaded object.
+	"""
+	if s3_custom_domain:
+		return f'https://{s3_custom_domain}/{s3_key}'
+	return f'https://{s3_bucket}.s3.amazonaws.com/{s3_key}'
+
+
+class ArtifactUploader:
+	"""
+	Uploads job artifacts (videos, screenshots) to S3 from a thread pool with one long-lived S3 client,
+	so the event loop never blocks on an upload.
+	"""
+
+	def __init__(
+		self,
+		s3_client=None,
+		bucket=None,
+		workers=ARTIFACT_UPLOAD_WORKERS,
+		max_pending=ARTIFACT_UPLOAD_MAX_PENDING,
+		retries=ARTIFACT_UPLOAD_RETRIES,
+		backoff_base=ARTIFACT_UPLOAD_BACKOFF_BASE,
+	):
+		"""
+		Args:
+			s3_client: A boto3 S3 client. Defaults to one built from the AWS_* environment variables.
+			bucket (str): The bucket to upload to. Defaults to AWS_STORAGE_BUCKET_NAME.
+			workers (int): Number of artifacts uploaded at the same time.
+			max_pending (int): Maximum number of artifacts queued or uploading.
+			retries (int): Retries of a failed upload.
+			backoff_base (float): Base of the exponential backoff between retries, in seconds.
+		"""
+		self.s3_client = s3_client
+		self.bucket = bucket or s3_bucket
+		self.retries = retries
+		self.backoff_base = backoff_base
+		self.transfer_config = TransferConfig(
+			multipart_threshold=ARTIFACT_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+			multipart_chunksize=ARTIFACT_MULTIPART_CHUNK_MB * 1024 * 1024,
+			max_concurrency=ARTIFACT_UPLOAD_PART_CONCURRENCY,
+			use_threads=True,
+		)
+		self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='artifact-upload')
+		self.slots = threading.BoundedSemaphore(max(1, max_pending))
+		self.client_lock = threading.Lock()
+		self.uploaded = 0
+		self.uploaded_bytes = 0
+		self.failed = 0
+
+	def is_configured(self):
+		"""
+		Check that there is a bucket and either an injected client or AWS credentials to upload with.
+		"""
+		if not self.bucket:
+			return False
+		return self.s3_client is not None or bool(aws_access_key_id and aws_secret_access_key and region_name)
+
+	def get_s3_client(self):
+		with self.client_lock:
+			if self.s3_client is None:
+				session = boto3.session.Session(  # type: ignore
+					aws_access_key_id=aws_access_key_id,
+					aws_secret_access_key=aws_secret_access_key,
+					region_name=region_name,
+				)
+				self.s3_client = session.client('s3', endpoint_url=s3_endpoint_url)
+			return self.s3_client
+
+	async def submit(self, local_path, s3_key, delete_after=True):
+		"""
+		Queue a file for upload. Waits, without blocking the event loop, while max_pending uploads are already queued.
+
+		Args:
+			local_path (str): The file to upload.
+			s3_key (str): The key to upload it to.
+			delete_after (bool): Delete the local file once it is uploaded.
+		Returns:
+			concurrent.futures.Future: Resolves with the S3 key, or with the upload exception.
+		"""
+		if not self.slots.acquire(blocking=False):
+			logger.info(f'Artifact upload queue is full, waiting for a slot to upload {s3_key}')
+			await asyncio.to_thread(self.slots.acquire)
+		try:
+			future = self.executor.submit(self.upload, local_path, s3_key, delete_after)
+		except Exception:
+			self.slots.release()
+			raise
+		future.add_done_callback(lambda _: self.slots.release())
+		return future
+
+	def upload(self, local_path, s3_key, delete_after=True):
+		"""
+		Upload a file, retrying with backoff. Runs on an upload thread.
+		"""
+		extra_args = dict(s3_object_parameters) if s3_object_parameters else {}
+		size = os.path.getsize(local_path)
+		started_at = time.monotonic()
+		for attempt in range(self.retries + 1):
+			try:
+				self.get_s3_client().upload_file(
+					local_path, self.bucket, s3_key, ExtraArgs=extra_args, Config=self.transfer_config
+				)
+				break
+			except RETRYABLE_UPLOAD_ERRORS as e:
+				if attempt >= self.retries:
+					self.failed += 1
+					logger.error(f'Failed to upload {local_path} to S3 after {attempt + 1} attempts: {e}')
+					raise
+				delay = random.uniform(0, self.backoff_base * 2**attempt)
+				logger.warning(f'Upload of {s3_key} failed with {e}, retrying in {delay:.2f} seconds')
+				time.sleep(delay)
+
+		self.uploaded += 1
+		self.uploaded_bytes += size
+		logger.info(f'Upload to S3 successful: {s3_key} ({size} bytes in {time.monotonic() - started_at:.2f}s)')
+		if delete_after:
+			try:
+				os.remove(local_path)
+				logger.info(f'Deleted local file: {local_path}')
+			except Exception as e:
+				logger.warning(f'Failed to delete local file {local_path}: {e}')
+		return s3_key
+
+	def stats(self):
+		return {'uploaded': self.uploaded, 'uploaded_bytes': self.uploaded_bytes, 'failed': self.failed}
+
+
+class ArtifactUploadGroup:
+	"""
+	Tracks the uploads submitted for one job, so the job can wait for them before it is marked final.
+	"""
+
+	def __init__(self):
+		self.futures = []
+
+	def add(self, future):
+		"""
+		Track an upload, as returned by ArtifactUploader.submit or as an asyncio task wrapping it.
+		"""
+		self.futures.append(future)
+
+	async def wait(self, timeout=ARTIFACT_UPLOAD_TIMEOUT):
+		"""
+		Wait for every upload added so far.
+
+		Returns:
+			dict: Number of uploads that succeeded, failed, or were still pending at the timeout.
+		"""
+		futures, self.futures = self.futures, []
+		if not futures:
+			return {'succeeded': 0, 'failed': 0, 'pending': 0}
+		done, not_done = await asyncio.wait([asyncio.wrap_future(future) for future in futures], timeout=timeout)
+		failed = sum(1 for future in done if future.exception() is not None)
+		if not_done:
+			logger.warning(f'{len(not_done)} artifact uploads still pending after {timeout}s, not waiting for them.')
+		return {'succeeded': len(done) - failed, 'failed': failed, 'pending': len(not_done)}
+
+
+_uploader = None
+_uploader_lock = threading.Lock()
+
+
+def get_artifact_uploader():
+	"""
+	Get the artifact uploader of this process, creating it on first use.
+	"""
+	global _uploader
+	with _uploader_lock:
+		if _uploader is None:
+			_uploader = ArtifactUploader()
+		return _uploader
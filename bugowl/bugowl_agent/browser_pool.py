@@ -0,0 +1,326 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+import weakref
+from urllib.parse import urlparse
+
+from browser_use.browser import BrowserProfile
+from browser_use.browser.session import BrowserSession
+
+logger = logging.getLogger('BrowserPool')
+
+# Number of warm browser sessions kept per worker event loop. 0 disables the pool (cold launch per test case).
+# Only used with AGENT_PERSISTENT_EVENT_LOOP=True: a job run on its own event loop would close the pool (and the
+# browsers it warmed) when it finishes, so such jobs always cold launch.
+BROWSER_POOL_SIZE = int(os.getenv('AGENT_BROWSER_POOL_SIZE', '0'))
+# Recycle a pooled browser once it is older than this many seconds...
+BROWSER_POOL_MAX_AGE = float(os.getenv('AGENT_BROWSER_POOL_MAX_AGE', '1800'))
+# ...or once it has been checked out this many times.
+BROWSER_POOL_MAX_USES = int(os.getenv('AGENT_BROWSER_POOL_MAX_USES', '20'))
+
+
+async def reset_browser_session(browser_session, clear_storage=True):
+	"""
+	Close every tab of a browser session, leaving a single blank tab open, and optionally clear its cookies,
+	storage and permissions. Much cheaper than launching a new browser.
+
+	The old tabs are closed, which also flushes their video recordings.
+
+	Args:
+		browser_session (BrowserSession): A started browser session.
+		clear_storage (bool): Also clear cookies, permissions and the storage of every origin it holds data for.
+	"""
+	browser_context = browser_session.browser_context
+	if not browser_context:
+		raise RuntimeError('Browser session has no browser context')
+
+	origins = set()
+	if clear_storage:
+		storage_state = await browser_context.storage_state()
+		for origin in storage_state.get('origins', []):
+			origins.add(origin['origin'])
+		for page in browser_context.pages:
+			parsed = urlparse(page.url)
+			if parsed.scheme in ('http', 'https'):
+				origins.add(f'{parsed.scheme}://{parsed.netloc}')
+
+		await browser_context.clear_cookies()
+		await browser_context.clear_permissions()
+
+	old_pages = list(browser_context.pages)
+	blank_page = await browser_context.new_page()
+	for page in old_pages:
+		if not page.is_closed():
+			await page.close()
+
+	if origins:
+		cdp_session = await browser_context.new_cdp_session(blank_page)
+		try:
+			for origin in origins:
+				await cdp_session.send('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+		finally:
+			await cdp_session.detach()
+
+	browser_session.agent_current_page = blank_page
+	browser_session.human_current_page = blank_page
+	browser_session._cached_browser_state_summary = None
+	browser_session._cached_clickable_element_hashes = None
+	browser_session._downloaded_files.clear()
+
+
+class PooledBrowser:
+	"""
+	A warm BrowserSession together with the bookkeeping needed for the recycle policy.
+	"""
+
+	def __init__(self, browser_session):
+		self.browser_session = browser_session
+		self.created_at = time.monotonic()
+		self.uses = 0
+
+	@property
+	def age(self):
+		return time.monotonic() - self.created_at
+
+	def is_expired(self, max_age, max_uses):
+		return self.age >= max_age or self.uses >= max_uses
+
+
+class BrowserPool:
+	"""
+	A pool of pre-launched browser sessions for one event loop.
+
+	Playwright objects are bound to the event loop that created them, so a pool must only be
+	used from its own loop. Use `get_browser_pool` to get the pool of the running loop.
+	"""
+
+	def __init__(self, profile_kwargs, size=BROWSER_POOL_SIZE, max_age=BROWSER_POOL_MAX_AGE, max_uses=BROWSER_POOL_MAX_USES):
+		"""
+		Args:
+			profile_kwargs (dict): BrowserProfile arguments shared by every session in the pool.
+				`user_data_dir` is generated per session.
+			size (int): Number of idle sessions to keep warm.
+			max_age (float): Seconds after which a session is killed instead of being returned to the pool.
+			max_uses (int): Number of checkouts after which a session is killed instead of being returned.
+		"""
+		self.profile_kwargs = profile_kwargs
+		self.size = size
+		self.max_age = max_age
+		self.max_uses = max_uses
+		self.idle = []
+		self.checked_out = {}
+		self.lock = asyncio.Lock()
+		self.closed = False
+		self.checkout_latencies = []
+		self.cold_launch_latencies = []
+		self.recycled = 0
+		self.warm_task = None
+
+	def create_browser_session(self):
+		"""
+		Create a new, not yet started, BrowserSession with its own user data directory.
+		"""
+		browser_profile = BrowserProfile(
+			**self.profile_kwargs,
+			user_data_dir=f'/app/bugowl/browser_profiles/{uuid.uuid4()}',
+		)
+		return BrowserSession(browser_profile=browser_profile)
+
+	async def launch(self):
+		"""
+		Cold launch a new browser session and record how long it took.
+		"""
+		started_at = time.perf_counter()
+		browser_session = self.create_browser_session()
+		await browser_session.start()
+		self.cold_launch_latencies.append(time.perf_counter() - started_at)
+		return PooledBrowser(browser_session)
+
+	async def warm(self):
+		"""
+		Launch browsers until the pool holds `size` idle sessions.
+		"""
+		async with self.lock:
+			missing = self.size - len(self.idle)
+		if missing <= 0 or self.closed:
+			return
+		results = await asyncio.gather(*(self.launch() for _ in range(missing)), return_exceptions=True)
+		for result in results:
+			if isinstance(result, BaseException):
+				logger.warning(f'Failed to warm up a pooled browser: {result}')
+				continue
+			async with self.lock:
+				if self.closed or len(self.idle) >= self.size:
+					await self.discard(result)
+					continue
+				self.idle.append(result)
+		logger.info(f'Browser pool warmed up with {len(self.idle)} idle sessions.')
+
+	def schedule_warm(self):
+		"""
+		Refill the pool in the background so the next checkout finds a warm browser.
+		"""
+		if self.closed or (self.warm_task and not self.warm_task.done()):
+			return
+		self.warm_task = asyncio.create_task(self.warm())
+
+	async def is_healthy(self, pooled):
+		"""
+		Check that a pooled browser is still connected and usable.
+		"""
+		try:
+			return await pooled.browser_session.is_connected(restart=True)
+		except Exception:
+			return False
+
+	async def checkout(self):
+		"""
+		Take a healthy browser session out of the pool, cold launching one if none is idle.
+
+		Returns:
+			BrowserSession: A started session. Give it back with `checkin` when done.
+		"""
+		started_at = time.perf_counter()
+		pooled = None
+		while pooled is None:
+			# Only take the candidate under the lock, so a slow health check doesn't hold up other checkouts
+			async with self.lock:
+				if not self.idle:
+					break
+				candidate = self.idle.pop(0)
+			if candidate.is_expired(self.max_age, self.max_uses) or not await self.is_healthy(candidate):
+				await self.discard(candidate)
+				continue
+			pooled = candidate
+		if pooled is None:
+			pooled = await self.launch()
+			source = 'cold'
+		else:
+			source = 'warm'
+
+		pooled.uses += 1
+		self.checked_out[id(pooled.browser_session)] = pooled
+		latency = time.perf_counter() - started_at
+		self.checkout_latencies.append(latency)
+		logger.info(
+			f'Checked out {source} browser in {latency * 1000:.0f}ms '
+			f'(avg checkout {self.average(self.checkout_latencies) * 1000:.0f}ms, '
+			f'avg cold launch {self.average(self.cold_launch_latencies) * 1000:.0f}ms)'
+		)
+		self.schedule_warm()
+		return pooled.browser_session
+
+	async def checkin(self, browser_session):
+		"""
+		Return a browser session to the pool after wiping its state.
+
+		Sessions that are expired, unhealthy, fail to reset or do not fit in the pool are killed.
+		"""
+		pooled = self.checked_out.pop(id(browser_session), None)
+		if pooled is None:
+			await browser_session.kill()
+			return
+
+		keep = not self.closed and not pooled.is_expired(self.max_age, self.max_uses)
+		if keep:
+			try:
+				await self.reset(browser_session)
+				keep = await self.is_healthy(pooled)
+			except Exception as e:
+				logger.warning(f'Failed to reset pooled browser, recycling it: {e}')
+				keep = False
+
+		async with self.lock:
+			if keep and len(self.idle) < self.size:
+				self.idle.append(pooled)
+				return
+		await self.discard(pooled)
+
+	async def reset(self, browser_session):
+		"""
+		Clear cookies, storage, permissions and tabs so the next test case starts from a clean browser.
+		"""
+		await reset_browser_session(browser_session)
+
+	async def discard(self, pooled):
+		"""
+		Kill a pooled browser for good.
+		"""
+		self.recycled += 1
+		try:
+			await pooled.browser_session.kill()
+		except Exception as e:
+			logger.warning(f'Failed to kill pooled browser: {e}')
+
+	async def close(self):
+		"""
+		Stop warming and kill every idle browser. Checked out browsers are killed when they are checked in.
+		"""
+		self.closed = True
+		if self.warm_task:
+			await asyncio.gather(self.warm_task, return_exceptions=True)
+		async with self.lock:
+			idle, self.idle = self.idle, []
+		for pooled in idle:
+			await self.discard(pooled)
+
+	@staticmethod
+	def average(values):
+		return sum(values) / len(values) if values else 0.0
+
+	def stats(self):
+		"""
+		Return the pool metrics, comparing warm checkout latency with cold launch latency.
+		"""
+		return {
+			'idle': len(self.idle),
+			'checked_out': len(self.checked_out),
+			'checkouts': len(self.checkout_latencies),
+			'cold_launches': len(self.cold_launch_latencies),
+			'recycled': self.recycled,
+			'avg_checkout_ms': round(self.average(self.checkout_latencies) * 1000, 1),
+			'avg_cold_launch_ms': round(self.average(self.cold_launch_latencies) * 1000, 1),
+		}
+
+
+# One pool per (event loop, profile options); see BrowserPool for why pools cannot cross event loops.
+_pools = weakref.WeakKeyDictionary()
+# Event loops that outlive their jobs, the only ones a pool is worth keeping on.
+_persistent_loops = weakref.WeakSet()
+
+
+def register_persistent_loop(loop):
+	"""
+	Allow browser pools on an event loop that runs job after job, such as the JobExecutor loop.
+	"""
+	_persistent_loops.add(loop)
+
+
+def get_browser_pool(profile_kwargs):
+	"""
+	Get the browser pool of the running event loop for the given profile options.
+
+	Returns:
+		BrowserPool | None: None when the pool is disabled (AGENT_BROWSER_POOL_SIZE=0) or the running loop
+			is not a registered persistent loop.
+	"""
+	loop = asyncio.get_running_loop()
+	if BROWSER_POOL_SIZE <= 0 or loop not in _persistent_loops:
+		return None
+	loop_pools = _pools.setdefault(loop, {})
+	key = repr(sorted(profile_kwargs.items()))
+	if key not in loop_pools:
+		loop_pools[key] = BrowserPool(profile_kwargs)
+	return loop_pools[key]
+
+
+async def close_browser_pools():
+	"""
+	Close every browser pool of the running event loop. Call it before the loop finishes.
+	"""
+	loop_pools = _pools.pop(asyncio.get_running_loop(), {})
+	for pool in loop_pools.values():
+		await pool.close()
+		logger.info(f'Browser pool closed: {pool.stats()}')
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+import redis.asyncio as redis
+from job.utils import get_cancel_channel_name
+
+logger = logging.getLogger('CancelListener')
+
+
+class CancelListener:
+	"""
+	Listens on the Redis pub/sub channel of a job and interrupts its AgentManager as soon as a cancel is published.
+
+	The cancel cache key stays the source of truth (check_job_cancelled); this only makes the worker react
+	immediately instead of at the next check between tasks.
+	"""
+
+	def __init__(self, agent_manager, redis_client=None):
+		"""
+		Args:
+			agent_manager (AgentManager): The manager running the job.
+			redis_client: A redis.asyncio client. Defaults to one connected to DJANGO_CACHE_LOCATION.
+		"""
+		self.agent_manager = agent_manager
+		self.job_uuid = agent_manager.job_instance.job_uuid
+		self.channel_name = get_cancel_channel_name(self.job_uuid)
+		self.redis = redis_client
+		self.owns_redis = redis_client is None
+		self.pubsub = None
+		self.task = None
+
+	async def start(self):
+		"""
+		Subscribe to the cancel channel of the job and start listening in the background.
+		"""
+		if self.redis is None:
+			self.redis = redis.from_url(os.getenv('DJANGO_CACHE_LOCATION', 'redis://redis-agent:6381/1'))
+		self.pubsub = self.redis.pubsub()
+		await self.pubsub.subscribe(self.channel_name)
+		self.task = asyncio.create_task(self.listen())
+		logger.info(f'Listening for cancellation of job {self.job_uuid} on {self.channel_name}')
+
+	async def listen(self):
+		try:
+			while True:
+				message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)  # type: ignore
+				if not message or message.get('type') != 'message':
+					continue
+				published_at = None
+				try:
+					published_at = json.loads(message['data']).get('published_at')
+				except (TypeError, ValueError, AttributeError):
+					pass
+				if published_at:
+					logger.info(
+						f'Cancel of job {self.job_uuid} received {(time.time() - published_at) * 1000:.0f}ms after publish'
+					)
+				self.agent_manager.interrupt_for_cancel(published_at)
+				return
+		except asyncio.CancelledError:
+			raise
+		except Exception as e:
+			logger.error(f'Cancel listener of job {self.job_uuid} failed, falling back to cache polling: {e}', exc_info=True)
+
+	async def stop(self):
+		"""
+		Stop listening and release the Redis connection.
+		"""
+		if self.task and not self.task.done():
+			self.task.cancel()
+			await asyncio.gather(self.task, return_exceptions=True)
+		if self.pubsub:
+			try:
+				await self.pubsub.unsubscribe(self.channel_name)
+				await self.pubsub.aclose()
+			except Exception as e:
+				logger.warning(f'Failed to close cancel listener of job {self.job_uuid}: {e}')
+		if self.owns_redis and self.redis:
+			await self.redis.aclose()
@@ -0,0 +1,146 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+
+from celery.signals import worker_shutdown
+
+from .browser_pool import close_browser_pools, register_persistent_loop
+from .status_outbox import flush_status_outbox
+
+logger = logging.getLogger('JobExecutor')
+
+# Run jobs on one long-lived event loop per worker process instead of asyncio.run() per job.
+# The Celery worker should then use a thread pool (--pool threads) so several execute_job tasks can wait on it.
+PERSISTENT_EVENT_LOOP = os.getenv('AGENT_PERSISTENT_EVENT_LOOP', 'False') == 'True'
+# Maximum number of jobs running on the event loop at the same time.
+MAX_CONCURRENT_JOBS = int(os.getenv('AGENT_MAX_CONCURRENT_JOBS', '4'))
+# Seconds to wait for running jobs to finish when the worker shuts down.
+DRAIN_TIMEOUT = float(os.getenv('AGENT_JOB_DRAIN_TIMEOUT', '600'))
+
+
+class ExecutorShutdownError(Exception):
+	"""
+	Raised when a job is submitted to an executor that is draining or stopped.
+	"""
+
+	pass
+
+
+class JobExecutor:
+	"""
+	Owns a single event loop, running forever in a background thread, on which jobs are run as coroutines.
+
+	Keeping the loop alive keeps the Playwright driver and the browser pool of the loop alive between jobs.
+	"""
+
+	def __init__(self, max_concurrent_jobs=MAX_CONCURRENT_JOBS):
+		self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+		self.loop = None
+		self.thread = None
+		self.semaphore = None
+		self.futures = set()
+		self.accepting = False
+		self.drained = False
+		self.lock = threading.Lock()
+
+	def start(self):
+		"""
+		Start the event loop thread. Does nothing if it is already running or the executor was drained.
+		"""
+		with self.lock:
+			if self.drained or (self.thread and self.thread.is_alive()):
+				return
+			self.loop = asyncio.new_event_loop()
+			register_persistent_loop(self.loop)
+			self.semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+			self.thread = threading.Thread(target=self.run_loop, name='agent-job-executor', daemon=True)
+			self.thread.start()
+			self.accepting = True
+		logger.info(f'Job executor started with max {self.max_concurrent_jobs} concurrent jobs.')
+
+	def run_loop(self):
+		asyncio.set_event_loop(self.loop)
+		self.loop.run_forever()  # type: ignore
+
+	async def run_limited(self, coro):
+		async with self.semaphore:  # type: ignore
+			return await coro
+
+	def submit(self, coro):
+		"""
+		Schedule a coroutine on the executor loop.
+
+		Returns:
+			concurrent.futures.Future: Resolves with the result of the coroutine.
+		"""
+		self.start()
+		with self.lock:
+			if not self.accepting:
+				coro.close()
+				raise ExecutorShutdownError('Job executor is shutting down, not accepting new jobs')
+			future = asyncio.run_coroutine_threadsafe(self.run_limited(coro), self.loop)  # type: ignore
+			self.futures.add(future)
+		future.add_done_callback(self.futures.discard)
+		return future
+
+	def run(self, coro):
+		"""
+		Run a coroutine on the executor loop and block the calling thread until it is done.
+		"""
+		return self.submit(coro).result()
+
+	def drain(self, timeout=DRAIN_TIMEOUT):
+		"""
+		Stop accepting jobs, wait up to `timeout` seconds for the running ones, then stop the loop.
+
+		Jobs still running after the timeout are cancelled.
+		"""
+		with self.lock:
+			self.accepting = False
+			self.drained = True
+			pending = list(self.futures)
+		if not self.loop or not self.thread or not self.thread.is_alive():
+			return
+
+		logger.info(f'Draining job executor, waiting for {len(pending)} running jobs...')
+		done, not_done = concurrent.futures.wait(pending, timeout=timeout)
+		for future in not_done:
+			future.cancel()
+		if not_done:
+			logger.warning(f'Cancelled {len(not_done)} jobs that did not finish within {timeout}s.')
+
+		try:
+			asyncio.run_coroutine_threadsafe(close_browser_pools(), self.loop).result(timeout=60)
+		except Exception as e:
+			logger.warning(f'Failed to close browser pools while draining: {e}')
+		self.loop.call_soon_threadsafe(self.loop.stop)
+		self.thread.join(timeout=30)
+		# Deliver the final statuses of the drained jobs
+		flush_status_outbox()
+		logger.info('Job executor stopped.')
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_job_executor():
+	"""
+	Get the job executor of this worker process, creating it on first use.
+	"""
+	global _executor
+	with _executor_lock:
+		if _executor is None:
+			_executor = JobExecutor()
+		return _executor
+
+
+@worker_shutdown.connect
+def drain_job_executor(sender=None, **kwargs):
+	"""
+	Let running jobs finish before the worker process exits.
+	"""
+	if _executor is not None:
+		_executor.drain()
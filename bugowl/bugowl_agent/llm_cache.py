@@ -0,0 +1,83 @@
+import logging
+import os
+
+from asgiref.sync import sync_to_async
+from testcase.models import LLMCache
+
+logger = logging.getLogger('LLMCache')
+
+# Reuse stored LLM responses for identical agent steps. A job can opt out with payload['job']['llm_cache'] = False.
+LLM_CACHE_ENABLED = os.getenv('AGENT_LLM_CACHE', 'True') == 'True'
+
+
+class DjangoLLMResponseCache:
+	"""
+	Agent LLM response cache backed by the LLMCache model, keyed by the agent's step caching hash.
+
+	Cache errors are logged and treated as misses, so a database problem never fails a step.
+	"""
+
+	def __init__(self):
+		self.hits = 0
+		self.misses = 0
+		self.invalidations = 0
+
+	async def get(self, key):
+		"""
+		Get the stored AgentOutput data for a caching hash, or None on a miss.
+		"""
+		try:
+			llm_output = await sync_to_async(
+				LLMCache.objects.filter(caching_hash=key).values_list('llm_output', flat=True).first
+			)()
+		except Exception as e:
+			logger.warning(f'Failed to read LLM cache entry {key}: {e}')
+			llm_output = None
+		if llm_output is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return llm_output
+
+	async def set(self, key, output):
+		"""
+		Store the AgentOutput data of a step whose actions succeeded.
+		"""
+		try:
+			await sync_to_async(LLMCache.objects.update_or_create)(caching_hash=key, defaults={'llm_output': output})
+		except Exception as e:
+			logger.warning(f'Failed to write LLM cache entry {key}: {e}')
+
+	async def invalidate(self, key):
+		"""
+		Delete a cached output, e.g. because replaying it made an action fail.
+		"""
+		try:
+			await sync_to_async(LLMCache.objects.filter(caching_hash=key).delete)()
+			self.invalidations += 1
+		except Exception as e:
+			logger.warning(f'Failed to invalidate LLM cache entry {key}: {e}')
+
+	def stats(self):
+		"""
+		Return the hit/miss counters of this cache.
+		"""
+		lookups = self.hits + self.misses
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'invalidations': self.invalidations,
+			'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+		}
+
+
+def get_llm_response_cache(job_instance):
+	"""
+	Get an LLM response cache for a job, or None if caching is disabled globally or for this job.
+	"""
+	if not LLM_CACHE_ENABLED or not job_instance:
+		return None
+	job_payload = (job_instance.payload or {}).get('job') or {}
+	if job_payload.get('llm_cache') is False:
+		return None
+	return DjangoLLMResponseCache()
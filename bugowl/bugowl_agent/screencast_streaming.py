@@ -0,0 +1,213 @@
+import asyncio
+import base64
+import os
+
+from playwright._impl._errors import TargetClosedError
+
+from .stream_controller import AdaptiveStreamController
+from .video_recording_streaming import LiveStreaming
+
+# 'screenshot' polls page.screenshot() (LiveStreaming), 'screencast' lets Chrome push frames (ScreencastStreaming).
+STREAMING_ENGINE = os.getenv('AGENT_STREAMING_ENGINE', 'screenshot')
+# Highest JPEG quality of the screencast, lowered by the AdaptiveStreamController while the stream is congested.
+SCREENCAST_QUALITY = int(os.getenv('AGENT_SCREENCAST_QUALITY', '60'))
+SCREENCAST_MAX_WIDTH = int(os.getenv('AGENT_SCREENCAST_MAX_WIDTH', '1280'))
+SCREENCAST_MAX_HEIGHT = int(os.getenv('AGENT_SCREENCAST_MAX_HEIGHT', '720'))
+SCREENCAST_EVERY_NTH_FRAME = int(os.getenv('AGENT_SCREENCAST_EVERY_NTH_FRAME', '1'))
+# Seconds between checks of the tab the agent works on and of the adaptive quality.
+SCREENCAST_WATCH_INTERVAL = 1.0
+
+
+class ScreencastStreaming(LiveStreaming):
+	"""
+	LiveStreaming engine where Chrome pushes JPEG frames over CDP (Page.startScreencast) instead of being
+	polled with page.screenshot(). The JPEG frames are forwarded as they are, without re-encoding.
+
+	A frame is acknowledged with Page.screencastFrameAck only once it has been sent and the target fps allows
+	the next one, so a slow channel layer slows the browser down instead of queueing frames.
+	"""
+
+	def __init__(
+		self,
+		agent_manager,
+		group_name=None,
+		channel_name=None,
+		fps=8,
+		frame_buffer=None,
+		quality=SCREENCAST_QUALITY,
+		max_width=SCREENCAST_MAX_WIDTH,
+		max_height=SCREENCAST_MAX_HEIGHT,
+		every_nth_frame=SCREENCAST_EVERY_NTH_FRAME,
+	):
+		super().__init__(agent_manager, group_name=group_name, channel_name=channel_name, fps=fps, frame_buffer=frame_buffer)
+		self.controller = AdaptiveStreamController(max_fps=fps, max_quality=quality)
+		self.max_width = max_width
+		self.max_height = max_height
+		self.every_nth_frame = every_nth_frame
+		self.page = None
+		self.cdp_session = None
+		self.screencasting = False
+		self.screencast_quality = None
+		self.watch_task = None
+		self.last_frame_at = 0.0
+		self.frames_received = 0
+		self.frames_sent = 0
+
+	async def start(self):
+		"""
+		Start the screencast of the current page.
+		"""
+		if self.recording:
+			if self.logger:
+				self.logger.warning('Streaming already in progress.')
+			return
+		if not self._connect_redis():
+			return
+		self.recording = True
+		self.paused = False
+		await self._start_viewer_tracker(on_change=self._on_viewers_changed)
+		await self._attach(await self.browser_session.get_current_page())
+		self.watch_task = asyncio.create_task(self._watch())
+		if self.logger:
+			self.logger.info('Starting screencast streaming.')
+
+	async def _attach(self, page):
+		"""
+		Move the screencast to another page, e.g. when the agent switches tabs.
+		"""
+		await self._detach()
+		self.page = page
+		self.cdp_session = await page.context.new_cdp_session(page)
+		self.cdp_session.on('Page.screencastFrame', self._on_screencast_frame)
+		await self._sync_screencast()
+
+	async def _detach(self):
+		cdp_session, self.cdp_session = self.cdp_session, None
+		self.page = None
+		self.screencasting = False
+		if cdp_session:
+			try:
+				await asyncio.wait_for(cdp_session.send('Page.stopScreencast'), timeout=1.0)
+				await asyncio.wait_for(cdp_session.detach(), timeout=1.0)
+			except Exception:
+				pass
+
+	def _wants_frames(self):
+		return self.recording and not self.paused and (self._is_watched() or self.frame_buffer is not None)
+
+	async def _on_viewers_changed(self, viewer_count):
+		try:
+			await self._sync_screencast()
+		except Exception as e:
+			if self.logger:
+				self.logger.warning(f'Failed to update the screencast for {viewer_count} viewers: {e}')
+
+	async def _sync_screencast(self):
+		"""
+		Start or stop the screencast depending on whether anyone (viewers or the frame buffer) needs frames,
+		and restart it when the adaptive quality changed.
+		"""
+		if not self.cdp_session:
+			return
+		wants_frames = self._wants_frames()
+		if wants_frames and self.screencasting and self.screencast_quality != self.controller.quality:
+			await self.cdp_session.send('Page.stopScreencast')
+			self.screencasting = False
+		if wants_frames and not self.screencasting:
+			await self.cdp_session.send(
+				'Page.startScreencast',
+				{
+					'format': 'jpeg',
+					'quality': self.controller.quality,
+					'maxWidth': self.max_width,
+					'maxHeight': self.max_height,
+					'everyNthFrame': self.every_nth_frame,
+				},
+			)
+			self.screencasting = True
+			self.screencast_quality = self.controller.quality
+		elif not wants_frames and self.screencasting:
+			await self.cdp_session.send('Page.stopScreencast')
+			self.screencasting = False
+
+	async def _watch(self):
+		"""
+		Follow the tab the agent works on and the adaptive quality.
+		"""
+		while self.recording:
+			try:
+				page = await self.browser_session.get_current_page()
+				if page is not self.page and not page.is_closed():
+					await self._attach(page)
+				else:
+					await self._sync_screencast()
+			except TargetClosedError:
+				pass
+			except Exception as e:
+				if self.logger:
+					self.logger.warning(f'Screencast watcher error: {e}')
+			await asyncio.sleep(SCREENCAST_WATCH_INTERVAL)
+
+	def _on_screencast_frame(self, params):
+		asyncio.create_task(self._handle_frame(self.cdp_session, self.page, params))
+
+	async def _handle_frame(self, cdp_session, page, params):
+		self.frames_received += 1
+		try:
+			frame_bytes = base64.b64decode(params['data'])
+			if self.frame_buffer and self.frame_buffer.wants_frame():
+				self.frame_buffer.add(frame_bytes)
+			if self._is_watched() and not self.paused and self.channel_layer:
+				if await self._send_frame(frame_bytes, page.url if page else None):
+					self.frames_sent += 1
+			await self._publish_metrics()
+			# Acknowledge no sooner than the adaptive fps allows, Chrome sends the next frame after the ack
+			loop = asyncio.get_running_loop()
+			delay = self.controller.frame_interval() - (loop.time() - self.last_frame_at)
+			if delay > 0:
+				await asyncio.sleep(delay)
+			self.last_frame_at = loop.time()
+		except Exception as e:
+			if self.logger:
+				self.logger.error(f'Failed to handle screencast frame: {e}', exc_info=True)
+		finally:
+			if self.recording and cdp_session is self.cdp_session:
+				try:
+					await cdp_session.send('Page.screencastFrameAck', {'sessionId': params['sessionId']})
+				except Exception:
+					pass
+
+	async def pause(self):
+		"""
+		Pause streaming.
+		"""
+		await super().pause()
+		await self._sync_screencast()
+
+	async def resume(self):
+		"""
+		Resume streaming.
+		"""
+		await super().resume()
+		await self._sync_screencast()
+
+	async def stop(self):
+		"""
+		Stop streaming.
+		"""
+		self.recording = False
+		if self.watch_task:
+			self.watch_task.cancel()
+			self.watch_task = None
+		await self._stop_viewer_tracker()
+		await self._detach()
+		await super().stop()
+
+
+def create_live_streaming(agent_manager, engine=STREAMING_ENGINE, **kwargs):
+	"""
+	Create the live streaming engine configured by AGENT_STREAMING_ENGINE.
+	"""
+	if engine == 'screencast':
+		return ScreencastStreaming(agent_manager, **kwargs)
+	return LiveStreaming(agent_manager, **kwargs)
@@ -0,0 +1,223 @@
+import logging
+import os
+import threading
+import time
+
+from api.utils import JobStatusEnum, get_http_session
+from celery.signals import worker_shutdown
+from job.helpers import get_agent_JWT_token
+
+from .tasks import update_status_main
+
+logger = logging.getLogger('StatusOutbox')
+
+# Deliver status updates to the main server from a per-worker outbox instead of one Celery task per update.
+STATUS_OUTBOX_ENABLED = os.getenv('AGENT_STATUS_OUTBOX', 'True') == 'True'
+# Seconds the outbox waits after the first pending update, so quick successive updates of an entity coalesce.
+STATUS_OUTBOX_FLUSH_INTERVAL = float(os.getenv('AGENT_STATUS_OUTBOX_FLUSH_INTERVAL', '0.5'))
+# Connect and read timeouts, in seconds, of a status update POST.
+STATUS_OUTBOX_TIMEOUT = (
+	float(os.getenv('AGENT_STATUS_OUTBOX_CONNECT_TIMEOUT', '3')),
+	float(os.getenv('AGENT_STATUS_OUTBOX_READ_TIMEOUT', '10')),
+)
+
+# Responses after which the main server is treated as overloaded, like a server error.
+OVERLOADED_STATUS_CODES = {408, 429}
+
+TERMINAL_STATUSES = {JobStatusEnum.PASS_.value, JobStatusEnum.FAILED.value, JobStatusEnum.CANCELED.value}
+
+
+def get_update_key(update):
+	"""
+	Get the entity a status update is about: the test case if it has one, else the job.
+	"""
+	if update.get('test_case_uuid'):
+		return ('test_case', update['test_case_uuid'])
+	return ('job', update.get('job_uuid'))
+
+
+def get_update_status(update):
+	return update.get('test_case_status') if update.get('test_case_uuid') else update.get('job_status')
+
+
+class StatusOutbox:
+	"""
+	Coalesces status updates per job / test case and delivers them to the main server from a dedicated thread.
+
+	A newer update of an entity replaces the pending one (last write wins), except that a pending terminal
+	status (Pass, Failed, Canceled) is never replaced by a non-terminal one. Updates are POSTed over one
+	keep-alive session with a cached JWT; if the main server is unreachable they are handed to the
+	update_status_main Celery task instead.
+	"""
+
+	def __init__(self, flush_interval=STATUS_OUTBOX_FLUSH_INTERVAL, timeout=STATUS_OUTBOX_TIMEOUT, session=None):
+		"""
+		Args:
+			flush_interval (float): Seconds to wait for more updates before delivering the pending ones.
+			timeout (tuple): Connect and read timeouts of a status update POST.
+			session (requests.Session): HTTP session to deliver with. Defaults to the shared pooled session.
+		"""
+		self.flush_interval = flush_interval
+		self.timeout = timeout
+		self.session = session or get_http_session()
+		self.main_host = os.getenv('MAIN_SERVER_HOST', 'http://localhost:8000')
+		self.pending = {}
+		self.condition = threading.Condition()
+		self.delivering = False
+		self.thread = None
+		self.delivered = 0
+		self.coalesced = 0
+		self.fallbacks = 0
+
+	def start(self):
+		"""
+		Start the delivery thread. Does nothing if it is already running.
+		"""
+		with self.condition:
+			if self.thread and self.thread.is_alive():
+				return
+			self.thread = threading.Thread(target=self.run, name='agent-status-outbox', daemon=True)
+			self.thread.start()
+
+	def put(self, job_uuid, job_status=None, test_case_uuid=None, test_case_status=None):
+		"""
+		Queue a status update without blocking. Takes the same arguments as update_status_main.
+		"""
+		update = {
+			'job_uuid': job_uuid,
+			'job_status': job_status,
+			'test_case_uuid': test_case_uuid,
+			'test_case_status': test_case_status,
+		}
+		key = get_update_key(update)
+		self.start()
+		with self.condition:
+			pending_update = self.pending.pop(key, None)
+			if pending_update:
+				self.coalesced += 1
+				if get_update_status(pending_update) in TERMINAL_STATUSES and get_update_status(update) not in TERMINAL_STATUSES:
+					logger.warning(f'Ignoring {get_update_status(update)} update of {key}, it already has a terminal status')
+					update = pending_update
+			# Re-inserting keeps the updates in the order of their latest change, so a job finishes after its test cases
+			self.pending[key] = update
+			self.condition.notify_all()
+
+	def flush(self, timeout=None):
+		"""
+		Block until every update queued before this call has been delivered or handed to Celery.
+
+		Returns:
+			bool: False if the timeout expired first.
+		"""
+		deadline = None if timeout is None else time.monotonic() + timeout
+		with self.condition:
+			self.condition.notify_all()
+			while self.pending or self.delivering:
+				remaining = None if deadline is None else deadline - time.monotonic()
+				if remaining is not None and remaining <= 0:
+					return False
+				self.condition.wait(remaining)
+		return True
+
+	def run(self):
+		while True:
+			with self.condition:
+				while not self.pending:
+					self.condition.wait()
+			# Let more updates of the same entities coalesce before delivering
+			time.sleep(self.flush_interval)
+			with self.condition:
+				batch = list(self.pending.values())
+				self.pending = {}
+				self.delivering = True
+			try:
+				self.deliver(batch)
+			finally:
+				with self.condition:
+					self.delivering = False
+					self.condition.notify_all()
+
+	def deliver(self, batch):
+		"""
+		POST a batch of updates in order. Falls back to Celery for the rest of the batch once the main server is unreachable
+		or overloaded, and for a single update the main server rejected.
+		"""
+		for index, update in enumerate(batch):
+			try:
+				response = self.post(update)
+			except Exception as e:
+				logger.warning(f'Main server unreachable ({e}), handing {len(batch) - index} status updates to Celery')
+				self.fall_back(batch[index:])
+				return
+			if response.status_code >= 500 or response.status_code in OVERLOADED_STATUS_CODES:
+				logger.warning(f'Main server error {response.status_code}, handing {len(batch) - index} status updates to Celery')
+				self.fall_back(batch[index:])
+				return
+			if response.status_code == 200:
+				self.delivered += 1
+				logger.info(f'Delivered status update {update}')
+			elif response.status_code == 401:
+				logger.error(f'Failed to deliver status update {update}: {response.status_code} - {response.text[:500]}')
+			else:
+				# Rejected by the main server, retry it from the update_status_main task
+				logger.warning(f'Main server rejected status update {update}: {response.status_code} - {response.text[:500]}')
+				self.fall_back([update])
+
+	def post(self, update):
+		url = f'{self.main_host}/api/job/status-update/'
+		response = self.session.post(
+			url, headers={'Authorization': f'Token {get_agent_JWT_token("agent")}'}, json=update, timeout=self.timeout
+		)
+		if response.status_code == 401:
+			# The main server may have rotated its view of our token, retry once with a new one
+			response = self.session.post(
+				url,
+				headers={'Authorization': f'Token {get_agent_JWT_token("agent", refresh=True)}'},
+				json=update,
+				timeout=self.timeout,
+			)
+		return response
+
+	def fall_back(self, updates):
+		for update in updates:
+			try:
+				update_status_main.delay(**update)  # type: ignore
+				self.fallbacks += 1
+			except Exception as e:
+				logger.error(f'Failed to hand status update {update} to Celery: {e}', exc_info=True)
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_status_outbox():
+	"""
+	Get the status outbox of this process, creating it on first use.
+	"""
+	global _outbox
+	with _outbox_lock:
+		if _outbox is None:
+			_outbox = StatusOutbox()
+		return _outbox
+
+
+def send_status_update(job_uuid, job_status=None, test_case_uuid=None, test_case_status=None):
+	"""
+	Send a job or test case status update to the main server through the outbox, or as a Celery task if it is disabled.
+	"""
+	if STATUS_OUTBOX_ENABLED:
+		get_status_outbox().put(job_uuid, job_status=job_status, test_case_uuid=test_case_uuid, test_case_status=test_case_status)
+	else:
+		update_status_main.delay(  # type: ignore
+			job_uuid=job_uuid, job_status=job_status, test_case_uuid=test_case_uuid, test_case_status=test_case_status
+		)
+
+
+@worker_shutdown.connect
+def flush_status_outbox(sender=None, **kwargs):
+	"""
+	Deliver pending status updates before the worker process exits.
+	"""
+	if _outbox is not None and not _outbox.flush(timeout=30):
+		logger.warning('Status outbox still had undelivered updates at worker shutdown.')
@@ -0,0 +1,88 @@
+import logging
+import os
+
+logger = logging.getLogger('StepActivity')
+
+# Maximum number of network requests and console messages kept per step; older ones are dropped first.
+STEP_ACTIVITY_MAX_ENTRIES = int(os.getenv('AGENT_STEP_ACTIVITY_MAX_ENTRIES', '200'))
+# Longer URLs and console messages are truncated.
+STEP_ACTIVITY_MAX_TEXT = 2000
+
+
+class StepActivityRecorder:
+	"""
+	Collects the network requests and console messages of a browser context between two agent steps, for the
+	network_requests and console fields of the step records.
+	"""
+
+	def __init__(self, browser_context, max_entries=STEP_ACTIVITY_MAX_ENTRIES):
+		"""
+		Args:
+			browser_context (BrowserContext): Playwright context whose pages are recorded.
+			max_entries (int): Maximum number of network requests and of console messages kept per step.
+		"""
+		self.browser_context = browser_context
+		self.max_entries = max(1, max_entries)
+		self.network_requests = []
+		self.console_messages = []
+		self.handlers = {
+			'response': self.on_response,
+			'requestfailed': self.on_request_failed,
+			'console': self.on_console,
+		}
+
+	def start(self):
+		for event, handler in self.handlers.items():
+			self.browser_context.on(event, handler)
+
+	def stop(self):
+		"""
+		Remove the listeners, so a pooled browser context does not keep recording for this manager.
+		"""
+		for event, handler in self.handlers.items():
+			try:
+				self.browser_context.remove_listener(event, handler)
+			except Exception as e:
+				logger.debug(f'Failed to remove the {event} listener: {e}')
+
+	def add(self, entries, entry):
+		if len(entries) >= self.max_entries:
+			del entries[0]
+		entries.append(entry)
+
+	def on_response(self, response):
+		request = response.request
+		self.add(
+			self.network_requests,
+			{
+				'method': request.method,
+				'url': request.url[:STEP_ACTIVITY_MAX_TEXT],
+				'resource_type': request.resource_type,
+				'status': response.status,
+			},
+		)
+
+	def on_request_failed(self, request):
+		self.add(
+			self.network_requests,
+			{
+				'method': request.method,
+				'url': request.url[:STEP_ACTIVITY_MAX_TEXT],
+				'resource_type': request.resource_type,
+				'failure': request.failure,
+			},
+		)
+
+	def on_console(self, message):
+		self.add(self.console_messages, f'[{message.type}] {message.text[:STEP_ACTIVITY_MAX_TEXT]}')
+
+	def take(self):
+		"""
+		Return what was recorded since the last call and start over.
+
+		Returns:
+			tuple[list[dict], str]: The network requests, and the console messages one per line.
+		"""
+		network_requests, self.network_requests = self.network_requests, []
+		console_messages, self.console_messages = self.console_messages, []
+		return network_requests, '\n'.join(console_messages)
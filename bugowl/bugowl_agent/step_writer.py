@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from django.db import close_old_connections
+from teststep.models import TestStepRun
+
+logger = logging.getLogger('StepWriter')
+
+# Write a batch as soon as it holds this many step records...
+STEP_WRITER_BATCH_SIZE = int(os.getenv('AGENT_STEP_WRITER_BATCH_SIZE', '50'))
+# ...or once its oldest record has waited this many seconds.
+STEP_WRITER_FLUSH_INTERVAL = float(os.getenv('AGENT_STEP_WRITER_FLUSH_INTERVAL', '2'))
+# Maximum number of step records held in memory.
+STEP_WRITER_MAX_QUEUE = int(os.getenv('AGENT_STEP_WRITER_MAX_QUEUE', '1000'))
+# What to do with a record when the queue is full: 'drop' it or 'spill' it to a file in AGENT_STEP_WRITER_SPILL_DIR.
+STEP_WRITER_OVERFLOW_POLICY = os.getenv('AGENT_STEP_WRITER_OVERFLOW_POLICY', 'spill')
+STEP_WRITER_SPILL_DIR = os.getenv('AGENT_STEP_WRITER_SPILL_DIR', '/app/bugowl/step_spill')
+
+
+def resolve_step_record(record):
+	"""
+	Evaluate the lazy (callable) fields of a step record.
+
+	Encoding of data already copied from the agent (such as the JSON of the agent history) is passed as callables
+	so it runs on the writer thread instead of the agent loop. A callable must not read objects the agent may
+	still change.
+	"""
+	return {field: value() if callable(value) else value for field, value in record.items()}
+
+
+class FlushRequest:
+	"""
+	Marker put on the queue to make the writer write everything queued before it.
+	"""
+
+	def __init__(self):
+		self.done = threading.Event()
+
+
+class StepRecordWriter:
+	"""
+	Writes TestStepRun records in batches from a dedicated thread, so the agent loop never waits on the database.
+	"""
+
+	def __init__(
+		self,
+		batch_size=STEP_WRITER_BATCH_SIZE,
+		flush_interval=STEP_WRITER_FLUSH_INTERVAL,
+		max_queue=STEP_WRITER_MAX_QUEUE,
+		overflow_policy=STEP_WRITER_OVERFLOW_POLICY,
+		spill_dir=STEP_WRITER_SPILL_DIR,
+	):
+		"""
+		Args:
+			batch_size (int): Number of records written per bulk_create.
+			flush_interval (float): Seconds after which a partial batch is written anyway.
+			max_queue (int): Maximum number of records held in memory.
+			overflow_policy (str): 'drop' or 'spill', applied to records put on a full queue.
+			spill_dir (str): Directory of the spill file used by the 'spill' policy.
+		"""
+		if overflow_policy not in ('drop', 'spill'):
+			raise ValueError(f'Unknown step writer overflow policy: {overflow_policy}')
+		self.batch_size = max(1, batch_size)
+		self.flush_interval = flush_interval
+		self.queue = queue.Queue(maxsize=max(1, max_queue))
+		self.overflow_policy = overflow_policy
+		self.spill_path = os.path.join(spill_dir, f'steps-{os.getpid()}-{uuid.uuid4().hex}.jsonl')
+		self.spill_lock = threading.Lock()
+		self.spilled = 0
+		self.dropped = 0
+		self.written = 0
+		self.thread = None
+		self.start_lock = threading.Lock()
+
+	def start(self):
+		"""
+		Start the writer thread. Does nothing if it is already running.
+		"""
+		with self.start_lock:
+			if self.thread and self.thread.is_alive():
+				return
+			self.thread = threading.Thread(target=self.run, name='agent-step-writer', daemon=True)
+			self.thread.start()
+
+	async def aput(self, record):
+		"""
+		Queue a step record from the event loop. Applies the overflow policy if the queue is full; a spilled record is
+		written to the spill file off the loop.
+
+		Args:
+			record (dict): TestStepRun field values; callable values are evaluated on the writer thread.
+		"""
+		if not self.try_put(record):
+			await asyncio.to_thread(self.spill, record)
+
+	def try_put(self, record):
+		"""
+		Queue a step record without blocking, or drop it if the queue is full and the overflow policy is 'drop'.
+
+		Returns:
+			bool: False if the queue is full and the record must be spilled.
+		"""
+		self.start()
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			if self.overflow_policy == 'spill':
+				return False
+			self.dropped += 1
+			logger.warning(f'Step writer queue is full, dropped step record ({self.dropped} dropped so far)')
+		return True
+
+	def spill(self, record):
+		"""
+		Append a record to the spill file, to be written after the in-memory queue.
+		"""
+		record = resolve_step_record(record)
+		with self.spill_lock:
+			os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+			with open(self.spill_path, 'a') as spill_file:
+				spill_file.write(json.dumps(record, default=str) + '\n')
+			self.spilled += 1
+
+	def take_spilled(self):
+		"""
+		Read and remove the spill file.
+
+		Returns:
+			list[dict]: The spilled records.
+		"""
+		with self.spill_lock:
+			if not os.path.exists(self.spill_path):
+				return []
+			with open(self.spill_path) as spill_file:
+				records = [json.loads(line) for line in spill_file if line.strip()]
+			os.remove(self.spill_path)
+			self.spilled = 0
+			return records
+
+	def flush(self, timeout=None):
+		"""
+		Block until every record queued before this call has been written.
+
+		Returns:
+			bool: False if the timeout expired first.
+		"""
+		self.start()
+		flush_request = FlushRequest()
+		self.queue.put(flush_request)
+		return flush_request.done.wait(timeout)
+
+	def run(self):
+		batch = []
+		batch_started_at = None
+		while True:
+			timeout = None
+			if batch:
+				timeout = max(0.0, self.flush_interval - (time.monotonic() - batch_started_at))  # type: ignore
+			try:
+				item = self.queue.get(timeout=timeout)
+			except queue.Empty:
+				item = None
+
+			if isinstance(item, FlushRequest):
+				self.write(batch)
+				batch = []
+				self.write(self.take_spilled())
+				item.done.set()
+				continue
+
+			if item is not None:
+				if not batch:
+					batch_started_at = time.monotonic()
+				batch.append(item)
+
+			if batch and (len(batch) >= self.batch_size or item is None):
+				self.write(batch)
+				batch = []
+				if self.spilled and self.queue.empty():
+					self.write(self.take_spilled())
+
+	def write(self, records):
+		"""
+		Write records with bulk_create, batch_size at a time. Failures are logged, never raised.
+		"""
+		if not records:
+			return
+		close_old_connections()
+		try:
+			step_runs = [TestStepRun(**resolve_step_record(record)) for record in records]
+			TestStepRun.objects.bulk_create(step_runs, batch_size=self.batch_size)
+			self.written += len(step_runs)
+			logger.debug(f'Wrote {len(step_runs)} step records ({self.written} so far)')
+		except Exception as e:
+			logger.error(f'Failed to write {len(records)} step records: {e}', exc_info=True)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_step_writer():
+	"""
+	Get the step record writer of this process, creating it on first use.
+	"""
+	global _writer
+	with _writer_lock:
+		if _writer is None:
+			_writer = StepRecordWriter()
+		return _writer
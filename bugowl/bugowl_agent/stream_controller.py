@@ -0,0 +1,289 @@
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import os
+import time
+
+import redis.asyncio as redis
+from websocket.utils import get_job_viewers_channel_name
+
+logger = logging.getLogger('StreamController')
+
+# Bounds of the adaptive frame rate and JPEG quality of live streams.
+STREAM_MIN_FPS = float(os.getenv('AGENT_STREAM_MIN_FPS', '1'))
+STREAM_MAX_QUALITY = int(os.getenv('AGENT_STREAM_MAX_QUALITY', '80'))
+STREAM_MIN_QUALITY = int(os.getenv('AGENT_STREAM_MIN_QUALITY', '30'))
+STREAM_QUALITY_STEP = 10
+# Frame rate once the page has not changed for STREAM_IDLE_SECONDS. An unchanged frame is re-sent at this rate.
+STREAM_KEEPALIVE_FPS = float(os.getenv('AGENT_STREAM_KEEPALIVE_FPS', '0.5'))
+STREAM_IDLE_SECONDS = float(os.getenv('AGENT_STREAM_IDLE_SECONDS', '3'))
+# A send taking longer than this fraction of the frame interval counts as lag.
+STREAM_LAG_FACTOR = float(os.getenv('AGENT_STREAM_LAG_FACTOR', '0.5'))
+# Seconds without congestion before fps and quality are stepped back up, and between two downgrades.
+STREAM_RECOVER_SECONDS = float(os.getenv('AGENT_STREAM_RECOVER_SECONDS', '5'))
+STREAM_DEGRADE_COOLDOWN = 1.0
+# Seconds of history the bytes/sec and measured fps metrics are computed over.
+STREAM_METRICS_WINDOW = 5.0
+# Seconds between two recounts of the viewers from the channel layer group, to correct missed events.
+STREAM_VIEWER_RESYNC_INTERVAL = float(os.getenv('AGENT_STREAM_VIEWER_RESYNC_INTERVAL', '30'))
+# Seconds to wait before subscribing again after the viewer events subscription failed.
+STREAM_VIEWER_RESUBSCRIBE_DELAY = float(os.getenv('AGENT_STREAM_VIEWER_RESUBSCRIBE_DELAY', '1'))
+
+
+class AdaptiveStreamController:
+	"""
+	Decides which live stream frames are sent and at which frame rate and JPEG quality.
+
+	Unchanged frames are skipped, the frame rate falls to a keepalive rate while the page is idle, and fps and
+	quality are halved/lowered when the channel layer is full or sends lag, then stepped back up once it recovers.
+	"""
+
+	def __init__(
+		self,
+		max_fps,
+		min_fps=STREAM_MIN_FPS,
+		max_quality=STREAM_MAX_QUALITY,
+		min_quality=STREAM_MIN_QUALITY,
+		keepalive_fps=STREAM_KEEPALIVE_FPS,
+		idle_seconds=STREAM_IDLE_SECONDS,
+		recover_seconds=STREAM_RECOVER_SECONDS,
+		clock=time.monotonic,
+	):
+		self.max_fps = max_fps
+		self.min_fps = min(min_fps, max_fps)
+		self.max_quality = max_quality
+		self.min_quality = min(min_quality, max_quality)
+		self.keepalive_fps = keepalive_fps
+		self.idle_seconds = idle_seconds
+		self.recover_seconds = recover_seconds
+		self.clock = clock
+
+		self.fps = max_fps
+		self.quality = max_quality
+		now = clock()
+		self.last_hash = None
+		self.last_change_at = now
+		self.last_sent_at = None
+		self.last_degraded_at = None
+		self.last_adjusted_at = now
+		self.frames_sent = 0
+		self.bytes_sent = 0
+		self.dropped_duplicate = 0
+		self.dropped_congestion = 0
+		self.sent_window = collections.deque()
+
+	def is_idle(self):
+		return self.clock() - self.last_change_at >= self.idle_seconds
+
+	def frame_interval(self):
+		"""
+		Seconds to wait between two frame captures.
+		"""
+		return 1 / self.keepalive_fps if self.is_idle() else 1 / self.fps
+
+	def should_send(self, frame_bytes):
+		"""
+		Check whether a captured frame is worth sending: it differs from the previous one, or the previous one
+		was sent longer than the keepalive interval ago.
+		"""
+		digest = hashlib.blake2b(frame_bytes, digest_size=16).digest()
+		now = self.clock()
+		if digest != self.last_hash:
+			self.last_hash = digest
+			self.last_change_at = now
+			return True
+		if self.last_sent_at is None or now - self.last_sent_at >= 1 / self.keepalive_fps:
+			return True
+		self.dropped_duplicate += 1
+		return False
+
+	def record_sent(self, size, send_seconds):
+		"""
+		Record a sent frame and how long sending it took. Lowers fps and quality if the send lagged.
+		"""
+		now = self.clock()
+		self.frames_sent += 1
+		self.bytes_sent += size
+		self.last_sent_at = now
+		self.sent_window.append((now, size))
+		if send_seconds > STREAM_LAG_FACTOR / self.fps:
+			self.degrade(f'send took {send_seconds * 1000:.0f}ms')
+		elif now - self.last_adjusted_at >= self.recover_seconds:
+			self.recover()
+
+	def record_congestion(self):
+		"""
+		Record a frame dropped because the channel layer was full.
+		"""
+		self.dropped_congestion += 1
+		self.degrade('channel full')
+
+	def degrade(self, reason):
+		now = self.clock()
+		if self.last_degraded_at is not None and now - self.last_degraded_at < STREAM_DEGRADE_COOLDOWN:
+			return
+		fps, quality = self.fps, self.quality
+		self.fps = max(self.min_fps, self.fps / 2)
+		self.quality = max(self.min_quality, self.quality - STREAM_QUALITY_STEP)
+		self.last_degraded_at = now
+		self.last_adjusted_at = now
+		if (fps, quality) != (self.fps, self.quality):
+			logger.info(f'Live stream congested ({reason}): {fps:g} -> {self.fps:g} fps, quality {quality} -> {self.quality}')
+
+	def recover(self):
+		self.last_adjusted_at = self.clock()
+		if self.fps < self.max_fps or self.quality < self.max_quality:
+			self.fps = min(self.max_fps, self.fps + 1)
+			self.quality = min(self.max_quality, self.quality + STREAM_QUALITY_STEP)
+
+	def metrics(self):
+		"""
+		Get the current state of the stream.
+
+		Returns:
+			dict: Target and measured fps, JPEG quality, sent and dropped frames, and bytes/sec over the last
+			STREAM_METRICS_WINDOW seconds.
+		"""
+		now = self.clock()
+		while self.sent_window and now - self.sent_window[0][0] > STREAM_METRICS_WINDOW:
+			self.sent_window.popleft()
+		idle = self.is_idle()
+		return {
+			'fps': self.keepalive_fps if idle else self.fps,
+			'measured_fps': round(len(self.sent_window) / STREAM_METRICS_WINDOW, 2),
+			'quality': self.quality,
+			'idle': idle,
+			'frames_sent': self.frames_sent,
+			'bytes_sent': self.bytes_sent,
+			'dropped_frames': self.dropped_duplicate + self.dropped_congestion,
+			'dropped_duplicate': self.dropped_duplicate,
+			'dropped_congestion': self.dropped_congestion,
+			'bytes_per_second': round(sum(size for _, size in self.sent_window) / STREAM_METRICS_WINDOW),
+		}
+
+
+class ViewerTracker:
+	"""
+	Keeps the number of viewers of a job's live stream from the join/leave events the WebSocket consumers
+	publish, instead of counting the channel layer group before every frame.
+
+	The group is still counted when the tracker starts and every STREAM_VIEWER_RESYNC_INTERVAL seconds, to
+	correct for events missed while the worker was not subscribed.
+	"""
+
+	def __init__(self, job_uuid, count_viewers, on_change=None, redis_client=None):
+		"""
+		Args:
+			job_uuid (str): The job whose stream is watched.
+			count_viewers (callable): Coroutine function counting the viewers from the channel layer group.
+			on_change (callable): Coroutine function called with the new count whenever it changes.
+			redis_client: A redis.asyncio client. Defaults to one connected to DJANGO_CACHE_LOCATION.
+		"""
+		self.job_uuid = job_uuid
+		self.channel_name = get_job_viewers_channel_name(job_uuid)
+		self.count_viewers = count_viewers
+		self.on_change = on_change
+		self.redis = redis_client
+		self.owns_redis = redis_client is None
+		self.pubsub = None
+		self.task = None
+		self.viewer_count = 0
+		self.changed = asyncio.Event()
+
+	async def start(self):
+		"""
+		Subscribe to the viewer events of the job, then take the initial count.
+		"""
+		await self.subscribe()
+		self.task = asyncio.create_task(self.listen())
+
+	async def subscribe(self):
+		if self.redis is None:
+			self.redis = redis.from_url(os.getenv('DJANGO_CACHE_LOCATION', 'redis://redis-agent:6381/1'))
+		self.pubsub = self.redis.pubsub()
+		await self.pubsub.subscribe(self.channel_name)
+		await self.resync()
+
+	async def close_pubsub(self):
+		pubsub, self.pubsub = self.pubsub, None
+		if pubsub:
+			try:
+				await pubsub.unsubscribe(self.channel_name)
+				await pubsub.aclose()
+			except Exception as e:
+				logger.warning(f'Failed to close viewer tracker of job {self.job_uuid}: {e}')
+
+	async def resync(self):
+		try:
+			await self.set_viewer_count(await self.count_viewers())
+		except Exception as e:
+			logger.warning(f'Failed to count viewers of job {self.job_uuid}, keeping {self.viewer_count}: {e}')
+
+	async def set_viewer_count(self, viewer_count):
+		viewer_count = max(0, viewer_count)
+		if viewer_count == self.viewer_count:
+			return
+		logger.info(f'Live stream of job {self.job_uuid}: {self.viewer_count} -> {viewer_count} viewers')
+		self.viewer_count = viewer_count
+		self.changed.set()
+		self.changed = asyncio.Event()
+		if self.on_change:
+			await self.on_change(viewer_count)
+
+	async def listen(self):
+		"""
+		Apply the viewer events until stopped. If the subscription fails it is made again, and the viewers are
+		recounted since events were missed meanwhile.
+		"""
+		resynced_at = time.monotonic()
+		while True:
+			try:
+				if self.pubsub is None:
+					await self.subscribe()
+					resynced_at = time.monotonic()
+				message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)  # type: ignore
+				if message and message.get('type') == 'message':
+					try:
+						delta = int(json.loads(message['data'])['delta'])
+					except (TypeError, ValueError, KeyError):
+						logger.warning(f'Ignoring malformed viewer event: {message.get("data")}')
+					else:
+						await self.set_viewer_count(self.viewer_count + delta)
+				if time.monotonic() - resynced_at >= STREAM_VIEWER_RESYNC_INTERVAL:
+					await self.resync()
+					resynced_at = time.monotonic()
+			except asyncio.CancelledError:
+				raise
+			except Exception as e:
+				logger.warning(
+					f'Viewer tracker of job {self.job_uuid} failed, subscribing again in {STREAM_VIEWER_RESUBSCRIBE_DELAY}s: {e}'
+				)
+				await self.close_pubsub()
+				await asyncio.sleep(STREAM_VIEWER_RESUBSCRIBE_DELAY)
+
+	async def wait_for_viewers(self, timeout):
+		"""
+		Wait until somebody watches the stream, at most timeout seconds.
+		"""
+		if self.viewer_count > 0:
+			return
+		try:
+			await asyncio.wait_for(self.changed.wait(), timeout)
+		except asyncio.TimeoutError:
+			pass
+
+	async def stop(self):
+		"""
+		Stop listening and release the Redis connection.
+		"""
+		if self.task and not self.task.done():
+			self.task.cancel()
+			await asyncio.gather(self.task, return_exceptions=True)
+		await self.close_pubsub()
+		if self.owns_redis and self.redis:
+			try:
+				await self.redis.aclose()
+			except Exception as e:
+				logger.warning(f'Failed to close the Redis connection of the viewer tracker of job {self.job_uuid}: {e}')
@@ -4,7 +4,7 @@ import os
 from api.utils import HttpMethod, HttpUtils
 from celery import shared_task
 from django.conf import settings
-from job.helpers import generate_agent_JWT_token
+from job.helpers import get_agent_JWT_token
 
 logger = logging.getLogger(settings.ENV)
 
@@ -30,7 +30,7 @@ def update_status_main(
 
 	try:
 		main_host = os.getenv('MAIN_SERVER_HOST', 'http://localhost:8000')
-		token, payload = generate_agent_JWT_token('agent')
+		token = get_agent_JWT_token('agent')
 		response = HttpUtils.make_http_call(
 			method=HttpMethod.POST,
 			url=f'{main_host}/api/job/status-update/',
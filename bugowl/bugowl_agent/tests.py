@@ -0,0 +1,1010 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import cv2
+import numpy as np
+import redis.asyncio as redis
+import requests
+from botocore.exceptions import ClientError
+from celery.signals import worker_shutdown
+from django.test import SimpleTestCase
+from websocket.utils import get_job_viewers_channel_name
+
+from .agent import AgentManager
+from .artifact_uploader import ArtifactUploader, ArtifactUploadGroup
+from .browser_pool import BrowserPool, get_browser_pool, register_persistent_loop, reset_browser_session
+from .executor import ExecutorShutdownError, JobExecutor
+from .status_outbox import StatusOutbox
+from .step_activity import StepActivityRecorder
+from .step_writer import StepRecordWriter
+from .stream_controller import AdaptiveStreamController, ViewerTracker
+from .utils import upload_video_S3
+from .video_recording_streaming import LiveStreaming
+from .video_ring_buffer import FrameRingBuffer, VideoCaptureStats
+from .video_transcoder import transcode_video
+
+
+class FakePubSub:
+	def __init__(self, redis_client):
+		self.redis = redis_client
+		self.messages = asyncio.Queue()
+
+	async def subscribe(self, channel_name):
+		self.redis.subscribers.setdefault(channel_name, []).append(self)
+
+	async def unsubscribe(self, channel_name):
+		self.redis.subscribers.get(channel_name, []).remove(self)
+
+	async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+		try:
+			return await asyncio.wait_for(self.messages.get(), timeout)
+		except asyncio.TimeoutError:
+			return None
+
+	async def aclose(self):
+		pass
+
+
+class FakePipeline:
+	def __init__(self, redis_client):
+		self.redis = redis_client
+		self.commands = []
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *exc_info):
+		return False
+
+	def set(self, *args, **kwargs):
+		self.commands.append(self.redis.set(*args, **kwargs))
+
+	def publish(self, *args):
+		self.commands.append(self.redis.publish(*args))
+
+	async def execute(self):
+		return [await command for command in self.commands]
+
+
+class FakeRedis:
+	"""
+	In-process stand-in for a redis.asyncio client with get/set, pipelines and pub/sub.
+	"""
+
+	def __init__(self):
+		self.store = {}
+		self.subscribers = {}
+
+	def pubsub(self):
+		return FakePubSub(self)
+
+	def pipeline(self, transaction=True):
+		return FakePipeline(self)
+
+	async def get(self, key):
+		return self.store.get(key)
+
+	async def set(self, key, value, ex=None):
+		self.store[key] = value
+		return True
+
+	async def publish(self, channel_name, data):
+		subscribers = self.subscribers.get(channel_name, [])
+		for pubsub in subscribers:
+			pubsub.messages.put_nowait({'type': 'message', 'channel': channel_name, 'data': data})
+		return len(subscribers)
+
+
+class FakeBrowserSession:
+	def __init__(self):
+		self.started = False
+		self.killed = False
+		self.connected = True
+
+	async def start(self):
+		self.started = True
+
+	async def kill(self):
+		self.killed = True
+
+	async def is_connected(self, restart=True):
+		return self.connected
+
+
+@mock.patch.object(BrowserPool, 'schedule_warm')
+@mock.patch.object(BrowserPool, 'reset', mock.AsyncMock())
+@mock.patch.object(BrowserPool, 'create_browser_session', side_effect=FakeBrowserSession)
+class BrowserPoolTests(SimpleTestCase):
+	def test_browser_is_reused_until_its_max_uses(self, create_browser_session, schedule_warm):
+		pool = BrowserPool({}, size=1, max_age=60, max_uses=2)
+
+		async def scenario():
+			first = await pool.checkout()
+			await pool.checkin(first)
+			second = await pool.checkout()
+			await pool.checkin(second)
+			third = await pool.checkout()
+			return first, second, third
+
+		first, second, third = asyncio.run(scenario())
+
+		self.assertIs(first, second)
+		self.assertTrue(first.killed)
+		self.assertIsNot(third, first)
+		self.assertEqual((pool.recycled, len(pool.cold_launch_latencies)), (1, 2))
+
+	def test_idle_browser_older_than_max_age_is_recycled_on_checkout(self, create_browser_session, schedule_warm):
+		pool = BrowserPool({}, size=1, max_age=60, max_uses=20)
+
+		async def scenario():
+			first = await pool.checkout()
+			await pool.checkin(first)
+			pool.idle[0].created_at -= 61
+			second = await pool.checkout()
+			return first, second
+
+		first, second = asyncio.run(scenario())
+
+		self.assertTrue(first.killed)
+		self.assertIsNot(second, first)
+		self.assertEqual(pool.recycled, 1)
+
+	def test_expired_or_unhealthy_browser_is_not_returned_to_the_pool(self, create_browser_session, schedule_warm):
+		pool = BrowserPool({}, size=2, max_age=0, max_uses=20)
+		healthy_pool = BrowserPool({}, size=2, max_age=60, max_uses=20)
+
+		async def scenario():
+			expired = await pool.checkout()
+			await pool.checkin(expired)
+			unhealthy = await healthy_pool.checkout()
+			unhealthy.connected = False
+			await healthy_pool.checkin(unhealthy)
+			return expired, unhealthy
+
+		expired, unhealthy = asyncio.run(scenario())
+
+		self.assertTrue(expired.killed and unhealthy.killed)
+		self.assertEqual((pool.idle, healthy_pool.idle), ([], []))
+
+	@mock.patch('bugowl_agent.browser_pool.BROWSER_POOL_SIZE', 2)
+	def test_pool_is_only_used_on_a_persistent_loop(self, create_browser_session, schedule_warm):
+		async def get_pools():
+			return get_browser_pool({'headless': True}), get_browser_pool({'headless': True})
+
+		self.assertEqual(asyncio.run(get_pools()), (None, None))
+
+		loop = asyncio.new_event_loop()
+		try:
+			register_persistent_loop(loop)
+			first, second = loop.run_until_complete(get_pools())
+		finally:
+			loop.close()
+		self.assertIsInstance(first, BrowserPool)
+		self.assertIs(first, second)
+
+	def test_health_check_does_not_hold_the_lock(self, create_browser_session, schedule_warm):
+		pool = BrowserPool({}, size=2, max_age=60, max_uses=20)
+		health_check_started = asyncio.Event()
+		finish_health_check = asyncio.Event()
+
+		async def slow_is_healthy(pooled):
+			health_check_started.set()
+			await finish_health_check.wait()
+			return True
+
+		async def scenario():
+			first = await pool.checkout()
+			second = await pool.checkout()
+			await pool.checkin(first)
+			await pool.checkin(second)
+			with mock.patch.object(pool, 'is_healthy', slow_is_healthy):
+				slow_checkout = asyncio.create_task(pool.checkout())
+				await health_check_started.wait()
+				lock_was_free = not pool.lock.locked()
+				finish_health_check.set()
+				await slow_checkout
+			return lock_was_free
+
+		self.assertTrue(asyncio.run(scenario()))
+
+
+class FakePage:
+	def __init__(self, url):
+		self.url = url
+		self.closed = False
+
+	def is_closed(self):
+		return self.closed
+
+	async def close(self):
+		self.closed = True
+
+
+class FakeCDPSession:
+	def __init__(self):
+		self.sent = []
+		self.detached = False
+
+	async def send(self, method, params):
+		self.sent.append((method, params))
+
+	async def detach(self):
+		self.detached = True
+
+
+class FakeStorageContext:
+	"""
+	Stand-in for a Playwright BrowserContext holding pages, cookies and storage.
+	"""
+
+	def __init__(self, page_urls, storage_origins):
+		self.pages = [FakePage(url) for url in page_urls]
+		self.storage_origins = storage_origins
+		self.cleared = []
+		self.cdp_session = FakeCDPSession()
+
+	async def storage_state(self):
+		return {'cookies': [], 'origins': [{'origin': origin} for origin in self.storage_origins]}
+
+	async def clear_cookies(self):
+		self.cleared.append('cookies')
+
+	async def clear_permissions(self):
+		self.cleared.append('permissions')
+
+	async def new_page(self):
+		page = FakePage('about:blank')
+		self.pages.append(page)
+		return page
+
+	async def new_cdp_session(self, page):
+		return self.cdp_session
+
+
+class ResetBrowserSessionTests(SimpleTestCase):
+	def make_browser_session(self, browser_context):
+		return SimpleNamespace(
+			browser_context=browser_context,
+			agent_current_page=browser_context.pages[0],
+			human_current_page=browser_context.pages[0],
+			_cached_browser_state_summary='state',
+			_cached_clickable_element_hashes='hashes',
+			_downloaded_files=['report.pdf'],
+		)
+
+	def test_tabs_are_replaced_by_one_blank_tab_and_storage_is_cleared(self):
+		browser_context = FakeStorageContext(
+			['https://app.example.com/login', 'about:blank'], storage_origins=['https://auth.example.com']
+		)
+		old_pages = list(browser_context.pages)
+		browser_session = self.make_browser_session(browser_context)
+
+		asyncio.run(reset_browser_session(browser_session))
+
+		self.assertTrue(all(page.closed for page in old_pages))
+		[blank_page] = [page for page in browser_context.pages if not page.closed]
+		self.assertEqual(blank_page.url, 'about:blank')
+		self.assertIs(browser_session.agent_current_page, blank_page)
+		self.assertIs(browser_session.human_current_page, blank_page)
+		self.assertEqual(browser_context.cleared, ['cookies', 'permissions'])
+		cleared_origins = sorted(params['origin'] for method, params in browser_context.cdp_session.sent)
+		self.assertEqual(cleared_origins, ['https://app.example.com', 'https://auth.example.com'])
+		self.assertTrue(browser_context.cdp_session.detached)
+		self.assertIsNone(browser_session._cached_browser_state_summary)
+		self.assertEqual(browser_session._downloaded_files, [])
+
+	def test_storage_is_kept_unless_asked_to_clear_it(self):
+		browser_context = FakeStorageContext(['https://app.example.com/login'], storage_origins=['https://auth.example.com'])
+		browser_session = self.make_browser_session(browser_context)
+
+		asyncio.run(reset_browser_session(browser_session, clear_storage=False))
+
+		self.assertEqual(browser_context.cleared, [])
+		self.assertEqual(browser_context.cdp_session.sent, [])
+		self.assertEqual([page.url for page in browser_context.pages if not page.closed], ['about:blank'])
+
+
+@mock.patch('bugowl_agent.executor.flush_status_outbox')
+@mock.patch('bugowl_agent.executor.close_browser_pools', new_callable=mock.AsyncMock)
+class JobExecutorTests(SimpleTestCase):
+	def test_drain_waits_for_running_jobs_and_cancels_the_ones_past_the_timeout(self, close_browser_pools, flush_status_outbox):
+		job_executor = JobExecutor(max_concurrent_jobs=2)
+
+		async def job(duration):
+			await asyncio.sleep(duration)
+			return duration
+
+		finishing = job_executor.submit(job(0.05))
+		hanging = job_executor.submit(job(60))
+		job_executor.drain(timeout=0.5)
+
+		self.assertEqual(finishing.result(), 0.05)
+		self.assertTrue(hanging.cancelled())
+		self.assertFalse(job_executor.thread.is_alive())
+		close_browser_pools.assert_awaited_once()
+		flush_status_outbox.assert_called_once()
+		with self.assertRaises(ExecutorShutdownError):
+			job_executor.submit(job(0))
+
+	def test_worker_shutdown_drains_the_executor(self, close_browser_pools, flush_status_outbox):
+		job_executor = mock.Mock()
+
+		with mock.patch('bugowl_agent.executor._executor', job_executor):
+			worker_shutdown.send(sender=None)
+
+		job_executor.drain.assert_called_once_with()
+
+
+class FakeReplayAgent:
+	"""
+	Stand-in for the browser_use Agent that replays `replayable_steps` steps and has the LLM plan `planned_steps` more.
+	"""
+
+	def __init__(self, earlier_steps, replayable_steps, planned_steps, fully_replayed=False):
+		self.state = SimpleNamespace(
+			history=SimpleNamespace(history=['earlier'] * earlier_steps, is_successful=lambda: True), last_result=None
+		)
+		self.sensitive_data = {}
+		self.replayable_steps = replayable_steps
+		self.planned_steps = planned_steps
+		self.fully_replayed = fully_replayed
+		self.run = mock.AsyncMock(side_effect=self.plan)
+
+	def add_new_task(self, task):
+		pass
+
+	async def replay_history_until_divergence(self, history, on_step_end=None):
+		self.state.history.history += ['replayed'] * self.replayable_steps
+		self.state.last_result = [SimpleNamespace(is_done=self.fully_replayed, success=True)]
+		return self.replayable_steps
+
+	async def plan(self, on_step_end=None):
+		self.state.history.history += ['planned'] * self.planned_steps
+		return self.state.history
+
+
+@mock.patch('bugowl_agent.agent.get_cancel_job_status_cache', return_value=None)
+class ReplayHistoryTests(SimpleTestCase):
+	def run_task(self, agent, replay_history='saved history'):
+		"""
+		Run a test task of `agent` on AgentManager.run_task and return its test task run.
+		"""
+		job_instance = SimpleNamespace(job_uuid='job-1', payload={'job': {'llm_cache': False}})
+		agent_manager = AgentManager(job_instance)
+		agent_manager.agent = agent
+		agent_manager.testtask_run = SimpleNamespace(test_task_uuid='task-1')
+		with (
+			mock.patch.object(AgentManager, 'get_replay_history', mock.AsyncMock(return_value=replay_history)),
+			mock.patch.object(AgentManager, 'flush_step_records', mock.AsyncMock()),
+			mock.patch.object(AgentManager, 'save_passing_history', mock.AsyncMock()) as save_passing_history,
+		):
+			asyncio.run(agent_manager.run_task('Click next'))
+		save_passing_history.assert_awaited_once_with(2)
+		return agent_manager.testtask_run
+
+	def test_llm_plans_the_steps_after_the_replay_diverged(self, get_cancel_status):
+		agent = FakeReplayAgent(earlier_steps=2, replayable_steps=3, planned_steps=4)
+
+		testtask_run = self.run_task(agent)
+
+		agent.run.assert_awaited_once()
+		self.assertEqual((testtask_run.replayed_steps, testtask_run.replanned_steps), (3, 4))
+
+	def test_fully_replayed_task_skips_the_llm(self, get_cancel_status):
+		agent = FakeReplayAgent(earlier_steps=2, replayable_steps=3, planned_steps=4, fully_replayed=True)
+
+		testtask_run = self.run_task(agent)
+
+		agent.run.assert_not_awaited()
+		self.assertEqual((testtask_run.replayed_steps, testtask_run.replanned_steps), (3, 0))
+
+	def test_task_without_a_passing_history_is_planned_by_the_llm(self, get_cancel_status):
+		agent = FakeReplayAgent(earlier_steps=2, replayable_steps=3, planned_steps=4)
+
+		testtask_run = self.run_task(agent, replay_history=None)
+
+		self.assertEqual((testtask_run.replayed_steps, testtask_run.replanned_steps), (0, 4))
+
+	def test_replay_is_off_unless_enabled_and_a_job_can_opt_out(self, get_cancel_status):
+		def replay_enabled(**job_payload):
+			return AgentManager(SimpleNamespace(job_uuid='job-1', payload={'job': job_payload})).replay_enabled
+
+		self.assertFalse(replay_enabled())
+		with mock.patch('bugowl_agent.agent.REPLAY_PASSING_HISTORY', True):
+			self.assertTrue(replay_enabled())
+			self.assertFalse(replay_enabled(replay_history=False))
+
+
+@mock.patch('bugowl_agent.step_writer.TestStepRun')
+class StepRecordWriterTests(SimpleTestCase):
+	def setUp(self):
+		self.temp_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.temp_dir.cleanup)
+
+	def written_steps(self, step_run_model):
+		return [call.kwargs['step'] for call in step_run_model.call_args_list]
+
+	def block_writes(self, step_run_model):
+		"""
+		Make the writer thread block in bulk_create until the returned event is set.
+		"""
+		writing = threading.Event()
+		release = threading.Event()
+
+		def bulk_create(step_runs, batch_size=None):
+			writing.set()
+			release.wait(5)
+
+		step_run_model.objects.bulk_create.side_effect = bulk_create
+		return writing, release
+
+	def test_records_are_written_in_batches_with_lazy_fields_resolved(self, step_run_model):
+		writer = StepRecordWriter(batch_size=2, flush_interval=60, spill_dir=self.temp_dir.name)
+
+		async def scenario():
+			for step in range(5):
+				await writer.aput({'step': step, 'agent_history': lambda step=step: json.dumps({'step': step})})
+
+		asyncio.run(scenario())
+		self.assertTrue(writer.flush(timeout=5))
+
+		self.assertEqual(self.written_steps(step_run_model), [0, 1, 2, 3, 4])
+		self.assertEqual(step_run_model.call_args_list[4].kwargs['agent_history'], '{"step": 4}')
+		self.assertEqual([len(call.args[0]) for call in step_run_model.objects.bulk_create.call_args_list], [2, 2, 1])
+		self.assertEqual(writer.written, 5)
+
+	def test_full_queue_drops_records_with_the_drop_policy(self, step_run_model):
+		writing, release = self.block_writes(step_run_model)
+		writer = StepRecordWriter(batch_size=1, max_queue=1, overflow_policy='drop', spill_dir=self.temp_dir.name)
+
+		async def scenario():
+			await writer.aput({'step': 0})
+			writing.wait(5)
+			for step in range(1, 4):
+				await writer.aput({'step': step})
+
+		asyncio.run(scenario())
+		release.set()
+		self.assertTrue(writer.flush(timeout=5))
+
+		self.assertEqual(writer.dropped, 2)
+		self.assertEqual(self.written_steps(step_run_model), [0, 1])
+
+	def test_full_queue_spills_off_the_loop_and_flush_writes_the_spill_file(self, step_run_model):
+		writing, release = self.block_writes(step_run_model)
+		writer = StepRecordWriter(batch_size=1, max_queue=1, overflow_policy='spill', spill_dir=self.temp_dir.name)
+		spill_threads = []
+		spill = writer.spill
+
+		def record_spill_thread(record):
+			spill_threads.append(threading.current_thread())
+			spill(record)
+
+		writer.spill = record_spill_thread
+
+		async def scenario():
+			await writer.aput({'step': 0})
+			writing.wait(5)
+			for step in range(1, 4):
+				await writer.aput({'step': step, 'agent_history': lambda step=step: json.dumps({'step': step})})
+
+		asyncio.run(scenario())
+		self.assertEqual(writer.spilled, 2)
+		self.assertTrue(os.path.exists(writer.spill_path))
+		release.set()
+		self.assertTrue(writer.flush(timeout=5))
+
+		self.assertEqual(len(spill_threads), 2)
+		self.assertNotIn(threading.main_thread(), spill_threads)
+		self.assertEqual(self.written_steps(step_run_model), [0, 1, 2, 3])
+		self.assertEqual(step_run_model.call_args_list[3].kwargs['agent_history'], '{"step": 3}')
+		self.assertFalse(os.path.exists(writer.spill_path))
+
+
+class FakeBrowserContext:
+	def __init__(self):
+		self.listeners = {}
+
+	def on(self, event, handler):
+		self.listeners.setdefault(event, []).append(handler)
+
+	def remove_listener(self, event, handler):
+		self.listeners[event].remove(handler)
+
+	def emit(self, event, payload):
+		for handler in self.listeners.get(event, []):
+			handler(payload)
+
+
+class StepActivityRecorderTests(SimpleTestCase):
+	def make_request(self, url, failure=None):
+		return SimpleNamespace(method='GET', url=url, resource_type='fetch', failure=failure)
+
+	def test_records_requests_and_console_messages_per_step(self):
+		browser_context = FakeBrowserContext()
+		step_activity = StepActivityRecorder(browser_context, max_entries=2)
+		step_activity.start()
+
+		for index in range(3):
+			browser_context.emit(
+				'response', SimpleNamespace(request=self.make_request(f'https://example.com/{index}'), status=200)
+			)
+		browser_context.emit('requestfailed', self.make_request('https://example.com/down', failure='net::ERR_FAILED'))
+		browser_context.emit('console', SimpleNamespace(type='error', text='Uncaught TypeError'))
+		network_requests, console = step_activity.take()
+
+		self.assertEqual([request['url'] for request in network_requests], ['https://example.com/2', 'https://example.com/down'])
+		self.assertEqual(network_requests[1]['failure'], 'net::ERR_FAILED')
+		self.assertEqual(console, '[error] Uncaught TypeError')
+		self.assertEqual(step_activity.take(), ([], ''))
+
+		step_activity.stop()
+		browser_context.emit('console', SimpleNamespace(type='log', text='after stop'))
+		self.assertEqual(step_activity.take(), ([], ''))
+
+
+class FakeSession:
+	def __init__(self, status_code=200, error=None, status_codes=None):
+		self.status_code = status_code
+		self.error = error
+		# Status code per test case uuid, overriding status_code
+		self.status_codes = status_codes or {}
+		self.posted = []
+
+	def post(self, url, headers=None, json=None, timeout=None):
+		if self.error:
+			raise self.error
+		self.posted.append(json)
+		return SimpleNamespace(status_code=self.status_codes.get(json['test_case_uuid'], self.status_code), text='')
+
+
+@mock.patch('bugowl_agent.status_outbox.get_agent_JWT_token', return_value='token')
+class StatusOutboxTests(SimpleTestCase):
+	def test_updates_coalesce_per_entity_in_order_of_latest_change(self, get_token):
+		session = FakeSession()
+		outbox = StatusOutbox(flush_interval=0.05, session=session)
+		outbox.put('job-1', job_status='Running')
+		outbox.put('job-1', test_case_uuid='case-1', test_case_status='Running')
+		outbox.put('job-1', test_case_uuid='case-1', test_case_status='Pass')
+		outbox.put('job-1', job_status='Pass')
+
+		self.assertTrue(outbox.flush(timeout=5))
+		self.assertEqual(
+			[(update['test_case_uuid'], update['test_case_status'] or update['job_status']) for update in session.posted],
+			[('case-1', 'Pass'), (None, 'Pass')],
+		)
+		self.assertEqual(outbox.coalesced, 2)
+		get_token.assert_called_with('agent')
+
+	def test_terminal_status_is_never_replaced(self, get_token):
+		session = FakeSession()
+		outbox = StatusOutbox(flush_interval=0.05, session=session)
+		outbox.put('job-1', job_status='Canceled')
+		outbox.put('job-1', job_status='Running')
+
+		self.assertTrue(outbox.flush(timeout=5))
+		self.assertEqual([update['job_status'] for update in session.posted], ['Canceled'])
+
+	@mock.patch('bugowl_agent.status_outbox.update_status_main')
+	def test_unreachable_main_server_falls_back_to_celery(self, update_status_main, get_token):
+		outbox = StatusOutbox(flush_interval=0.05, session=FakeSession(error=requests.ConnectionError('refused')))
+		outbox.put('job-1', test_case_uuid='case-1', test_case_status='Failed')
+		outbox.put('job-1', job_status='Failed')
+
+		self.assertTrue(outbox.flush(timeout=5))
+		self.assertEqual(update_status_main.delay.call_count, 2)
+		update_status_main.delay.assert_called_with(
+			job_uuid='job-1', job_status='Failed', test_case_uuid=None, test_case_status=None
+		)
+
+	@mock.patch('bugowl_agent.status_outbox.update_status_main')
+	def test_unexpected_error_falls_back_to_celery(self, update_status_main, get_token):
+		get_token.side_effect = RuntimeError('cache unavailable')
+		outbox = StatusOutbox(flush_interval=0.05, session=FakeSession())
+		outbox.put('job-1', test_case_uuid='case-1', test_case_status='Pass')
+		outbox.put('job-1', job_status='Pass')
+
+		self.assertTrue(outbox.flush(timeout=5))
+		self.assertEqual(update_status_main.delay.call_count, 2)
+		self.assertEqual(outbox.fallbacks, 2)
+
+	@mock.patch('bugowl_agent.status_outbox.update_status_main')
+	def test_rejected_update_falls_back_and_the_rest_are_delivered(self, update_status_main, get_token):
+		session = FakeSession(status_codes={'case-1': 404})
+		outbox = StatusOutbox(flush_interval=0.05, session=session)
+		outbox.put('job-1', test_case_uuid='case-1', test_case_status='Pass')
+		outbox.put('job-1', job_status='Pass')
+
+		self.assertTrue(outbox.flush(timeout=5))
+		update_status_main.delay.assert_called_once_with(
+			job_uuid='job-1', job_status=None, test_case_uuid='case-1', test_case_status='Pass'
+		)
+		self.assertEqual(outbox.delivered, 1)
+		self.assertEqual(session.posted[-1]['job_status'], 'Pass')
+
+	@mock.patch('bugowl_agent.status_outbox.update_status_main')
+	def test_rate_limited_main_server_falls_back_for_the_rest_of_the_batch(self, update_status_main, get_token):
+		session = FakeSession(status_code=429)
+		outbox = StatusOutbox(flush_interval=0.05, session=session)
+		outbox.put('job-1', test_case_uuid='case-1', test_case_status='Pass')
+		outbox.put('job-1', job_status='Pass')
+
+		self.assertTrue(outbox.flush(timeout=5))
+		self.assertEqual(len(session.posted), 1)
+		self.assertEqual(update_status_main.delay.call_count, 2)
+
+
+class FakeS3Client:
+	"""
+	In-memory stand-in for a boto3 S3 client that fails the first `failures` uploads.
+	"""
+
+	def __init__(self, failures=0):
+		self.failures = failures
+		self.objects = {}
+		self.attempts = 0
+
+	def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+		self.attempts += 1
+		if self.attempts <= self.failures:
+			raise ClientError({'Error': {'Code': 'SlowDown', 'Message': 'Slow down'}}, 'PutObject')
+		with open(Filename, 'rb') as f:
+			self.objects[(Bucket, Key)] = f.read()
+
+
+class ArtifactUploaderTests(SimpleTestCase):
+	def setUp(self):
+		self.temp_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.temp_dir.cleanup)
+
+	def make_file(self, name, content=b'video'):
+		path = os.path.join(self.temp_dir.name, name)
+		with open(path, 'wb') as f:
+			f.write(content)
+		return path
+
+	def test_upload_is_retried_and_local_file_deleted(self):
+		s3_client = FakeS3Client(failures=2)
+		uploader = ArtifactUploader(s3_client=s3_client, bucket='artifacts', retries=3, backoff_base=0.01)
+		path = self.make_file('case.webm')
+
+		async def scenario():
+			artifact_uploads = ArtifactUploadGroup()
+			artifact_uploads.add(await uploader.submit(path, 'videos/case.webm'))
+			return await artifact_uploads.wait(timeout=5)
+
+		self.assertEqual(asyncio.run(scenario()), {'succeeded': 1, 'failed': 0, 'pending': 0})
+		self.assertEqual(s3_client.objects[('artifacts', 'videos/case.webm')], b'video')
+		self.assertEqual(s3_client.attempts, 3)
+		self.assertFalse(os.path.exists(path))
+
+	def test_failed_upload_keeps_file(self):
+		uploader = ArtifactUploader(s3_client=FakeS3Client(failures=10), bucket='artifacts', retries=1, backoff_base=0.01)
+		path = self.make_file('case.webm')
+
+		async def scenario():
+			artifact_uploads = ArtifactUploadGroup()
+			artifact_uploads.add(await uploader.submit(path, 'videos/case.webm'))
+			return await artifact_uploads.wait(timeout=5)
+
+		self.assertEqual(asyncio.run(scenario()), {'succeeded': 0, 'failed': 1, 'pending': 0})
+		self.assertTrue(os.path.exists(path))
+
+	def upload_test_case_video(self, s3_client):
+		"""
+		Upload a test case video in the background, save the test case run right after as run_single_test_case does,
+		and return the upload results and the video URLs written to the database.
+		"""
+		uploader = ArtifactUploader(s3_client=s3_client, bucket='artifacts', retries=0)
+		test_case_run = SimpleNamespace(pk=1, test_case_uuid='case-1', video=None)
+		job_instance = SimpleNamespace(job_uuid='job-1', business='business-1')
+		path = self.make_file('recording.webm')
+		self.addCleanup(os.chdir, os.getcwd())
+		os.chdir(self.temp_dir.name)
+
+		async def scenario():
+			artifact_uploads = ArtifactUploadGroup()
+			video_url = await upload_video_S3(job_instance, test_case_run, path, mock.Mock(), artifact_uploads=artifact_uploads)
+			return video_url, await artifact_uploads.wait(timeout=5)
+
+		with (
+			mock.patch('bugowl_agent.utils.get_artifact_uploader', return_value=uploader),
+			mock.patch('bugowl_agent.utils.get_video_transcoder', return_value=None),
+			mock.patch('bugowl_agent.utils.settings', SimpleNamespace(ENV='PROD')),
+			mock.patch('bugowl_agent.utils.TestCaseRun') as test_case_run_model,
+		):
+			video_url, upload_results = asyncio.run(scenario())
+		saved_urls = [call.kwargs['video'] for call in test_case_run_model.objects.filter.return_value.update.call_args_list]
+		return video_url, upload_results, saved_urls, test_case_run
+
+	def test_video_url_is_saved_once_the_upload_succeeded(self):
+		video_url, upload_results, saved_urls, test_case_run = self.upload_test_case_video(FakeS3Client())
+
+		self.assertIsNone(video_url)
+		self.assertEqual(upload_results['succeeded'], 1)
+		self.assertEqual(len(saved_urls), 1)
+		self.assertTrue(saved_urls[0].endswith('.mp4'))
+		self.assertEqual(test_case_run.video, saved_urls[0])
+
+	def test_failed_video_upload_saves_no_url(self):
+		video_url, upload_results, saved_urls, test_case_run = self.upload_test_case_video(FakeS3Client(failures=1))
+
+		self.assertIsNone(video_url)
+		self.assertEqual(upload_results['failed'], 1)
+		self.assertEqual(saved_urls, [])
+		self.assertIsNone(test_case_run.video)
+
+	def test_submit_waits_for_a_free_slot(self):
+		s3_client = FakeS3Client()
+		uploader = ArtifactUploader(s3_client=s3_client, bucket='artifacts', workers=1, max_pending=1)
+		paths = [self.make_file(f'case-{index}.webm') for index in range(3)]
+
+		async def scenario():
+			artifact_uploads = ArtifactUploadGroup()
+			for index, path in enumerate(paths):
+				artifact_uploads.add(await uploader.submit(path, f'videos/case-{index}.webm'))
+			return await artifact_uploads.wait(timeout=5)
+
+		self.assertEqual(asyncio.run(scenario()), {'succeeded': 3, 'failed': 0, 'pending': 0})
+		self.assertEqual(len(s3_client.objects), 3)
+
+
+class FrameRingBufferTests(SimpleTestCase):
+	def make_frame(self, value, size=(64, 48)):
+		_, buffer = cv2.imencode('.jpg', np.full((size[1], size[0], 3), value, dtype=np.uint8))
+		return buffer.tobytes()
+
+	def test_keeps_only_the_last_seconds_at_the_buffer_fps(self):
+		frame_buffer = FrameRingBuffer(seconds=2, fps=2, max_bytes=10 * 1024 * 1024)
+		for tick in range(40):
+			frame_buffer.add(self.make_frame(tick), timestamp=tick * 0.25)
+
+		self.assertEqual(frame_buffer.frames_seen, 20)
+		self.assertEqual([timestamp for timestamp, _ in frame_buffer.frames], [7.5, 8.0, 8.5, 9.0, 9.5])
+		self.assertEqual(frame_buffer.recorded_seconds(), 9.5)
+
+	def test_memory_bound_evicts_oldest_frames(self):
+		frame = self.make_frame(0)
+		frame_buffer = FrameRingBuffer(seconds=60, fps=10, max_bytes=len(frame) * 3)
+		for tick in range(10):
+			frame_buffer.add(frame, timestamp=tick)
+
+		self.assertEqual(len(frame_buffer.frames), 3)
+		self.assertLessEqual(frame_buffer.size, len(frame) * 3)
+
+	def test_encode_writes_video_and_reports_stats(self):
+		frame_buffer = FrameRingBuffer(seconds=10, fps=4)
+		for tick in range(8):
+			frame_buffer.add(self.make_frame(tick * 20), timestamp=tick * 0.25)
+		with tempfile.TemporaryDirectory() as temp_dir:
+			video_bytes, cpu_seconds = frame_buffer.encode(os.path.join(temp_dir, 'case.mp4'))
+
+		self.assertGreater(video_bytes, 0)
+		self.assertGreaterEqual(cpu_seconds, 0)
+
+		video_stats = VideoCaptureStats()
+		video_stats.record_encoded(frame_buffer, video_bytes, cpu_seconds)
+		video_stats.record_skipped(frame_buffer)
+		summary = video_stats.summary()
+		self.assertEqual((summary['videos_encoded'], summary['videos_skipped']), (1, 1))
+		self.assertEqual(summary['encoded_bytes'], video_bytes)
+
+	def test_savings_are_estimated_without_failed_cases(self):
+		frame_buffer = FrameRingBuffer(seconds=10, fps=4)
+		frame_buffer.add(self.make_frame(0), timestamp=0)
+		frame_buffer.add(self.make_frame(1), timestamp=20)
+
+		video_stats = VideoCaptureStats(baseline_kbps=800, baseline_cpu_per_second=0.5)
+		video_stats.record_skipped(frame_buffer)
+		video_stats.record_skipped(frame_buffer)
+		summary = video_stats.summary()
+
+		self.assertEqual(summary['videos_encoded'], 0)
+		self.assertEqual(summary['skipped_seconds'], 40)
+		self.assertEqual(summary['estimated_bytes_saved'], 800 * 1000 // 8 * 40)
+		self.assertEqual(summary['estimated_cpu_seconds_saved'], 20)
+
+
+class VideoTranscoderTests(SimpleTestCase):
+	def write_video(self, path, frame_values, size=(320, 240), fps=20):
+		writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+		for value in frame_values:
+			writer.write(np.full((size[1], size[0], 3), value, dtype=np.uint8))
+		writer.release()
+
+	def count_frames(self, path):
+		capture = cv2.VideoCapture(path)
+		frames = 0
+		while capture.read()[0]:
+			frames += 1
+		capture.release()
+		return frames
+
+	@mock.patch('bugowl_agent.video_transcoder.shutil.which', return_value=None)
+	def test_opencv_fallback_drops_static_frames_and_caps_resolution(self, which):
+		with tempfile.TemporaryDirectory() as temp_dir:
+			input_path = os.path.join(temp_dir, 'case.raw.mp4')
+			output_path = os.path.join(temp_dir, 'case.mp4')
+			# Two second long static stretches with a change in between
+			self.write_video(input_path, [0] * 40 + [255] * 40)
+
+			result = transcode_video(input_path, output_path, fps=10, max_height=120, drop_static=True)
+
+			capture = cv2.VideoCapture(output_path)
+			height = capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+			capture.release()
+			self.assertEqual(result['encoder'], 'opencv')
+			self.assertEqual(height, 120)
+			self.assertLess(self.count_frames(output_path), 10)
+			self.assertGreater(result['compression_ratio'], 1)
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+class AdaptiveStreamControllerTests(SimpleTestCase):
+	def test_unchanged_frames_are_skipped_until_keepalive(self):
+		clock = FakeClock()
+		controller = AdaptiveStreamController(max_fps=8, keepalive_fps=0.5, idle_seconds=3, clock=clock)
+
+		self.assertTrue(controller.should_send(b'frame-a'))
+		controller.record_sent(7, 0.001)
+		clock.now += 0.125
+		self.assertFalse(controller.should_send(b'frame-a'))
+		self.assertTrue(controller.should_send(b'frame-b'))
+		controller.record_sent(7, 0.001)
+		clock.now += 2
+		self.assertTrue(controller.should_send(b'frame-b'))
+
+		self.assertEqual(controller.metrics()['dropped_duplicate'], 1)
+
+	def test_idle_page_drops_to_keepalive_rate(self):
+		clock = FakeClock()
+		controller = AdaptiveStreamController(max_fps=8, keepalive_fps=0.5, idle_seconds=3, clock=clock)
+		controller.should_send(b'frame-a')
+
+		self.assertEqual(controller.frame_interval(), 1 / 8)
+		clock.now += 3
+		self.assertEqual(controller.frame_interval(), 2)
+		controller.should_send(b'frame-b')
+		self.assertEqual(controller.frame_interval(), 1 / 8)
+
+	def test_congestion_lowers_fps_and_quality_then_recovers(self):
+		clock = FakeClock()
+		controller = AdaptiveStreamController(
+			max_fps=8, min_fps=1, max_quality=80, min_quality=30, recover_seconds=5, clock=clock
+		)
+
+		controller.record_congestion()
+		self.assertEqual((controller.fps, controller.quality), (4, 70))
+		# Lagging sends within the cooldown do not degrade again
+		controller.record_sent(1000, 1.0)
+		self.assertEqual((controller.fps, controller.quality), (4, 70))
+		clock.now += 1
+		controller.record_sent(1000, 1.0)
+		self.assertEqual((controller.fps, controller.quality), (2, 60))
+
+		clock.now += 5
+		controller.record_sent(1000, 0.001)
+		self.assertEqual((controller.fps, controller.quality), (3, 70))
+		metrics = controller.metrics()
+		self.assertEqual(metrics['dropped_congestion'], 1)
+		self.assertEqual(metrics['frames_sent'], 3)
+
+	def test_bytes_per_second_covers_the_metrics_window(self):
+		clock = FakeClock()
+		controller = AdaptiveStreamController(max_fps=8, clock=clock)
+		for _ in range(10):
+			controller.record_sent(5000, 0.001)
+			clock.now += 0.5
+
+		metrics = controller.metrics()
+
+		self.assertEqual(metrics['bytes_per_second'], 10000)
+		self.assertEqual(metrics['measured_fps'], 2)
+
+
+class ViewerTrackerTests(SimpleTestCase):
+	def test_viewer_events_update_count_without_recounting(self):
+		async def scenario():
+			redis_client = FakeRedis()
+			counts = []
+			recounts = []
+
+			async def count_viewers():
+				recounts.append(1)
+				return 1
+
+			async def on_change(viewer_count):
+				counts.append(viewer_count)
+
+			viewer_tracker = ViewerTracker('job-1', count_viewers, on_change=on_change, redis_client=redis_client)
+			await viewer_tracker.start()
+			channel_name = get_job_viewers_channel_name('job-1')
+			await redis_client.publish(channel_name, json.dumps({'job_uuid': 'job-1', 'delta': 1}))
+			await redis_client.publish(channel_name, json.dumps({'job_uuid': 'job-1', 'delta': -1}))
+			await redis_client.publish(channel_name, json.dumps({'job_uuid': 'job-1', 'delta': -1}))
+			await asyncio.sleep(0.05)
+			viewer_count = viewer_tracker.viewer_count
+			await viewer_tracker.stop()
+			return counts, recounts, viewer_count
+
+		counts, recounts, viewer_count = asyncio.run(scenario())
+
+		self.assertEqual(counts, [1, 2, 1, 0])
+		self.assertEqual(len(recounts), 1)
+		self.assertEqual(viewer_count, 0)
+
+	def test_wait_for_viewers_wakes_up_on_join(self):
+		async def scenario():
+			redis_client = FakeRedis()
+
+			async def count_viewers():
+				return 0
+
+			viewer_tracker = ViewerTracker('job-1', count_viewers, redis_client=redis_client)
+			await viewer_tracker.start()
+			started_at = time.monotonic()
+			waiter = asyncio.create_task(viewer_tracker.wait_for_viewers(timeout=5))
+			await asyncio.sleep(0.01)
+			await redis_client.publish(get_job_viewers_channel_name('job-1'), json.dumps({'delta': 1}))
+			await waiter
+			waited = time.monotonic() - started_at
+			await viewer_tracker.stop()
+			return waited
+
+		self.assertLess(asyncio.run(scenario()), 1)
+
+	@mock.patch('bugowl_agent.stream_controller.STREAM_VIEWER_RESUBSCRIBE_DELAY', 0)
+	def test_failed_subscription_is_made_again(self):
+		async def scenario():
+			redis_client = FakeRedis()
+			recounts = []
+
+			async def count_viewers():
+				recounts.append(1)
+				return 0
+
+			viewer_tracker = ViewerTracker('job-1', count_viewers, redis_client=redis_client)
+			await viewer_tracker.start()
+			viewer_tracker.pubsub.get_message = mock.AsyncMock(side_effect=redis.ConnectionError('Connection reset'))
+			await asyncio.sleep(0.05)
+			await redis_client.publish(get_job_viewers_channel_name('job-1'), json.dumps({'delta': 1}))
+			await asyncio.sleep(0.05)
+			viewer_count = viewer_tracker.viewer_count
+			await viewer_tracker.stop()
+			return viewer_count, recounts
+
+		viewer_count, recounts = asyncio.run(scenario())
+
+		self.assertEqual(viewer_count, 1)
+		self.assertEqual(len(recounts), 2)
+
+	@mock.patch.object(ViewerTracker, 'subscribe', side_effect=redis.ConnectionError('Connection refused'))
+	def test_stream_counts_as_watched_when_the_tracker_cannot_start(self, subscribe):
+		agent_manager = SimpleNamespace(
+			logger=logging.getLogger('AgentManager'),
+			browser_session=None,
+			job_instance=SimpleNamespace(job_uuid='job-1', business=1),
+			testtask_run=None,
+			test_case_run=None,
+		)
+		live_streaming = LiveStreaming(agent_manager, group_name='BrowserStreaming_1')
+
+		asyncio.run(live_streaming._start_viewer_tracker())
+
+		subscribe.assert_called_once()
+		self.assertIsNone(live_streaming.viewer_tracker)
+		self.assertTrue(live_streaming._is_watched())
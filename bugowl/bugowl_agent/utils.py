@@ -1,25 +1,20 @@
+import asyncio
 import base64
-import json
 import os
 import uuid
 from datetime import datetime
 
 import anyio
-import boto3
 import cv2
+from asgiref.sync import sync_to_async
 from channels.layers import get_channel_layer
 from django.conf import settings
+from testcase.models import TestCaseRun
 
 from browser_use.llm import ChatAnthropic, ChatGoogle, ChatGroq, ChatOpenAI
 
-# aws configs
-s3_bucket = os.getenv('AWS_STORAGE_BUCKET_NAME')
-aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
-aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-region_name = os.getenv('AWS_S3_REGION_NAME')
-s3_custom_domain = os.getenv('AWS_S3_CUSTOM_DOMAIN')
-obj_params = os.getenv('AWS_S3_OBJECT_PARAMETERS')
-s3_object_parameters = json.loads(obj_params) if obj_params else None
+from .artifact_uploader import get_artifact_uploader, get_s3_url
+from .video_transcoder import get_video_transcoder
 
 google_models = [
 	'gemini-2.0-flash',
@@ -163,10 +158,14 @@ def get_video_filename(job_uuid, testcase_uuid, ext='mp4'):
 	return filename
 
 
-async def upload_video_S3(job_instance, test_case_run, video_path, logger):
+async def upload_video_S3(job_instance, test_case_run, video_path, logger, artifact_uploads=None):
 	"""
 	Upload the Playwright video recording for the current test case to S3.
 	This should be called after the browser session is stopped.
+
+	If `artifact_uploads` (ArtifactUploadGroup) is given, the upload (and the transcoding, if enabled) runs in
+	the background and None is returned right away; the video URL is saved to the test case run once the upload
+	succeeded, and the job waits for the group before it is marked final.
 	"""
 	try:
 		if not video_path:
@@ -185,42 +184,40 @@ async def upload_video_S3(job_instance, test_case_run, video_path, logger):
 		logger.info(f'Renamed video from {video_path} to {new_video_path}')
 
 		# Upload to S3
-		if not s3_bucket or not aws_access_key_id or not aws_secret_access_key or not region_name:
+		uploader = get_artifact_uploader()
+		if not uploader.is_configured():
 			logger.error('S3 configuration is missing. Cannot upload video.')
 			return None
 
-		session = boto3.session.Session(  # type: ignore
-			aws_access_key_id=aws_access_key_id,
-			aws_secret_access_key=aws_secret_access_key,
-			region_name=region_name,
-		)
-		s3 = session.client('s3')
 		s3_key = f'videos/browser_recordings/{business_id}/{new_filename}'
-		extra_args = {}
-		if s3_object_parameters:
-			extra_args.update(s3_object_parameters)
-		try:
-			if 'LOCAL' != settings.ENV.upper():
-				s3.upload_file(new_video_path, s3_bucket, s3_key, ExtraArgs=extra_args)
-				logger.info(f'Upload to S3 successful: {s3_key}')
-			else:
-				logger.info(f'Skipping S3 upload in LOCAL environment: {s3_key}')
-		except Exception as e:
-			logger.error(f'Failed to upload video to S3: {e}')
-			return None
-		# Delete the local video file after successful upload
-		try:
-			if 'LOCAL' != settings.ENV.upper():
-				os.remove(new_video_path)
-				logger.info(f'Deleted local video file: {new_video_path}')
-			else:
-				logger.info(f'Skipping local file deletion in LOCAL environment: {new_video_path}')
-		except Exception as e:
-			logger.warning(f'Failed to delete local video file {new_video_path}: {e}')
-		if s3_custom_domain:
-			url = f'https://{s3_custom_domain}/{s3_key}'
+		if 'LOCAL' == settings.ENV.upper():
+			logger.info(f'Skipping S3 upload in LOCAL environment: {s3_key}')
 		else:
-			url = f'https://{s3_bucket}.s3.amazonaws.com/{s3_key}'
+			transcoder = get_video_transcoder()
+
+			async def transcode_and_upload():
+				if transcoder:
+					await transcode_before_upload(transcoder, new_video_path, logger)
+				return await asyncio.wrap_future(await uploader.submit(new_video_path, s3_key))
+
+			async def upload_and_save_video_url():
+				await transcode_and_upload()
+				# Written only after the upload succeeded, so a failed upload never leaves a dangling URL behind
+				url = get_s3_url(s3_key)
+				test_case_run.video = url
+				await sync_to_async(TestCaseRun.objects.filter(pk=test_case_run.pk).update)(video=url)
+				logger.info(f'S3 video URL saved: {url}')
+
+			if artifact_uploads is not None:
+				artifact_uploads.add(asyncio.ensure_future(upload_and_save_video_url()))
+				logger.info(f'Queued video upload to S3: {s3_key}')
+				return None
+			try:
+				await transcode_and_upload()
+			except Exception as e:
+				logger.error(f'Failed to upload video to S3: {e}')
+				return None
+		url = get_s3_url(s3_key)
 		logger.info(f'S3 video URL: {url}')
 
 		return url
@@ -230,6 +227,21 @@ async def upload_video_S3(job_instance, test_case_run, video_path, logger):
 		return None
 
 
+async def transcode_before_upload(transcoder, video_path, logger):
+	"""
+	Transcode a video in place. If transcoding fails, the original recording is kept and uploaded as is.
+	"""
+	base_path, ext = os.path.splitext(video_path)
+	raw_path = f'{base_path}.raw{ext}'
+	os.rename(video_path, raw_path)
+	try:
+		await transcoder.transcode(raw_path, video_path)
+		os.remove(raw_path)
+	except Exception as e:
+		logger.warning(f'Failed to transcode {video_path}, uploading the original recording: {e}')
+		os.replace(raw_path, video_path)
+
+
 async def save_failure_screenshot(browser_session, logger, job_uuid, task_id: str) -> str | None:
 	"""
 	Take a screenshot of the current browser state and save it to a file.
@@ -258,42 +270,23 @@ async def save_failure_screenshot(browser_session, logger, job_uuid, task_id: st
 		logger.info(f'Saved failure screenshot to {filename}')
 
 		# Upload to S3
-		if not s3_bucket or not aws_access_key_id or not aws_secret_access_key or not region_name:
+		uploader = get_artifact_uploader()
+		if not uploader.is_configured():
 			logger.error('S3 configuration is missing. Cannot upload screenshot.')
 			return None
 
-		session = boto3.session.Session(  # type: ignore
-			aws_access_key_id=aws_access_key_id,
-			aws_secret_access_key=aws_secret_access_key,
-			region_name=region_name,
-		)
-		s3 = session.client('s3')
 		s3_key = f'failure_screenshots/{job_uuid}/{task_id}.png'
-		extra_args = {}
-		if s3_object_parameters:
-			extra_args.update(s3_object_parameters)
-		try:
-			if 'LOCAL' != settings.ENV.upper():
-				s3.upload_file(filename, s3_bucket, s3_key, ExtraArgs=extra_args)
-				logger.info(f'Failure screenshot uploaded to S3: {s3_key}')
-			else:
-				logger.info(f'Skipping S3 upload in LOCAL environment: {s3_key}')
-		except Exception as e:
-			logger.error(f'Failed to upload failure screenshot to S3: {e}')
-			return None
-		# Delete the local screenshot file after successful upload
-		try:
-			if 'LOCAL' != settings.ENV.upper():
-				os.remove(filename)
-				logger.info(f'Deleted local screenshot file: {filename}')
-			else:
-				logger.info(f'Skipping local file deletion in LOCAL environment: {filename}')
-		except Exception as e:
-			logger.warning(f'Failed to delete local screenshot file {filename}: {e}')
-		if s3_custom_domain:
-			url = f'https://{s3_custom_domain}/{s3_key}'
+		if 'LOCAL' == settings.ENV.upper():
+			logger.info(f'Skipping S3 upload in LOCAL environment: {s3_key}')
 		else:
-			url = f'https://{s3_bucket}.s3.amazonaws.com/{s3_key}'
+			# Screenshots are small, wait for the upload so a failed one is never linked
+			try:
+				await asyncio.wrap_future(await uploader.submit(filename, s3_key))
+				logger.info(f'Failure screenshot uploaded to S3: {s3_key}')
+			except Exception as e:
+				logger.error(f'Failed to upload failure screenshot to S3: {e}')
+				return None
+		url = get_s3_url(s3_key)
 		logger.info(f'S3 failure screenshot URL: {url}')
 		return url
 	except Exception as e:
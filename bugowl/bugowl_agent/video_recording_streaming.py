@@ -1,27 +1,46 @@
 import asyncio
-import base64
+import json
 import os
+import time
 
 import redis.asyncio as redis
 from channels.exceptions import ChannelFull
 from channels.layers import get_channel_layer
 from dotenv import load_dotenv
 from playwright._impl._errors import TargetClosedError
+from websocket.frame_protocol import detect_codec, get_image_size
+from websocket.frame_relay import STREAM_RELAY_ENABLED, publish_frame
+from websocket.utils import get_job_stream_metrics_key
+
+from .stream_controller import AdaptiveStreamController, ViewerTracker
+from .video_ring_buffer import VIDEO_RING_JPEG_QUALITY
+
+# Seconds between two writes of the stream metrics of a job to Redis, and how long they are kept.
+STREAM_METRICS_INTERVAL = 2.0
+STREAM_METRICS_TTL = 60
 
 
 class LiveStreaming:
-	def __init__(self, agent_manager, group_name=None, channel_name=None, fps=8):
+	def __init__(self, agent_manager, group_name=None, channel_name=None, fps=8, frame_buffer=None):
 		# Load environment variables from .env
 		load_dotenv()
 
+		# FrameRingBuffer fed with the captured frames, also while nobody watches the stream
+		self.frame_buffer = frame_buffer
+
 		self.agent_manager = agent_manager
 		self.logger = agent_manager.logger
 		self.browser_session = agent_manager.browser_session
 		self.fps = fps
+		self.controller = AdaptiveStreamController(max_fps=fps)
+		self.viewer_tracker = None
+		self.metrics_published_at = 0.0
 		self.recording = False
 		self.paused = False
 		self.redis = None
+		self.job_uuid = None
 		if agent_manager.job_instance:
+			self.job_uuid = str(agent_manager.job_instance.job_uuid)
 			self.business_id = agent_manager.job_instance.business
 			self.job_instance = agent_manager.job_instance
 			self.testtask_run = agent_manager.testtask_run
@@ -39,16 +58,66 @@ class LiveStreaming:
 
 	async def _capture_frame(self):
 		"""
-		Capture a frame using the browser session's screenshot method.
+		Capture a frame using the browser session's screenshot method, as a JPEG of the current adaptive quality.
+		"""
+		screenshot, current_url = await self._capture_cached_screenshot(self.controller.quality)
+		if not screenshot:
+			return None, None
+		if self.frame_buffer:
+			self.frame_buffer.add(screenshot)
+		return screenshot, current_url
+
+	async def _buffer_frame(self):
+		"""
+		Capture a frame for the frame buffer only, as a JPEG which is much smaller to keep in memory.
 		"""
+		if self.frame_buffer.wants_frame():  # type: ignore
+			screenshot, _ = await self._capture_cached_screenshot(VIDEO_RING_JPEG_QUALITY)
+			self.frame_buffer.add(screenshot)  # type: ignore
+
+	async def _capture_cached_screenshot(self, quality):
+		"""
+		Take a JPEG viewport screenshot of the current page, or reuse the agent's latest screenshot if the page
+		has not changed since. The captured frames are shared with the agent's state capture the same way.
+
+		Returns:
+			tuple: (image bytes, current URL), or (None, None) if the screenshot failed.
+		"""
+		frame_cache = getattr(self.browser_session, 'frame_cache', None)
+		reuse_max_age = getattr(getattr(self.browser_session, 'browser_profile', None), 'screenshot_reuse_max_age', 0)
+		if frame_cache is None or not reuse_max_age:
+			return await self._capture_screenshot(type='jpeg', quality=quality)
 		try:
 			page = await self.browser_session.get_current_page()
+		except Exception as e:
+			if self.logger:
+				self.logger.error(f'Failed to get the current page: {e}')
+			return None, None
+		# Taken before the capture, so a change during the capture makes the frame look stale rather than fresh
+		signature = await frame_cache.get_page_signature(page)
+		cached_frame = frame_cache.lookup(page, signature, consumer='stream', max_age=reuse_max_age, sources=('agent',))
+		if cached_frame:
+			return cached_frame.data, page.url
+		# Hiding the caret injects a style into the page, a DOM mutation that would make the frame stale right away
+		screenshot, current_url = await self._capture_screenshot(page=page, type='jpeg', quality=quality, caret='initial')
+		if screenshot:
+			frame_cache.record(page, signature, consumer='stream', data=screenshot, image_format='jpeg', quality=quality)
+		return screenshot, current_url
+
+	async def _capture_screenshot(self, page=None, **screenshot_kwargs):
+		"""
+		Take a viewport screenshot of the current page.
+
+		Returns:
+			tuple: (image bytes, current URL), or (None, None) if the screenshot failed.
+		"""
+		try:
+			page = page or await self.browser_session.get_current_page()
 			# Taking a viewport screenshot is much faster than a full-page one.
-			screenshot = await page.screenshot()
-			frame_b64 = base64.b64encode(screenshot).decode('utf-8')
+			screenshot = await page.screenshot(**screenshot_kwargs)
 			current_url = page.url if page else None
 			# self.logger.info(f'Captured frame for URL: {current_url}')
-			return frame_b64, current_url
+			return screenshot, current_url
 		except TargetClosedError:
 			if self.logger:
 				self.logger.error('Browser closed while capturing frame. Skipping frame capture.')
@@ -58,6 +127,109 @@ class LiveStreaming:
 				self.logger.error(f'Failed to capture frame: {e}', exc_info=True)
 			return None, None
 
+	def _is_watched(self):
+		if not self.group_name or self.viewer_tracker is None:
+			return True
+		return self.viewer_tracker.viewer_count > 0
+
+	async def _count_viewers(self):
+		"""
+		Count the WebSocket connections in the streaming group. Only used by the ViewerTracker to resync.
+		"""
+		group_key = f'asgi:group:{self.group_name}'
+		# Check the key type to prevent WRONGTYPE errors
+		key_type = await self.redis.type(group_key)  # type:ignore
+		if key_type.decode('utf-8') not in ['set', 'zset', 'none']:
+			self.logger.warning(f"Deleting key '{group_key}' with wrong type '{key_type.decode('utf-8')}'.")
+			await self.redis.delete(group_key)  # type:ignore
+
+		# Use SCARD to efficiently check the number of active connections
+		return (
+			await self.redis.scard(group_key)  # type:ignore
+			if key_type.decode('utf-8') == 'set'
+			else await self.redis.zcard(group_key)  # type:ignore
+		)  # type:ignore
+
+	def _build_payload(self, frame_bytes, current_url):
+		"""
+		Build the channel layer message of a frame, with the job, task and test case it belongs to.
+
+		The image is sent as raw bytes, the consumers base64 encode it only for clients of the JSON frame format.
+		"""
+		codec = detect_codec(frame_bytes)
+		width, height = get_image_size(frame_bytes, codec)
+		payload = {
+			'type': 'send_frame',
+			'frame_bytes': frame_bytes,
+			'timestamp': time.time(),
+			'codec': codec,
+			'width': width,
+			'height': height,
+			'current_url': current_url,
+			'job_uuid': (str(self.job_instance.job_uuid) if hasattr(self, 'job_instance') and self.job_instance else None),
+			'job_status': (self.job_instance.status if hasattr(self, 'job_instance') and self.job_instance else None),
+			'task_uuid': (str(self.testtask_run.test_task_uuid) if hasattr(self, 'testtask_run') and self.testtask_run else None),
+			'task_status': (self.testtask_run.status if hasattr(self, 'testtask_run') and self.testtask_run else None),
+			'case_uuid': (
+				str(self.test_case_run.test_case_uuid) if hasattr(self, 'test_case_run') and self.test_case_run else None
+			),
+			'case_status': (self.test_case_run.status if hasattr(self, 'test_case_run') and self.test_case_run else None),
+		}
+		if hasattr(self.agent_manager, 'task') and self.agent_manager.task:  # type:ignore
+			payload['task_uuid'] = str(self.agent_manager.task.uuid)  # type:ignore
+			payload['task_title'] = self.agent_manager.task.title  # type:ignore
+			payload['task_status'] = self.agent_manager.task.status  # type:ignore
+		return payload
+
+	async def _send_frame(self, frame_bytes, current_url):
+		"""
+		Send a frame unless it is unchanged, and report the outcome to the adaptive controller.
+		"""
+		if not self.controller.should_send(frame_bytes):
+			return False
+		loop = asyncio.get_running_loop()
+		started_at = loop.time()
+		try:
+			await self._send_payload(self._build_payload(frame_bytes, current_url))
+		except ChannelFull:
+			self.controller.record_congestion()
+			if self.logger:
+				self.logger.warning(f'Channel {self.channel_name or self.group_name} is full, skipping frame.')
+			return False
+		self.controller.record_sent(len(frame_bytes), loop.time() - started_at)
+		return True
+
+	async def _publish_metrics(self, force=False):
+		"""
+		Write the stream metrics of the job to Redis, at most every STREAM_METRICS_INTERVAL seconds.
+		"""
+		now = time.monotonic()
+		if not self.redis or not self.job_uuid or (not force and now - self.metrics_published_at < STREAM_METRICS_INTERVAL):
+			return
+		self.metrics_published_at = now
+		metrics = self.controller.metrics()
+		metrics['viewers'] = self.viewer_tracker.viewer_count if self.viewer_tracker else None
+		try:
+			await self.redis.set(get_job_stream_metrics_key(self.job_uuid), json.dumps(metrics), ex=STREAM_METRICS_TTL)
+		except Exception as e:
+			if self.logger:
+				self.logger.warning(f'Failed to publish stream metrics: {e}')
+
+	async def _send_payload(self, payload):
+		if self.group_name and STREAM_RELAY_ENABLED and self.redis and self.job_uuid:
+			# One copy per frame in Redis, fanned out to the viewers by the FrameRelay of each ASGI process
+			await publish_frame(self.redis, self.job_uuid, payload)
+		elif self.group_name:
+			await self.channel_layer.group_send(
+				self.group_name,
+				payload,
+			)
+		elif self.channel_name:
+			await self.channel_layer.send(
+				self.channel_name,
+				payload,
+			)
+
 	async def _stream_frames(self):
 		"""
 		Stream frames to the WebSocket consumer's group by capturing them in a loop.
@@ -65,76 +237,30 @@ class LiveStreaming:
 		if self.logger:
 			self.logger.info('Started streaming frames by capturing in a loop.')
 
-		group_name = self.group_name
-		group_key = f'asgi:group:{group_name}'
 		try:
 			while self.recording:
-				if group_name:
-					# Check the key type to prevent WRONGTYPE errors
-					key_type = await self.redis.type(group_key)  # type:ignore
-					if key_type.decode('utf-8') not in ['set', 'zset', 'none']:
-						self.logger.warning(f"Deleting key '{group_key}' with wrong type '{key_type.decode('utf-8')}'.")
-						await self.redis.delete(group_key)  # type:ignore
-
-					# Use SCARD to efficiently check the number of active connections
-					active_connection_count = (
-						await self.redis.scard(group_key)  # type:ignore
-						if key_type.decode('utf-8') == 'set'
-						else await self.redis.zcard(group_key)  # type:ignore
-					)  # type:ignore
-					if active_connection_count == 0:
-						# self.logger.warning(f'No active connections in group {group_name}. Pausing frame capture.')
-						await asyncio.sleep(1)  # Sleep for a second if no one is watching
-						continue
-
 				if self.paused:
 					await asyncio.sleep(0.1)
 					continue
 
+				if not self._is_watched():
+					if self.frame_buffer:
+						# Nobody is watching, but the frame buffer still records the session
+						await self._buffer_frame()
+						await asyncio.sleep(1 / self.frame_buffer.fps)
+						continue
+					# Wakes up as soon as a viewer joins
+					await self.viewer_tracker.wait_for_viewers(timeout=1)  # type: ignore
+					continue
+
 				start_time = asyncio.get_event_loop().time()
-				frame_b64, current_url = await self._capture_frame()
-				if frame_b64 and self.channel_layer:
-					payload = {
-						'type': 'send_frame',
-						'frame': frame_b64,
-						'current_url': current_url,
-						'job_uuid': (
-							str(self.job_instance.job_uuid) if hasattr(self, 'job_instance') and self.job_instance else None
-						),
-						'job_status': (self.job_instance.status if hasattr(self, 'job_instance') and self.job_instance else None),
-						'task_uuid': (
-							str(self.testtask_run.test_task_uuid) if hasattr(self, 'testtask_run') and self.testtask_run else None
-						),
-						'task_status': (
-							self.testtask_run.status if hasattr(self, 'testtask_run') and self.testtask_run else None
-						),
-						'case_uuid': (
-							str(self.test_case_run.test_case_uuid)
-							if hasattr(self, 'test_case_run') and self.test_case_run
-							else None
-						),
-						'case_status': (
-							self.test_case_run.status if hasattr(self, 'test_case_run') and self.test_case_run else None
-						),
-					}
-					if hasattr(self.agent_manager, 'task') and self.agent_manager.task:  # type:ignore
-						payload['task_uuid'] = str(self.agent_manager.task.uuid)  # type:ignore
-						payload['task_title'] = self.agent_manager.task.title  # type:ignore
-						payload['task_status'] = self.agent_manager.task.status  # type:ignore
-
-					if group_name:
-						await self.channel_layer.group_send(
-							group_name,
-							payload,
-						)
-					elif self.channel_name:
-						await self.channel_layer.send(
-							self.channel_name,
-							payload,
-						)
-				# Adjust sleep time to maintain the target FPS
+				frame_bytes, current_url = await self._capture_frame()
+				if frame_bytes and self.channel_layer:
+					await self._send_frame(frame_bytes, current_url)
+				await self._publish_metrics()
+				# Adjust sleep time to maintain the target FPS, lowered while congested or idle
 				elapsed_time = asyncio.get_event_loop().time() - start_time
-				sleep_duration = (1 / self.fps) - elapsed_time
+				sleep_duration = self.controller.frame_interval() - elapsed_time
 				if sleep_duration > 0:
 					await asyncio.sleep(sleep_duration)
 		except redis.ConnectionError as e:
@@ -154,9 +280,6 @@ class LiveStreaming:
 
 			await asyncio.sleep(1)  # Wait before retrying
 			await self.start()
-		except ChannelFull:
-			if self.logger:
-				self.logger.warning(f'Channel {self.channel_name} is full, skipping frame.')
 		except Exception as e:
 			if self.logger:
 				self.logger.error(f'Error during frame streaming loop: {e}', exc_info=True)
@@ -164,14 +287,13 @@ class LiveStreaming:
 			if self.redis:
 				await self.redis.close()
 
-	async def start(self):
+	def _connect_redis(self):
 		"""
-		Start streaming frames.
+		Connect to Redis, used to count the viewers of the streaming group.
+
+		Returns:
+			bool: False if the connection failed.
 		"""
-		if self.recording:
-			if self.logger:
-				self.logger.warning('Streaming already in progress.')
-			return
 		try:
 			if (hasattr(self, 'redis') and self.redis is None) and (hasattr(self, 'group_name') and self.group_name):
 				# Initialize Redis connection if not already done
@@ -180,7 +302,46 @@ class LiveStreaming:
 		except Exception as e:
 			if self.logger:
 				self.logger.error(f'Failed to connect to Redis: {e}', exc_info=True)
+			return False
+		return True
+
+	async def _start_viewer_tracker(self, on_change=None):
+		"""
+		Start tracking the viewers of the streaming group. Without a job to track, the stream counts as watched.
+		"""
+		if not self.group_name or self.viewer_tracker:
+			return
+		if not self.job_uuid:
+			if self.logger:
+				self.logger.warning('No job to track the viewers of, streaming without checking for viewers.')
+			return
+		viewer_tracker = ViewerTracker(self.job_uuid, self._count_viewers, on_change=on_change)
+		try:
+			await viewer_tracker.start()
+		except Exception as e:
+			# Streaming must not fail the test case; without a tracker the stream counts as watched
+			if self.logger:
+				self.logger.warning(f'Failed to track the viewers of the stream, streaming without checking for viewers: {e}')
+			await viewer_tracker.stop()
+			return
+		self.viewer_tracker = viewer_tracker
+
+	async def _stop_viewer_tracker(self):
+		if self.viewer_tracker:
+			await self.viewer_tracker.stop()
+			self.viewer_tracker = None
+
+	async def start(self):
+		"""
+		Start streaming frames.
+		"""
+		if self.recording:
+			if self.logger:
+				self.logger.warning('Streaming already in progress.')
+			return
+		if not self._connect_redis():
 			return
+		await self._start_viewer_tracker()
 		self.recording = True
 		self.paused = False
 		if self.logger:
@@ -208,9 +369,11 @@ class LiveStreaming:
 		Stop streaming.
 		"""
 		self.recording = False
+		await self._stop_viewer_tracker()
 		if hasattr(self, 'redis') and self.redis:
+			await self._publish_metrics(force=True)
 			await self.redis.close()
 			self.redis = None
 			self.logger.info('Redis connection for streaming closed.')
 		if self.logger:
-			self.logger.info('Stopping frame streaming.')
+			self.logger.info(f'Stopping frame streaming. Stream metrics: {self.controller.metrics()}')
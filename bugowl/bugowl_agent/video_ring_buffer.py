@@ -0,0 +1,161 @@
+import collections
+import logging
+import os
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger('VideoRingBuffer')
+
+# 'full': Playwright records a video of every test case. 'failure': only the last AGENT_VIDEO_RING_SECONDS of
+# frames are kept in memory and encoded to a video when the test case fails (or the job asks for debug videos).
+VIDEO_RECORDING_MODE = os.getenv('AGENT_VIDEO_RECORDING_MODE', 'full')
+VIDEO_RING_SECONDS = float(os.getenv('AGENT_VIDEO_RING_SECONDS', '30'))
+VIDEO_RING_FPS = float(os.getenv('AGENT_VIDEO_RING_FPS', '4'))
+# Upper bound of the memory held by the buffered frames of one test case.
+VIDEO_RING_MAX_MB = float(os.getenv('AGENT_VIDEO_RING_MAX_MB', '64'))
+# JPEG quality of the frames captured only for the buffer, when nobody is watching the live stream.
+VIDEO_RING_JPEG_QUALITY = int(os.getenv('AGENT_VIDEO_RING_JPEG_QUALITY', '70'))
+# Cost of one second of the 'full' mode recording, the baseline of the savings reported for the failure-only mode:
+# Playwright encodes a VP8 WebM at 1 Mbit/s, at roughly this many CPU seconds per recorded second.
+VIDEO_BASELINE_KBPS = float(os.getenv('AGENT_VIDEO_BASELINE_KBPS', '1000'))
+VIDEO_BASELINE_CPU_PER_SECOND = float(os.getenv('AGENT_VIDEO_BASELINE_CPU_PER_SECOND', '0.3'))
+
+
+class FrameRingBuffer:
+	"""
+	Keeps the most recent frames of a browser session (encoded PNG/JPEG bytes), bounded by duration and memory.
+	"""
+
+	def __init__(self, seconds=VIDEO_RING_SECONDS, fps=VIDEO_RING_FPS, max_bytes=int(VIDEO_RING_MAX_MB * 1024 * 1024)):
+		"""
+		Args:
+			seconds (float): Duration of the frames kept.
+			fps (float): Maximum number of frames kept per second; frames arriving faster are dropped.
+			max_bytes (int): Maximum total size of the frames kept.
+		"""
+		self.seconds = seconds
+		self.fps = fps
+		self.max_bytes = max_bytes
+		self.frames = collections.deque()
+		self.size = 0
+		self.frames_seen = 0
+		self.started_at = None
+		self.last_added_at = None
+
+	def wants_frame(self, timestamp=None):
+		"""
+		Check if a frame taken now would be kept, to avoid capturing frames that would be dropped.
+		"""
+		timestamp = time.monotonic() if timestamp is None else timestamp
+		return self.last_added_at is None or timestamp - self.last_added_at >= 1 / self.fps
+
+	def add(self, image_bytes, timestamp=None):
+		"""
+		Add an encoded frame, evicting the oldest frames beyond the duration or memory bound.
+
+		Returns:
+			bool: False if the frame came too soon after the previous one and was dropped.
+		"""
+		timestamp = time.monotonic() if timestamp is None else timestamp
+		if not image_bytes or not self.wants_frame(timestamp):
+			return False
+		if self.started_at is None:
+			self.started_at = timestamp
+		self.frames.append((timestamp, image_bytes))
+		self.size += len(image_bytes)
+		self.frames_seen += 1
+		self.last_added_at = timestamp
+		while self.frames and (timestamp - self.frames[0][0] > self.seconds or self.size > self.max_bytes):
+			_, evicted = self.frames.popleft()
+			self.size -= len(evicted)
+		return True
+
+	def recorded_seconds(self):
+		"""
+		Get the duration of the whole session seen by the buffer, including evicted frames.
+		"""
+		if self.started_at is None:
+			return 0.0
+		return self.last_added_at - self.started_at  # type: ignore
+
+	def encode(self, path):
+		"""
+		Encode the buffered frames to an MP4 file. Blocking and CPU bound, run it in a thread.
+
+		Returns:
+			tuple: (size of the video in bytes, CPU seconds spent encoding). (0, cpu) if there was nothing to encode.
+		"""
+		cpu_started_at = time.thread_time()
+		frames = list(self.frames)
+		if not frames:
+			return 0, time.thread_time() - cpu_started_at
+		duration = frames[-1][0] - frames[0][0]
+		# Play back at the rate the frames were actually captured
+		fps = min(self.fps, max(1.0, (len(frames) - 1) / duration)) if duration > 0 else self.fps
+
+		os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+		writer = None
+		frame_size = None
+		try:
+			for _, image_bytes in frames:
+				frame = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+				if frame is None:
+					continue
+				if writer is None:
+					frame_size = (frame.shape[1], frame.shape[0])
+					writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)  # type: ignore
+				elif (frame.shape[1], frame.shape[0]) != frame_size:
+					frame = cv2.resize(frame, frame_size)  # type: ignore
+				writer.write(frame)
+		finally:
+			if writer is not None:
+				writer.release()
+		video_bytes = os.path.getsize(path) if writer is not None and os.path.exists(path) else 0
+		return video_bytes, time.thread_time() - cpu_started_at
+
+
+class VideoCaptureStats:
+	"""
+	Per-job counters of the failure-only recording mode.
+	"""
+
+	def __init__(self, baseline_kbps=VIDEO_BASELINE_KBPS, baseline_cpu_per_second=VIDEO_BASELINE_CPU_PER_SECOND):
+		"""
+		Args:
+			baseline_kbps (float): Bitrate of the video the 'full' mode would have recorded.
+			baseline_cpu_per_second (float): CPU seconds the 'full' mode spends encoding one recorded second.
+		"""
+		self.baseline_kbps = baseline_kbps
+		self.baseline_cpu_per_second = baseline_cpu_per_second
+		self.videos_encoded = 0
+		self.videos_skipped = 0
+		self.encoded_seconds = 0.0
+		self.skipped_seconds = 0.0
+		self.encoded_bytes = 0
+		self.encode_cpu_seconds = 0.0
+
+	def record_encoded(self, frame_buffer, video_bytes, cpu_seconds):
+		self.videos_encoded += 1
+		self.encoded_seconds += min(frame_buffer.recorded_seconds(), frame_buffer.seconds)
+		self.encoded_bytes += video_bytes
+		self.encode_cpu_seconds += cpu_seconds
+
+	def record_skipped(self, frame_buffer):
+		self.videos_skipped += 1
+		self.skipped_seconds += frame_buffer.recorded_seconds()
+
+	def summary(self):
+		"""
+		Summarize the job, estimating the bytes and CPU saved from the cost of recording the skipped seconds in 'full' mode.
+		"""
+		return {
+			'videos_encoded': self.videos_encoded,
+			'videos_skipped': self.videos_skipped,
+			'encode_cpu_seconds': round(self.encode_cpu_seconds, 3),
+			'encoded_bytes': self.encoded_bytes,
+			'skipped_seconds': round(self.skipped_seconds, 1),
+			'estimated_bytes_saved': int(self.baseline_kbps * 1000 / 8 * self.skipped_seconds),
+			'estimated_cpu_seconds_saved': round(self.baseline_cpu_per_second * self.skipped_seconds, 3),
+		}
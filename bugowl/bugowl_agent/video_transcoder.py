@@ -0,0 +1,209 @@
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger('VideoTranscoder')
+
+# Transcode test case videos to a compact, faststart MP4 before they are uploaded.
+VIDEO_TRANSCODE_ENABLED = os.getenv('AGENT_VIDEO_TRANSCODE', 'False') == 'True'
+# Number of videos transcoded at the same time, each in its own process.
+VIDEO_TRANSCODE_WORKERS = int(os.getenv('AGENT_VIDEO_TRANSCODE_WORKERS', '1'))
+VIDEO_TRANSCODE_BITRATE = os.getenv('AGENT_VIDEO_TRANSCODE_BITRATE', '800k')
+VIDEO_TRANSCODE_FPS = int(os.getenv('AGENT_VIDEO_TRANSCODE_FPS', '10'))
+VIDEO_TRANSCODE_MAX_HEIGHT = int(os.getenv('AGENT_VIDEO_TRANSCODE_MAX_HEIGHT', '720'))
+# Drop runs of identical frames, e.g. while the agent waits for the LLM.
+VIDEO_TRANSCODE_DROP_STATIC = os.getenv('AGENT_VIDEO_TRANSCODE_DROP_STATIC', 'True') == 'True'
+# Seconds after which an ffmpeg run is killed.
+VIDEO_TRANSCODE_TIMEOUT = float(os.getenv('AGENT_VIDEO_TRANSCODE_TIMEOUT', '600'))
+FFMPEG_BINARY = os.getenv('AGENT_FFMPEG_BINARY', 'ffmpeg')
+
+# Mean absolute pixel difference under which a frame counts as identical to the previous one (OpenCV fallback).
+STATIC_FRAME_THRESHOLD = 0.5
+
+
+def transcode_with_ffmpeg(input_path, output_path, bitrate, fps, max_height, drop_static):
+	filters = []
+	if drop_static:
+		# mpdecimate drops near-duplicate frames, setpts closes the gaps they leave
+		filters += ['mpdecimate', 'setpts=N/FRAME_RATE/TB']
+	filters += [f'fps={fps}', f"scale=-2:'min({max_height},ih)'"]
+	command = [
+		FFMPEG_BINARY,
+		'-y',
+		'-loglevel',
+		'error',
+		'-i',
+		input_path,
+		'-vf',
+		','.join(filters),
+		'-an',
+		'-c:v',
+		'libx264',
+		'-preset',
+		'veryfast',
+		'-pix_fmt',
+		'yuv420p',
+		'-b:v',
+		bitrate,
+		'-maxrate',
+		bitrate,
+		'-bufsize',
+		bitrate,
+		'-movflags',
+		'+faststart',
+		output_path,
+	]
+	subprocess.run(command, check=True, capture_output=True, timeout=VIDEO_TRANSCODE_TIMEOUT)
+
+
+def transcode_with_opencv(input_path, output_path, fps, max_height, drop_static):
+	"""
+	Fallback when ffmpeg is not installed: re-encodes with OpenCV's MPEG-4 encoder, which has no bitrate
+	control and writes the moov atom at the end of the file.
+	"""
+	capture = cv2.VideoCapture(input_path)
+	source_fps = capture.get(cv2.CAP_PROP_FPS) or fps
+	# Keep one source frame out of `step` to reach the target frame rate
+	step = max(1, round(source_fps / fps))
+	writer = None
+	previous = None
+	index = 0
+	try:
+		while True:
+			ok, frame = capture.read()
+			if not ok:
+				break
+			index += 1
+			if (index - 1) % step:
+				continue
+			if frame.shape[0] > max_height:
+				width = int(frame.shape[1] * max_height / frame.shape[0]) // 2 * 2
+				frame = cv2.resize(frame, (width, max_height), interpolation=cv2.INTER_AREA)
+			if drop_static and previous is not None and np.mean(cv2.absdiff(frame, previous)) < STATIC_FRAME_THRESHOLD:
+				continue
+			previous = frame
+			if writer is None:
+				writer = cv2.VideoWriter(
+					output_path,
+					cv2.VideoWriter_fourcc(*'mp4v'),  # type: ignore
+					source_fps / step,
+					(frame.shape[1], frame.shape[0]),
+				)
+			writer.write(frame)
+	finally:
+		capture.release()
+		if writer is not None:
+			writer.release()
+	if writer is None:
+		raise ValueError(f'No frames could be read from {input_path}')
+
+
+def transcode_video(
+	input_path,
+	output_path,
+	bitrate=VIDEO_TRANSCODE_BITRATE,
+	fps=VIDEO_TRANSCODE_FPS,
+	max_height=VIDEO_TRANSCODE_MAX_HEIGHT,
+	drop_static=VIDEO_TRANSCODE_DROP_STATIC,
+):
+	"""
+	Transcode a recording to a compact MP4. Runs in a worker process.
+
+	Returns:
+		dict: Input and output sizes, compression ratio, encode time and the encoder used.
+	"""
+	started_at = time.monotonic()
+	if shutil.which(FFMPEG_BINARY):
+		transcode_with_ffmpeg(input_path, output_path, bitrate, fps, max_height, drop_static)
+		encoder = 'ffmpeg'
+	else:
+		transcode_with_opencv(input_path, output_path, fps, max_height, drop_static)
+		encoder = 'opencv'
+	input_bytes = os.path.getsize(input_path)
+	output_bytes = os.path.getsize(output_path)
+	return {
+		'encoder': encoder,
+		'input_bytes': input_bytes,
+		'output_bytes': output_bytes,
+		'compression_ratio': round(input_bytes / output_bytes, 2) if output_bytes else None,
+		'encode_seconds': round(time.monotonic() - started_at, 2),
+	}
+
+
+class VideoTranscoder:
+	"""
+	Runs transcode_video in a bounded process pool, outside the event loop of the agent.
+	"""
+
+	def __init__(self, workers=VIDEO_TRANSCODE_WORKERS):
+		self.workers = max(1, workers)
+		self.executor = None
+		self.lock = threading.Lock()
+		self.transcoded = 0
+		self.input_bytes = 0
+		self.output_bytes = 0
+		self.encode_seconds = 0.0
+
+	def get_executor(self):
+		with self.lock:
+			if self.executor is None:
+				if multiprocessing.current_process().daemon:
+					# Daemonic processes (Celery prefork children) cannot start a process pool. ffmpeg runs in its
+					# own process anyway, so threads only lose the parallelism of the OpenCV fallback.
+					self.executor = concurrent.futures.ThreadPoolExecutor(
+						max_workers=self.workers, thread_name_prefix='video-transcode'
+					)
+				else:
+					self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+			return self.executor
+
+	async def transcode(self, input_path, output_path):
+		"""
+		Transcode a video without blocking the event loop.
+
+		Returns:
+			dict: The result of transcode_video.
+		"""
+		result = await asyncio.wrap_future(self.get_executor().submit(transcode_video, input_path, output_path))
+		self.transcoded += 1
+		self.input_bytes += result['input_bytes']
+		self.output_bytes += result['output_bytes']
+		self.encode_seconds += result['encode_seconds']
+		logger.info(
+			f'Transcoded {input_path} with {result["encoder"]}: {result["input_bytes"]} -> {result["output_bytes"]} bytes '
+			f'(x{result["compression_ratio"]}) in {result["encode_seconds"]}s'
+		)
+		return result
+
+	def stats(self):
+		return {
+			'transcoded': self.transcoded,
+			'compression_ratio': round(self.input_bytes / self.output_bytes, 2) if self.output_bytes else None,
+			'encode_seconds': round(self.encode_seconds, 2),
+		}
+
+
+_transcoder = None
+_transcoder_lock = threading.Lock()
+
+
+def get_video_transcoder():
+	"""
+	Get the video transcoder of this process, or None if transcoding is disabled.
+	"""
+	global _transcoder
+	if not VIDEO_TRANSCODE_ENABLED:
+		return None
+	with _transcoder_lock:
+		if _transcoder is None:
+			_transcoder = VideoTranscoder()
+		return _transcoder
@@ -1,18 +1,23 @@
+import json
 import logging
 import os
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 
 import jwt
 from api.utils import Browser
 from django.conf import settings
 from django.core.cache import cache
+from django_redis import get_redis_connection
 from rest_framework.exceptions import ValidationError
 from testask.serializers import TestTaskRunSerializer
 from testcase.models import TestCaseRun
 from testcase.serializers import TestCaseRunSerializer
+from websocket.utils import get_job_stream_metrics_key
 
 from .models import Job
-from .utils import JobTypeEnum, get_cancel_cache_key
+from .utils import JobTypeEnum, get_cancel_cache_key, get_cancel_channel_name
 
 logger = logging.getLogger(settings.ENV)
 
@@ -432,6 +437,31 @@ def generate_agent_JWT_token(source='agent'):
 	return token, payload
 
 
+_agent_JWT_tokens = {}
+_agent_JWT_tokens_lock = threading.Lock()
+# Refresh a cached token this long before it expires.
+AGENT_JWT_REFRESH_MARGIN = timedelta(minutes=10)
+
+
+def get_agent_JWT_token(source='agent', refresh=False):
+	"""
+	Get a cached JWT token for a source, generating a new one when it is about to expire.
+
+	Args:
+	    source : agent
+	    refresh (bool): Generate a new token even if the cached one is still valid, e.g. after a 401.
+
+	Returns:
+	    str: Signed JWT token.
+	"""
+	with _agent_JWT_tokens_lock:
+		cached = _agent_JWT_tokens.get(source)
+		if refresh or not cached or cached[1]['exp'] - AGENT_JWT_REFRESH_MARGIN <= datetime.now(timezone.utc):
+			cached = generate_agent_JWT_token(source)
+			_agent_JWT_tokens[source] = cached
+		return cached[0]
+
+
 def get_cancel_job_status_cache(job_uuid):
 	"""
 	Get the job status from cache.
@@ -449,3 +479,34 @@ def get_cancel_job_status_cache(job_uuid):
 	else:
 		logger.info('No cached job status found for %s', job_uuid)
 	return status
+
+
+def publish_job_cancel(job_uuid):
+	"""
+	Publish the cancellation of a job so the worker running it stops immediately.
+
+	Args:
+	    job_uuid (str): The UUID of the job.
+
+	Returns:
+	    int: The number of listeners that received the message.
+	"""
+	channel_name = get_cancel_channel_name(job_uuid)
+	message = json.dumps({'job_uuid': str(job_uuid), 'published_at': time.time()})
+	receivers = get_redis_connection('default').publish(channel_name, message)
+	logger.info('Published cancellation of job %s to %s listeners', job_uuid, receivers)
+	return receivers
+
+
+def get_job_stream_metrics(job_uuid):
+	"""
+	Get the live stream metrics the worker streaming a job last published.
+
+	Args:
+	    job_uuid (str): The UUID of the job.
+
+	Returns:
+	    dict | None: fps, quality, dropped frames and bytes/sec of the stream, or None if the job is not streaming.
+	"""
+	metrics = get_redis_connection('default').get(get_job_stream_metrics_key(job_uuid))
+	return json.loads(metrics) if metrics else None
@@ -1,17 +1,65 @@
 import logging
+import os
 
 from bugowl_agent.agent import AgentManager
 from bugowl_agent.exceptions import JobCancelledException
-from celery import shared_task
+from bugowl_agent.executor import PERSISTENT_EVENT_LOOP, get_job_executor
+from bugowl_agent.status_outbox import send_status_update
+from celery import chord, shared_task
 from django.conf import settings
+from django.core.cache import cache
 
 from bugowl.api.utils import JobStatusEnum
 from job.models import Job
 
 from .helpers import get_cancel_job_status_cache
+from .utils import JobTypeEnum, get_cancel_cache_key
 
 logger = logging.getLogger(settings.ENV)
 
+# Split TestSuite jobs into one Celery subtask per group of test cases so several workers share a suite.
+# A job can override it with payload['job']['sharded'].
+SHARD_SUITE_JOBS = os.getenv('AGENT_SHARD_SUITE_JOBS', 'False') == 'True'
+# Number of test cases run by each subtask of a sharded job.
+TEST_CASES_PER_SHARD = max(1, int(os.getenv('AGENT_TEST_CASES_PER_SHARD', '1')))
+
+
+def run_agent_coroutine(agent_manager, coro):
+	"""
+	Run an AgentManager coroutine on the worker's persistent event loop, or on a new loop.
+	"""
+	if PERSISTENT_EVENT_LOOP:
+		return get_job_executor().run(coro)
+	return agent_manager.run_on_own_loop(coro)
+
+
+def should_shard_job(job):
+	"""
+	Check whether a job should run as sharded per-test-case subtasks.
+	"""
+	test_cases = job.payload.get('test_case') or []
+	if len(test_cases) <= TEST_CASES_PER_SHARD:
+		return False
+	sharded = (job.payload.get('job') or {}).get('sharded')
+	if sharded is not None:
+		return bool(sharded)
+	return SHARD_SUITE_JOBS and job.job_type == JobTypeEnum.TEST_SUITE.value
+
+
+def dispatch_sharded_job(job):
+	"""
+	Dispatch one execute_test_cases subtask per shard of the job, with finalize_job as the chord callback.
+	"""
+	case_count = len(job.payload.get('test_case') or [])
+	shards = [
+		list(range(start, min(start + TEST_CASES_PER_SHARD, case_count))) for start in range(0, case_count, TEST_CASES_PER_SHARD)
+	]
+	logger.info(f'Sharding job {job.job_uuid} with {case_count} test cases into {len(shards)} subtasks')
+	job.status = JobStatusEnum.RUNNING.value
+	job.save(update_fields=['status', 'updated_at'])
+	send_status_update(str(job.job_uuid), job_status=job.status)
+	chord(execute_test_cases.s(job.id, case_indexes) for case_indexes in shards)(finalize_job.s(job.id))  # type: ignore
+
 
 @shared_task()
 def execute_job(job_id):
@@ -40,8 +88,12 @@ def execute_job(job_id):
 			logger.info('Job %s is already cancelled, skipping execution', job.job_uuid)
 			raise JobCancelledException('execute_job')
 
+		if should_shard_job(job):
+			dispatch_sharded_job(job)
+			return True, 'Job is sharded'
+
 		agent_manager = AgentManager(job)
-		run_results = agent_manager.run_job()
+		run_results = run_agent_coroutine(agent_manager, agent_manager.arun_job())
 
 		logger.info(f'Job executed successfully. Results: {run_results}')
 		return True, run_results
@@ -57,3 +109,72 @@ def execute_job(job_id):
 	except Exception as e:
 		logger.error(f'Error occurred while executing job: {e}', exc_info=True)
 		return False, None
+
+
+@shared_task()
+def execute_test_cases(job_id, case_indexes):
+	"""
+	Execute one shard of a sharded job
+
+	Args:
+		job_id (int): Job id
+		case_indexes (list[int]): Indexes of the test cases to run in payload['test_case']
+	Returns:
+		dict: Shard result for finalize_job. Never raises, so the chord callback always runs.
+	"""
+	shard_result = {'case_count': len(case_indexes), 'results': {}, 'cancelled': False}
+	try:
+		job = Job.objects.get(id=job_id)
+	except Exception as e:
+		logger.error(f'Error occurred while fetching Job {job_id} for shard {case_indexes}: {e}', exc_info=True)
+		return shard_result
+
+	try:
+		job_cache_status = get_cancel_job_status_cache(job.job_uuid)
+		if job_cache_status and job_cache_status == JobStatusEnum.CANCELED.value:
+			logger.info('Job %s is already cancelled, skipping shard %s', job.job_uuid, case_indexes)
+			raise JobCancelledException('execute_test_cases')
+
+		agent_manager = AgentManager(job, max_concurrent_test_cases=1)
+		shard_result['results'] = run_agent_coroutine(agent_manager, agent_manager.arun_job_shard(case_indexes)) or {}
+		logger.info(f'Job {job.job_uuid} shard {case_indexes} executed. Results: {shard_result["results"]}')
+	except JobCancelledException as e:
+		logger.info(f'Job {job.job_uuid} shard {case_indexes} cancelled: {e}')
+		shard_result['cancelled'] = True
+	except Exception as e:
+		logger.error(f'Error occurred while executing job {job.job_uuid} shard {case_indexes}: {e}', exc_info=True)
+	return shard_result
+
+
+@shared_task()
+def finalize_job(shard_results, job_id):
+	"""
+	Aggregate the shard results of a sharded job into its final status
+
+	Args:
+		shard_results (list[dict]): Results of the execute_test_cases subtasks
+		job_id (int): Job id
+	Returns:
+		str: The final job status
+	"""
+	job = Job.objects.get(id=job_id)
+	job_cache_status = get_cancel_job_status_cache(job.job_uuid)
+	if any(shard['cancelled'] for shard in shard_results) or job_cache_status == JobStatusEnum.CANCELED.value:
+		key = get_cancel_cache_key(job.job_uuid)
+		cache.delete(key)
+		logger.info(f'Cache key {key} deleted successfully.')
+		job.status = JobStatusEnum.CANCELED.value
+		job.save(update_fields=['status', 'updated_at'])
+		logger.info(f'Sharded job {job.job_uuid} cancelled, updating its status in the main server...')
+		send_status_update(str(job.job_uuid), job_status=job.status)
+		return job.status
+
+	# A shard with fewer results than test cases failed to save or run one of them
+	all_testcases_passed = all(
+		len(shard['results']) == shard['case_count'] and all(shard['results'].values()) for shard in shard_results
+	)
+	job.status = JobStatusEnum.PASS_.value if all_testcases_passed else JobStatusEnum.FAILED.value
+	job.save(update_fields=['status', 'updated_at'])
+	logger.info(f'Updating sharded job {job.job_uuid} status to {job.status} in the main server...')
+	send_status_update(str(job.job_uuid), job_status=job.status)
+	return job.status
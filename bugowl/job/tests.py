@@ -1 +1,254 @@
-# Create your tests here.
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from bugowl_agent.agent import AgentManager
+from bugowl_agent.cancel_listener import CancelListener
+from bugowl_agent.tests import FakeRedis
+from django.test import SimpleTestCase
+
+from . import tasks
+from .utils import JobTypeEnum, get_cancel_channel_name
+
+
+class StubAgentManager:
+	def __init__(self, job_uuid):
+		self.job_instance = SimpleNamespace(job_uuid=job_uuid)
+		self.in_flight_task = None
+		self.cancel_published_at = None
+		self.halted_at = None
+
+	def interrupt_for_cancel(self, published_at=None):
+		self.cancel_published_at = published_at
+		self.in_flight_task.cancel()
+
+	async def run_step(self):
+		try:
+			await asyncio.sleep(60)
+		except asyncio.CancelledError:
+			self.halted_at = time.time()
+			raise
+
+
+class CancelListenerTests(SimpleTestCase):
+	def test_published_cancel_interrupts_running_step(self):
+		async def scenario():
+			redis_client = FakeRedis()
+			agent_manager = StubAgentManager('job-1')
+			cancel_listener = CancelListener(agent_manager, redis_client=redis_client)
+			await cancel_listener.start()
+			agent_manager.in_flight_task = asyncio.ensure_future(agent_manager.run_step())
+			await asyncio.sleep(0)
+
+			published_at = time.time()
+			receivers = await redis_client.publish(
+				get_cancel_channel_name('job-1'), json.dumps({'job_uuid': 'job-1', 'published_at': published_at})
+			)
+			with self.assertRaises(asyncio.CancelledError):
+				await agent_manager.in_flight_task
+			await cancel_listener.stop()
+			return receivers, published_at, agent_manager, redis_client
+
+		receivers, published_at, agent_manager, redis_client = asyncio.run(scenario())
+
+		self.assertEqual(receivers, 1)
+		self.assertEqual(agent_manager.cancel_published_at, published_at)
+		self.assertLess(agent_manager.halted_at - published_at, 1.0)
+		self.assertEqual(redis_client.subscribers[get_cancel_channel_name('job-1')], [])
+
+	def test_other_job_cancel_is_ignored(self):
+		async def scenario():
+			redis_client = FakeRedis()
+			agent_manager = StubAgentManager('job-1')
+			cancel_listener = CancelListener(agent_manager, redis_client=redis_client)
+			await cancel_listener.start()
+			agent_manager.in_flight_task = asyncio.ensure_future(agent_manager.run_step())
+
+			receivers = await redis_client.publish(
+				get_cancel_channel_name('job-2'), json.dumps({'job_uuid': 'job-2', 'published_at': time.time()})
+			)
+			await asyncio.sleep(0.05)
+			still_running = not agent_manager.in_flight_task.done()
+			await cancel_listener.stop()
+			agent_manager.in_flight_task.cancel()
+			await asyncio.gather(agent_manager.in_flight_task, return_exceptions=True)
+			return receivers, still_running
+
+		receivers, still_running = asyncio.run(scenario())
+
+		self.assertEqual(receivers, 0)
+		self.assertTrue(still_running)
+
+
+@mock.patch('bugowl_agent.agent.get_cancel_job_status_cache', return_value=None)
+@mock.patch('bugowl_agent.agent.WORKER_MAX_CONCURRENT_TEST_CASES', 4)
+class ConcurrentTestCaseTests(SimpleTestCase):
+	def run_job(self, case_results, max_concurrent_test_cases, shard_case_indexes=None):
+		"""
+		Run a job whose test cases return `case_results` on AgentManager.arun_job, or one shard of it on
+		arun_job_shard, and return the job statuses written.
+		"""
+		running = []
+		max_running = []
+		logger_names = []
+		job_statuses = []
+
+		async def run_single_test_case(manager, test_case):
+			logger_names.append(manager.logger.name)
+			running.append(test_case)
+			max_running.append(len(running))
+			await asyncio.sleep(0.01)
+			running.remove(test_case)
+			case_result = case_results[test_case['index']]
+			if isinstance(case_result, Exception):
+				raise case_result
+			return case_result
+
+		async def update_job_instance(manager, status):
+			job_statuses.append(status)
+
+		self.job_statuses = job_statuses
+		job_instance = SimpleNamespace(job_uuid='job-1', payload={'job': {'llm_cache': False}})
+		agent_manager = AgentManager(job_instance, max_concurrent_test_cases=max_concurrent_test_cases)
+		agent_manager.test_case_list = [{'index': index} for index in range(len(case_results))]
+		run = agent_manager.arun_job() if shard_case_indexes is None else agent_manager.arun_job_shard(shard_case_indexes)
+		with (
+			mock.patch.object(AgentManager, 'process_job_payload'),
+			mock.patch.object(AgentManager, 'start_cancel_listener', mock.AsyncMock(return_value=None)),
+			mock.patch.object(AgentManager, 'run_single_test_case', run_single_test_case),
+			mock.patch.object(AgentManager, 'update_job_instance', update_job_instance),
+		):
+			asyncio.run(run)
+		return job_statuses, max(max_running), logger_names
+
+	def test_test_cases_run_up_to_the_concurrency_limit(self, get_cancel_status):
+		case_results = [{f'case-{index}': True} for index in range(6)]
+
+		job_statuses, max_running, logger_names = self.run_job(case_results, max_concurrent_test_cases=2)
+
+		self.assertEqual(max_running, 2)
+		self.assertEqual(job_statuses, ['Running', 'Pass'])
+		self.assertEqual(sorted(logger_names), [f'AgentManager.case-{index}' for index in range(1, 7)])
+
+	def test_unfinished_test_case_keeps_the_job_failed(self, get_cancel_status):
+		case_results = [{'case-0': True}, None, {'case-2': True}]
+
+		job_statuses, max_running, logger_names = self.run_job(case_results, max_concurrent_test_cases=3)
+
+		self.assertEqual(max_running, 3)
+		self.assertEqual(job_statuses, ['Running', 'Failed'])
+
+	def test_unfinished_test_case_fails_the_job_when_run_one_by_one(self, get_cancel_status):
+		case_results = [{'case-0': True}, None, {'case-2': True}]
+
+		job_statuses, max_running, logger_names = self.run_job(case_results, max_concurrent_test_cases=1)
+
+		self.assertEqual(max_running, 1)
+		self.assertEqual(job_statuses, ['Running', 'Failed'])
+		self.assertEqual(logger_names, ['AgentManager', 'AgentManager'])
+
+	def test_crashed_test_case_fails_the_job(self, get_cancel_status):
+		for max_concurrent_test_cases in (1, 3):
+			case_results = [{'case-0': True}, RuntimeError('Browser failed to launch'), {'case-2': True}]
+
+			with self.assertRaises(RuntimeError):
+				self.run_job(case_results, max_concurrent_test_cases=max_concurrent_test_cases)
+
+			self.assertEqual(self.job_statuses, ['Running', 'Failed'])
+
+	def test_job_shard_leaves_the_job_status_to_finalize_job(self, get_cancel_status):
+		case_results = [{'case-0': True}, None, {'case-2': False}]
+
+		job_statuses, max_running, logger_names = self.run_job(
+			case_results, max_concurrent_test_cases=1, shard_case_indexes=[0, 2]
+		)
+
+		self.assertEqual(job_statuses, [])
+		self.assertEqual(max_running, 1)
+
+
+class FakeJob(SimpleNamespace):
+	def save(self, update_fields=None):
+		self.saved_statuses = [*getattr(self, 'saved_statuses', []), self.status]
+
+
+@mock.patch('job.tasks.send_status_update')
+class ShardedJobTests(SimpleTestCase):
+	def make_job(self, case_count, job_type=JobTypeEnum.TEST_SUITE.value, **job_payload):
+		return FakeJob(
+			id=7,
+			job_uuid='job-1',
+			job_type=job_type,
+			status='Queued',
+			payload={'job': job_payload, 'test_case': [{'name': f'case-{index}'} for index in range(case_count)]},
+		)
+
+	@mock.patch('job.tasks.TEST_CASES_PER_SHARD', 2)
+	@mock.patch('job.tasks.SHARD_SUITE_JOBS', True)
+	def test_suite_jobs_are_sharded_unless_the_job_opts_out(self, send_status_update):
+		self.assertTrue(tasks.should_shard_job(self.make_job(5)))
+		self.assertFalse(tasks.should_shard_job(self.make_job(2)))
+		self.assertFalse(tasks.should_shard_job(self.make_job(5, job_type=JobTypeEnum.TEST_CASE.value)))
+		self.assertFalse(tasks.should_shard_job(self.make_job(5, sharded=False)))
+
+	@mock.patch('job.tasks.chord')
+	@mock.patch('job.tasks.TEST_CASES_PER_SHARD', 2)
+	def test_dispatch_runs_one_subtask_per_shard_with_finalize_job_as_callback(self, chord, send_status_update):
+		job = self.make_job(5)
+
+		tasks.dispatch_sharded_job(job)
+
+		subtasks = list(chord.call_args.args[0])
+		self.assertEqual([subtask.args for subtask in subtasks], [(7, [0, 1]), (7, [2, 3]), (7, [4])])
+		callback = chord.return_value.call_args.args[0]
+		self.assertEqual((callback.task, callback.args), (tasks.finalize_job.name, (7,)))
+		self.assertEqual(job.saved_statuses, ['Running'])
+		send_status_update.assert_called_once_with('job-1', job_status='Running')
+
+	def finalize(self, shard_results, cancel_status=None):
+		job = self.make_job(3)
+		with (
+			mock.patch('job.tasks.Job.objects.get', return_value=job),
+			mock.patch('job.tasks.get_cancel_job_status_cache', return_value=cancel_status),
+			mock.patch('job.tasks.cache') as cache,
+		):
+			status = tasks.finalize_job(shard_results, job.id)
+		return status, job, cache
+
+	def test_finalize_passes_the_job_when_every_test_case_passed(self, send_status_update):
+		shard_results = [
+			{'case_count': 2, 'results': {'run-0': True, 'run-1': True}, 'cancelled': False},
+			{'case_count': 1, 'results': {'run-2': True}, 'cancelled': False},
+		]
+
+		status, job, cache = self.finalize(shard_results)
+
+		self.assertEqual((status, job.saved_statuses), ('Pass', ['Pass']))
+		send_status_update.assert_called_once_with('job-1', job_status='Pass')
+
+	def test_finalize_fails_the_job_when_a_test_case_failed_or_did_not_finish(self, send_status_update):
+		unfinished = [
+			{'case_count': 2, 'results': {'run-0': True}, 'cancelled': False},
+			{'case_count': 1, 'results': {'run-2': True}, 'cancelled': False},
+		]
+		failed = [
+			{'case_count': 2, 'results': {'run-0': True, 'run-1': False}, 'cancelled': False},
+			{'case_count': 1, 'results': {'run-2': True}, 'cancelled': False},
+		]
+
+		self.assertEqual(self.finalize(unfinished)[0], 'Failed')
+		self.assertEqual(self.finalize(failed)[0], 'Failed')
+
+	def test_finalize_cancels_the_job_in_the_main_server(self, send_status_update):
+		shard_results = [
+			{'case_count': 2, 'results': {'run-0': True}, 'cancelled': True},
+			{'case_count': 1, 'results': {'run-2': True}, 'cancelled': False},
+		]
+
+		status, job, cache = self.finalize(shard_results)
+
+		self.assertEqual((status, job.saved_statuses), ('Canceled', ['Canceled']))
+		send_status_update.assert_called_once_with('job-1', job_status='Canceled')
+		cache.delete.assert_called_once()
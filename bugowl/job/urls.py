@@ -8,5 +8,6 @@ urlpatterns = [
 	path('test-case/detail/public/', views.JobTestCasePublicDetailView.as_view(), name='job_test_case_public_detail'),
 	path('<str:job_uuid>/detail/', views.JobDetailView.as_view(), name='job_detail'),
 	path('<str:job_uuid>/detail/public/', views.JobPublicDetailView.as_view(), name='job_detail_public'),
+	path('<str:job_uuid>/stream-metrics/', views.JobStreamMetricsView.as_view(), name='job_stream_metrics'),
 	path('cancel-job/', views.CancelJobAPIView.as_view(), name='cancel_job'),
 ]
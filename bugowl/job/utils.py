@@ -15,3 +15,10 @@ def get_cancel_cache_key(job_uuid):
 	Generate a cache key for job cancellation based on the job UUID.
 	"""
 	return f'cancel_job_{job_uuid}'
+
+
+def get_cancel_channel_name(job_uuid):
+	"""
+	Generate the Redis pub/sub channel name on which the cancellation of a job is published.
+	"""
+	return f'cancel_job_channel_{job_uuid}'
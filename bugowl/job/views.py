@@ -10,7 +10,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from testcase.models import TestCaseRun
 
-from .helpers import get_cancel_job_status_cache, get_job_details, get_test_case_details, validate_job_payload
+from .helpers import (
+	get_cancel_job_status_cache,
+	get_job_details,
+	get_job_stream_metrics,
+	get_test_case_details,
+	publish_job_cancel,
+	validate_job_payload,
+)
 from .models import Job
 from .serializer import JobSerializer
 from .tasks import execute_job
@@ -235,9 +242,31 @@ class CancelJobAPIView(APIView):
 		try:
 			cache_key = get_cancel_cache_key(job_uuid)
 			cache.set(cache_key, JobStatusEnum.CANCELED.value, timeout=2 * 24 * 60 * 60)
+			try:
+				publish_job_cancel(job_uuid)
+			except Exception as e:
+				# The worker still picks the cancellation up from the cache at its next check
+				logger.warning('Failed to publish cancellation of job %s: %s', job_uuid, str(e))
 
 			return Response({'message': 'Job cancelled successfully'}, status=status.HTTP_200_OK)
 
 		except Exception as e:
 			logger.error('Error cancelling job %s: %s', job_uuid, str(e), exc_info=True)
 			return Response({'error': 'Failed to cancel job', 'details': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class JobStreamMetricsView(APIView):
+	"""
+	API view to fetch the live stream metrics (fps, quality, dropped frames, bytes/sec) of a running job.
+	"""
+
+	def get(self, request, *args, **kwargs):
+		job_uuid = kwargs.get('job_uuid')
+		try:
+			metrics = get_job_stream_metrics(job_uuid)
+		except Exception as e:
+			logger.error('Error fetching stream metrics of job %s: %s', job_uuid, str(e), exc_info=True)
+			return Response({'error': 'Failed to fetch stream metrics'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+		if metrics is None:
+			return Response({'error': 'Job is not streaming'}, status=status.HTTP_404_NOT_FOUND)
+		return Response(metrics, status=status.HTTP_200_OK)
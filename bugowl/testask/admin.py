@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import TestTaskRun
+from .models import TestTaskHistory, TestTaskRun
 
 
 @admin.register(TestTaskRun)
@@ -13,6 +13,8 @@ class TestTaskRunAdmin(admin.ModelAdmin):
 		'title',
 		'status',
 		'test_data',
+		'replayed_steps',
+		'replanned_steps',
 		'created_at',
 		'updated_at',
 	)
@@ -23,3 +25,11 @@ class TestTaskRunAdmin(admin.ModelAdmin):
 		'created_at',
 		'updated_at',
 	)
+
+
+@admin.register(TestTaskHistory)
+class TestTaskHistoryAdmin(admin.ModelAdmin):
+	list_display = ('test_task_uuid', 'test_task_run', 'created_at', 'updated_at')
+	search_fields = ('test_task_uuid',)
+	list_filter = ('created_at', 'updated_at')
+	readonly_fields = ('created_at', 'updated_at')
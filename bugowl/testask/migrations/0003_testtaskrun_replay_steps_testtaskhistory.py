@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+	dependencies = [
+		('testask', '0002_testtaskrun_test_task_uuid_and_more'),
+	]
+
+	operations = [
+		migrations.AddField(
+			model_name='testtaskrun',
+			name='replanned_steps',
+			field=models.IntegerField(default=0),
+		),
+		migrations.AddField(
+			model_name='testtaskrun',
+			name='replayed_steps',
+			field=models.IntegerField(default=0),
+		),
+		migrations.CreateModel(
+			name='TestTaskHistory',
+			fields=[
+				('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+				('test_task_uuid', models.UUIDField(unique=True)),
+				('history', models.JSONField()),
+				('created_at', models.DateTimeField(auto_now_add=True)),
+				('updated_at', models.DateTimeField(auto_now=True)),
+				(
+					'test_task_run',
+					models.ForeignKey(
+						blank=True,
+						null=True,
+						on_delete=django.db.models.deletion.SET_NULL,
+						to='testask.testtaskrun',
+					),
+				),
+			],
+		),
+	]
@@ -14,5 +14,17 @@ class TestTaskRun(models.Model):
 	title = models.TextField()
 	status = models.CharField(max_length=20, choices=JobStatusEnum.choices())  # Will be updated by background worker/user
 	test_data = models.JSONField(null=True, blank=True)  # Specific to the environment of the test case., Comes from main service
+	replayed_steps = models.IntegerField(default=0)  # Steps replayed from the last passing run without the LLM
+	replanned_steps = models.IntegerField(default=0)  # Steps planned by the LLM
+	created_at = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
+
+
+class TestTaskHistory(models.Model):
+	test_task_uuid = models.UUIDField(unique=True)  # Comes from main API, UUID of the test task
+	test_task_run = models.ForeignKey(
+		TestTaskRun, on_delete=models.SET_NULL, null=True, blank=True
+	)  # The passing run the history was recorded from
+	history = models.JSONField()  # AgentHistoryList.model_dump() of the last passing run, without screenshots
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
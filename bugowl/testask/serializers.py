@@ -13,7 +13,9 @@ class TestTaskRunSerializer(serializers.ModelSerializer):
 			'title',
 			'status',
 			'test_data',
+			'replayed_steps',
+			'replanned_steps',
 			'created_at',
 			'updated_at',
 		]
-		read_only_fields = ['uuid', 'created_at', 'updated_at']
+		read_only_fields = ['uuid', 'replayed_steps', 'replanned_steps', 'created_at', 'updated_at']
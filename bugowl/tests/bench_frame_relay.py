@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Load test of the live stream FrameRelay with simulated viewers against an in-process Redis stand-in.
+
+A publisher sends frames of one job at a fixed rate while fast and slow viewers watch it, and late viewers
+join mid-run. Reports frames delivered per viewer, frames dropped for slow viewers, the time a late joiner
+waits for its first frame, and the bytes written to Redis compared with one channel layer message per viewer.
+
+Run from the bugowl directory:
+	python tests/bench_frame_relay.py --viewers 50 --slow-viewers 5 --seconds 10 --fps 8
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from websocket.frame_relay import FrameRelay, pack_frame_event, publish_frame  # noqa: E402
+
+
+class LocalPubSub:
+	def __init__(self, redis_client):
+		self.redis = redis_client
+		self.messages = asyncio.Queue()
+
+	async def subscribe(self, channel_name):
+		self.redis.subscribers.setdefault(channel_name, []).append(self)
+
+	async def unsubscribe(self, channel_name):
+		self.redis.subscribers.get(channel_name, []).remove(self)
+
+	async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+		try:
+			return await asyncio.wait_for(self.messages.get(), timeout)
+		except asyncio.TimeoutError:
+			return None
+
+	async def aclose(self):
+		pass
+
+
+class LocalPipeline:
+	def __init__(self, redis_client):
+		self.redis = redis_client
+		self.commands = []
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *exc_info):
+		return False
+
+	def set(self, *args, **kwargs):
+		self.commands.append(self.redis.set(*args, **kwargs))
+
+	def publish(self, *args):
+		self.commands.append(self.redis.publish(*args))
+
+	async def execute(self):
+		self.redis.round_trips += 1
+		return [await command for command in self.commands]
+
+
+class LocalRedis:
+	"""
+	Redis stand-in with get/set, pipelines and pub/sub, counting the bytes written to it.
+	"""
+
+	def __init__(self):
+		self.store = {}
+		self.subscribers = {}
+		self.bytes_written = 0
+		self.round_trips = 0
+
+	def pubsub(self):
+		return LocalPubSub(self)
+
+	def pipeline(self, transaction=True):
+		return LocalPipeline(self)
+
+	async def get(self, key):
+		self.round_trips += 1
+		return self.store.get(key)
+
+	async def set(self, key, value, ex=None):
+		self.bytes_written += len(value)
+		self.store[key] = value
+		return True
+
+	async def publish(self, channel_name, data):
+		self.bytes_written += len(data)
+		subscribers = self.subscribers.get(channel_name, [])
+		for pubsub in subscribers:
+			pubsub.messages.put_nowait({'type': 'message', 'channel': channel_name, 'data': data})
+		return len(subscribers)
+
+
+class SimulatedViewer:
+	def __init__(self, send_delay, joined_at):
+		self.send_delay = send_delay
+		self.joined_at = joined_at
+		self.first_frame_after = None
+		self.frames = 0
+
+	async def send_frame(self, event):
+		if self.first_frame_after is None:
+			self.first_frame_after = time.monotonic() - self.joined_at
+		self.frames += 1
+		await asyncio.sleep(self.send_delay)
+
+
+async def run(viewer_count, slow_viewer_count, late_viewer_count, seconds, fps, frame_kb):
+	redis_client = LocalRedis()
+	relay = FrameRelay(redis_client=redis_client)
+	frame_bytes = os.urandom(frame_kb * 1024)
+	viewers = []
+
+	async def join(send_delay):
+		viewer = SimulatedViewer(send_delay, time.monotonic())
+		viewers.append((viewer, await relay.join('job-1', viewer)))
+		return viewer
+
+	fast = [await join(0.001) for _ in range(viewer_count - slow_viewer_count)]
+	# Slow viewers take two frame intervals to send each frame
+	slow = [await join(2 / fps) for _ in range(slow_viewer_count)]
+	late = []
+
+	frames_published = 0
+	event_size = 0
+	started_at = time.monotonic()
+	while time.monotonic() - started_at < seconds:
+		event = {'type': 'send_frame', 'frame_bytes': frame_bytes, 'timestamp': time.time(), 'job_uuid': 'job-1'}
+		event_size = len(pack_frame_event(event))
+		await publish_frame(redis_client, 'job-1', event)
+		frames_published += 1
+		if len(late) < late_viewer_count and time.monotonic() - started_at > seconds / 2:
+			late.append(await join(0.001))
+		await asyncio.sleep(1 / fps)
+	await asyncio.sleep(0.5)
+	stats = relay.stats()
+	for viewer, relay_viewer in viewers:
+		await relay.leave('job-1', relay_viewer)
+
+	group_send_bytes = frames_published * event_size * (viewer_count + late_viewer_count)
+	print(f'{frames_published} frames published to {viewer_count + late_viewer_count} viewers in {seconds}s')
+	print(f'fast viewers: {statistics.mean(viewer.frames for viewer in fast):.1f} frames each')
+	if slow:
+		print(f'slow viewers: {statistics.mean(viewer.frames for viewer in slow):.1f} frames each')
+	if late:
+		first_frame_ms = statistics.mean(viewer.first_frame_after for viewer in late) * 1000
+		print(f'late joiners: first frame after {first_frame_ms:.1f}ms')
+	print(f'frames dropped for slow viewers: {stats["frames_dropped"]}')
+	print(
+		f'redis bytes written: {redis_client.bytes_written / 1024 / 1024:.1f} MiB with the relay vs '
+		f'{group_send_bytes / 1024 / 1024:.1f} MiB with one channel layer message per viewer'
+	)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--viewers', type=int, default=50)
+	parser.add_argument('--slow-viewers', type=int, default=5)
+	parser.add_argument('--late-viewers', type=int, default=5)
+	parser.add_argument('--seconds', type=float, default=10)
+	parser.add_argument('--fps', type=int, default=8)
+	parser.add_argument('--frame-kb', type=int, default=60)
+	args = parser.parse_args()
+	asyncio.run(run(args.viewers, args.slow_viewers, args.late_viewers, args.seconds, args.fps, args.frame_kb))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of HttpUtils against a local HTTP stub: requests/sec with a new connection per request
+(module-level requests.post, as HttpUtils used to do) vs the pooled session.
+
+Run from the bugowl directory:
+	python tests/bench_http_client.py --requests 500 --concurrency 10
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import requests  # noqa: E402
+from api.utils import get_http_session, get_timeout  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def do_POST(self):
+		self.rfile.read(int(self.headers.get('Content-Length', 0)))
+		body = b'{"ok": true}'
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+def start_stub_server():
+	server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server, f'http://127.0.0.1:{server.server_address[1]}/api/job/status-update/'
+
+
+def measure(name, total, run):
+	started_at = time.perf_counter()
+	run()
+	elapsed = time.perf_counter() - started_at
+	print(f'{name:<28} {total / elapsed:>10.1f} req/s  ({elapsed:.2f}s for {total} requests)')
+
+
+def run_threads(total, concurrency, call):
+	with ThreadPoolExecutor(max_workers=concurrency) as executor:
+		list(executor.map(lambda _: call(), range(total)))
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--requests', type=int, default=500)
+	parser.add_argument('--concurrency', type=int, default=10)
+	args = parser.parse_args()
+
+	server, url = start_stub_server()
+	body = {'job_uuid': 'bench', 'job_status': 'Running'}
+
+	def unpooled_call():
+		# What invoke_http_request_inner did before: a new connection (and TLS handshake, over https) per request
+		requests.post(url, json=body, timeout=get_timeout(url))
+
+	def pooled_call():
+		get_http_session().post(url, json=body, timeout=get_timeout(url))
+
+	measure('unpooled requests.post', args.requests, lambda: run_threads(args.requests, args.concurrency, unpooled_call))
+	measure('pooled session', args.requests, lambda: run_threads(args.requests, args.concurrency, pooled_call))
+	server.shutdown()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the live streaming engines on a local animated test page: achieved fps and CPU time of this
+process plus the browser, for screenshot polling (LiveStreaming) vs CDP screencast (ScreencastStreaming).
+
+Run from the bugowl directory:
+	python tests/bench_streaming_engines.py --seconds 10 --fps 12
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import psutil  # noqa: E402
+from bugowl_agent.screencast_streaming import create_live_streaming  # noqa: E402
+from playwright.async_api import async_playwright  # noqa: E402
+
+TEST_PAGE = """
+<html><body style="margin:0">
+<canvas id="c" width="1280" height="720"></canvas>
+<script>
+const ctx = document.getElementById('c').getContext('2d');
+let x = 0;
+function draw() {
+	ctx.fillStyle = '#fff'; ctx.fillRect(0, 0, 1280, 720);
+	ctx.fillStyle = '#36c'; ctx.fillRect(x, 300, 120, 120);
+	ctx.fillStyle = '#000'; ctx.font = '32px sans-serif'; ctx.fillText(new Date().toISOString(), 40, 60);
+	x = (x + 4) % 1160;
+	requestAnimationFrame(draw);
+}
+draw();
+</script>
+</body></html>
+"""
+
+
+class CountingChannelLayer:
+	def __init__(self):
+		self.frames = 0
+		self.bytes = 0
+
+	async def send(self, channel_name, payload):
+		self.frames += 1
+		self.bytes += len(payload['frame_bytes'])
+
+	async def group_send(self, group_name, payload):
+		await self.send(group_name, payload)
+
+
+def cpu_seconds(process):
+	"""
+	CPU time of a process and all its descendants (the Playwright driver and the browser).
+	"""
+	total = 0.0
+	for proc in [process, *process.children(recursive=True)]:
+		try:
+			times = proc.cpu_times()
+			total += times.user + times.system
+		except psutil.NoSuchProcess:
+			pass
+	return total
+
+
+async def run_engine(engine, page, seconds, fps):
+	browser_session = SimpleNamespace(get_current_page=lambda: asyncio.sleep(0, result=page))
+	agent_manager = SimpleNamespace(logger=None, browser_session=browser_session, job_instance=None)
+	streaming = create_live_streaming(agent_manager, engine=engine, channel_name='bench', fps=fps)
+	channel_layer = CountingChannelLayer()
+	streaming.channel_layer = channel_layer
+
+	process = psutil.Process()
+	cpu_before = cpu_seconds(process)
+	await streaming.start()
+	await asyncio.sleep(seconds)
+	await streaming.stop()
+	cpu_used = cpu_seconds(process) - cpu_before
+	print(
+		f'{engine:<12} {channel_layer.frames / seconds:>6.1f} fps  {cpu_used / seconds * 100:>6.1f}% CPU  '
+		f'{channel_layer.bytes / max(1, channel_layer.frames) / 1024:>7.1f} KiB/frame'
+	)
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--seconds', type=float, default=10)
+	parser.add_argument('--fps', type=int, default=12)
+	args = parser.parse_args()
+
+	async with async_playwright() as playwright:
+		browser = await playwright.chromium.launch(headless=True)
+		page = await browser.new_page(viewport={'width': 1280, 'height': 720})
+		await page.set_content(TEST_PAGE)
+		for engine in ('screenshot', 'screencast'):
+			await run_engine(engine, page, args.seconds, args.fps)
+			await asyncio.sleep(1)
+		await browser.close()
+
+
+if __name__ == '__main__':
+	asyncio.run(main())
@@ -1,19 +1,94 @@
 import asyncio
+import base64
 import json
 import logging
+import time
 import uuid
+from urllib.parse import parse_qs
 
+from asgiref.sync import sync_to_async
 from bugowl_agent.agent import PlayGroundAgentManager
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
-
-from .helpers import COMMAND_HANDLER
-from .utils import PLAYCOMMANDS, get_job_streaming_group_name
+from django.core.cache import cache
+
+from .frame_protocol import FRAME_PROTOCOL_BINARY, FRAME_PROTOCOL_JSON, FrameMetadataTracker, encode_frame
+from .frame_relay import STREAM_RELAY_ENABLED, get_frame_relay
+from .helpers import COMMAND_HANDLER, publish_viewer_event
+from .playground_worker import (
+	PLAYGROUND_SESSION_CLOSED_TTL,
+	PLAYGROUND_START_TIMEOUT,
+	PLAYGROUND_WORKER_CHANNEL,
+	PLAYGROUND_WORKER_ENABLED,
+)
+from .utils import (
+	PLAYCOMMANDS,
+	get_job_streaming_group_name,
+	get_playground_session_closed_key,
+	get_playground_session_group_name,
+)
 
 logger = logging.getLogger(settings.ENV)
 
 
-class AgentLiveStreamingSocketConsumer(AsyncWebsocketConsumer):
+class FrameStreamingMixin:
+	"""
+	Sends browser frames as binary messages (see frame_protocol) to clients that asked for it, and as JSON
+	'browser_frame' messages with a base64 frame to everyone else.
+	"""
+
+	frame_protocol = FRAME_PROTOCOL_JSON
+
+	def negotiate_frame_protocol(self, requested=None):
+		"""
+		Pick the frame protocol of the connection from the requested one, or from the frame_protocol query string parameter.
+		"""
+		if requested is None:
+			query = parse_qs(self.scope.get('query_string', b'').decode('utf-8'))  # type: ignore
+			requested = (query.get('frame_protocol') or [None])[0]
+		self.frame_protocol = FRAME_PROTOCOL_BINARY if requested == FRAME_PROTOCOL_BINARY else FRAME_PROTOCOL_JSON
+		self.frame_sequence = 0
+		self.frame_metadata = FrameMetadataTracker()
+		return self.frame_protocol
+
+	async def send_browser_frame(self, event, json_fields):
+		"""
+		Send a frame event from the channel layer to the client.
+
+		Args:
+			event (dict): The channel layer message, with the raw image in 'frame_bytes' (or base64 in 'frame').
+			json_fields (tuple): Event fields sent with every frame in the JSON format.
+		"""
+		frame_bytes = event.get('frame_bytes')
+		if self.frame_protocol == FRAME_PROTOCOL_BINARY:
+			if frame_bytes is None:
+				frame_bytes = base64.b64decode(event['frame'])
+			metadata_changes = self.frame_metadata.changes(event)
+			if metadata_changes:
+				await self.send(text_data=json.dumps({'type': 'frame_metadata', **metadata_changes}))  # type: ignore
+			self.frame_sequence += 1
+			await self.send(  # type: ignore
+				bytes_data=encode_frame(
+					frame_bytes,
+					self.frame_sequence,
+					event.get('timestamp') or time.time(),
+					codec=event.get('codec'),
+					width=event.get('width'),
+					height=event.get('height'),
+				)
+			)
+		else:
+			frame_b64 = event.get('frame') or base64.b64encode(frame_bytes).decode('utf-8')  # type: ignore
+			await self.send(  # type: ignore
+				text_data=json.dumps(
+					{'type': 'browser_frame', 'frame': frame_b64, **{field: event.get(field) for field in json_fields}}
+				)
+			)
+
+
+class AgentLiveStreamingSocketConsumer(FrameStreamingMixin, AsyncWebsocketConsumer):
+	frame_json_fields = ('job_uuid', 'job_status', 'current_url', 'case_uuid', 'case_status', 'task_uuid', 'task_status')
+
 	async def connect(self):
 		logger.info('WebSocket connection attempt received')
 		logger.info('WebSocket scope path: %s', self.scope.get('path', 'unknown'))
@@ -35,6 +110,8 @@ class AgentLiveStreamingSocketConsumer(AsyncWebsocketConsumer):
 			self.scope['user_business'] = user.get('business')
 
 			self.group_name = None
+			self.relay_viewer = None
+			self.negotiate_frame_protocol()
 			await self.accept()
 			logger.info('WebSocket connection established for user: %s', self.scope['user_email'])
 
@@ -42,11 +119,23 @@ class AgentLiveStreamingSocketConsumer(AsyncWebsocketConsumer):
 			logger.error('WebSocket connection failed: Authorization header missing')
 			await self.close(code=401, reason='Authorization header missing')
 
+	async def join_frame_relay(self):
+		if STREAM_RELAY_ENABLED:
+			self.relay_viewer = await get_frame_relay().join(self.job_uuid, self)
+
+	async def leave_frame_relay(self, job_uuid):
+		if getattr(self, 'relay_viewer', None):
+			relay_viewer, self.relay_viewer = self.relay_viewer, None
+			await get_frame_relay().leave(job_uuid, relay_viewer)
+
 	async def disconnect(self, close_code):
 		if hasattr(self, 'group_name'):
 			await self.channel_layer.group_discard(  # type: ignore
 				self.group_name, self.channel_name
 			)
+			if self.group_name:
+				await self.leave_frame_relay(self.job_uuid)
+				await publish_viewer_event(self.job_uuid, -1)
 		else:
 			logger.warning('WebSocket disconnect called without group_name set')
 		reason = self.scope.get('auth_error', 'Connection closed')
@@ -66,57 +155,61 @@ class AgentLiveStreamingSocketConsumer(AsyncWebsocketConsumer):
 			return
 
 		if data.get('COMMAND') == PLAYCOMMANDS.C2S_CONNECT.value:
+			if data.get('FRAME_PROTOCOL'):
+				self.negotiate_frame_protocol(data.get('FRAME_PROTOCOL'))
+			previous_job_uuid = getattr(self, 'job_uuid', None)
 			self.job_uuid = data.get('JOB_UUID')
 			group_name = get_job_streaming_group_name(self.job_uuid)
 
-			if self.group_name != group_name:
+			joined = self.group_name != group_name
+			if joined:
 				if self.group_name:
 					await self.channel_layer.group_discard(self.group_name, self.channel_name)  # type: ignore
+					await self.leave_frame_relay(previous_job_uuid)
+					await publish_viewer_event(previous_job_uuid, -1)
 				self.group_name = group_name
+				# Membership of the group is what the worker recounts its viewers from, frames come from the relay
 				await self.channel_layer.group_add(self.group_name, self.channel_name)  # type: ignore
+				await publish_viewer_event(self.job_uuid, 1)
 			else:
 				logger.info(f'Already connected to group {self.group_name}, skipping group add')
 
-			await self.send(text_data=json.dumps({'ACK': PLAYCOMMANDS.S2C_CONNECT.value, 'job_uuid': self.job_uuid}))
+			await self.send(
+				text_data=json.dumps(
+					{'ACK': PLAYCOMMANDS.S2C_CONNECT.value, 'job_uuid': self.job_uuid, 'frame_protocol': self.frame_protocol}
+				)
+			)
+			if joined:
+				# Sends the latest frame of the job right away
+				await self.join_frame_relay()
 
 	async def send_frame(self, event):
-		frame_data = event.get('frame', None)
-		job_uuid = event.get('job_uuid', None)
-		job_status = event.get('job_status', None)
-		case_uuid = event.get('case_uuid', None)
-		case_status = event.get('case_status', None)
-		task_uuid = event.get('task_uuid', None)
-		task_status = event.get('task_status', None)
-		current_url = event.get('current_url', None)
-		if not frame_data:
+		if not event.get('frame_bytes') and not event.get('frame'):
 			logger.warning('No frame to send')
 			return
 
-		if not job_uuid:
+		if not event.get('job_uuid'):
 			logger.error('No job UUID provided for frame sending')
 			return
 
 		try:
-			await self.send(
-				text_data=json.dumps(
-					{
-						'type': 'browser_frame',
-						'frame': frame_data,
-						'job_uuid': job_uuid,
-						'job_status': job_status,
-						'current_url': current_url,
-						'case_uuid': case_uuid,
-						'case_status': case_status,
-						'task_uuid': task_uuid,
-						'task_status': task_status,
-					}
-				)
-			)
+			await self.send_browser_frame(event, self.frame_json_fields)
 		except Exception as e:
 			logger.error(f'Error sending frame: {e}', exc_info=True)
 
 
-class AgentPlayGroundSocketConsumer(AsyncWebsocketConsumer):
+class AgentPlayGroundSocketConsumer(FrameStreamingMixin, AsyncWebsocketConsumer):
+	frame_json_fields = (
+		'job_uuid',
+		'job_status',
+		'current_url',
+		'case_uuid',
+		'case_status',
+		'task_uuid',
+		'task_title',
+		'task_status',
+	)
+
 	async def connect(self):
 		try:
 			logger.info('WebSocket connection attempt received')
@@ -138,7 +231,11 @@ class AgentPlayGroundSocketConsumer(AsyncWebsocketConsumer):
 				self.scope['user_last_name'] = user.get('last_name')
 				self.scope['user_business'] = user.get('business')
 
+				self.negotiate_frame_protocol()
 				await self.accept()
+				if PLAYGROUND_WORKER_ENABLED:
+					await self.request_playground_session()
+					return
 				self.playground_agent = PlayGroundAgentManager(
 					task_id=str(uuid.uuid4()),
 					channel_name=self.channel_name,
@@ -151,6 +248,7 @@ class AgentPlayGroundSocketConsumer(AsyncWebsocketConsumer):
 					text_data=json.dumps(
 						{
 							'ACK': PLAYCOMMANDS.S2C_CONNECT.value,
+							'frame_protocol': self.frame_protocol,
 						}
 					)
 				)
@@ -161,7 +259,70 @@ class AgentPlayGroundSocketConsumer(AsyncWebsocketConsumer):
 			logger.error(f'Error during WebSocket connection: {e}', exc_info=True)
 			await self.close(code=500, reason='Internal Server Error')
 
+	async def request_playground_session(self):
+		"""
+		Ask a playground worker to start the browser of this connection. The S2C_CONNECT ACK is sent once the
+		worker replies with playground.started.
+		"""
+		self.session_id = str(uuid.uuid4())
+		self.session_started = False
+		await self.channel_layer.send(  # type: ignore
+			PLAYGROUND_WORKER_CHANNEL,
+			{
+				'type': 'playground.start',
+				'session_id': self.session_id,
+				'reply_channel': self.channel_name,
+				'requested_at': time.time(),
+			},
+		)
+		self.start_timeout_task = asyncio.create_task(self.wait_for_playground_session())
+		logger.info(f'Requested playground session {self.session_id} for user: {self.scope["user_email"]}')
+
+	async def wait_for_playground_session(self):
+		await asyncio.sleep(PLAYGROUND_START_TIMEOUT)
+		if not self.session_started:
+			logger.error(f'No playground worker started session {self.session_id} in {PLAYGROUND_START_TIMEOUT}s')
+			await self.send(
+				text_data=json.dumps({'ACK': PLAYCOMMANDS.S2C_ERROR.value, 'error': 'No playground browser is available.'})
+			)
+			await self.close(code=1013)
+
+	async def playground_started(self, event):
+		self.session_started = True
+		logger.info(f'Playground session {self.session_id} established for user: {self.scope["user_email"]}')
+		await self.send(
+			text_data=json.dumps(
+				{
+					'ACK': PLAYCOMMANDS.S2C_CONNECT.value,
+					'frame_protocol': self.frame_protocol,
+				}
+			)
+		)
+
+	async def playground_error(self, event):
+		logger.error(f'Playground session {self.session_id} failed: {event.get("error")}')
+		await self.send(text_data=json.dumps({'ACK': PLAYCOMMANDS.S2C_ERROR.value, 'error': event.get('error')}))
+		await self.close(code=1011)
+
+	async def playground_reply(self, event):
+		await self.send(text_data=event['text_data'])
+
 	async def disconnect(self, close_code):
+		if getattr(self, 'session_id', None):
+			try:
+				if getattr(self, 'start_timeout_task', None):
+					self.start_timeout_task.cancel()
+				# The marker covers a start request still queued, the stop a session already running
+				await sync_to_async(cache.set)(
+					get_playground_session_closed_key(self.session_id), True, PLAYGROUND_SESSION_CLOSED_TTL
+				)
+				await self.channel_layer.group_send(  # type: ignore
+					get_playground_session_group_name(self.session_id), {'type': 'playground.stop'}
+				)
+				logger.info(f'Playground session {self.session_id} closed with code: {close_code}')
+			except Exception as e:
+				logger.error(f'Error closing playground session: {e}', exc_info=True)
+			return
 		try:
 			if hasattr(self, 'playground_agent'):
 				if self.playground_agent:
@@ -182,6 +343,17 @@ class AgentPlayGroundSocketConsumer(AsyncWebsocketConsumer):
 
 			logger.info(f'Received data: {data}')
 
+			if getattr(self, 'session_id', None):
+				if not self.session_started:
+					await self.send(
+						text_data=json.dumps({'ACK': PLAYCOMMANDS.S2C_ERROR.value, 'error': 'Browser session is starting.'})
+					)
+					return
+				await self.channel_layer.group_send(  # type: ignore
+					get_playground_session_group_name(self.session_id), {'type': 'playground.command', 'data': data}
+				)
+				return
+
 			asyncio.create_task(COMMAND_HANDLER(self, data))
 
 		except Exception as e:
@@ -191,35 +363,11 @@ class AgentPlayGroundSocketConsumer(AsyncWebsocketConsumer):
 			)
 
 	async def send_frame(self, event):
-		frame_data = event.get('frame', None)
-		job_uuid = event.get('job_uuid', None)
-		job_status = event.get('job_status', None)
-		case_uuid = event.get('case_uuid', None)
-		case_status = event.get('case_status', None)
-		task_uuid = event.get('task_uuid', None)
-		task_title = event.get('task_title', None)
-		task_status = event.get('task_status', None)
-		current_url = event.get('current_url', None)
-		if not frame_data:
+		if not event.get('frame_bytes') and not event.get('frame'):
 			logger.warning('No frame to send')
 			return
 
 		try:
-			await self.send(
-				text_data=json.dumps(
-					{
-						'type': 'browser_frame',
-						'frame': frame_data,
-						'job_uuid': job_uuid,
-						'job_status': job_status,
-						'current_url': current_url,
-						'case_uuid': case_uuid,
-						'case_status': case_status,
-						'task_uuid': task_uuid,
-						'task_title': task_title,
-						'task_status': task_status,
-					}
-				)
-			)
+			await self.send_browser_frame(event, self.frame_json_fields)
 		except Exception as e:
 			logger.error(f'Error sending frame: {e}', exc_info=True)
@@ -0,0 +1,165 @@
+"""
+Binary WebSocket frame protocol for live streaming.
+
+Each frame is one binary WebSocket message: a fixed 18 byte header followed by the raw image bytes.
+
+	offset  size  field
+	0       1     version (FRAME_PROTOCOL_VERSION)
+	1       1     codec (CODEC_JPEG, CODEC_PNG or CODEC_WEBP)
+	2       4     sequence number, per connection
+	6       8     capture timestamp, seconds since the epoch (float64)
+	14      2     image width in pixels (0 if unknown)
+	16      2     image height in pixels (0 if unknown)
+
+All fields are big-endian. Metadata (job/task/case status, URL, title) is sent as a JSON text message
+{"type": "frame_metadata", ...} only when it changes, before the first frame it applies to.
+
+Clients opt in with the query string parameter frame_protocol=binary or the FRAME_PROTOCOL field of
+C2S_CONNECT; everyone else keeps receiving JSON 'browser_frame' messages with a base64 frame.
+"""
+
+import struct
+
+FRAME_PROTOCOL_VERSION = 1
+FRAME_PROTOCOL_BINARY = 'binary'
+FRAME_PROTOCOL_JSON = 'json'
+
+CODEC_JPEG = 1
+CODEC_PNG = 2
+CODEC_WEBP = 3
+CODEC_NAMES = {CODEC_JPEG: 'jpeg', CODEC_PNG: 'png', CODEC_WEBP: 'webp'}
+
+FRAME_HEADER = struct.Struct('!BBIdHH')
+
+# Fields of a frame event that are sent as metadata instead of with every frame.
+FRAME_METADATA_FIELDS = (
+	'job_uuid',
+	'job_status',
+	'current_url',
+	'case_uuid',
+	'case_status',
+	'task_uuid',
+	'task_title',
+	'task_status',
+)
+
+
+def detect_codec(image_bytes):
+	"""
+	Detect the codec of an encoded image from its signature.
+	"""
+	if image_bytes[:3] == b'\xff\xd8\xff':
+		return CODEC_JPEG
+	if image_bytes[:8] == b'\x89PNG\r\n\x1a\n':
+		return CODEC_PNG
+	if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+		return CODEC_WEBP
+	raise ValueError('Unknown image format')
+
+
+def get_image_size(image_bytes, codec=None):
+	"""
+	Read the width and height of a JPEG, PNG or WebP image from its headers, without decoding it.
+
+	Returns:
+		tuple: (width, height), or (0, 0) if the headers could not be parsed.
+	"""
+	try:
+		codec = codec or detect_codec(image_bytes)
+		if codec == CODEC_PNG:
+			return struct.unpack('!II', image_bytes[16:24])
+		if codec == CODEC_WEBP:
+			chunk = image_bytes[12:16]
+			if chunk == b'VP8X':
+				width = int.from_bytes(image_bytes[24:27], 'little') + 1
+				height = int.from_bytes(image_bytes[27:30], 'little') + 1
+				return width, height
+			if chunk == b'VP8 ':
+				width, height = struct.unpack('<HH', image_bytes[26:30])
+				return width & 0x3FFF, height & 0x3FFF
+			if chunk == b'VP8L':
+				bits = int.from_bytes(image_bytes[21:25], 'little')
+				return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+			return 0, 0
+		# JPEG: walk the segments up to the start of frame marker
+		offset = 2
+		while offset + 9 < len(image_bytes):
+			if image_bytes[offset] != 0xFF:
+				return 0, 0
+			marker = image_bytes[offset + 1]
+			if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+				offset += 2
+				continue
+			segment_length = struct.unpack('!H', image_bytes[offset + 2 : offset + 4])[0]
+			if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+				height, width = struct.unpack('!HH', image_bytes[offset + 5 : offset + 9])
+				return width, height
+			offset += 2 + segment_length
+	except (ValueError, struct.error):
+		pass
+	return 0, 0
+
+
+def encode_frame(image_bytes, sequence, timestamp, codec=None, width=None, height=None):
+	"""
+	Build the binary message of a frame.
+
+	Args:
+		image_bytes (bytes): The encoded image.
+		sequence (int): Sequence number of the frame on its connection.
+		timestamp (float): Capture time, seconds since the epoch.
+		codec (int): One of the CODEC_* constants. Detected from the image if not given.
+		width (int), height (int): Image size. Read from the image headers if not given.
+	"""
+	codec = codec or detect_codec(image_bytes)
+	if width is None or height is None:
+		width, height = get_image_size(image_bytes, codec)
+	header = FRAME_HEADER.pack(
+		FRAME_PROTOCOL_VERSION, codec, sequence & 0xFFFFFFFF, timestamp, min(width, 0xFFFF), min(height, 0xFFFF)
+	)
+	return header + image_bytes
+
+
+def decode_frame(message):
+	"""
+	Parse a binary frame message.
+
+	Returns:
+		tuple: (header dict, image bytes)
+	"""
+	version, codec, sequence, timestamp, width, height = FRAME_HEADER.unpack_from(message)
+	if version != FRAME_PROTOCOL_VERSION:
+		raise ValueError(f'Unsupported frame protocol version: {version}')
+	header = {
+		'version': version,
+		'codec': CODEC_NAMES.get(codec, 'unknown'),
+		'sequence': sequence,
+		'timestamp': timestamp,
+		'width': width,
+		'height': height,
+	}
+	return header, message[FRAME_HEADER.size :]
+
+
+class FrameMetadataTracker:
+	"""
+	Remembers the metadata last sent on a connection, to send only what changed.
+	"""
+
+	def __init__(self):
+		self.last_metadata = {}
+
+	def changes(self, event):
+		"""
+		Get the metadata fields of a frame event that changed since the previous frame.
+
+		Returns:
+			dict | None: The changed fields, or None if nothing changed.
+		"""
+		changed = {
+			field: event.get(field) for field in FRAME_METADATA_FIELDS if event.get(field) != self.last_metadata.get(field)
+		}
+		if not changed:
+			return None
+		self.last_metadata.update(changed)
+		return changed
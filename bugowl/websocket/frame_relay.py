@@ -0,0 +1,230 @@
+"""
+Fan-out relay of live stream frames between the agent workers and the WebSocket consumers.
+
+The worker publishes each frame of a job once, on a Redis pub/sub channel, and keeps the latest one under a
+key with a short TTL. Every ASGI process subscribes once per job it has viewers for and hands the frames to
+its viewers through bounded per-viewer queues, so a slow viewer only loses its own stale frames. A viewer that
+joins mid-run gets the latest frame immediately instead of waiting for the next capture. After that, frame
+metadata is only sent when it changes (see frame_protocol) and unchanged frames are not sent at all
+(see bugowl_agent.stream_controller).
+"""
+
+import asyncio
+import logging
+import os
+import threading
+
+import msgpack
+import redis.asyncio as redis
+
+from .utils import get_job_frames_channel_name, get_job_latest_frame_key
+
+logger = logging.getLogger('FrameRelay')
+
+# Send live stream frames through the relay instead of channel layer group messages.
+STREAM_RELAY_ENABLED = os.getenv('AGENT_STREAM_RELAY', 'True') == 'True'
+# Seconds the latest frame of a job is kept for viewers who join later.
+STREAM_RELAY_LATEST_FRAME_TTL = int(os.getenv('AGENT_STREAM_RELAY_LATEST_FRAME_TTL', '30'))
+# Frames queued per viewer; when a viewer falls behind, its oldest frame is dropped.
+STREAM_RELAY_VIEWER_QUEUE_SIZE = int(os.getenv('AGENT_STREAM_RELAY_VIEWER_QUEUE_SIZE', '2'))
+
+
+def pack_frame_event(event):
+	return msgpack.packb(event, use_bin_type=True)
+
+
+def unpack_frame_event(data):
+	return msgpack.unpackb(data, raw=False)
+
+
+async def publish_frame(redis_client, job_uuid, event):
+	"""
+	Publish a frame event of a job to the relay and keep it as the latest frame of the job.
+
+	Args:
+		redis_client: A redis.asyncio client.
+		job_uuid (str): The job the frame belongs to.
+		event (dict): The 'send_frame' event, as built by LiveStreaming._build_payload.
+	Returns:
+		int: The number of ASGI processes that received the frame.
+	"""
+	data = pack_frame_event(event)
+	async with redis_client.pipeline(transaction=False) as pipe:
+		pipe.set(get_job_latest_frame_key(job_uuid), data, ex=STREAM_RELAY_LATEST_FRAME_TTL)
+		pipe.publish(get_job_frames_channel_name(job_uuid), data)
+		_, receivers = await pipe.execute()
+	return receivers
+
+
+class RelayViewer:
+	"""
+	One WebSocket connection watching a job, fed from a bounded queue by its own sender task.
+	"""
+
+	def __init__(self, consumer, queue_size=STREAM_RELAY_VIEWER_QUEUE_SIZE):
+		"""
+		Args:
+			consumer: The WebSocket consumer, frames are passed to its send_frame(event).
+			queue_size (int): Frames queued before the oldest one is dropped.
+		"""
+		self.consumer = consumer
+		self.queue = asyncio.Queue(maxsize=max(1, queue_size))
+		self.task = asyncio.create_task(self.send_frames())
+		self.frames_sent = 0
+		self.frames_dropped = 0
+
+	def offer(self, event):
+		"""
+		Queue a frame without waiting, dropping the oldest queued frame if the viewer is behind.
+		"""
+		if self.queue.full():
+			try:
+				self.queue.get_nowait()
+				self.frames_dropped += 1
+			except asyncio.QueueEmpty:
+				pass
+		self.queue.put_nowait(event)
+
+	async def send_frames(self):
+		while True:
+			event = await self.queue.get()
+			try:
+				await self.consumer.send_frame(event)
+				self.frames_sent += 1
+			except asyncio.CancelledError:
+				raise
+			except Exception as e:
+				logger.warning(f'Failed to send frame to viewer: {e}')
+
+	async def close(self):
+		self.task.cancel()
+		await asyncio.gather(self.task, return_exceptions=True)
+
+
+class JobSubscription:
+	"""
+	The viewers of one job in this process, and the pub/sub subscription feeding them.
+	"""
+
+	def __init__(self, job_uuid):
+		self.job_uuid = job_uuid
+		self.viewers = set()
+		self.latest_event = None
+		self.pubsub = None
+		self.task = None
+
+
+class FrameRelay:
+	"""
+	Relays the frames of the jobs watched in this ASGI process to their viewers.
+	"""
+
+	def __init__(self, redis_client=None, queue_size=STREAM_RELAY_VIEWER_QUEUE_SIZE):
+		"""
+		Args:
+			redis_client: A redis.asyncio client. Defaults to one connected to DJANGO_CACHE_LOCATION.
+			queue_size (int): Frames queued per viewer.
+		"""
+		self.redis = redis_client
+		self.queue_size = queue_size
+		self.subscriptions = {}
+		self.lock = asyncio.Lock()
+
+	def get_redis(self):
+		if self.redis is None:
+			self.redis = redis.from_url(os.getenv('DJANGO_CACHE_LOCATION', 'redis://redis-agent:6381/1'))
+		return self.redis
+
+	async def join(self, job_uuid, consumer):
+		"""
+		Start relaying the frames of a job to a consumer, beginning with the latest frame if there is one.
+
+		Returns:
+			RelayViewer: Pass it to leave() when the consumer stops watching.
+		"""
+		job_uuid = str(job_uuid)
+		viewer = RelayViewer(consumer, queue_size=self.queue_size)
+		async with self.lock:
+			subscription = self.subscriptions.get(job_uuid)
+			if subscription is None:
+				subscription = JobSubscription(job_uuid)
+				subscription.pubsub = self.get_redis().pubsub()
+				await subscription.pubsub.subscribe(get_job_frames_channel_name(job_uuid))
+				subscription.task = asyncio.create_task(self.listen(subscription))
+				self.subscriptions[job_uuid] = subscription
+				logger.info(f'Relaying frames of job {job_uuid}')
+			subscription.viewers.add(viewer)
+
+		latest_event = subscription.latest_event
+		if latest_event is None:
+			try:
+				data = await self.get_redis().get(get_job_latest_frame_key(job_uuid))
+				latest_event = unpack_frame_event(data) if data else None
+			except Exception as e:
+				logger.warning(f'Failed to load the latest frame of job {job_uuid}: {e}')
+		if latest_event is not None:
+			viewer.offer(latest_event)
+		return viewer
+
+	async def leave(self, job_uuid, viewer):
+		"""
+		Stop relaying frames to a viewer, and unsubscribe from the job once it has no viewers left here.
+		"""
+		job_uuid = str(job_uuid)
+		await viewer.close()
+		async with self.lock:
+			subscription = self.subscriptions.get(job_uuid)
+			if subscription is None:
+				return
+			subscription.viewers.discard(viewer)
+			if subscription.viewers:
+				return
+			del self.subscriptions[job_uuid]
+		subscription.task.cancel()  # type: ignore
+		await asyncio.gather(subscription.task, return_exceptions=True)  # type: ignore
+		try:
+			await subscription.pubsub.unsubscribe(get_job_frames_channel_name(job_uuid))  # type: ignore
+			await subscription.pubsub.aclose()  # type: ignore
+		except Exception as e:
+			logger.warning(f'Failed to unsubscribe from the frames of job {job_uuid}: {e}')
+		logger.info(f'Stopped relaying frames of job {job_uuid}')
+
+	async def listen(self, subscription):
+		while True:
+			try:
+				message = await subscription.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+				if not message or message.get('type') != 'message':
+					continue
+				event = unpack_frame_event(message['data'])
+				subscription.latest_event = event
+				for viewer in list(subscription.viewers):
+					viewer.offer(event)
+			except asyncio.CancelledError:
+				raise
+			except Exception as e:
+				logger.error(f'Frame relay of job {subscription.job_uuid} failed: {e}', exc_info=True)
+				await asyncio.sleep(1)
+
+	def stats(self):
+		viewers = [viewer for subscription in self.subscriptions.values() for viewer in subscription.viewers]
+		return {
+			'jobs': len(self.subscriptions),
+			'viewers': len(viewers),
+			'frames_sent': sum(viewer.frames_sent for viewer in viewers),
+			'frames_dropped': sum(viewer.frames_dropped for viewer in viewers),
+		}
+
+
+_relay = None
+_relay_lock = threading.Lock()
+
+
+def get_frame_relay():
+	"""
+	Get the frame relay of this ASGI process, creating it on first use.
+	"""
+	global _relay
+	with _relay_lock:
+		if _relay is None:
+			_relay = FrameRelay()
+		return _relay
@@ -2,13 +2,28 @@ import json
 import logging
 
 from api.utils import JobStatusEnum
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django_redis import get_redis_connection
 
-from .utils import PLAYCOMMANDS
+from .utils import PLAYCOMMANDS, get_job_viewers_channel_name
 
 logger = logging.getLogger(settings.ENV)
 
 
+async def publish_viewer_event(job_uuid, delta):
+	"""
+	Tell the worker streaming a job that a viewer joined (+1) or left (-1), so it only captures frames while
+	somebody watches. Failures are logged only, the worker recounts its viewers periodically.
+	"""
+	try:
+		await sync_to_async(get_redis_connection('default').publish)(
+			get_job_viewers_channel_name(job_uuid), json.dumps({'job_uuid': str(job_uuid), 'delta': delta})
+		)
+	except Exception as e:
+		logger.warning(f'Failed to publish viewer event of job {job_uuid}: {e}')
+
+
 async def LOAD_TASK(self, data):
 	"""
 	Load a task based on the provided data.
@@ -51,6 +66,7 @@ async def EXECUTE_ALL_TASKS(self, data):
 					'message': 'All tasks executed successfully',
 					'run_results': run_results,
 					'response': response,
+					'metrics': self.playground_agent.latency_stats(),
 				}
 			)
 		)
@@ -101,6 +117,7 @@ async def EXECUTE_TASK(self, data, uuid):
 					'task_uuid': str(self.playground_agent.task.uuid),
 					'task_title': self.playground_agent.task.title,
 					'task_status': self.playground_agent.task.status,
+					'metrics': self.playground_agent.latency_stats(),
 				}
 			)
 		)
@@ -108,12 +125,33 @@ async def EXECUTE_TASK(self, data, uuid):
 		raise
 
 
+async def RESET(self, clear_storage):
+	"""
+	Bring the warm browser back to a blank tab, optionally clearing cookies and storage.
+	"""
+	if not await self.playground_agent.reset(clear_storage=clear_storage):
+		await self.send(
+			text_data=json.dumps({'ACK': PLAYCOMMANDS.S2C_ERROR.value, 'error': 'Cannot reset while tasks are being executed.'})
+		)
+		return
+	await self.send(
+		text_data=json.dumps(
+			{
+				'ACK': PLAYCOMMANDS.S2C_RESET.value,
+				'message': 'reset successfully',
+				'metrics': self.playground_agent.latency_stats(),
+			}
+		)
+	)
+
+
 async def COMMAND_HANDLER(self, data):
 	"""Handle commands received from the WebSocket.
 	Args:
 		data (dict): The data received from the WebSocket.
 	"""
 	try:
+		self.playground_agent.mark_active()
 		if not data.get('COMMAND'):
 			logger.warning('No COMMANDS found in received data')
 			await self.send(
@@ -181,6 +219,10 @@ async def COMMAND_HANDLER(self, data):
 			await self.playground_agent.restart()
 			await self.send(text_data=json.dumps({'ACK': PLAYCOMMANDS.S2C_RESTART.value, 'message': 'restarted successfully'}))
 
+		elif data['COMMAND'] == PLAYCOMMANDS.C2S_RESET.value:
+			logger.info('Processing RESET command')
+			await RESET(self, bool(data.get('CLEAR_STORAGE')))
+
 		else:
 			logger.error(f'Unknown command received: {data["COMMAND"]}')
 			await self.send(
@@ -0,0 +1,35 @@
+import asyncio
+import logging
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from websocket.playground_worker import PLAYGROUND_WORKER_MAX_SESSIONS, PlaygroundWorker
+
+logger = logging.getLogger(settings.ENV)
+
+
+class Command(BaseCommand):
+	"""
+	Run playground browser sessions for the playground WebSocket consumers
+	Example:
+	    manage.py run_playground_worker --max-sessions=2
+	"""
+
+	def add_arguments(self, parser):
+		parser.add_argument('--max-sessions', type=int, default=PLAYGROUND_WORKER_MAX_SESSIONS)
+
+	def handle(self, *args, **options):
+		asyncio.run(self.run_worker(options['max_sessions']))
+
+	async def run_worker(self, max_sessions):
+		worker = PlaygroundWorker(max_sessions=max_sessions)
+		run_task = asyncio.create_task(worker.run())
+		loop = asyncio.get_running_loop()
+		for signum in (signal.SIGTERM, signal.SIGINT):
+			# Cancelling the run tears down every session before the process exits
+			loop.add_signal_handler(signum, run_task.cancel)
+		try:
+			await run_task
+		except asyncio.CancelledError:
+			logger.info('Playground worker shut down')
@@ -0,0 +1,205 @@
+"""
+Playground sessions run in dedicated worker processes (manage.py run_playground_worker) instead of the ASGI
+process, which only relays WebSocket messages.
+
+Protocol over the channel layer:
+	consumer -> PLAYGROUND_WORKER_CHANNEL  {'type': 'playground.start', 'session_id', 'reply_channel', 'requested_at'}
+	worker   -> reply_channel              {'type': 'playground.started'} or {'type': 'playground.error', 'error'}
+	consumer -> session group              {'type': 'playground.command', 'data'} or {'type': 'playground.stop'}
+	worker   -> reply_channel              {'type': 'playground.reply', 'text_data'} and 'send_frame' live frames
+
+Any idle worker may pick up a start message. The session then only listens on a channel of that worker's
+process, joined to the session's group, so every follow-up command reaches the same browser.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+from asgiref.sync import sync_to_async
+from bugowl_agent.agent import PlayGroundAgentManager
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+
+from .helpers import COMMAND_HANDLER
+from .utils import PLAYCOMMANDS, get_playground_session_closed_key, get_playground_session_group_name
+
+logger = logging.getLogger(settings.ENV)
+
+# Run playground sessions in run_playground_worker processes (the playground-agent service). Off by default, so
+# deployments without that service keep running sessions in the consumer's process.
+PLAYGROUND_WORKER_ENABLED = os.getenv('PLAYGROUND_WORKER_ENABLED', 'False') == 'True'
+# Channel the consumers send new sessions to, shared by all playground workers.
+PLAYGROUND_WORKER_CHANNEL = 'playground-worker'
+# Playground sessions (browsers) a worker process runs at the same time.
+PLAYGROUND_WORKER_MAX_SESSIONS = int(os.getenv('PLAYGROUND_WORKER_MAX_SESSIONS', '2'))
+# Seconds a consumer waits for a worker to start its session. Older start requests are dropped by the workers.
+PLAYGROUND_START_TIMEOUT = float(os.getenv('PLAYGROUND_START_TIMEOUT', '60'))
+# Seconds the closed marker of a session is kept, longer than a start request can wait in the queue.
+PLAYGROUND_SESSION_CLOSED_TTL = 600
+
+
+class PlaygroundSession:
+	"""
+	A playground session on a worker: the PlayGroundAgentManager, and a send() relaying messages to the
+	consumer, so the COMMAND_HANDLER commands run on it unchanged.
+	"""
+
+	def __init__(self, worker, session_id, reply_channel):
+		self.worker = worker
+		self.session_id = session_id
+		self.reply_channel = reply_channel
+		self.session_channel = None
+		self.playground_agent = None
+		self.command_tasks = set()
+
+	async def send(self, text_data=None, bytes_data=None):
+		await self.worker.channel_layer.send(self.reply_channel, {'type': 'playground.reply', 'text_data': text_data})
+
+	async def is_closed(self):
+		"""
+		Check whether the client disconnected, possibly before this session was picked up.
+		"""
+		return bool(await sync_to_async(cache.get)(get_playground_session_closed_key(self.session_id)))
+
+
+class PlaygroundWorker:
+	"""
+	Runs up to max_sessions playground sessions, taking new ones from PLAYGROUND_WORKER_CHANNEL only while it has
+	a free slot.
+	"""
+
+	def __init__(self, max_sessions=PLAYGROUND_WORKER_MAX_SESSIONS, channel_layer=None):
+		self.max_sessions = max(1, max_sessions)
+		self.channel_layer = channel_layer or get_channel_layer()
+		self.slots = asyncio.Semaphore(self.max_sessions)
+		self.sessions = {}
+
+	async def run(self):
+		"""
+		Take start requests until cancelled, then tear down every session.
+		"""
+		logger.info(f'Playground worker started with {self.max_sessions} session slots')
+		session_tasks = set()
+		try:
+			while True:
+				await self.slots.acquire()
+				try:
+					message = await self.channel_layer.receive(PLAYGROUND_WORKER_CHANNEL)  # type: ignore
+				except BaseException:
+					self.slots.release()
+					raise
+				if message.get('type') != 'playground.start':
+					logger.warning(f'Ignoring unexpected playground worker message: {message.get("type")}')
+					self.slots.release()
+					continue
+				task = asyncio.create_task(self.serve(message))
+				session_tasks.add(task)
+				task.add_done_callback(session_tasks.discard)
+		finally:
+			await asyncio.gather(
+				*[
+					self.close_session(session, error='The playground worker is shutting down')
+					for session in list(self.sessions.values())
+				]
+			)
+			for task in list(session_tasks):
+				task.cancel()
+			await asyncio.gather(*session_tasks, return_exceptions=True)
+			logger.info('Playground worker stopped')
+
+	async def serve(self, message):
+		"""
+		Start a session, run its commands until the client leaves, then tear it down and free the slot.
+		"""
+		session = PlaygroundSession(self, message['session_id'], message['reply_channel'])
+		try:
+			if time.time() - message.get('requested_at', 0) > PLAYGROUND_START_TIMEOUT or await session.is_closed():
+				logger.info(f'Dropping playground session {session.session_id}, its client is gone')
+				return
+			self.sessions[session.session_id] = session
+			session.session_channel = await self.channel_layer.new_channel('playground-session')  # type: ignore
+			# Joined before the browser starts, so a stop sent meanwhile waits in the session channel
+			await self.channel_layer.group_add(get_playground_session_group_name(session.session_id), session.session_channel)  # type: ignore
+			try:
+				await self.start_session(session)
+			except Exception as e:
+				logger.error(f'Failed to start playground session {session.session_id}: {e}', exc_info=True)
+				await self.channel_layer.send(session.reply_channel, {'type': 'playground.error', 'error': str(e)})  # type: ignore
+				return
+			await self.run_commands(session)
+		finally:
+			await self.close_session(session)
+			self.slots.release()
+
+	async def start_session(self, session):
+		session.playground_agent = PlayGroundAgentManager(
+			task_id=session.session_id,
+			channel_name=session.reply_channel,
+			save_conversation_path='logs/playground/conversation',
+			record_video_dir=None,
+		)
+		await session.playground_agent.start_browser_session()
+		await self.channel_layer.send(session.reply_channel, {'type': 'playground.started', 'session_id': session.session_id})  # type: ignore
+		logger.info(f'Playground session {session.session_id} started')
+
+	async def run_commands(self, session):
+		while True:
+			message = await self.channel_layer.receive(session.session_channel)  # type: ignore
+			if message.get('type') == 'playground.stop':
+				logger.info(f'Playground session {session.session_id} closed by its client')
+				return
+			if message.get('type') != 'playground.command':
+				logger.warning(f'Ignoring unexpected playground session message: {message.get("type")}')
+				continue
+			# Commands run concurrently, so C2S_STOP or C2S_PAUSE can reach a session that is executing tasks
+			task = asyncio.create_task(self.run_command(session, message['data']))
+			session.command_tasks.add(task)
+			task.add_done_callback(session.command_tasks.discard)
+
+	async def run_command(self, session, data):
+		try:
+			await COMMAND_HANDLER(session, data)
+		except Exception as e:
+			logger.error(f'Error running playground command {data.get("COMMAND")}: {e}', exc_info=True)
+			await session.send(
+				text_data=json.dumps({'ACK': PLAYCOMMANDS.S2C_ERROR.value, 'error': f'Error processing received data: {e}'})
+			)
+
+	async def close_session(self, session, error=None):
+		"""
+		Stop the agent and the browser of a session. Safe to call more than once.
+
+		Args:
+			session (PlaygroundSession): The session to close.
+			error (str): Sent to the client when the session is closed by the worker rather than by the client.
+		"""
+		if self.sessions.pop(session.session_id, None) is None:
+			return
+		if error:
+			try:
+				await self.channel_layer.send(session.reply_channel, {'type': 'playground.error', 'error': error})  # type: ignore
+			except Exception as e:
+				logger.warning(f'Failed to notify the client of playground session {session.session_id}: {e}')
+		for task in list(session.command_tasks):
+			task.cancel()
+		await asyncio.gather(*session.command_tasks, return_exceptions=True)
+		playground_agent, session.playground_agent = session.playground_agent, None
+		if playground_agent:
+			try:
+				if playground_agent.agent:
+					playground_agent.agent.stop()  # type:ignore
+				await playground_agent.stop_browser_session()
+			except Exception as e:
+				logger.error(f'Error stopping playground session {session.session_id}: {e}', exc_info=True)
+		if session.session_channel:
+			try:
+				await self.channel_layer.group_discard(  # type: ignore
+					get_playground_session_group_name(session.session_id), session.session_channel
+				)
+			except Exception as e:
+				logger.warning(f'Failed to leave the group of playground session {session.session_id}: {e}')
+		logger.info(f'Playground session {session.session_id} torn down')
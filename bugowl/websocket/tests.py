@@ -1 +1,324 @@
-# Create your tests here.
+import asyncio
+import json
+import struct
+import zlib
+from unittest.mock import patch
+
+from bugowl_agent.agent import PlayGroundAgentManager
+from bugowl_agent.tests import FakeRedis
+from channels.layers import InMemoryChannelLayer
+from django.test import SimpleTestCase
+
+from .frame_protocol import (
+	CODEC_JPEG,
+	CODEC_PNG,
+	FRAME_HEADER,
+	FrameMetadataTracker,
+	decode_frame,
+	detect_codec,
+	encode_frame,
+	get_image_size,
+)
+from .frame_relay import FrameRelay, publish_frame
+from .helpers import RESET
+from .playground_worker import PLAYGROUND_WORKER_CHANNEL, PlaygroundWorker
+from .utils import PLAYCOMMANDS, get_playground_session_group_name
+
+
+def make_png_header(width, height):
+	ihdr = struct.pack('!IIBBBBB', width, height, 8, 2, 0, 0, 0)
+	return b'\x89PNG\r\n\x1a\n' + struct.pack('!I', len(ihdr)) + b'IHDR' + ihdr + struct.pack('!I', zlib.crc32(b'IHDR' + ihdr))
+
+
+def make_jpeg_header(width, height):
+	app0 = b'\xff\xe0' + struct.pack('!H', 16) + b'JFIF\x00' + b'\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+	sof0 = b'\xff\xc0' + struct.pack('!HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+	return b'\xff\xd8' + app0 + sof0 + b'\xff\xd9'
+
+
+class FrameProtocolTests(SimpleTestCase):
+	def test_detects_codec_and_size_from_headers(self):
+		png = make_png_header(1280, 720)
+		jpeg = make_jpeg_header(800, 600)
+
+		self.assertEqual(detect_codec(png), CODEC_PNG)
+		self.assertEqual(detect_codec(jpeg), CODEC_JPEG)
+		self.assertEqual(get_image_size(png), (1280, 720))
+		self.assertEqual(get_image_size(jpeg), (800, 600))
+		self.assertEqual(get_image_size(b'\xff\xd8\xff'), (0, 0))
+
+	def test_encode_decode_round_trip(self):
+		jpeg = make_jpeg_header(640, 480)
+
+		message = encode_frame(jpeg, 7, 1700000000.25)
+		header, image_bytes = decode_frame(message)
+
+		self.assertEqual(len(message), FRAME_HEADER.size + len(jpeg))
+		self.assertEqual(image_bytes, jpeg)
+		self.assertEqual(header['codec'], 'jpeg')
+		self.assertEqual(header['sequence'], 7)
+		self.assertEqual(header['timestamp'], 1700000000.25)
+		self.assertEqual((header['width'], header['height']), (640, 480))
+
+	def test_rejects_unknown_version(self):
+		message = bytearray(encode_frame(make_png_header(1, 1), 1, 0.0))
+		message[0] = 99
+
+		with self.assertRaises(ValueError):
+			decode_frame(bytes(message))
+
+	def test_metadata_is_sent_only_when_it_changes(self):
+		tracker = FrameMetadataTracker()
+		event = {'job_uuid': 'job', 'job_status': 'Running', 'current_url': 'https://example.com', 'frame_bytes': b'x'}
+
+		self.assertEqual(tracker.changes(event)['current_url'], 'https://example.com')
+		self.assertIsNone(tracker.changes(dict(event, frame_bytes=b'y')))
+		self.assertEqual(
+			tracker.changes(dict(event, current_url='https://example.com/next')), {'current_url': 'https://example.com/next'}
+		)
+
+
+class RecordingConsumer:
+	def __init__(self, send_delay=0):
+		self.send_delay = send_delay
+		self.frames = []
+
+	async def send_frame(self, event):
+		await asyncio.sleep(self.send_delay)
+		self.frames.append(event['frame_bytes'])
+
+
+def make_frame_event(index):
+	return {'type': 'send_frame', 'frame_bytes': b'frame-%d' % index, 'job_uuid': 'job-1'}
+
+
+class FrameRelayTests(SimpleTestCase):
+	def test_late_joiner_gets_latest_frame_immediately(self):
+		async def scenario():
+			redis_client = FakeRedis()
+			await publish_frame(redis_client, 'job-1', make_frame_event(1))
+			await publish_frame(redis_client, 'job-1', make_frame_event(2))
+
+			relay = FrameRelay(redis_client=redis_client)
+			consumer = RecordingConsumer()
+			viewer = await relay.join('job-1', consumer)
+			await asyncio.sleep(0.01)
+			frames_on_join = list(consumer.frames)
+			receivers = await publish_frame(redis_client, 'job-1', make_frame_event(3))
+			await asyncio.sleep(0.01)
+			await relay.leave('job-1', viewer)
+			return frames_on_join, consumer.frames, receivers, relay.subscriptions
+
+		frames_on_join, frames, receivers, subscriptions = asyncio.run(scenario())
+
+		self.assertEqual(frames_on_join, [b'frame-2'])
+		self.assertEqual(frames, [b'frame-2', b'frame-3'])
+		self.assertEqual(receivers, 1)
+		self.assertEqual(subscriptions, {})
+
+	def test_slow_viewer_drops_stale_frames_without_slowing_others(self):
+		async def scenario():
+			redis_client = FakeRedis()
+			relay = FrameRelay(redis_client=redis_client, queue_size=2)
+			fast = RecordingConsumer()
+			slow = RecordingConsumer(send_delay=0.2)
+			fast_viewer = await relay.join('job-1', fast)
+			slow_viewer = await relay.join('job-1', slow)
+
+			for index in range(10):
+				await publish_frame(redis_client, 'job-1', make_frame_event(index))
+				await asyncio.sleep(0.01)
+			await asyncio.sleep(0.5)
+			stats = relay.stats()
+			await relay.leave('job-1', fast_viewer)
+			await relay.leave('job-1', slow_viewer)
+			return fast.frames, slow.frames, stats
+
+		fast_frames, slow_frames, stats = asyncio.run(scenario())
+
+		self.assertEqual(len(fast_frames), 10)
+		self.assertLess(len(slow_frames), 10)
+		# The slow viewer skips ahead to the newest frames instead of replaying a backlog
+		self.assertEqual(slow_frames[-1], b'frame-9')
+		self.assertGreater(stats['frames_dropped'], 0)
+
+
+class FakePlayGroundAgentManager:
+	instances = []
+
+	def __init__(self, task_id, channel_name, **kwargs):
+		self.task_id = task_id
+		self.agent = None
+		self.stopped = False
+		FakePlayGroundAgentManager.instances.append(self)
+
+	async def start_browser_session(self):
+		pass
+
+	async def stop_browser_session(self):
+		self.stopped = True
+
+
+async def fake_command_handler(session, data):
+	await session.send(text_data=json.dumps({'task_id': session.playground_agent.task_id, 'command': data['COMMAND']}))
+
+
+@patch('websocket.playground_worker.COMMAND_HANDLER', fake_command_handler)
+@patch('websocket.playground_worker.PlayGroundAgentManager', FakePlayGroundAgentManager)
+class PlaygroundWorkerTests(SimpleTestCase):
+	def setUp(self):
+		FakePlayGroundAgentManager.instances = []
+		closed_patcher = patch('websocket.playground_worker.PlaygroundSession.is_closed', return_value=False)
+		closed_patcher.start()
+		self.addCleanup(closed_patcher.stop)
+
+	async def start_session(self, channel_layer, session_id):
+		reply_channel = await channel_layer.new_channel('consumer')
+		await channel_layer.send(
+			PLAYGROUND_WORKER_CHANNEL,
+			{'type': 'playground.start', 'session_id': session_id, 'reply_channel': reply_channel, 'requested_at': 0},
+		)
+		return reply_channel
+
+	def test_commands_reach_their_session_and_stop_tears_it_down(self):
+		async def scenario():
+			channel_layer = InMemoryChannelLayer()
+			worker = PlaygroundWorker(max_sessions=2, channel_layer=channel_layer)
+			run_task = asyncio.create_task(worker.run())
+			replies = {}
+			with patch('websocket.playground_worker.time.time', return_value=0):
+				for session_id in ('session-1', 'session-2'):
+					reply_channel = await self.start_session(channel_layer, session_id)
+					started = await asyncio.wait_for(channel_layer.receive(reply_channel), 1)
+					await channel_layer.group_send(
+						get_playground_session_group_name(session_id), {'type': 'playground.command', 'data': {'COMMAND': 'X'}}
+					)
+					reply = await asyncio.wait_for(channel_layer.receive(reply_channel), 1)
+					replies[session_id] = (started['type'], json.loads(reply['text_data'])['task_id'])
+				await channel_layer.group_send(get_playground_session_group_name('session-1'), {'type': 'playground.stop'})
+				await asyncio.sleep(0.05)
+			sessions = list(worker.sessions)
+			run_task.cancel()
+			await asyncio.gather(run_task, return_exceptions=True)
+			return replies, sessions
+
+		replies, sessions = asyncio.run(scenario())
+
+		self.assertEqual(
+			replies, {'session-1': ('playground.started', 'session-1'), 'session-2': ('playground.started', 'session-2')}
+		)
+		self.assertEqual(sessions, ['session-2'])
+		self.assertEqual([agent.stopped for agent in FakePlayGroundAgentManager.instances], [True, True])
+
+	def test_sessions_wait_for_a_free_slot(self):
+		async def scenario():
+			channel_layer = InMemoryChannelLayer()
+			worker = PlaygroundWorker(max_sessions=1, channel_layer=channel_layer)
+			run_task = asyncio.create_task(worker.run())
+			with patch('websocket.playground_worker.time.time', return_value=0):
+				first_reply = await self.start_session(channel_layer, 'session-1')
+				second_reply = await self.start_session(channel_layer, 'session-2')
+				await asyncio.wait_for(channel_layer.receive(first_reply), 1)
+				await asyncio.sleep(0.05)
+				sessions_while_full = list(worker.sessions)
+				await channel_layer.group_send(get_playground_session_group_name('session-1'), {'type': 'playground.stop'})
+				second_started = await asyncio.wait_for(channel_layer.receive(second_reply), 1)
+			run_task.cancel()
+			await asyncio.gather(run_task, return_exceptions=True)
+			return sessions_while_full, second_started
+
+		sessions_while_full, second_started = asyncio.run(scenario())
+
+		self.assertEqual(sessions_while_full, ['session-1'])
+		self.assertEqual(second_started['type'], 'playground.started')
+
+
+class RecordingSender:
+	def __init__(self):
+		self.messages = []
+
+	async def send(self, text_data=None):
+		self.messages.append(json.loads(text_data))
+
+
+@patch('bugowl_agent.agent.PLAYGROUND_IDLE_TIMEOUT', 0.01)
+class PlayGroundAgentManagerTests(SimpleTestCase):
+	def make_manager(self):
+		playground_agent = PlayGroundAgentManager('task-1', 'channel-1')
+		playground_agent.stopped_sessions = []
+
+		async def stop_browser_session():
+			playground_agent.stopped_sessions.append(playground_agent.browser_session)
+			playground_agent.browser_session = None
+
+		playground_agent.stop_browser_session = stop_browser_session
+		return playground_agent
+
+	def test_idle_timeout_skips_an_executing_session(self):
+		async def scenario():
+			playground_agent = self.make_manager()
+			playground_agent.browser_session = 'warm-browser'
+			playground_agent.execution = True
+			playground_agent.last_active_at -= 60
+			idle_task = asyncio.create_task(playground_agent.watch_idle())
+			await asyncio.sleep(0.05)
+			stopped_while_executing = list(playground_agent.stopped_sessions)
+			playground_agent.execution = False
+			await asyncio.wait_for(idle_task, 3)
+			return stopped_while_executing, playground_agent.stopped_sessions
+
+		stopped_while_executing, stopped_sessions = asyncio.run(scenario())
+
+		self.assertEqual(stopped_while_executing, [])
+		self.assertEqual(stopped_sessions, ['warm-browser'])
+
+	@patch('bugowl_agent.agent.reset_browser_session')
+	def test_reset_is_refused_while_executing(self, reset_browser_session):
+		async def scenario():
+			playground_agent = self.make_manager()
+			playground_agent.browser_session = 'warm-browser'
+			playground_agent.stopped = True
+			playground_agent.execution = True
+			refused = await playground_agent.reset()
+			playground_agent.execution = False
+			reset = await playground_agent.reset(clear_storage=True)
+			return refused, reset, playground_agent.stopped
+
+		refused, reset, stopped = asyncio.run(scenario())
+
+		self.assertFalse(refused)
+		self.assertTrue(reset)
+		self.assertFalse(stopped)
+		reset_browser_session.assert_called_once_with('warm-browser', clear_storage=True)
+
+	def test_first_action_latency_is_split_by_warm_and_cold_browser(self):
+		playground_agent = self.make_manager()
+		clock = [100.0]
+
+		with patch('bugowl_agent.agent.time.monotonic', side_effect=lambda: clock[0]):
+			playground_agent.begin_command()
+			playground_agent.browser_session = 'warm-browser'
+			clock[0] += 3.0
+			playground_agent.on_new_step(None, None, 1)
+			for latency in (0.5, 0.25):
+				playground_agent.begin_command()
+				clock[0] += latency
+				playground_agent.on_new_step(None, None, 1)
+			# Later steps of a command are not first actions
+			clock[0] += 10
+			playground_agent.on_new_step(None, None, 2)
+
+		self.assertEqual(
+			playground_agent.latency_stats(),
+			{'warm_commands': 2, 'cold_commands': 1, 'avg_warm_first_action_ms': 375.0, 'avg_cold_first_action_ms': 3000.0},
+		)
+
+	def test_reset_command_reports_a_refusal(self):
+		consumer = RecordingSender()
+		consumer.playground_agent = self.make_manager()
+		consumer.playground_agent.execution = True
+
+		result = asyncio.run(RESET(consumer, clear_storage=False))
+
+		self.assertIsNone(result)
+		self.assertEqual(consumer.messages[0]['ACK'], PLAYCOMMANDS.S2C_ERROR.value)
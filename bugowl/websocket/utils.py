@@ -6,6 +6,8 @@ class PLAYCOMMANDS(enum.Enum):
 	C2S_CONNECT = 'C2S_CONNECT'
 	C2S_RESTART = 'C2S_RESTART'
 	S2C_RESTART = 'S2C_RESTART'
+	C2S_RESET = 'C2S_RESET'
+	S2C_RESET = 'S2C_RESET'
 	S2C_ERROR = 'S2C_ERROR'
 	C2S_LOAD_TASK = 'C2S_LOAD_TASK'
 	S2C_OK = 'S2C_OK'
@@ -26,3 +28,12 @@ class PLAYCOMMANDS(enum.Enum):
 
 
 get_job_streaming_group_name = lambda job_uuid: f'BrowserStreaming_Job_{job_uuid}'
+# Pub/sub channel on which the consumers announce viewers joining (+1) or leaving (-1) the stream of a job.
+get_job_viewers_channel_name = lambda job_uuid: f'BrowserStreaming_Viewers_{job_uuid}'
+get_job_stream_metrics_key = lambda job_uuid: f'BrowserStreaming_Metrics_{job_uuid}'
+# Pub/sub channel the worker publishes the frames of a job on, and the key keeping its latest frame (see frame_relay).
+get_job_frames_channel_name = lambda job_uuid: f'BrowserStreaming_Frames_{job_uuid}'
+get_job_latest_frame_key = lambda job_uuid: f'BrowserStreaming_LatestFrame_{job_uuid}'
+# Group of the playground worker channel serving a session, and the cache key marking a session closed by its client.
+get_playground_session_group_name = lambda session_id: f'PlaygroundSession_{session_id}'
+get_playground_session_closed_key = lambda session_id: f'PlaygroundSession_Closed_{session_id}'
@@ -73,6 +73,17 @@ echo "DJANGO_SETTINGS_MODULE=$DJANGO_SETTINGS_MODULE"
 echo "PATH=$PATH"
 echo "PYTHON_BIN=$PYTHON_BIN"
 
+if [ "$AGENT_WORKER_ROLE" = "playground" ]; then
+    # Runs the playground browsers, the ASGI process only relays the WebSocket messages
+    echo "STARTING PLAYGROUND WORKER"
+    cd /app/bugowl
+    exec $PYTHON_BIN manage.py run_playground_worker
+fi
+
 echo "STARTING CELERY WORKER"
 cd /app/bugowl
+if [ "$AGENT_PERSISTENT_EVENT_LOOP" = "True" ]; then
+    # Jobs run on one shared event loop per process; task threads only wait for them
+    exec /app/.venv/bin/celery -A api.celery_app worker -l info --pool threads --concurrency "${AGENT_MAX_CONCURRENT_JOBS:-4}"
+fi
 exec /app/.venv/bin/celery -A api.celery_app worker -l info
@@ -0,0 +1,118 @@
+"""
+Test that the Agent replays the history of a passing run without the LLM, and stops where the page diverges from it.
+"""
+
+from werkzeug.wrappers import Response
+
+from browser_use import Agent, AgentHistoryList, BrowserProfile, BrowserSession
+from tests.ci.conftest import create_mock_llm
+
+BUTTON_PAGE = '<html><body><button id="next" onclick="document.title = \'clicked\'">Next</button></body></html>'
+CHANGED_PAGE = '<html><body><h1>No buttons here</h1></body></html>'
+
+
+def get_actions(page_url):
+	return [
+		f"""{{
+			"thinking": "Navigating",
+			"evaluation_previous_goal": "Starting task",
+			"memory": "Need to open the page",
+			"next_goal": "Open the page",
+			"action": [{{"go_to_url": {{"url": "{page_url}", "new_tab": false}}}}]
+		}}""",
+		"""{
+			"thinking": "Clicking",
+			"evaluation_previous_goal": "Opened the page",
+			"memory": "Need to click next",
+			"next_goal": "Click next",
+			"action": [{"click_element_by_index": {"index": 0}}]
+		}""",
+	]
+
+
+class TestAgentHistoryReplay:
+	async def record_passing_history(self, browser_session, page_url):
+		"""
+		Run the task once with the LLM and return its history, serialized and loaded again like a saved history.
+		"""
+		await browser_session.navigate('about:blank')
+		agent = Agent(task='Click next', llm=create_mock_llm(get_actions(page_url)), browser_session=browser_session)
+		history = await agent.run(max_steps=5)
+		assert history.is_successful()
+		return AgentHistoryList.load_from_dict(history.model_dump(), agent.AgentOutput)
+
+	async def test_passing_history_is_replayed_without_the_llm(self, httpserver):
+		httpserver.expect_request('/page').respond_with_data(BUTTON_PAGE, content_type='text/html')
+		browser_session = BrowserSession(browser_profile=BrowserProfile(headless=True, user_data_dir=None, keep_alive=True))
+		await browser_session.start()
+
+		try:
+			saved_history = await self.record_passing_history(browser_session, httpserver.url_for('/page'))
+
+			await browser_session.navigate('about:blank')
+			llm = create_mock_llm([])
+			llm_ainvoke = llm.ainvoke
+			agent = Agent(task='Click next', llm=llm, browser_session=browser_session)
+			replayed_step_numbers = []
+
+			async def remember_step(agent):
+				replayed_step_numbers.append(agent.state.n_steps)
+
+			replayed_steps = await agent.replay_history_until_divergence(saved_history, on_step_end=remember_step)
+
+			assert replayed_steps == len(saved_history.history) == 3
+			assert llm_ainvoke.call_count == 0
+			assert agent.state.last_result[-1].is_done
+			assert agent.state.history.is_successful()
+			assert len(agent.state.history.history) == replayed_steps
+			assert len(replayed_step_numbers) == replayed_steps
+			assert (await browser_session.get_current_page()).url == httpserver.url_for('/page')
+		finally:
+			await browser_session.kill()
+
+	async def test_replay_stops_before_an_element_missing_from_the_page(self, httpserver):
+		pages = [BUTTON_PAGE]
+		httpserver.expect_request('/page').respond_with_handler(lambda request: Response(pages[-1], content_type='text/html'))
+		browser_session = BrowserSession(browser_profile=BrowserProfile(headless=True, user_data_dir=None, keep_alive=True))
+		await browser_session.start()
+
+		try:
+			saved_history = await self.record_passing_history(browser_session, httpserver.url_for('/page'))
+			pages.append(CHANGED_PAGE)
+
+			await browser_session.navigate('about:blank')
+			llm = create_mock_llm([])
+			llm_ainvoke = llm.ainvoke
+			agent = Agent(task='Click next', llm=llm, browser_session=browser_session)
+
+			replayed_steps = await agent.replay_history_until_divergence(saved_history)
+
+			# Only the navigation is replayed, the click diverges and is left to the LLM
+			assert replayed_steps == 1
+			assert llm_ainvoke.call_count == 0
+			assert len(agent.state.history.history) == 1
+			assert not agent.state.last_result[-1].is_done
+		finally:
+			await browser_session.kill()
+
+	async def test_replay_stops_after_a_failed_action(self, httpserver):
+		httpserver.expect_request('/page').respond_with_data(BUTTON_PAGE, content_type='text/html')
+		browser_session = BrowserSession(browser_profile=BrowserProfile(headless=True, user_data_dir=None, keep_alive=True))
+		await browser_session.start()
+
+		try:
+			saved_history = await self.record_passing_history(browser_session, httpserver.url_for('/page'))
+			# Without its element the click is replayed as saved, at an index the page doesn't have
+			saved_history.history[1].state.interacted_element = [None]
+			saved_history.history[1].model_output.action[0].set_index(999)
+
+			await browser_session.navigate('about:blank')
+			agent = Agent(task='Click next', llm=create_mock_llm([]), browser_session=browser_session)
+
+			replayed_steps = await agent.replay_history_until_divergence(saved_history)
+
+			assert replayed_steps == 2
+			assert agent.state.last_result[-1].success is False
+			assert len(agent.state.history.history) == 2
+		finally:
+			await browser_session.kill()
@@ -0,0 +1,100 @@
+"""
+Test that the Agent reuses cached LLM responses for identical steps and never caches outputs whose actions failed.
+"""
+
+from browser_use import Agent, BrowserProfile, BrowserSession
+from tests.ci.conftest import create_mock_llm
+
+
+class InMemoryLLMResponseCache:
+	def __init__(self):
+		self.entries = {}
+		self.hits = 0
+		self.misses = 0
+
+	async def get(self, key):
+		output = self.entries.get(key)
+		if output is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return output
+
+	async def set(self, key, output):
+		self.entries[key] = output
+
+	async def invalidate(self, key):
+		self.entries.pop(key, None)
+
+
+class TestAgentLLMResponseCache:
+	async def test_identical_run_is_served_from_cache(self, httpserver):
+		httpserver.expect_request('/page').respond_with_data('<html><body><h1>Cached page</h1></body></html>')
+		browser_session = BrowserSession(browser_profile=BrowserProfile(headless=True, user_data_dir=None, keep_alive=True))
+		await browser_session.start()
+		cache = InMemoryLLMResponseCache()
+		actions = [
+			f"""{{
+				"thinking": "Navigating",
+				"evaluation_previous_goal": "Starting task",
+				"memory": "Need to open the page",
+				"next_goal": "Open the page",
+				"action": [{{"go_to_url": {{"url": "{httpserver.url_for('/page')}", "new_tab": false}}}}]
+			}}"""
+		]
+
+		try:
+			await browser_session.navigate('about:blank')
+			first_llm = create_mock_llm(actions)
+			# the Agent wraps llm.ainvoke for token tracking, so keep the mock to count the real LLM calls
+			first_llm_ainvoke = first_llm.ainvoke
+			first_agent = Agent(task='Open the page', llm=first_llm, browser_session=browser_session, llm_response_cache=cache)
+			await first_agent.run(max_steps=3)
+			first_llm_calls = first_llm_ainvoke.call_count
+			assert cache.entries
+			assert cache.hits == 0
+
+			await browser_session.navigate('about:blank')
+			second_llm = create_mock_llm(actions)
+			second_llm_ainvoke = second_llm.ainvoke
+			second_agent = Agent(task='Open the page', llm=second_llm, browser_session=browser_session, llm_response_cache=cache)
+			history = await second_agent.run(max_steps=3)
+
+			assert cache.hits == first_llm_calls
+			assert second_llm_ainvoke.call_count == 0
+			assert history.is_done()
+			assert history.history[0].state.url == 'about:blank'
+		finally:
+			await browser_session.kill()
+
+	async def test_failed_action_output_is_not_cached(self):
+		browser_session = BrowserSession(browser_profile=BrowserProfile(headless=True, user_data_dir=None, keep_alive=True))
+		await browser_session.start()
+		cache = InMemoryLLMResponseCache()
+		actions = [
+			"""{
+				"thinking": "Clicking",
+				"evaluation_previous_goal": "Starting task",
+				"memory": "Need to click",
+				"next_goal": "Click a missing element",
+				"action": [{"click_element_by_index": {"index": 999}}]
+			}"""
+		]
+
+		try:
+			await browser_session.navigate('about:blank')
+			agent = Agent(
+				task='Click it', llm=create_mock_llm(actions), browser_session=browser_session, llm_response_cache=cache
+			)
+			step_key = None
+
+			async def remember_first_key(agent):
+				nonlocal step_key
+				step_key = step_key or agent.llm_cache_key
+
+			await agent.run(max_steps=2, on_step_end=remember_first_key)
+
+			assert step_key is not None
+			assert step_key not in cache.entries
+		finally:
+			await browser_session.kill()
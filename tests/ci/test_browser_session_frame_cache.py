@@ -0,0 +1,102 @@
+"""
+Test that screenshots of an unchanged viewport are reused across take_screenshot calls and from live streaming captures.
+"""
+
+import asyncio
+import base64
+
+import pytest
+
+from browser_use.browser import BrowserProfile, BrowserSession
+from browser_use.utils import get_image_media_type
+
+
+@pytest.fixture
+async def browser_session():
+	browser_session = BrowserSession(
+		browser_profile=BrowserProfile(headless=True, user_data_dir=None, keep_alive=False, screenshot_reuse_max_age=5.0)
+	)
+	await browser_session.start()
+	yield browser_session
+	await browser_session.kill()
+
+
+@pytest.fixture
+def page_url(httpserver):
+	httpserver.expect_request('/').respond_with_data(
+		"""<html><body>
+		<h1 id="title">Frame cache test</h1>
+		<input id="name" type="text">
+		</body></html>""",
+		content_type='text/html',
+	)
+	return httpserver.url_for('/')
+
+
+class TestFrameCache:
+	async def test_unchanged_page_reuses_screenshot(self, browser_session, page_url):
+		await browser_session.navigate(page_url)
+
+		first = await browser_session.take_screenshot()
+		second = await browser_session.take_screenshot()
+
+		assert second == first
+		assert browser_session.frame_cache.summary()['agent'] == {'captured': 1, 'reused': 1, 'reuse_rate': 0.5}
+
+	async def test_screenshots_are_not_reused_by_default(self, page_url):
+		browser_session = BrowserSession(browser_profile=BrowserProfile(headless=True, user_data_dir=None, keep_alive=False))
+		await browser_session.start()
+		try:
+			await browser_session.navigate(page_url)
+			await browser_session.take_screenshot()
+			await browser_session.take_screenshot()
+
+			assert browser_session.browser_profile.screenshot_reuse_max_age == 0
+			assert 'agent' not in browser_session.frame_cache.summary()
+		finally:
+			await browser_session.kill()
+
+	async def test_dom_mutation_and_typing_invalidate_screenshot(self, browser_session, page_url):
+		await browser_session.navigate(page_url)
+		page = await browser_session.get_current_page()
+
+		await browser_session.take_screenshot()
+		await page.evaluate("document.getElementById('title').textContent = 'Changed'")
+		await browser_session.take_screenshot()
+		# Typing changes the input value, which is not a DOM mutation
+		await page.fill('#name', 'typed')
+		await browser_session.take_screenshot()
+
+		assert browser_session.frame_cache.summary()['agent'] == {'captured': 3, 'reused': 0, 'reuse_rate': 0.0}
+
+	async def test_streaming_capture_is_reused_by_agent(self, browser_session, page_url):
+		await browser_session.navigate(page_url)
+		page = await browser_session.get_current_page()
+		frame_cache = browser_session.frame_cache
+
+		signature = await frame_cache.get_page_signature(page)
+		# Captured like live streaming does, without hiding the caret, which would mutate the DOM
+		jpeg = await page.screenshot(type='jpeg', quality=80, caret='initial')
+		frame_cache.record(page, signature, consumer='stream', data=jpeg, image_format='jpeg', quality=80)
+		screenshot_b64 = await browser_session.take_screenshot()
+
+		assert base64.b64decode(screenshot_b64) == jpeg
+		assert get_image_media_type(screenshot_b64) == 'image/jpeg'
+		assert frame_cache.summary()['agent']['reused'] == 1
+
+	async def test_low_quality_and_old_captures_are_not_reused(self, browser_session, page_url):
+		await browser_session.navigate(page_url)
+		page = await browser_session.get_current_page()
+		frame_cache = browser_session.frame_cache
+
+		signature = await frame_cache.get_page_signature(page)
+		jpeg = await page.screenshot(type='jpeg', quality=30, caret='initial')
+		frame_cache.record(page, signature, consumer='stream', data=jpeg, image_format='jpeg', quality=30)
+		screenshot_b64 = await browser_session.take_screenshot()
+		assert get_image_media_type(screenshot_b64) == 'image/png'
+
+		browser_session.browser_profile.screenshot_reuse_max_age = 0.1
+		await asyncio.sleep(0.2)
+		await browser_session.take_screenshot()
+
+		assert frame_cache.summary()['agent'] == {'captured': 2, 'reused': 0, 'reuse_rate': 0.0}
@@ -0,0 +1,69 @@
+"""
+Test the browser state capture: page metrics measured with the DOM tree, highlights replaced instead of
+stacked, and the per-phase timing breakdown.
+"""
+
+import pytest
+
+from browser_use.browser import BrowserProfile, BrowserSession
+
+
+@pytest.fixture
+def page_url(httpserver):
+	httpserver.expect_request('/').respond_with_data(
+		"""<html>
+		<head><title>State capture test</title></head>
+		<body style="margin: 0">
+			<button id="button1">Button 1</button>
+			<a href="#bottom">Link</a>
+			<div style="height: 5000px"></div>
+			<p id="bottom">Bottom</p>
+		</body>
+		</html>""",
+		content_type='text/html',
+	)
+	return httpserver.url_for('/')
+
+
+@pytest.fixture(params=[True, False], ids=['highlights', 'no-highlights'])
+async def browser_session(request):
+	browser_session = BrowserSession(
+		browser_profile=BrowserProfile(
+			headless=True,
+			user_data_dir=None,
+			keep_alive=False,
+			highlight_elements=request.param,
+			viewport={'width': 1280, 'height': 720},
+		)
+	)
+	await browser_session.start()
+	yield browser_session
+	await browser_session.kill()
+
+
+class TestStateCapture:
+	async def test_state_summary_has_page_metrics_and_timings(self, browser_session, page_url):
+		await browser_session.navigate(page_url)
+		page = await browser_session.get_current_page()
+		await page.evaluate('window.scrollTo(0, 1000)')
+
+		state = await browser_session.get_state_summary(cache_clickable_elements_hashes=False)
+
+		assert state.title == 'State capture test'
+		assert state.screenshot
+		assert len(state.tabs) == 1
+		assert state.page_info is not None
+		assert state.page_info.scroll_y == 1000
+		assert state.pixels_above == 1000
+		assert state.pixels_below == state.page_info.page_height - 1000 - state.page_info.viewport_height
+		assert set(browser_session.state_capture_timings) == {'dom', 'tabs', 'title', 'screenshot', 'total'}
+
+	async def test_highlights_of_previous_capture_are_removed(self, browser_session, page_url):
+		await browser_session.navigate(page_url)
+		page = await browser_session.get_current_page()
+
+		await browser_session.get_state_summary(cache_clickable_elements_hashes=False)
+		await browser_session.get_state_summary(cache_clickable_elements_hashes=False)
+
+		containers = await page.evaluate("document.querySelectorAll('#playwright-highlight-container').length")
+		assert containers == (1 if browser_session.browser_profile.highlight_elements else 0)
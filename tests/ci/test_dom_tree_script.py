@@ -0,0 +1,158 @@
+"""
+Test that the DOM extraction script is installed once per document and only called with its arguments on later steps,
+that incremental extraction patches the previous tree into the same result as a full extraction, and that the compact
+columnar result decodes to the same tree as the per-node map.
+"""
+
+import json
+
+import pytest
+
+from browser_use.browser import BrowserProfile, BrowserSession
+from browser_use.dom.service import DOM_TREE_FUNCTION, DOM_TREE_INSTALL_AND_CALL_JS, DomService
+from browser_use.dom.views import DOMTextNode
+
+
+@pytest.fixture
+async def browser_session():
+	browser_session = BrowserSession(browser_profile=BrowserProfile(headless=True, user_data_dir=None, keep_alive=False))
+	await browser_session.start()
+	yield browser_session
+	await browser_session.kill()
+
+
+@pytest.fixture
+def base_url(httpserver):
+	for path in ('/one', '/two'):
+		httpserver.expect_request(path).respond_with_data(
+			f'<html><body><h1>Page {path}</h1><button id="save">Save</button><a href="/two">Next</a></body></html>',
+			content_type='text/html',
+		)
+	return httpserver.url_for('')
+
+
+class TestDomTreeScript:
+	async def test_installed_once_and_reused(self, browser_session, base_url):
+		await browser_session.navigate(f'{base_url}/one')
+		page = await browser_session.get_current_page()
+		assert not await page.evaluate(f'typeof window.{DOM_TREE_FUNCTION} === "function"')
+
+		first = await DomService(page).get_clickable_elements(highlight_elements=False)
+		assert await page.evaluate(f'typeof window.{DOM_TREE_FUNCTION} === "function"')
+		second = await DomService(page).get_clickable_elements(highlight_elements=False)
+
+		assert [node.tag_name for node in first.selector_map.values()] == ['button', 'a']
+		assert [node.xpath for node in second.selector_map.values()] == [node.xpath for node in first.selector_map.values()]
+
+	async def test_new_documents_get_the_function_from_the_init_script(self, browser_session, base_url):
+		await browser_session.navigate(f'{base_url}/one')
+		page = await browser_session.get_current_page()
+		await DomService(page).get_clickable_elements(highlight_elements=False)
+
+		await browser_session.navigate(f'{base_url}/two')
+		page = await browser_session.get_current_page()
+
+		assert await page.evaluate(f'typeof window.{DOM_TREE_FUNCTION} === "function"')
+		state = await DomService(page).get_clickable_elements(highlight_elements=False)
+		assert len(state.selector_map) == 2
+
+
+def describe_tree(node, depth=0):
+	"""Flatten a DOM tree into comparable lines."""
+	if isinstance(node, DOMTextNode):
+		return [f'{"  " * depth}"{node.text}" visible={node.is_visible}']
+	lines = [
+		f'{"  " * depth}<{node.tag_name}> {node.xpath} {sorted(node.attributes.items())} '
+		f'visible={node.is_visible} top={node.is_top_element} interactive={node.is_interactive} index={node.highlight_index}'
+	]
+	for child in node.children:
+		assert child.parent is node
+		lines.extend(describe_tree(child, depth + 1))
+	return lines
+
+
+@pytest.fixture
+def form_url(httpserver):
+	httpserver.expect_request('/form').respond_with_data(
+		"""<html><body>
+		<h1 id="title">Form</h1>
+		<div id="fields">
+			<input name="first" placeholder="First">
+			<input name="last" placeholder="Last">
+		</div>
+		<button id="submit">Submit</button>
+		</body></html>""",
+		content_type='text/html',
+	)
+	return httpserver.url_for('/form')
+
+
+class TestIncrementalDomExtraction:
+	async def test_unchanged_page_keeps_the_same_tree(self, browser_session, form_url):
+		await browser_session.navigate(form_url)
+		page = await browser_session.get_current_page()
+
+		first = await DomService(page).get_clickable_elements(highlight_elements=False, incremental=True)
+		second = await DomService(page).get_clickable_elements(highlight_elements=False, incremental=True)
+
+		assert second.element_tree is first.element_tree
+		assert [node.xpath for node in second.selector_map.values()] == [node.xpath for node in first.selector_map.values()]
+
+	async def test_patched_tree_matches_a_full_extraction(self, browser_session, form_url):
+		await browser_session.navigate(form_url)
+		page = await browser_session.get_current_page()
+		await DomService(page).get_clickable_elements(highlight_elements=True, incremental=True)
+
+		await page.evaluate("""() => {
+			document.getElementById('title').textContent = 'Changed form';
+			const email = document.createElement('input');
+			email.name = 'email';
+			document.getElementById('fields').prepend(email);
+			document.querySelector('input[name=last]').remove();
+			document.getElementById('submit').setAttribute('aria-label', 'Send');
+		}""")
+		patched = await DomService(page).get_clickable_elements(highlight_elements=True, incremental=True)
+		full = await DomService(page).get_clickable_elements(highlight_elements=True)
+
+		assert describe_tree(patched.element_tree) == describe_tree(full.element_tree)
+		assert {index: node.xpath for index, node in patched.selector_map.items()} == {
+			index: node.xpath for index, node in full.selector_map.items()
+		}
+		containers = await page.evaluate("document.querySelectorAll('#playwright-highlight-container').length")
+		assert containers == 1
+
+	async def test_navigation_rebuilds_the_tree(self, browser_session, base_url):
+		await browser_session.navigate(f'{base_url}/one')
+		page = await browser_session.get_current_page()
+		first = await DomService(page).get_clickable_elements(highlight_elements=False, incremental=True)
+
+		await browser_session.navigate(f'{base_url}/two')
+		page = await browser_session.get_current_page()
+		second = await DomService(page).get_clickable_elements(highlight_elements=False, incremental=True)
+
+		assert second.element_tree is not first.element_tree
+		assert len(second.selector_map) == 2
+
+
+class TestColumnarDomFormat:
+	async def test_columnar_result_decodes_to_the_same_tree(self, browser_session, form_url):
+		await browser_session.navigate(form_url)
+		page = await browser_session.get_current_page()
+		dom_service = DomService(page)
+		args = {'doHighlightElements': False, 'focusHighlightIndex': -1, 'viewportExpansion': 0, 'debugMode': False}
+
+		map_result = await page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, args)
+		columnar_result = await page.evaluate(DOM_TREE_INSTALL_AND_CALL_JS, {**args, 'compact': True})
+		assert columnar_result['format'] == 'columnar'
+		assert len(json.dumps(columnar_result)) < len(json.dumps(map_result))
+
+		map_tree, map_selector_map = await dom_service._construct_dom_tree(map_result)
+		columnar_tree, columnar_selector_map = await dom_service._construct_dom_tree(columnar_result)
+
+		assert describe_tree(columnar_tree) == describe_tree(map_tree)
+		# Slotted nodes whose xpaths are stored relative to their parent
+		assert not hasattr(columnar_tree, '__dict__')
+		assert any(node._xpath_relative for node in columnar_selector_map.values())
+		assert {index: node.xpath for index, node in columnar_selector_map.items()} == {
+			index: node.xpath for index, node in map_selector_map.items()
+		}